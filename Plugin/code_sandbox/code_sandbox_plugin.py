@@ -1,108 +1,476 @@
-import sys
-import json
-import subprocess
-import tempfile
-import os
-
-# 默认配置
-DEFAULT_PYTHON_EXECUTION_TIMEOUT = 10
-DEFAULT_NODEJS_EXECUTION_TIMEOUT = 10
-
-# 加载插件自身配置
-python_execution_timeout = DEFAULT_PYTHON_EXECUTION_TIMEOUT
-nodejs_execution_timeout = DEFAULT_NODEJS_EXECUTION_TIMEOUT
-try:
-    plugin_config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.json")
-    if os.path.exists(plugin_config_path):
-        with open(plugin_config_path, 'r', encoding='utf-8') as f:
-            plugin_config_data = json.load(f)
-            psc = plugin_config_data.get("plugin_specific_config", {})
-            python_execution_timeout = psc.get("python_execution_timeout_seconds", DEFAULT_PYTHON_EXECUTION_TIMEOUT)
-            nodejs_execution_timeout = psc.get("nodejs_execution_timeout_seconds", DEFAULT_NODEJS_EXECUTION_TIMEOUT)
-except Exception as e:
-    print(f"警告: 读取插件 code_sandbox 配置失败: {e}. 将使用默认超时值。", file=sys.stderr)
-
-
-def run_code_sandbox(params_json_str: str):
-    """
-    在“沙盒”中执行代码。目前主要支持Python和Node.js (实验性)。
-    """
-    try:
-        params = json.loads(params_json_str)
-        language = params.get("language", "").lower()
-        code = params.get("code", "")
-
-        if not language or not code:
-            return json.dumps({"status": "错误", "output": "", "error": "请求JSON必须包含 'language' 和 'code' 字段。"})
-
-        if language == "python":
-            script_path = ""
-            try:
-                with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.py', encoding='utf-8') as tmp_script:
-                    tmp_script.write(code)
-                    script_path = tmp_script.name
-                
-                process = subprocess.run(
-                    [sys.executable, script_path], # 使用当前Python解释器
-                    capture_output=True,
-                    text=True,
-                    timeout=python_execution_timeout,
-                    encoding='utf-8',
-                    errors='replace'
-                )
-                if process.returncode == 0:
-                    return json.dumps({"status": "成功", "stdout": process.stdout, "stderr": process.stderr, "return_code": process.returncode})
-                else:
-                    return json.dumps({"status": "执行失败", "stdout": process.stdout, "stderr": process.stderr, "return_code": process.returncode})
-            except subprocess.TimeoutExpired:
-                return json.dumps({"status": "错误", "stdout": "", "stderr": f"Python代码执行超时 ({python_execution_timeout}秒)。", "return_code": -1})
-            except Exception as e:
-                return json.dumps({"status": "错误", "stdout": "", "stderr": f"执行Python代码时发生内部错误: {str(e)}", "return_code": -1})
-            finally:
-                if script_path and os.path.exists(script_path):
-                    os.remove(script_path)
-        
-        elif language == "javascript_node":
-            script_path = ""
-            try:
-                with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.js', encoding='utf-8') as tmp_script:
-                    tmp_script.write(code)
-                    script_path = tmp_script.name
-                
-                process = subprocess.run(
-                    ["node", script_path],
-                    capture_output=True,
-                    text=True,
-                    timeout=nodejs_execution_timeout,
-                    encoding='utf-8',
-                    errors='replace'
-                )
-                if process.returncode == 0:
-                    return json.dumps({"status": "成功", "stdout": process.stdout, "stderr": process.stderr, "return_code": process.returncode})
-                else:
-                    return json.dumps({"status": "执行失败", "stdout": process.stdout, "stderr": process.stderr, "return_code": process.returncode})
-            except FileNotFoundError:
-                 return json.dumps({"status": "错误", "stdout": "", "stderr": "Node.js解释器 (node) 未找到。无法执行JavaScript代码。", "return_code": -1})
-            except subprocess.TimeoutExpired:
-                return json.dumps({"status": "错误", "stdout": "", "stderr": f"JavaScript代码执行超时 ({nodejs_execution_timeout}秒)。", "return_code": -1})
-            except Exception as e:
-                return json.dumps({"status": "错误", "stdout": "", "stderr": f"执行JavaScript代码时发生内部错误: {str(e)}", "return_code": -1})
-            finally:
-                if script_path and os.path.exists(script_path):
-                    os.remove(script_path)
-        else:
-            return json.dumps({"status": "错误", "output": "", "error": f"不支持的语言: '{language}'. 目前仅支持 'python' 和 'javascript_node' (实验性)。"})
-
-    except json.JSONDecodeError:
-        return json.dumps({"status": "错误", "output": "", "error": "输入参数不是有效的JSON字符串。"})
-    except Exception as e:
-        return json.dumps({"status": "错误", "output": "", "error": f"代码沙盒插件发生未知错误: {str(e)}"})
-
-if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        json_param = sys.argv[1]
-        result = run_code_sandbox(json_param)
-        print(result)
-    else:
-        print(json.dumps({"status": "错误", "message": "代码沙盒插件需要JSON参数。"}))
-    sys.stdout.flush()
+import sys
+import json
+import time
+import queue
+import signal
+import socket
+import atexit
+import shutil
+import subprocess
+import threading
+import os
+from collections import deque
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PROJECT_ROOT = os.path.realpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+from plugin_common.plugin_protocol import read_plugin_argument, read_frame, write_frame, FRAME_HEADER, current_conversation_id
+from plugin_common.output_capture import BoundedOutput, PipeReader, omitted_bytes_summary
+
+# 默认配置
+DEFAULT_PYTHON_EXECUTION_TIMEOUT = 10
+DEFAULT_NODEJS_EXECUTION_TIMEOUT = 10
+DEFAULT_PYTHON_POOL_SIZE = 2
+DEFAULT_NODE_POOL_SIZE = 1
+DEFAULT_WORKER_MAX_RUNS = 1
+DEFAULT_MEMORY_LIMIT_MB = 2048
+DEFAULT_MAX_OPEN_FILES = 64
+DEFAULT_PRELOAD_MODULES = ["json", "re", "math", "random", "collections", "itertools", "functools", "datetime",
+                           "decimal", "fractions", "statistics", "string", "textwrap", "typing", "dataclasses"]
+DEFAULT_OUTPUT_HEAD_BYTES = 16384
+DEFAULT_OUTPUT_TAIL_BYTES = 16384
+DEFAULT_SESSIONS_ENABLED = True
+DEFAULT_SESSION_PORT = 3014
+DEFAULT_MAX_SESSIONS = 8
+DEFAULT_SESSION_IDLE_SECONDS = 1800
+DEFAULT_SESSION_MEMORY_LIMIT_MB = 1024
+
+PLUGIN_DIR = os.path.dirname(os.path.abspath(__file__))
+WORKER_SCRIPT = os.path.join(PLUGIN_DIR, "sandbox_worker.py")
+NODE_WORKER_SCRIPT = os.path.join(PLUGIN_DIR, "sandbox_worker.js")
+WORKER_STARTUP_CPU_SECONDS = 2  # 资源限制中额外留给解释器启动与预导入的 CPU 时间
+INTERRUPT_GRACE_SECONDS = 2  # 超时后发送 SIGINT，等待代码中断并返回已有输出的时间
+OUTPUT_JOIN_TIMEOUT_SECONDS = 1
+SESSION_SERVICE_SCRIPT = os.path.join(PLUGIN_DIR, "session_service.py")
+SESSION_TOKEN_FILE = os.path.join(PLUGIN_DIR, "cache", "session_service.token")
+SESSION_SERVICE_LOG_FILE = os.path.join(PROJECT_ROOT, "code_sandbox_session_service.log")
+SESSION_SERVICE_START_TIMEOUT_S = 10
+SESSION_REQUEST_MARGIN_S = 10  # 会话服务请求的超时在代码执行超时之外额外等待的时间 (含创建会话进程)
+
+# 加载插件自身配置
+python_execution_timeout = DEFAULT_PYTHON_EXECUTION_TIMEOUT
+nodejs_execution_timeout = DEFAULT_NODEJS_EXECUTION_TIMEOUT
+python_pool_size = DEFAULT_PYTHON_POOL_SIZE
+node_pool_size = DEFAULT_NODE_POOL_SIZE
+worker_max_runs = DEFAULT_WORKER_MAX_RUNS
+memory_limit_mb = DEFAULT_MEMORY_LIMIT_MB
+max_open_files = DEFAULT_MAX_OPEN_FILES
+preload_modules = DEFAULT_PRELOAD_MODULES
+output_head_bytes = DEFAULT_OUTPUT_HEAD_BYTES
+output_tail_bytes = DEFAULT_OUTPUT_TAIL_BYTES
+sessions_enabled = DEFAULT_SESSIONS_ENABLED
+session_port = DEFAULT_SESSION_PORT
+max_sessions = DEFAULT_MAX_SESSIONS
+session_idle_seconds = DEFAULT_SESSION_IDLE_SECONDS
+session_memory_limit_mb = DEFAULT_SESSION_MEMORY_LIMIT_MB
+try:
+    plugin_config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.json")
+    if os.path.exists(plugin_config_path):
+        with open(plugin_config_path, 'r', encoding='utf-8') as f:
+            plugin_config_data = json.load(f)
+            psc = plugin_config_data.get("plugin_specific_config", {})
+            python_execution_timeout = psc.get("python_execution_timeout_seconds", DEFAULT_PYTHON_EXECUTION_TIMEOUT)
+            nodejs_execution_timeout = psc.get("nodejs_execution_timeout_seconds", DEFAULT_NODEJS_EXECUTION_TIMEOUT)
+            python_pool_size = psc.get("sandbox_python_pool_size", DEFAULT_PYTHON_POOL_SIZE)
+            node_pool_size = psc.get("sandbox_node_pool_size", DEFAULT_NODE_POOL_SIZE)
+            worker_max_runs = psc.get("sandbox_worker_max_runs", DEFAULT_WORKER_MAX_RUNS)
+            memory_limit_mb = psc.get("sandbox_memory_limit_mb", DEFAULT_MEMORY_LIMIT_MB)
+            max_open_files = psc.get("sandbox_max_open_files", DEFAULT_MAX_OPEN_FILES)
+            preload_modules = psc.get("sandbox_preload_modules", DEFAULT_PRELOAD_MODULES)
+            output_head_bytes = psc.get("sandbox_output_head_bytes", DEFAULT_OUTPUT_HEAD_BYTES)
+            output_tail_bytes = psc.get("sandbox_output_tail_bytes", DEFAULT_OUTPUT_TAIL_BYTES)
+            sessions_enabled = psc.get("sandbox_sessions_enabled", DEFAULT_SESSIONS_ENABLED)
+            session_port = psc.get("sandbox_session_port", DEFAULT_SESSION_PORT)
+            max_sessions = psc.get("sandbox_max_sessions", DEFAULT_MAX_SESSIONS)
+            session_idle_seconds = psc.get("sandbox_session_idle_seconds", DEFAULT_SESSION_IDLE_SECONDS)
+            session_memory_limit_mb = psc.get("sandbox_session_memory_limit_mb", DEFAULT_SESSION_MEMORY_LIMIT_MB)
+except Exception as e:
+    print(f"警告: 读取插件 code_sandbox 配置失败: {e}. 将使用默认超时值。", file=sys.stderr)
+
+
+class SandboxWorker:
+    """
+    一个预先启动的沙盒工作进程 (sandbox_worker.py / sandbox_worker.js)，代码通过 stdin 上的帧传入，不写临时文件。
+    Python 工作进程可以连续执行多段代码，结果通过 stdout 上的帧返回；Node.js 工作进程只执行一段代码，输出为进程的 stdout/stderr。
+    """
+
+    def __init__(self, language: str, command: list, limits: list = ()):
+        self.language = language
+        self.runs = 0
+        self.process = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE if language == "node" else None,  # Python 工作进程自身的警告输出到插件的 stderr
+            cwd=PLUGIN_DIR,
+            env={**os.environ, "PYTHONIOENCODING": "utf-8"},
+        )
+        for kind, value in limits:
+            # 工作进程在收到代码前不会执行任何代码，启动后立即设置限制不存在竞争
+            try:
+                resource.prlimit(self.process.pid, kind, (value, value))
+            except (ValueError, OSError) as e:
+                print(f"警告: 设置沙盒工作进程资源限制 {kind} 失败: {e}", file=sys.stderr)
+
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def close(self):
+        if self.alive():
+            self.process.kill()
+        for pipe in (self.process.stdin, self.process.stdout, self.process.stderr):
+            if pipe:
+                try: pipe.close()
+                except OSError: pass
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            pass
+
+    def send_python(self, code: str):
+        self.runs += 1
+        write_frame(self.process.stdin, code.encode('utf-8'))
+        self.process.stdin.flush()
+
+    def wait_python(self, timeout: float) -> dict:
+        """
+        等待 send_python 发送的代码执行完毕。
+        超时时先发送 SIGINT 中断代码 (POSIX)，工作进程照常返回超时前的输出，进程和会话状态得以保留；
+        中断后仍未返回 (或在 Windows 上) 时终止工作进程。超时的结果中 timed_out 为 True。
+        """
+        results = queue.Queue()
+
+        def read_result():
+            try: results.put(read_frame(self.process.stdout))
+            except Exception: results.put(None)
+
+        threading.Thread(target=read_result, daemon=True).start()
+        timed_out = False
+        try:
+            payload = results.get(timeout=timeout)
+        except queue.Empty:
+            timed_out, payload = True, None
+            if os.name == "posix" and self.alive():
+                try:
+                    self.process.send_signal(signal.SIGINT)
+                    payload = results.get(timeout=INTERRUPT_GRACE_SECONDS)
+                except (OSError, queue.Empty):
+                    pass
+            if payload is None:
+                self.close()
+                return {"return_code": -1, "stdout": "", "stderr": "", "timed_out": True}
+        if payload is None:
+            # 工作进程在返回结果前退出，例如代码调用了 os._exit() 或超出 CPU 时间限制
+            return_code = self.process.wait()
+            return {"return_code": return_code, "stdout": "", "stderr": f"沙盒进程意外退出 (退出码: {return_code})。"}
+        result = json.loads(payload)
+        result["timed_out"] = timed_out
+        return result
+
+    def run_node(self, code: str, timeout: float) -> dict:
+        """执行一段代码，边读边丢地捕获输出。超时时终止进程，结果中 timed_out 为 True，stdout/stderr 为超时前的输出。"""
+        self.runs += 1
+        data = code.encode('utf-8')
+        stdout, stderr = BoundedOutput(output_head_bytes, output_tail_bytes), BoundedOutput(output_head_bytes, output_tail_bytes)
+        readers = [PipeReader(self.process.stdout, stdout), PipeReader(self.process.stderr, stderr)]
+        for reader in readers:
+            reader.start()
+        try:
+            with self.process.stdin:
+                self.process.stdin.write(FRAME_HEADER.pack(len(data)) + data)
+        except OSError:
+            pass  # 工作进程已退出，退出码和输出照常返回
+        timed_out = False
+        try:
+            self.process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            timed_out = True
+            self.process.kill()
+            self.process.wait()
+        for reader in readers:
+            reader.join(OUTPUT_JOIN_TIMEOUT_SECONDS)
+        return {"return_code": self.process.returncode, "stdout": stdout.text(), "stderr": stderr.text(),
+                "omitted_bytes": omitted_bytes_summary(stdout=stdout, stderr=stderr), "timed_out": timed_out}
+
+
+class WorkerPool:
+    """
+    某种语言的空闲工作进程池，使调用不必等待解释器启动。
+    用掉的进程在本次执行结束后才在后台补充: 与正在执行的代码同时启动解释器会争用 CPU，在核心较少的机器上反而拖慢本次执行。
+    """
+
+    def __init__(self, language: str, size: int, max_runs: int, timeout: float):
+        self.language = language
+        self.size = max(0, size)
+        self.max_runs = max(1, max_runs) if language == "python" else 1
+        self.timeout = timeout
+        self.idle = deque()
+        self.busy = set()
+        self.lock = threading.Lock()
+
+    def _spawn(self) -> SandboxWorker:
+        cpu_seconds = int(self.timeout * self.max_runs + WORKER_STARTUP_CPU_SECONDS)
+        if self.language == "node" and (resource is None or hasattr(resource, "prlimit")):
+            # 直接启动 node，省去经 sandbox_worker.py 设置限制再 exec 的一次 Python 启动。
+            # Linux 上启动后用 prlimit 设置限制；Windows 上没有 setrlimit，只依靠超时
+            node_command = ["node"] + ([f"--max-old-space-size={memory_limit_mb}"] if memory_limit_mb else []) + [NODE_WORKER_SCRIPT]
+            limits = [(resource.RLIMIT_CPU, cpu_seconds), (resource.RLIMIT_NOFILE, max_open_files)] if resource else []
+            return SandboxWorker("node", node_command, [(kind, value) for kind, value in limits if value])
+        return SandboxWorker(self.language, [
+            sys.executable, WORKER_SCRIPT, self.language, "--cpu-seconds", str(cpu_seconds),
+            "--memory-mb", str(memory_limit_mb), "--max-open-files", str(max_open_files), "--preload", ",".join(preload_modules),
+            *output_limit_args()])
+
+    def acquire(self) -> SandboxWorker:
+        with self.lock:
+            worker = None
+            while self.idle and worker is None:
+                candidate = self.idle.popleft()
+                if candidate.alive():
+                    worker = candidate
+                else:
+                    candidate.close()
+            if worker is None:
+                worker = self._spawn()
+            self.busy.add(worker)
+        return worker
+
+    def release(self, worker: SandboxWorker):
+        with self.lock:
+            self.busy.discard(worker)
+            reuse = worker.alive() and worker.runs < self.max_runs and len(self.idle) < self.size
+            if reuse:
+                self.idle.appendleft(worker)
+        if not reuse:
+            worker.close()
+        self.replenish_in_background()
+
+    def replenish(self):
+        """补充空闲进程。执行完后会放回池中的忙碌进程也计入数量。"""
+        with self.lock:
+            returning = sum(1 for worker in self.busy if worker.runs < self.max_runs)
+            while len(self.idle) + returning < self.size:
+                self.idle.append(self._spawn())
+
+    def replenish_in_background(self):
+        threading.Thread(target=self.replenish, daemon=True).start()
+
+    def shutdown(self):
+        with self.lock:
+            workers, self.idle = list(self.idle), deque()
+        for worker in workers:
+            worker.close()
+
+
+def output_limit_args() -> list:
+    return ["--output-head-bytes", str(output_head_bytes), "--output-tail-bytes", str(output_tail_bytes)]
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+_node_available = None
+
+
+def get_pool(language: str) -> WorkerPool:
+    with _pools_lock:
+        if language not in _pools:
+            if language == "python":
+                _pools[language] = WorkerPool("python", python_pool_size, worker_max_runs, python_execution_timeout)
+            else:
+                _pools[language] = WorkerPool("node", node_pool_size, 1, nodejs_execution_timeout)
+        return _pools[language]
+
+
+@atexit.register
+def shutdown_pools():
+    for pool in list(_pools.values()):
+        pool.shutdown()
+
+
+def format_result(result: dict, timeout_message: str, **extra) -> str:
+    response = {"status": "成功" if result["return_code"] == 0 else "执行失败", "stdout": result["stdout"], "stderr": result["stderr"],
+                "return_code": result["return_code"]}
+    if result.get("timed_out"):
+        response.update(status="错误", return_code=-1, timed_out=True, message=f"{timeout_message}，stdout/stderr 为超时前的输出。")
+    if result.get("omitted_bytes"):
+        response["omitted_bytes"] = result["omitted_bytes"]  # 输出超过 sandbox_output_head_bytes + sandbox_output_tail_bytes 时省略的字节数
+    response.update(extra)
+    return json.dumps(response)
+
+
+def run_python(code: str) -> str:
+    pool = get_pool("python")
+    worker = pool.acquire()
+    try:
+        try:
+            worker.send_python(code)
+        except OSError:
+            # 空闲期间被终止的进程，换一个新进程重试一次
+            pool.release(worker)
+            worker = pool.acquire()
+            worker.send_python(code)
+        return format_result(worker.wait_python(python_execution_timeout), f"Python代码执行超时 ({python_execution_timeout}秒)")
+    except Exception as e:
+        worker.close()
+        return json.dumps({"status": "错误", "stdout": "", "stderr": f"执行Python代码时发生内部错误: {str(e)}", "return_code": -1})
+    finally:
+        pool.release(worker)
+
+
+def run_node(code: str) -> str:
+    global _node_available
+    if _node_available is None:
+        _node_available = shutil.which("node") is not None
+    if not _node_available:
+        return json.dumps({"status": "错误", "stdout": "", "stderr": "Node.js解释器 (node) 未找到。无法执行JavaScript代码。", "return_code": -1})
+
+    pool = get_pool("node")
+    worker = pool.acquire()
+    try:
+        return format_result(worker.run_node(code, nodejs_execution_timeout), f"JavaScript代码执行超时 ({nodejs_execution_timeout}秒)")
+    except Exception as e:
+        return json.dumps({"status": "错误", "stdout": "", "stderr": f"执行JavaScript代码时发生内部错误: {str(e)}", "return_code": -1})
+    finally:
+        pool.release(worker)
+
+
+# --- 会话 (见 session_service.py) ---
+
+def start_session_service():
+    """以独立进程启动会话服务，使会话在插件进程退出后继续存在。"""
+    kwargs = {}
+    if sys.platform == "win32":
+        kwargs["creationflags"] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        kwargs["start_new_session"] = True
+    with open(SESSION_SERVICE_LOG_FILE, 'a', encoding='utf-8') as log_file:
+        subprocess.Popen([sys.executable, SESSION_SERVICE_SCRIPT], cwd=PLUGIN_DIR,
+                         stdin=subprocess.DEVNULL, stdout=log_file, stderr=log_file, **kwargs)
+
+
+def _connect_session_service():
+    return socket.create_connection(("127.0.0.1", session_port), timeout=2)
+
+
+def _read_session_token() -> str:
+    try:
+        with open(SESSION_TOKEN_FILE, 'r', encoding='utf-8') as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+
+def request_session_service(request: dict, timeout_s: float) -> dict:
+    """向会话服务发送请求，服务未运行时自动启动。无法连接时抛出 ConnectionError。"""
+    for attempt in range(2):
+        try:
+            connection = _connect_session_service()
+        except OSError:
+            print("[Sandbox Sessions] 会话服务未运行，正在启动...", file=sys.stderr)
+            start_session_service()
+            deadline = time.monotonic() + SESSION_SERVICE_START_TIMEOUT_S
+            while True:
+                time.sleep(0.2)
+                try:
+                    connection = _connect_session_service()
+                    break
+                except OSError:
+                    if time.monotonic() > deadline:
+                        raise ConnectionError(f"会话服务在 {SESSION_SERVICE_START_TIMEOUT_S} 秒内未能启动，详见 {SESSION_SERVICE_LOG_FILE}。")
+        try:
+            connection.settimeout(timeout_s)
+            connection.sendall((json.dumps({**request, "token": _read_session_token()}, ensure_ascii=False) + "\n").encode('utf-8'))
+            with connection.makefile('rb') as stream:
+                line = stream.readline()
+            if not line:
+                raise ConnectionError("会话服务未返回响应。")
+            response = json.loads(line)
+        except (OSError, ValueError) as e:
+            raise ConnectionError(f"与会话服务通信失败: {e}")
+        finally:
+            connection.close()
+        # 服务刚启动时令牌文件可能尚未写入，稍后重新读取令牌再试一次
+        if response.get("error_kind") != "auth" or attempt:
+            return response
+        time.sleep(0.2)
+
+
+def run_in_session(language: str, name: str, code: str, reset: bool) -> str:
+    if language != "python":
+        return json.dumps({"status": "错误", "stdout": "", "stderr": "会话目前只支持 'python'。", "return_code": -1})
+    if not sessions_enabled:
+        return json.dumps({"status": "错误", "stdout": "", "stderr": "代码沙盒会话已在配置中禁用 (sandbox_sessions_enabled)。", "return_code": -1})
+    # 会话按对话区分，不同对话中同名的会话互不影响
+    key = f"{current_conversation_id() or 'default'}:{name}"
+    try:
+        if reset:
+            response = request_session_service({"op": "reset", "key": key}, SESSION_REQUEST_MARGIN_S)
+            if not response.get("ok"):
+                return json.dumps({"status": "错误", "stdout": "", "stderr": f"重置会话失败: {response.get('error')}", "return_code": -1})
+            if not code:
+                return json.dumps({"status": "成功", "message": f"会话 '{name}' 已重置。", "session": {"name": name, "reset": True}})
+        response = request_session_service({"op": "run", "key": key, "code": code, "timeout": python_execution_timeout},
+                                           python_execution_timeout + SESSION_REQUEST_MARGIN_S)
+    except ConnectionError as e:
+        return json.dumps({"status": "错误", "stdout": "", "stderr": f"无法使用代码沙盒会话: {e}", "return_code": -1})
+
+    session_info = {"name": name, "new": response.get("new", False)}
+    if reset:
+        session_info["reset"] = True
+    if response.get("lost"):
+        session_info["lost"] = True
+        session_info["message"] = "会话进程已结束 (超时后无法中断、超出资源限制或代码退出了解释器)，其中的变量已丢失，下次执行将使用新的会话。"
+    if not response.get("ok"):
+        return json.dumps({"status": "错误", "stdout": "", "stderr": response.get("error", ""), "return_code": -1, "session": session_info})
+    return format_result(response["result"], f"Python代码执行超时 ({python_execution_timeout}秒)", session=session_info)
+
+
+def run_code_sandbox(params_json_str: str):
+    """
+    在“沙盒”中执行代码。目前主要支持Python和Node.js (实验性)。
+    代码交给预先启动的工作进程执行 (见 sandbox_worker.py)，工作进程受 CPU 时间、地址空间和打开文件数限制，
+    执行 sandbox_worker_max_runs 次后 (默认每次) 被替换。
+    指定 'session' 时 Python 代码在该名称的常驻会话中执行，变量在同一对话的多次调用之间保留 (见 session_service.py)；
+    'reset': true 先清空会话。
+    """
+    try:
+        params = json.loads(params_json_str)
+        language = params.get("language", "").lower()
+        code = params.get("code", "")
+        session = params.get("session")
+        reset = params.get("reset") is True
+
+        if session is not None and (not isinstance(session, str) or not session.strip()):
+            return json.dumps({"status": "错误", "output": "", "error": "'session' 必须是非空字符串。"})
+        if not language or not (code or (session and reset)):
+            return json.dumps({"status": "错误", "output": "", "error": "请求JSON必须包含 'language' 和 'code' 字段。"})
+
+        if session:
+            return run_in_session(language, session.strip(), code, reset)
+        if language == "python":
+            return run_python(code)
+        elif language == "javascript_node":
+            return run_node(code)
+        else:
+            return json.dumps({"status": "错误", "output": "", "error": f"不支持的语言: '{language}'. 目前仅支持 'python' 和 'javascript_node' (实验性)。"})
+
+    except json.JSONDecodeError:
+        return json.dumps({"status": "错误", "output": "", "error": "输入参数不是有效的JSON字符串。"})
+    except Exception as e:
+        return json.dumps({"status": "错误", "output": "", "error": f"代码沙盒插件发生未知错误: {str(e)}"})
+
+if __name__ == "__main__":
+    # 单次进程模式下没有后续调用，不预先启动空闲工作进程
+    python_pool_size = node_pool_size = 0
+    json_param = read_plugin_argument()
+    if json_param is not None:
+        result = run_code_sandbox(json_param)
+        print(result)
+    else:
+        print(json.dumps({"status": "错误", "message": "代码沙盒插件需要JSON参数。"}))
+    sys.stdout.flush()
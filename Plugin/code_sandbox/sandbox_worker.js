@@ -0,0 +1,29 @@
+// 代码沙盒的预启动 Node.js 工作进程 (POSIX 上由 sandbox_worker.py 设置资源限制后 exec 启动)。
+// 收到代码前一直等待 stdin；代码是一帧长度前缀的 UTF-8 文本 (格式见 plugin_frame.js)。
+// 收到后关闭 stdin，把代码作为主模块执行 (可以使用 require)，输出直接写到 stdout/stderr，事件循环为空时进程退出。
+// 每个工作进程只执行一段代码。
+
+const path = require('path');
+const Module = require('module');
+const { FrameDecoder } = require('../../plugin_frame');
+
+const SANDBOX_FILENAME = path.join(process.cwd(), '[sandbox].js');
+
+function runSnippet(code) {
+    const sandboxModule = new Module(SANDBOX_FILENAME, null);
+    sandboxModule.filename = SANDBOX_FILENAME;
+    sandboxModule.paths = Module._nodeModulePaths(process.cwd());
+    process.mainModule = sandboxModule;
+    process.argv = [process.argv[0], SANDBOX_FILENAME];
+    sandboxModule._compile(code, SANDBOX_FILENAME);
+}
+
+const decoder = new FrameDecoder();
+const onData = (chunk) => {
+    const frames = decoder.push(chunk);
+    if (frames.length === 0) return;
+    process.stdin.off('data', onData);
+    process.stdin.destroy();
+    runSnippet(frames[0].toString('utf-8'));
+};
+process.stdin.on('data', onData);
@@ -0,0 +1,195 @@
+import os
+import sys
+import json
+import math
+import signal
+import argparse
+import builtins
+import linecache
+import traceback
+import importlib
+
+PROJECT_ROOT = os.path.realpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+from plugin_common.plugin_protocol import read_frame, write_frame
+from plugin_common.output_capture import BoundedOutput, PipeReader, omitted_bytes_summary
+
+# 代码沙盒的预启动工作进程，由 code_sandbox_plugin.py 的进程池提前启动，收到代码前一直阻塞在 stdin 上。
+# 启动时先用 setrlimit 限制 CPU 时间、地址空间和打开的文件数 (仅 POSIX)，然后:
+#   python: 预先导入常用模块，之后循环接收代码。每段代码是 stdin 上的一帧 UTF-8 文本，在新的 __main__ 命名空间中执行
+#           (--persistent 时所有代码共用同一个命名空间，用于会话)，
+#           执行期间文件描述符 1/2 被重定向到管道 (子进程的输出同样会被捕获，每个流只保留开头与结尾各
+#           --output-head-bytes / --output-tail-bytes 字节)，结束后从原 stdout 返回一帧 JSON:
+#           {"return_code": 0, "stdout": "...", "stderr": "...", "omitted_bytes": {"stdout": 省略的字节数}}。stdin 关闭时退出。
+#           执行超时时插件发送 SIGINT，代码中抛出 KeyboardInterrupt，照常返回超时前的输出。
+#   node:   设置限制后 exec 为 node sandbox_worker.js。Node 工作进程只执行一段代码，输出直接写到 stdout/stderr，
+#           事件循环为空时进程退出，与原先执行脚本文件的方式一致。
+
+SANDBOX_FILENAME = "<sandbox>"
+OUTPUT_JOIN_TIMEOUT_SECONDS = 1  # 代码启动的后台子进程仍持有输出管道时，最多等待这么久
+_code_running = False
+
+
+def interrupt_code(signum, frame):
+    # 只中断正在执行的代码；在读取代码、返回结果期间收到的 SIGINT 被忽略，以免破坏协议帧
+    if _code_running:
+        raise KeyboardInterrupt
+
+
+def limit_cpu_for_next_run(cpu_seconds_per_run: int):
+    # 会话进程长期存在，CPU 时间限制按每次执行计算: 软限制设为已用时间加上本次允许的时间，超出时进程收到 SIGXCPU
+    try:
+        import resource
+    except ImportError:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    soft = math.ceil(usage.ru_utime + usage.ru_stime) + cpu_seconds_per_run
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def apply_limits(cpu_seconds: int, memory_mb: int, max_open_files: int):
+    try:
+        import resource
+    except ImportError:  # Windows 没有 setrlimit，只依靠调用方的超时
+        return
+    limits = [(resource.RLIMIT_CPU, cpu_seconds), (resource.RLIMIT_NOFILE, max_open_files)]
+    if memory_mb:
+        limits.append((resource.RLIMIT_AS, memory_mb * 1024 * 1024))
+    for kind, value in limits:
+        if not value:
+            continue
+        _, hard = resource.getrlimit(kind)
+        if hard != resource.RLIM_INFINITY:
+            value = min(value, hard)
+        try:
+            resource.setrlimit(kind, (value, value))
+        except (ValueError, OSError) as e:
+            print(f"警告: 沙盒工作进程设置资源限制 {kind} 失败: {e}", file=sys.stderr)
+
+
+def exit_code(e: SystemExit) -> int:
+    if e.code is None:
+        return 0
+    if isinstance(e.code, int):
+        return e.code
+    print(e.code, file=sys.stderr)
+    return 1
+
+
+def new_namespace() -> dict:
+    return {"__name__": "__main__", "__builtins__": builtins, "__file__": SANDBOX_FILENAME}
+
+
+def run_snippet(code: str, parked_fd: int, namespace: dict, output_limits: tuple) -> dict:
+    global _code_running
+    linecache.cache[SANDBOX_FILENAME] = (len(code), None, code.splitlines(True), SANDBOX_FILENAME)  # 使 traceback 能显示源代码行
+    outputs, readers = [], []
+    for fd in (1, 2):
+        read_fd, write_fd = os.pipe()
+        os.dup2(write_fd, fd)
+        os.close(write_fd)
+        output = BoundedOutput(*output_limits)
+        reader = PipeReader(os.fdopen(read_fd, 'rb'), output)
+        reader.start()
+        outputs.append(output)
+        readers.append(reader)
+
+    return_code = 0
+    try:
+        _code_running = True
+        try:
+            exec(compile(code, SANDBOX_FILENAME, "exec"), namespace)
+        finally:
+            _code_running = False
+    except SystemExit as e:
+        return_code = exit_code(e)
+    except BaseException as error:
+        # 不显示工作进程自身的调用帧 (执行代码的 exec 与超时中断的信号处理函数)
+        report = traceback.TracebackException.from_exception(error)
+        report.stack = traceback.StackSummary.from_list(
+            [frame for frame in report.stack if frame.filename != interrupt_code.__code__.co_filename])
+        print("".join(report.format()), end="", file=sys.stderr)
+        return_code = 1
+    finally:
+        for stream in (sys.stdout, sys.stderr):
+            try:
+                stream.flush()
+            except Exception:
+                pass
+        # 恢复 1/2 后管道的写端全部关闭，读取线程随之结束
+        os.dup2(parked_fd, 1)
+        os.dup2(parked_fd, 2)
+        for reader in readers:
+            reader.join(OUTPUT_JOIN_TIMEOUT_SECONDS)
+    return {"return_code": return_code, "stdout": outputs[0].text(), "stderr": outputs[1].text(),
+            "omitted_bytes": omitted_bytes_summary(stdout=outputs[0], stderr=outputs[1])}
+
+
+def serve_python(preload: list, persistent: bool, cpu_seconds_per_run: int, output_limits: tuple):
+    # 协议帧使用原 stdout 的副本；1/2 在两次执行之间指向原 stderr，遗留的输出不会混入协议帧
+    protocol_out = os.fdopen(os.dup(1), 'wb')
+    parked_fd = os.dup(2)
+    os.dup2(parked_fd, 1)
+    for stream in (sys.stdout, sys.stderr):
+        stream.reconfigure(encoding='utf-8', errors='replace')
+
+    for module_name in preload:
+        try:
+            importlib.import_module(module_name)
+        except Exception as e:
+            print(f"警告: 沙盒工作进程预导入模块 {module_name} 失败: {e}", file=sys.stderr)
+
+    sys.argv = [SANDBOX_FILENAME]
+    signal.signal(signal.SIGINT, interrupt_code)
+    namespace = new_namespace()
+    while True:
+        payload = read_frame(sys.stdin.buffer)
+        if payload is None:
+            return
+        if cpu_seconds_per_run:
+            limit_cpu_for_next_run(cpu_seconds_per_run)
+        result = run_snippet(payload.decode('utf-8', errors='replace'), parked_fd, namespace if persistent else new_namespace(),
+                             output_limits)
+        write_frame(protocol_out, json.dumps(result, ensure_ascii=False).encode('utf-8'))
+        protocol_out.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("language", choices=["python", "node"])
+    parser.add_argument("--cpu-seconds", type=float, default=0)
+    parser.add_argument("--memory-mb", type=int, default=0)
+    parser.add_argument("--max-open-files", type=int, default=0)
+    parser.add_argument("--preload", default="")
+    parser.add_argument("--persistent", action="store_true")
+    parser.add_argument("--cpu-seconds-per-run", type=float, default=0)
+    parser.add_argument("--output-head-bytes", type=int, default=32768)
+    parser.add_argument("--output-tail-bytes", type=int, default=32768)
+    args = parser.parse_args()
+
+    cpu_seconds = math.ceil(args.cpu_seconds)
+    if args.language == "node":
+        # V8 启动时就会保留大量虚拟地址空间，RLIMIT_AS 会使 node 无法启动，因此改用 --max-old-space-size 限制堆大小
+        apply_limits(cpu_seconds, 0, args.max_open_files)
+        node_args = ["node"] + ([f"--max-old-space-size={args.memory_mb}"] if args.memory_mb else [])
+        node_args.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "sandbox_worker.js"))
+        try:
+            os.execvp("node", node_args)
+        except OSError as e:
+            print(f"Node.js解释器 (node) 启动失败: {e}", file=sys.stderr)
+            sys.exit(127)
+
+    apply_limits(cpu_seconds, args.memory_mb, args.max_open_files)
+    serve_python([name for name in args.preload.split(",") if name], args.persistent, math.ceil(args.cpu_seconds_per_run),
+                 (args.output_head_bytes, args.output_tail_bytes))
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
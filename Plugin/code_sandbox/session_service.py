@@ -0,0 +1,239 @@
+import os
+import sys
+import json
+import time
+import math
+import asyncio
+import secrets
+import threading
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import code_sandbox_plugin as sandbox
+
+# 代码沙盒的常驻会话服务。
+# 带 "session" 参数的 Python 代码不交给一次性的工作进程池，而是交给本服务: 每个会话对应一个长期存在的
+# sandbox_worker.py --persistent 进程 (内核)，多次执行共用同一个命名空间，变量、函数和导入的模块在调用之间保留。
+#   - 会话以 "<对话标识>:<会话名>" 为键 (对话标识由代理传入，见 plugin_protocol.current_conversation_id)，不同对话互不影响；
+#   - 每个内核进程的地址空间限制为 sandbox_session_memory_limit_mb，CPU 时间按每次执行限制；
+#   - 空闲超过 sandbox_session_idle_seconds 的会话被关闭，会话数超过 sandbox_max_sessions 时关闭最久未使用的会话；
+#   - 执行超时时先中断代码 (KeyboardInterrupt)，会话保留；无法中断或内核进程退出 (例如超出 CPU 时间) 时会话被关闭，
+#     其中的状态丢失，下次执行时重新创建；
+#   - 没有会话并且空闲超过 sandbox_session_idle_seconds 后服务自行退出，插件下次使用会话时重新启动。
+# 由插件在首次使用会话时以独立进程启动 (code_sandbox_plugin.start_session_service)。
+# 服务只监听 127.0.0.1；启动时生成随机令牌并写入 cache/session_service.token (仅当前用户可读)，
+# 请求必须带有该令牌，避免本机其他用户借助会话以当前用户身份执行代码。
+#
+# 请求: {"op": "run", "token": "...", "key": "...", "code": "...", "timeout": 15}
+# 响应: {"ok": true, "result": {"return_code": 0, "stdout": "...", "stderr": "..."}, "new": true, "lost": false}
+#        lost 为 true 表示本次执行后会话已被关闭 (超时后无法中断或内核进程退出)
+# 其他操作: {"op": "reset", "key": "..."}, {"op": "stats"}, {"op": "shutdown"}
+# 出错时: {"ok": false, "error": "...", "error_kind": "auth" | "busy" | "internal"}
+
+STREAM_LIMIT_BYTES = 64 * 1024 * 1024
+MAINTENANCE_INTERVAL_S = 5
+
+
+def write_token_file(token: str):
+    os.makedirs(os.path.dirname(sandbox.SESSION_TOKEN_FILE), exist_ok=True)
+    temp_path = f"{sandbox.SESSION_TOKEN_FILE}.{os.getpid()}.tmp"
+    fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(token)
+    os.replace(temp_path, sandbox.SESSION_TOKEN_FILE)
+
+
+class Session:
+    __slots__ = ("key", "worker", "lock", "last_used", "runs")
+
+    def __init__(self, key: str, worker: sandbox.SandboxWorker):
+        self.key = key
+        self.worker = worker
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+        self.runs = 0
+
+
+class SessionManager:
+    def __init__(self):
+        self.max_sessions = max(1, sandbox.max_sessions)
+        self.idle_timeout_s = sandbox.session_idle_seconds
+        self.lock = threading.Lock()
+        self.sessions = OrderedDict()  # 键 -> Session，按最近使用排序
+        self.stats = {"runs": 0, "sessions_created": 0, "resets": 0, "evicted_idle": 0, "evicted_lru": 0, "lost": 0}
+
+    def _spawn_kernel(self) -> sandbox.SandboxWorker:
+        cpu_seconds_per_run = math.ceil(sandbox.python_execution_timeout) + sandbox.WORKER_STARTUP_CPU_SECONDS
+        return sandbox.SandboxWorker("python", [
+            sys.executable, sandbox.WORKER_SCRIPT, "python", "--persistent", "--cpu-seconds-per-run", str(cpu_seconds_per_run),
+            "--memory-mb", str(sandbox.session_memory_limit_mb), "--max-open-files", str(sandbox.max_open_files),
+            "--preload", ",".join(sandbox.preload_modules), *sandbox.output_limit_args()])
+
+    def _close_sessions(self, sessions):
+        for session in sessions:
+            session.worker.close()
+
+    def _checkout(self, key: str):
+        """返回 (会话, 是否新建)。会话数超过上限时关闭最久未使用的空闲会话。"""
+        evicted = []
+        with self.lock:
+            session = self.sessions.get(key)
+            if session is not None and not session.worker.alive():
+                del self.sessions[key]  # 内核进程在空闲期间退出
+                evicted.append(session)
+                self.stats["lost"] += 1
+                session = None
+            created = session is None
+            if created:
+                session = Session(key, self._spawn_kernel())
+                self.sessions[key] = session
+                self.stats["sessions_created"] += 1
+            self.sessions.move_to_end(key)
+            session.last_used = time.monotonic()
+            for other in list(self.sessions.values()):
+                if len(self.sessions) <= self.max_sessions:
+                    break
+                if other is not session and not other.lock.locked():
+                    del self.sessions[other.key]
+                    evicted.append(other)
+                    self.stats["evicted_lru"] += 1
+        self._close_sessions(evicted)
+        return session, created
+
+    def _discard(self, session: Session):
+        with self.lock:
+            if self.sessions.get(session.key) is session:
+                del self.sessions[session.key]
+        session.worker.close()
+
+    def run(self, request: dict) -> dict:
+        key, code = str(request["key"]), request["code"]
+        timeout = float(request.get("timeout") or sandbox.python_execution_timeout)
+        session, created = self._checkout(key)
+        if not session.lock.acquire(timeout=timeout):
+            return {"ok": False, "error": "该会话正在执行其他代码，请稍后再试。", "error_kind": "busy"}
+        try:
+            self.stats["runs"] += 1
+            session.runs += 1
+            try:
+                session.worker.send_python(code)
+                # 超时的代码被 SIGINT 中断后会话照常保留，只有无法中断时内核进程才被终止
+                result = session.worker.wait_python(timeout)
+            except OSError as e:
+                # 内核进程已退出，管道写入失败
+                self.stats["lost"] += 1
+                self._discard(session)
+                result = {"return_code": -1, "stdout": "", "stderr": f"会话进程已退出: {e}"}
+            lost = not session.worker.alive()
+            if lost and self.sessions.get(key) is session:
+                self.stats["lost"] += 1
+                self._discard(session)
+            session.last_used = time.monotonic()
+            return {"ok": True, "result": result, "new": created, "lost": lost}
+        finally:
+            session.lock.release()
+
+    def reset(self, request: dict) -> dict:
+        with self.lock:
+            session = self.sessions.pop(str(request["key"]), None)
+        if session is not None:
+            self.stats["resets"] += 1
+            session.worker.close()
+        return {"ok": True, "existed": session is not None}
+
+    def evict_idle(self):
+        if self.idle_timeout_s <= 0:
+            return
+        now = time.monotonic()
+        with self.lock:
+            expired = [session for session in self.sessions.values()
+                       if now - session.last_used > self.idle_timeout_s and not session.lock.locked()]
+            for session in expired:
+                del self.sessions[session.key]
+            self.stats["evicted_idle"] += len(expired)
+        self._close_sessions(expired)
+
+    def describe(self) -> dict:
+        now = time.monotonic()
+        with self.lock:
+            sessions = [{"key": session.key, "runs": session.runs, "idle_seconds": round(now - session.last_used, 1),
+                         "busy": session.lock.locked(), "pid": session.worker.process.pid} for session in self.sessions.values()]
+        return {**self.stats, "sessions": sessions, "max_sessions": self.max_sessions}
+
+    def close(self):
+        with self.lock:
+            sessions, self.sessions = list(self.sessions.values()), OrderedDict()
+        self._close_sessions(sessions)
+
+
+async def serve(port: int):
+    manager = SessionManager()
+    loop = asyncio.get_running_loop()
+    # 每个会话同一时间最多执行一段代码，线程数按会话上限设置，避免某个会话的长时间执行阻塞其他会话
+    executor = ThreadPoolExecutor(max_workers=manager.max_sessions + 2)
+    stop_event = asyncio.Event()
+    last_activity = [time.monotonic()]
+    token = secrets.token_hex(16)
+    handlers = {"run": manager.run, "reset": manager.reset}
+
+    async def handle_client(reader, writer):
+        try:
+            line = await reader.readline()
+            if not line:
+                return
+            request = json.loads(line)
+            last_activity[0] = time.monotonic()
+            op = request.get("op")
+            if not secrets.compare_digest(str(request.get("token", "")), token):
+                response = {"ok": False, "error": "会话服务令牌无效。", "error_kind": "auth"}
+            elif op in handlers:
+                response = await loop.run_in_executor(executor, handlers[op], request)
+            elif op == "stats":
+                response = {"ok": True, "stats": manager.describe()}
+            elif op == "shutdown":
+                response = {"ok": True}
+                stop_event.set()
+            else:
+                response = {"ok": False, "error": f"未知操作 '{op}'", "error_kind": "internal"}
+            last_activity[0] = time.monotonic()
+        except Exception as e:
+            traceback.print_exc(file=sys.stderr)
+            response = {"ok": False, "error": f"{type(e).__name__}: {e}", "error_kind": "internal"}
+        try:
+            writer.write((json.dumps(response, ensure_ascii=False) + "\n").encode('utf-8'))
+            await writer.drain()
+            writer.close()
+        except Exception:
+            pass
+
+    async def maintenance():
+        idle_timeout_s = manager.idle_timeout_s
+        while not stop_event.is_set():
+            await asyncio.sleep(MAINTENANCE_INTERVAL_S)
+            await loop.run_in_executor(executor, manager.evict_idle)
+            if idle_timeout_s > 0 and not manager.sessions and time.monotonic() - last_activity[0] > idle_timeout_s:
+                print(f"[Sandbox Sessions] 没有会话且空闲超过 {idle_timeout_s} 秒，关闭会话服务。", file=sys.stderr)
+                stop_event.set()
+
+    server = await asyncio.start_server(handle_client, "127.0.0.1", port, limit=STREAM_LIMIT_BYTES)
+    write_token_file(token)
+    print(f"[Sandbox Sessions] 已在 127.0.0.1:{port} 上启动 (PID: {os.getpid()})，最多 {manager.max_sessions} 个会话，"
+          f"每个会话内存上限 {sandbox.session_memory_limit_mb} MB", file=sys.stderr)
+    maintenance_task = asyncio.create_task(maintenance())
+    async with server:
+        await stop_event.wait()
+    maintenance_task.cancel()
+    manager.close()
+    executor.shutdown(wait=False)
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(serve(sandbox.session_port))
+    except OSError as e:
+        # 端口已被占用，通常意味着另一个服务实例已在运行
+        print(f"[Sandbox Sessions] 启动失败: {e}", file=sys.stderr)
+        sys.exit(1)
+    except KeyboardInterrupt:
+        pass
@@ -1,54 +1,226 @@
-import os
-import sys
-
-# 注意：此插件的路径权限由根目录的 config.json 中的 file_operations_allowed_base_paths 控制
-# 但此插件本身只是读取，如果未来根配置想对此类只读操作也进行限制，则需要在这里添加逻辑。
-# 目前假设其访问的路径是用户已经认可的。
-
-def list_directory(target_path):
-    """
-    列出指定路径下的文件和文件夹。
-    返回一个结构化的字符串描述。
-    """
-    try:
-        resolved_path = os.path.realpath(target_path)
-
-        if not os.path.exists(resolved_path):
-            return f"错误：路径 '{target_path}' (解析为 '{resolved_path}') 不存在。"
-        if not os.path.isdir(resolved_path):
-            return f"错误：路径 '{target_path}' (解析为 '{resolved_path}') 不是一个文件夹。"
-
-        items = os.listdir(resolved_path)
-        if not items:
-            return f"目录 '{resolved_path}' 为空。"
-
-        files = []
-        directories = []
-        for item in items:
-            item_path = os.path.join(resolved_path, item)
-            if os.path.isdir(item_path):
-                directories.append(f"[D] {item}")
-            else:
-                files.append(f"[F] {item}")
-        
-        output = f"目录 '{resolved_path}' 下的内容：\n"
-        if directories:
-            output += "子文件夹:\n" + "\n".join(f"  {d}" for d in directories) + "\n"
-        if files:
-            output += "文件:\n" + "\n".join(f"  {f}" for f in files) + "\n"
-        
-        return output.strip()
-
-    except PermissionError:
-        return f"错误：没有权限访问路径 '{target_path}'。"
-    except Exception as e:
-        return f"列出目录 '{target_path}' 时发生未知错误: {str(e)}"
-
-if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        directory_path_param = sys.argv[1]
-        result = list_directory(directory_path_param)
-        print(result)
-    else:
-        print("错误：列出目录插件需要一个文件夹路径作为参数。请使用格式：[列出目录]文件夹路径[/列出目录]")
-    sys.stdout.flush()
+import os
+import sys
+import json
+import time
+import base64
+
+PROJECT_ROOT = os.path.realpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+from plugin_common.directory_walk import walk_directory
+from plugin_common import directory_index
+from plugin_common.plugin_protocol import read_plugin_argument
+
+# 注意：此插件的路径权限由根目录的 config.json 中的 file_operations_allowed_base_paths 控制
+# 但此插件本身只是读取，如果未来根配置想对此类只读操作也进行限制，则需要在这里添加逻辑。
+# 目前假设其访问的路径是用户已经认可的。
+
+# 默认配置值
+DEFAULT_MAX_DEPTH = 2
+DEFAULT_MAX_ENTRIES = 300
+DEFAULT_IGNORE_NAMES = [".git", "node_modules", "__pycache__", ".venv", "venv", ".idea", ".vscode", ".DS_Store"]
+
+# 加载插件自身配置
+default_max_depth = DEFAULT_MAX_DEPTH
+default_max_entries = DEFAULT_MAX_ENTRIES
+ignore_names = DEFAULT_IGNORE_NAMES
+respect_gitignore = True
+try:
+    plugin_config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.json")
+    if os.path.exists(plugin_config_path):
+        with open(plugin_config_path, 'r', encoding='utf-8') as f:
+            psc = json.load(f).get("plugin_specific_config", {})
+            default_max_depth = psc.get("default_max_depth", DEFAULT_MAX_DEPTH)
+            default_max_entries = psc.get("max_entries", DEFAULT_MAX_ENTRIES)
+            ignore_names = psc.get("ignore_names", DEFAULT_IGNORE_NAMES)
+            respect_gitignore = psc.get("respect_gitignore", True)
+except Exception as e:
+    print(f"警告: 读取插件 directory_lister 配置失败: {e}. 将使用默认值。", file=sys.stderr)
+
+
+def parse_request_argument(argument: str):
+    """
+    参数可以是文件夹路径字符串，也可以是JSON对象:
+    {"path": "...", "max_depth": 3, "include": ["*.py"], "exclude": ["tests/"], "show_size": true, "show_mtime": true,
+     "no_ignore": true, "max_entries": 500, "cursor": "..."}
+    或 {"path": "...", "changes_since": "上一次结果中的变更令牌"}，只列出此后发生的变化。
+    返回 (path, options)。
+    """
+    stripped = argument.strip()
+    if stripped.startswith("{"):
+        try:
+            params = json.loads(stripped)
+            if isinstance(params, dict):
+                return str(params.get("path", "")).strip(), params
+        except json.JSONDecodeError:
+            pass
+    return stripped, {}
+
+
+def encode_cursor(path_keys) -> str:
+    return base64.urlsafe_b64encode(json.dumps(path_keys, ensure_ascii=False).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: str):
+    keys = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+    if not isinstance(keys, list) or not all(isinstance(key, list) and len(key) == 2 for key in keys):
+        raise ValueError("cursor 格式错误")
+    return keys
+
+
+def as_pattern_list(value):
+    if value is None:
+        return None
+    return [value] if isinstance(value, str) else list(value)
+
+
+def format_size(size: int) -> str:
+    if size < 1024:
+        return f"{size} B"
+    if size < 1024 * 1024:
+        return f"{size / 1024:.1f} KB"
+    if size < 1024 * 1024 * 1024:
+        return f"{size / (1024 * 1024):.1f} MB"
+    return f"{size / (1024 * 1024 * 1024):.2f} GB"
+
+
+def format_entry(entry, show_size: bool, show_mtime: bool) -> str:
+    line = "  " * (entry.depth - 1) + entry.name + ("/" if entry.is_dir else "")
+    if entry.is_symlink:
+        link_target = getattr(entry.dir_entry, "link_target", None)  # 来自目录索引时已读取
+        try:
+            line += f" -> {link_target or os.readlink(entry.dir_entry.path)}"
+        except OSError:
+            line += " -> ?"
+    if entry.depth_limited:
+        line += " …"
+    if entry.error:
+        line += f" [无法打开: {entry.error}]"
+    if (show_size and not entry.is_dir) or show_mtime:
+        try:
+            stat = entry.dir_entry.stat(follow_symlinks=False)
+            if show_size and not entry.is_dir:
+                line += f"  {format_size(stat.st_size)}"
+            if show_mtime:
+                line += f"  {time.strftime('%Y-%m-%d %H:%M', time.localtime(stat.st_mtime))}"
+        except OSError:
+            pass
+    return line
+
+
+def list_changes(target_path: str, resolved_path: str, token: str) -> str:
+    if not directory_index.is_indexed_path(resolved_path):
+        return "错误：changes_since 只支持 file_operations_allowed_base_paths 下的文件夹 (且需启用目录索引)。"
+    try:
+        result = directory_index.changes_since(resolved_path, str(token), default_max_entries)
+    except ConnectionError as e:
+        return f"错误：目录索引服务不可用 ({e})，请直接重新列出目录。"
+    if result["expired"]:
+        return (f"变更令牌已失效 (目录索引服务已重启或变化记录过多)，请重新列出目录 '{resolved_path}'。\n"
+                f"[变更令牌: {result['token']}]")
+    marks = {"added": "+", "removed": "-", "modified": "~"}
+    lines = [f"{marks[change['change']]} {change['path']}{'/' if change['is_dir'] else ''}" for change in result["changes"]]
+    if not lines:
+        output = f"目录 '{resolved_path}' 自该令牌以来没有变化。"
+    else:
+        output = f"目录 '{resolved_path}' 自该令牌以来的变化 (+ 新增，- 删除，~ 修改)：\n" + "\n".join(lines)
+        if result["has_more"]:
+            output += f"\n[变化超过 {default_max_entries} 项，只显示前 {default_max_entries} 项，建议重新列出目录]"
+    return output + f"\n[变更令牌: {result['token']}，可使用 {json.dumps({'path': target_path, 'changes_since': result['token']}, ensure_ascii=False)} 查询此后的变化]"
+
+
+def list_directory(target_path):
+    """
+    列出指定路径下的文件和文件夹，以缩进的树形格式返回。
+    参数为路径时按默认深度列出；为JSON对象时可指定深度、过滤条件、是否显示大小和修改时间，
+    条目数达到上限时返回 cursor，用于继续列出剩余部分。
+    """
+    target_path, options = parse_request_argument(target_path)
+    try:
+        if not target_path:
+            return "错误：未提供文件夹路径。"
+        resolved_path = os.path.realpath(target_path)
+
+        if not os.path.exists(resolved_path):
+            return f"错误：路径 '{target_path}' (解析为 '{resolved_path}') 不存在。"
+        if not os.path.isdir(resolved_path):
+            return f"错误：路径 '{target_path}' (解析为 '{resolved_path}') 不是一个文件夹。"
+        if options.get("changes_since"):
+            return list_changes(target_path, resolved_path, options["changes_since"])
+
+        try:
+            max_depth = int(options.get("max_depth", default_max_depth))
+            max_entries = int(options.get("max_entries", default_max_entries))
+            cursor_key = decode_cursor(options["cursor"]) if options.get("cursor") else None
+        except (TypeError, ValueError) as e:
+            return f"错误：参数无效 ({e})。max_depth 和 max_entries 必须是正整数，cursor 应原样使用上一次结果中给出的值。"
+        if max_depth < 1 or max_entries < 1:
+            return "错误：max_depth 和 max_entries 必须是正整数。"
+        show_size = bool(options.get("show_size", False))
+        show_mtime = bool(options.get("show_mtime", False))
+        no_ignore = bool(options.get("no_ignore", False))
+
+        walk_options = dict(
+            max_depth=max_depth,
+            include=as_pattern_list(options.get("include")), exclude=as_pattern_list(options.get("exclude")),
+            ignore_names=() if no_ignore else ignore_names, respect_gitignore=respect_gitignore and not no_ignore,
+            cursor_key=cursor_key)
+        entries, token = None, None
+        if directory_index.is_indexed_path(resolved_path):
+            # 允许的工作目录下的列出由目录索引服务从内存中回答，多取一项用于判断是否还有更多条目
+            try:
+                entries, _, token = directory_index.list_entries(resolved_path, max_entries + 1, **walk_options)
+            except ConnectionError as e:
+                print(f"[directory_lister] 目录索引服务不可用，直接遍历文件系统: {e}", file=sys.stderr)
+        if entries is None:
+            entries = walk_directory(resolved_path, **walk_options)
+
+        lines = []
+        directory_count = file_count = 0
+        last_entry = None
+        truncated = False
+        for entry in entries:
+            if directory_count + file_count >= max_entries:
+                truncated = True
+                break
+            if last_entry is None:
+                # 从 cursor 继续时第一个条目可能位于深层文件夹中，先补上它所在的位置
+                for level, (_, name) in enumerate(entry.path_keys[:-1]):
+                    lines.append("  " * level + name + "/ (续)")
+            lines.append(format_entry(entry, show_size, show_mtime))
+            if entry.is_dir:
+                directory_count += 1
+            else:
+                file_count += 1
+            last_entry = entry
+
+        if not lines:
+            return f"目录 '{resolved_path}' 为空。" if not cursor_key else f"目录 '{resolved_path}' 中没有更多条目。"
+
+        filtered = not no_ignore and (respect_gitignore or ignore_names)
+        ignore_note = "，已按 .gitignore 和忽略列表过滤" if filtered else ""
+        output = f"目录 '{resolved_path}' 下的内容 (深度 {max_depth}{ignore_note}；以 / 结尾的为文件夹，… 表示未展开)：\n"
+        output += "\n".join(lines) + "\n"
+        output += f"\n[本次列出 {directory_count} 个文件夹，{file_count} 个文件]"
+        if truncated:
+            next_request = {key: value for key, value in options.items() if key != "cursor"}
+            next_request["path"] = target_path
+            next_request["cursor"] = encode_cursor(last_entry.path_keys)
+            output += f"\n[条目数达到上限 {max_entries}，可使用 {json.dumps(next_request, ensure_ascii=False)} 继续列出]"
+        if token:
+            output += f"\n[变更令牌: {token}，之后可使用 {json.dumps({'path': target_path, 'changes_since': token}, ensure_ascii=False)} 只查询此后的变化]"
+        return output.strip()
+
+    except PermissionError:
+        return f"错误：没有权限访问路径 '{target_path}'。"
+    except Exception as e:
+        return f"列出目录 '{target_path}' 时发生未知错误: {str(e)}"
+
+if __name__ == "__main__":
+    directory_path_param = read_plugin_argument()
+    if directory_path_param is not None:
+        result = list_directory(directory_path_param)
+        print(result)
+    else:
+        print("错误：列出目录插件需要一个文件夹路径作为参数。请使用格式：[列出目录]文件夹路径[/列出目录]")
+    sys.stdout.flush()
@@ -1,82 +1,388 @@
-import os
-import sys
-import json
-
-# 默认配置值
-DEFAULT_MAX_FILE_SIZE_MB = 5
-DEFAULT_MAX_OUTPUT_CHARS = 15000
-
-# 加载插件自身配置
-max_file_size_mb = DEFAULT_MAX_FILE_SIZE_MB
-max_output_chars = DEFAULT_MAX_OUTPUT_CHARS
-try:
-    # 插件配置在插件目录下
-    plugin_config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.json")
-    if os.path.exists(plugin_config_path):
-        with open(plugin_config_path, 'r', encoding='utf-8') as f:
-            plugin_config_data = json.load(f)
-            max_file_size_mb = plugin_config_data.get("plugin_specific_config", {}).get("max_file_size_mb", DEFAULT_MAX_FILE_SIZE_MB)
-            max_output_chars = plugin_config_data.get("plugin_specific_config", {}).get("max_output_chars", DEFAULT_MAX_OUTPUT_CHARS)
-except Exception as e:
-    print(f"警告: 读取插件 file_content_reader 配置失败: {e}. 将使用默认值。", file=sys.stderr)
-
-
-def read_file_content(file_path: str):
-    """
-    读取指定路径的文件内容。
-    """
-    try:
-        resolved_path = os.path.realpath(file_path)
-
-        if not os.path.exists(resolved_path):
-            return f"错误：文件路径 '{file_path}' (解析为 '{resolved_path}') 不存在。"
-        if not os.path.isfile(resolved_path):
-            return f"错误：路径 '{file_path}' (解析为 '{resolved_path}') 不是一个文件。"
-
-        file_size_bytes = os.path.getsize(resolved_path)
-        if file_size_bytes > max_file_size_mb * 1024 * 1024:
-            return f"错误：文件 '{resolved_path}' 大小为 {file_size_bytes / (1024*1024):.2f} MB，超过了 {max_file_size_mb} MB 的限制。"
-
-        encodings_to_try = ['utf-8', 'gbk', 'gb2312', 'latin-1', 'iso-8859-1']
-        content = None
-        detected_encoding = None
-
-        for enc in encodings_to_try:
-            try:
-                with open(resolved_path, 'r', encoding=enc) as f:
-                    content = f.read()
-                detected_encoding = enc
-                break
-            except UnicodeDecodeError:
-                continue
-            except Exception: # 其他可能的打开文件错误
-                pass # 后面会统一处理 content is None 的情况
-        
-        if content is None:
-            return f"错误：无法使用常用编码 (UTF-8, GBK, GB2312, Latin-1, ISO-8859-1) 解码文件 '{resolved_path}'。文件可能是二进制文件或使用了非常见编码。"
-
-        output = f"[文件路径]: {resolved_path}\n"
-        output += f"[文件编码 (尝试检测)]: {detected_encoding or '未知'}\n"
-        output += f"[文件大小]: {file_size_bytes / 1024:.2f} KB\n\n"
-        
-        output += "[文件内容]:\n"
-        if len(content) > max_output_chars:
-            output += content[:max_output_chars] + f"\n\n[内容过长，已截断至 {max_output_chars} 字符...]"
-        else:
-            output += content
-        
-        return output.strip()
-
-    except PermissionError:
-        return f"错误：没有权限读取文件 '{file_path}'。"
-    except Exception as e:
-        return f"读取文件 '{file_path}' 时发生未知错误: {str(e)}"
-
-if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        file_path_param = sys.argv[1]
-        result = read_file_content(file_path_param)
-        print(result)
-    else:
-        print("错误：读取文件内容插件需要一个文件路径作为参数。请使用格式：[读取文件]文件路径[/读取文件]")
-    sys.stdout.flush()
+import os
+import re
+import sys
+import json
+import glob
+import mmap
+import codecs
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+PROJECT_ROOT = os.path.realpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+from plugin_common.plugin_protocol import read_plugin_argument
+
+# 默认配置值
+DEFAULT_MAX_OUTPUT_CHARS = 15000
+DEFAULT_ENCODING_SAMPLE_KB = 64
+DEFAULT_BATCH_MAX_OUTPUT_CHARS = 60000
+DEFAULT_BATCH_MAX_FILES = 50
+DEFAULT_BATCH_READ_WORKERS = 8
+
+# 加载插件自身配置
+max_output_chars = DEFAULT_MAX_OUTPUT_CHARS
+encoding_sample_kb = DEFAULT_ENCODING_SAMPLE_KB
+batch_max_output_chars = DEFAULT_BATCH_MAX_OUTPUT_CHARS
+batch_max_files = DEFAULT_BATCH_MAX_FILES
+batch_read_workers = DEFAULT_BATCH_READ_WORKERS
+try:
+    # 插件配置在插件目录下
+    plugin_config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.json")
+    if os.path.exists(plugin_config_path):
+        with open(plugin_config_path, 'r', encoding='utf-8') as f:
+            plugin_config_data = json.load(f)
+            max_output_chars = plugin_config_data.get("plugin_specific_config", {}).get("max_output_chars", DEFAULT_MAX_OUTPUT_CHARS)
+            encoding_sample_kb = plugin_config_data.get("plugin_specific_config", {}).get("encoding_sample_kb", DEFAULT_ENCODING_SAMPLE_KB)
+            batch_max_output_chars = plugin_config_data.get("plugin_specific_config", {}).get("batch_max_output_chars", DEFAULT_BATCH_MAX_OUTPUT_CHARS)
+            batch_max_files = plugin_config_data.get("plugin_specific_config", {}).get("batch_max_files", DEFAULT_BATCH_MAX_FILES)
+            batch_read_workers = plugin_config_data.get("plugin_specific_config", {}).get("batch_read_workers", DEFAULT_BATCH_READ_WORKERS)
+except Exception as e:
+    print(f"警告: 读取插件 file_content_reader 配置失败: {e}. 将使用默认值。", file=sys.stderr)
+
+# 按顺序尝试的编码；latin-1 可以解码任意字节，作为最后的回退
+ENCODINGS_TO_TRY = ['utf-8', 'gbk', 'latin-1']
+SCAN_CHUNK_BYTES = 1024 * 1024
+MAX_BYTES_PER_CHAR = 4
+LONE_SURROGATE_PATTERN = re.compile('[\udc80-\udcff]')
+# GBK (以及 Big5、Shift_JIS) 双字节字符的第二个字节不小于 0x40，小于 0x40 的字节 (换行、空格、数字、ASCII 标点) 一定单独成字
+SINGLE_BYTE_CHAR_PATTERN = re.compile(rb'[\x00-\x3f]')
+ALIGN_SCAN_CHUNK_BYTES = 4096
+GLOB_CHARACTERS = ('*', '?', '[')
+
+# 文件总行数缓存: 真实路径 -> (大小, 修改时间, 行数)。插件在常驻宿主进程中运行，分页读取同一个大文件时不必每次重新统计。
+# 批量读取时多个线程共用，读写时加锁。
+_line_count_cache = {}
+_line_count_cache_lock = threading.Lock()
+LINE_COUNT_CACHE_SIZE = 64
+
+
+def parse_request_argument(argument: str):
+    """
+    参数可以是文件路径字符串，也可以是JSON对象:
+    {"path": "...", "offset": 起始字节, "length": 字节数} 按字节范围读取；
+    {"path": "...", "start_line": 起始行, "end_line": 结束行} 按行范围读取 (行号从 1 开始，包含结束行)。
+    返回 (path, options)。
+    """
+    stripped = argument.strip()
+    if stripped.startswith("{"):
+        try:
+            params = json.loads(stripped)
+            if isinstance(params, dict):
+                return str(params.get("path", "")).strip(), params
+        except json.JSONDecodeError:
+            pass
+    return stripped, {}
+
+
+def detect_encoding(sample: bytes, at_eof: bool):
+    """根据文件开头的字节样本检测一次编码。样本中含有 NUL 字节时视为二进制文件，返回 None。"""
+    if sample.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    if b'\x00' in sample:
+        return None
+    for enc in ENCODINGS_TO_TRY:
+        try:
+            # 样本可能在多字节字符中间截断，非文件末尾时允许最后一个字符不完整
+            codecs.getincrementaldecoder(enc)().decode(sample, final=at_eof)
+            return enc
+        except UnicodeDecodeError:
+            continue
+    return 'latin-1'
+
+
+def count_newlines(mm, start: int, end: int) -> int:
+    count = 0
+    for pos in range(start, end, SCAN_CHUNK_BYTES):
+        count += mm[pos:min(pos + SCAN_CHUNK_BYTES, end)].count(b'\n')
+    return count
+
+
+def count_lines(mm, resolved_path: str, stat) -> int:
+    key = (stat.st_size, stat.st_mtime_ns)
+    with _line_count_cache_lock:
+        cached = _line_count_cache.get(resolved_path)
+    if cached and cached[0] == key:
+        return cached[1]
+    size = stat.st_size
+    lines = count_newlines(mm, 0, size)
+    if size > 0 and mm[size - 1:size] != b'\n':
+        lines += 1
+    with _line_count_cache_lock:
+        if len(_line_count_cache) >= LINE_COUNT_CACHE_SIZE:
+            _line_count_cache.pop(next(iter(_line_count_cache)))
+        _line_count_cache[resolved_path] = (key, lines)
+    return lines
+
+
+def line_start_offset(mm, size: int, line_number: int):
+    """返回第 line_number 行 (从 1 开始) 的起始字节位置，超出文件末尾时返回 None。"""
+    remaining = line_number - 1
+    pos = 0
+    while remaining > 0:
+        if pos >= size:
+            return None
+        chunk = mm[pos:min(pos + SCAN_CHUNK_BYTES, size)]
+        newlines = chunk.count(b'\n')
+        if newlines < remaining:
+            remaining -= newlines
+            pos += len(chunk)
+            continue
+        index = -1
+        for _ in range(remaining):
+            index = chunk.find(b'\n', index + 1)
+        pos += index + 1
+        remaining = 0
+    return pos if pos < size or line_number == 1 else None
+
+
+def align_to_char_start(mm, encoding: str, pos: int, end: int) -> int:
+    """返回 pos 处或其后第一个字符的起始字节位置 (不超过 end)。"""
+    if encoding.startswith('utf-8'):
+        # UTF-8 的后续字节可以直接识别
+        while pos < end and (mm[pos] & 0xC0) == 0x80:
+            pos += 1
+        return pos
+    # 其他编码无法从单个字节判断是否位于字符中间: 向前找到一个单独成字的字节，从其后逐字符解码到 pos
+    anchor = 0
+    scan_end = pos
+    while scan_end > 0:
+        scan_start = max(0, scan_end - ALIGN_SCAN_CHUNK_BYTES)
+        matches = list(SINGLE_BYTE_CHAR_PATTERN.finditer(mm[scan_start:scan_end]))
+        if matches:
+            anchor = scan_start + matches[-1].end()
+            break
+        scan_end = scan_start
+    decoder = codecs.getincrementaldecoder(encoding)(errors='surrogateescape')
+    boundary = anchor
+    while boundary < pos:
+        char_end = boundary
+        while char_end < end:
+            char_end += 1
+            if decoder.decode(mm[char_end - 1:char_end]):
+                break
+        if char_end == boundary:
+            return end
+        boundary = char_end
+    return min(boundary, end)
+
+
+def decode_window(mm, encoding: str, start: int, end: int, size: int, char_limit: int):
+    """
+    解码 [start, end) 字节范围，最多返回 char_limit 个字符。起点落在多字节字符中间时后移到下一个字符开头。
+    返回 (文本, 实际起始的字节位置, 实际结束的字节位置, 是否因输出长度限制被截断)。
+    结束位置总是落在完整字符之后，可以作为下一次读取的 offset。
+    """
+    start = align_to_char_start(mm, encoding, start, end)
+    window_end = min(end, start + char_limit * MAX_BYTES_PER_CHAR)
+    decoder = codecs.getincrementaldecoder(encoding)(errors='surrogateescape')
+    text = decoder.decode(mm[start:window_end], final=(window_end == size))
+    truncated = window_end < end or len(text) > char_limit
+    if len(text) > char_limit:
+        text = text[:char_limit]
+    # utf-8-sig 编码时会重新加上 BOM，计算长度时按 utf-8 编码，BOM 单独计入
+    consumed = len(text.encode('utf-8' if encoding == 'utf-8-sig' else encoding, errors='surrogateescape'))
+    if encoding == 'utf-8-sig' and start == 0:
+        consumed += len(codecs.BOM_UTF8)
+    # 无法解码的字节以替换字符显示
+    return LONE_SURROGATE_PATTERN.sub('\ufffd', text), start, start + consumed, truncated
+
+
+def read_single_file(file_path: str, options: dict, char_limit: int):
+    """
+    读取单个文件。options 为空时返回文件开头的内容，否则按其中的字节范围或行范围读取；
+    通过 mmap 只读取所需部分，内容最多 char_limit 个字符，并返回文件大小和总行数，便于分页读取大文件。
+    """
+    try:
+        if not file_path:
+            return "错误：未提供文件路径。"
+        resolved_path = os.path.realpath(file_path)
+
+        if not os.path.exists(resolved_path):
+            return f"错误：文件路径 '{file_path}' (解析为 '{resolved_path}') 不存在。"
+        if not os.path.isfile(resolved_path):
+            return f"错误：路径 '{file_path}' (解析为 '{resolved_path}') 不是一个文件。"
+
+        try:
+            offset = int(options.get("offset", 0) or 0)
+            length = options.get("length")
+            length = int(length) if length is not None else None
+            start_line = options.get("start_line")
+            start_line = int(start_line) if start_line is not None else None
+            end_line = options.get("end_line")
+            end_line = int(end_line) if end_line is not None else None
+        except (TypeError, ValueError):
+            return "错误：offset、length、start_line 和 end_line 必须是整数。"
+        if offset < 0 or (length is not None and length < 0) or (start_line is not None and start_line < 1) \
+                or (end_line is not None and end_line < (start_line or 1)):
+            return "错误：读取范围无效。offset 和 length 不能为负数，行号从 1 开始且 end_line 不能小于 start_line。"
+
+        with open(resolved_path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            file_size_bytes = stat.st_size
+            output = f"[文件路径]: {resolved_path}\n"
+            if file_size_bytes == 0:
+                output += "[文件大小]: 0 字节\n[总行数]: 0\n\n[文件内容]:\n"
+                return output.strip()
+
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                sample_end = min(file_size_bytes, encoding_sample_kb * 1024)
+                encoding = detect_encoding(mm[:sample_end], sample_end == file_size_bytes)
+                if encoding is None:
+                    return f"错误：文件 '{resolved_path}' 似乎是二进制文件，无法作为文本读取。"
+                total_lines = count_lines(mm, resolved_path, stat)
+
+                if start_line is not None:
+                    range_start = line_start_offset(mm, file_size_bytes, start_line)
+                    if range_start is None:
+                        return f"错误：起始行 {start_line} 超出文件范围 (共 {total_lines} 行)。"
+                    range_end = file_size_bytes
+                    if end_line is not None:
+                        range_end = line_start_offset(mm, file_size_bytes, end_line + 1) or file_size_bytes
+                else:
+                    if offset >= file_size_bytes:
+                        return f"错误：起始位置 {offset} 超出文件范围 (文件大小 {file_size_bytes} 字节)。"
+                    range_start = offset
+                    range_end = file_size_bytes if length is None else min(file_size_bytes, offset + length)
+
+                requested_start = range_start
+                content, range_start, content_end, truncated = decode_window(mm, encoding, range_start, range_end, file_size_bytes, char_limit)
+                first_line = start_line if start_line is not None else count_newlines(mm, 0, range_start) + 1
+                last_line = first_line + content.count('\n') - (1 if content.endswith('\n') else 0)
+
+        output += f"[文件编码 (根据开头 {sample_end} 字节检测)]: {encoding}\n"
+        output += f"[文件大小]: {file_size_bytes / 1024:.2f} KB ({file_size_bytes} 字节)\n"
+        output += f"[总行数]: {total_lines}\n"
+        output += f"[本次读取]: 字节 {range_start}-{content_end} (不含结束位置)，第 {first_line}-{max(first_line, last_line)} 行\n"
+        if range_start != requested_start:
+            output += f"[起始位置调整]: 请求的 offset {requested_start} 位于多字节字符中间，已从下一个字符开头 (字节 {range_start}) 开始读取\n"
+        output += "\n"
+
+        output += "[文件内容]:\n"
+        output += content
+        if truncated:
+            next_request = json.dumps({"path": file_path, "offset": content_end}, ensure_ascii=False)
+            output += f"\n\n[内容过长，已截断至 {char_limit} 字符。可使用 {next_request} 继续读取]"
+        elif content_end < file_size_bytes and options:
+            output += f"\n\n[已读取到请求范围的末尾，文件剩余 {file_size_bytes - content_end} 字节]"
+
+        return output.strip()
+
+    except PermissionError:
+        return f"错误：没有权限读取文件 '{file_path}'。"
+    except Exception as e:
+        return f"读取文件 '{file_path}' 时发生未知错误: {str(e)}"
+
+
+def expand_batch_entries(items: list):
+    """
+    把批量读取的参数展开为 [(路径, options)]。元素可以是路径、glob 模式 (支持 ** 递归匹配) 或单文件读取所用的JSON对象。
+    glob 没有匹配到文件时返回 (模式, None)，由调用方报告。同一文件以相同方式读取多次时只保留一次。
+    """
+    entries = []
+    seen = set()
+    for item in items:
+        if isinstance(item, dict):
+            path, options = str(item.get("path", "")).strip(), item
+        else:
+            path, options = str(item).strip(), {}
+        if not isinstance(item, dict) and any(ch in path for ch in GLOB_CHARACTERS) and not os.path.exists(path):
+            matches = sorted(match for match in glob.glob(os.path.expanduser(path), recursive=True) if os.path.isfile(match))
+            if not matches:
+                entries.append((path, None))
+            candidates = [(match, {}) for match in matches]
+        else:
+            candidates = [(path, options)]
+        for candidate_path, candidate_options in candidates:
+            key = (os.path.realpath(candidate_path) if candidate_path else candidate_path,
+                   json.dumps({k: v for k, v in candidate_options.items() if k != "path"}, sort_keys=True))
+            if key not in seen:
+                seen.add(key)
+                entries.append((candidate_path, candidate_options))
+    return entries
+
+
+def split_output_budget(demands: list, budget: int) -> list:
+    """
+    按最大最小公平原则分配输出预算: 需要得少的文件拿到全部所需，剩余部分由其他文件平分。
+    demands 为每个文件最多可能输出的字符数。
+    """
+    allocation = [0] * len(demands)
+    order = sorted(range(len(demands)), key=lambda i: demands[i])
+    remaining = budget
+    for position, index in enumerate(order):
+        share = remaining // (len(order) - position)
+        allocation[index] = min(demands[index], share)
+        remaining -= allocation[index]
+    return allocation
+
+
+def estimate_output_demand(path: str, options: dict) -> int:
+    """文件最多能输出的字符数 (字符数不超过字节数)，用于分配预算。无法读取的文件只输出错误信息。"""
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return 0
+    offset = options.get("offset") if options.get("start_line") is None else None
+    length = options.get("length") if options.get("start_line") is None else None
+    try:
+        remaining = size - int(offset or 0)
+        return max(0, min(remaining, int(length)) if length is not None else remaining)
+    except (TypeError, ValueError):
+        return 0
+
+
+def read_multiple_files(items: list):
+    """
+    批量读取多个文件: 各文件在线程池中并发读取，共享 batch_max_output_chars 的输出预算，
+    结果按参数顺序合并，每个文件带有各自的路径、大小和截断标记。
+    """
+    entries = expand_batch_entries(items)
+    if not entries:
+        return "错误：批量读取的文件列表为空。"
+    if len(entries) > batch_max_files:
+        return f"错误：批量读取最多 {batch_max_files} 个文件，本次匹配到 {len(entries)} 个。请缩小 glob 模式的范围或分批读取。"
+
+    readable = [i for i, (_, options) in enumerate(entries) if options is not None]
+    budgets = split_output_budget([estimate_output_demand(*entries[i]) for i in readable], batch_max_output_chars)
+    char_limits = dict(zip(readable, budgets))
+
+    def read_entry(index: int) -> str:
+        path, options = entries[index]
+        if options is None:
+            return f"错误：模式 '{path}' 没有匹配到任何文件。"
+        return read_single_file(path, options, max(1, char_limits[index]))
+
+    with ThreadPoolExecutor(max_workers=max(1, min(batch_read_workers, len(entries)))) as executor:
+        results = list(executor.map(read_entry, range(len(entries))))
+
+    output = f"[批量读取]: 共 {len(entries)} 个文件，输出预算 {batch_max_output_chars} 字符\n"
+    for number, result in enumerate(results, start=1):
+        output += f"\n===== [{number}/{len(entries)}] {entries[number - 1][0]} =====\n{result}\n"
+    return output.strip()
+
+
+def read_file_content(file_path: str):
+    """
+    读取文件内容。参数为路径或单个文件的JSON对象时读取一个文件 (见 parse_request_argument)；
+    为JSON数组时批量读取其中的路径、glob 模式或JSON对象 (见 read_multiple_files)。
+    """
+    stripped = file_path.strip()
+    if stripped.startswith("["):
+        try:
+            items = json.loads(stripped)
+            if isinstance(items, list):
+                return read_multiple_files(items)
+        except json.JSONDecodeError:
+            pass
+    path, options = parse_request_argument(file_path)
+    return read_single_file(path, options, max_output_chars)
+
+if __name__ == "__main__":
+    file_path_param = read_plugin_argument()
+    if file_path_param is not None:
+        result = read_file_content(file_path_param)
+        print(result)
+    else:
+        print("错误：读取文件内容插件需要一个文件路径作为参数。请使用格式：[读取文件]文件路径[/读取文件]")
+    sys.stdout.flush()
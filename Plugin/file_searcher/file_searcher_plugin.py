@@ -0,0 +1,249 @@
+import os
+import re
+import sys
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+PROJECT_ROOT = os.path.realpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+from plugin_common import load_root_config
+from plugin_common.directory_walk import PathMatcher
+from plugin_common.plugin_protocol import read_plugin_argument
+try:
+    from plugin_common.text_index import TextIndex, query_literals, read_text_file, is_within
+    TEXT_INDEX_IMPORT_ERROR = None
+except ImportError as e:  # numpy 未安装
+    TEXT_INDEX_IMPORT_ERROR = e
+
+# 默认配置值
+DEFAULT_MAX_OUTPUT_CHARS = 12000
+DEFAULT_MAX_FILES = 20
+DEFAULT_MAX_MATCHES_PER_FILE = 10
+DEFAULT_CONTEXT_LINES = 2
+DEFAULT_MAX_FILE_SIZE_KB = 1024
+DEFAULT_REFRESH_INTERVAL_S = 2
+DEFAULT_INDEX_READ_WORKERS = 8
+DEFAULT_IGNORE_NAMES = [".git", "node_modules", "__pycache__", ".venv", "venv", ".idea", ".vscode", ".DS_Store"]
+
+# 加载插件自身配置
+max_output_chars = DEFAULT_MAX_OUTPUT_CHARS
+max_files = DEFAULT_MAX_FILES
+max_matches_per_file = DEFAULT_MAX_MATCHES_PER_FILE
+context_lines = DEFAULT_CONTEXT_LINES
+max_file_size_kb = DEFAULT_MAX_FILE_SIZE_KB
+refresh_interval_s = DEFAULT_REFRESH_INTERVAL_S
+index_read_workers = DEFAULT_INDEX_READ_WORKERS
+respect_gitignore = True
+ignore_names = DEFAULT_IGNORE_NAMES
+try:
+    plugin_config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.json")
+    if os.path.exists(plugin_config_path):
+        with open(plugin_config_path, 'r', encoding='utf-8') as f:
+            psc = json.load(f).get("plugin_specific_config", {})
+            max_output_chars = psc.get("max_output_chars", DEFAULT_MAX_OUTPUT_CHARS)
+            max_files = psc.get("max_files", DEFAULT_MAX_FILES)
+            max_matches_per_file = psc.get("max_matches_per_file", DEFAULT_MAX_MATCHES_PER_FILE)
+            context_lines = psc.get("context_lines", DEFAULT_CONTEXT_LINES)
+            max_file_size_kb = psc.get("max_file_size_kb", DEFAULT_MAX_FILE_SIZE_KB)
+            refresh_interval_s = psc.get("refresh_interval_seconds", DEFAULT_REFRESH_INTERVAL_S)
+            index_read_workers = psc.get("index_read_workers", DEFAULT_INDEX_READ_WORKERS)
+            respect_gitignore = psc.get("respect_gitignore", True)
+            ignore_names = psc.get("ignore_names", DEFAULT_IGNORE_NAMES)
+except Exception as e:
+    print(f"警告: 读取插件 file_searcher 配置失败: {e}. 将使用默认值。", file=sys.stderr)
+
+# 搜索范围为根 config.json 中的 file_operations_allowed_base_paths (相对路径相对于项目根目录)
+SEARCH_ROOTS = [os.path.realpath(os.path.join(PROJECT_ROOT, path)) for path in load_root_config().get("file_operations_allowed_base_paths", [])]
+INDEX_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache")
+MAX_LINE_CHARS = 300
+VERIFY_BATCH_SIZE = 32
+
+# 插件在常驻宿主进程中运行，索引加载后保存在内存中；每次搜索前 (间隔不少于 refresh_interval_seconds) 按大小与修改时间增量更新
+_index = None
+_last_refresh = 0.0
+
+
+def parse_request_argument(argument: str):
+    """
+    参数可以是要搜索的文字，也可以是JSON对象:
+    {"query": "...", "regex": false, "case_sensitive": false, "path": "限定搜索的文件夹 (相对路径相对于项目根目录)", "include": ["*.py"],
+     "context_lines": 2, "max_files": 20, "skip_files": 0}
+    或 {"index_stats": true} 返回索引的统计信息。
+    返回 (query, options)。
+    """
+    stripped = argument.strip()
+    if stripped.startswith("{"):
+        try:
+            params = json.loads(stripped)
+            if isinstance(params, dict):
+                return str(params.get("query", "")), params
+        except json.JSONDecodeError:
+            pass
+    return stripped, {}
+
+
+def get_index():
+    global _index, _last_refresh
+    if _index is not None and time.monotonic() - _last_refresh < refresh_interval_s:
+        return _index
+    # 宿主池的其他工作进程可能同时更新同一份磁盘索引: 持锁期间先换用其他进程保存的最新状态，再增量更新并保存
+    with TextIndex.lock(INDEX_DIRECTORY):
+        if _index is None or _index.is_stale():
+            _index = TextIndex.load(INDEX_DIRECTORY)
+        start = time.perf_counter()
+        stats = _index.refresh(SEARCH_ROOTS, ignore_names=ignore_names, respect_gitignore=respect_gitignore,
+                               max_file_bytes=max_file_size_kb * 1024, read_workers=index_read_workers,
+                               exclude_paths=[INDEX_DIRECTORY])
+        _last_refresh = time.monotonic()
+        if stats["added"] or stats["updated"] or stats["removed"]:
+            _index.save()
+            print(f"[file_searcher] 索引已更新: 新增 {stats['added']}，修改 {stats['updated']}，删除 {stats['removed']} 个文件，"
+                  f"耗时 {(time.perf_counter() - start) * 1000:.0f} ms", file=sys.stderr)
+    return _index
+
+
+def build_line_matcher(query: str, regex: bool, case_sensitive: bool):
+    if regex:
+        return re.compile(query, 0 if case_sensitive else re.IGNORECASE).search
+    if case_sensitive:
+        return lambda line: query in line
+    needle = query.lower()
+    return lambda line: needle in line.lower()
+
+
+def find_matches(path: str, matcher, context: int):
+    """返回 (按行分组的输出片段, 匹配行数)；文件无法读取或不匹配时匹配行数为 0。"""
+    text = read_text_file(path, max_file_size_kb * 1024)
+    if text is None:
+        return [], 0
+    lines = text.splitlines()
+    hits = [number for number, line in enumerate(lines) if matcher(line)]
+    hit_set = set(hits)
+    blocks = []
+    block_end = -1
+    for number in hits[:max_matches_per_file]:
+        start, end = max(0, number - context), min(len(lines), number + context + 1)
+        if blocks and start <= block_end:
+            start = block_end  # 与上一段上下文相连
+        elif blocks:
+            blocks.append("  --")
+        for line_number in range(start, end):
+            line = lines[line_number]
+            if len(line) > MAX_LINE_CHARS:
+                line = line[:MAX_LINE_CHARS] + " …"
+            marker = ">" if line_number in hit_set else " "
+            blocks.append(f"{marker}{line_number + 1:>6}: {line}")
+        block_end = max(block_end, end)
+    if len(hits) > max_matches_per_file:
+        blocks.append(f"  … (该文件中另有 {len(hits) - max_matches_per_file} 处匹配未显示)")
+    return blocks, len(hits)
+
+
+def format_index_stats(index) -> str:
+    return (f"搜索索引: {index.document_count} 个文本文件，{len(index.vocab)} 个词，"
+            f"{len(index.base_docs) + index.delta_postings} 条倒排记录 (其中未合并 {index.delta_postings} 条)，"
+            f"待清理的失效文件 {index.dead_documents} 个。\n搜索范围: {SEARCH_ROOTS}\n索引目录: {INDEX_DIRECTORY}")
+
+
+def search_files(argument):
+    """
+    在 file_operations_allowed_base_paths 下的文本文件中搜索文字或正则表达式，
+    按 TF-IDF 相关度排列返回匹配的文件以及匹配行和上下文。
+    """
+    query, options = parse_request_argument(argument)
+    if TEXT_INDEX_IMPORT_ERROR is not None:
+        return f"错误：搜索插件需要 numpy ({TEXT_INDEX_IMPORT_ERROR})。请运行 'pip install numpy'。"
+    try:
+        if options.get("index_stats"):
+            return format_index_stats(get_index())
+        if not query.strip():
+            return "错误：未提供要搜索的内容。"
+        if not SEARCH_ROOTS:
+            return "错误：根配置 file_operations_allowed_base_paths 为空，没有可搜索的目录。"
+
+        try:
+            context = max(0, int(options.get("context_lines", context_lines)))
+            file_limit = max(1, int(options.get("max_files", max_files)))
+            skip_files = max(0, int(options.get("skip_files", 0)))
+        except (TypeError, ValueError) as e:
+            return f"错误：参数无效 ({e})。context_lines、max_files 和 skip_files 必须是整数。"
+        regex = bool(options.get("regex", False))
+        case_sensitive = bool(options.get("case_sensitive", False))
+        try:
+            matcher = build_line_matcher(query, regex, case_sensitive)
+        except re.error as e:
+            return f"错误：正则表达式无效: {e}"
+
+        scope = None
+        if options.get("path"):
+            # 与 SEARCH_ROOTS 一样相对于项目根目录解析；插件进程的工作目录是插件自己的文件夹
+            scope = os.path.realpath(os.path.join(PROJECT_ROOT, str(options["path"])))
+            if not any(is_within(scope, root) or is_within(root, scope) for root in SEARCH_ROOTS):
+                return f"错误：路径 '{options['path']}' 不在可搜索的目录 {SEARCH_ROOTS} 之下。"
+        include = options.get("include")
+        include_matcher = PathMatcher([include] if isinstance(include, str) else include) if include else None
+
+        start = time.perf_counter()
+        index = get_index()
+        candidates = index.search(query_literals(query, regex))
+        if scope:
+            candidates = [(path, score) for path, score in candidates if is_within(path, scope)]
+        if include_matcher:
+            base = scope if scope and os.path.isdir(scope) else None
+            candidates = [(path, score) for path, score in candidates
+                          if include_matcher.matches(os.path.relpath(path, base).replace(os.sep, '/') if base else os.path.basename(path),
+                                                     os.path.basename(path), False)]
+
+        # 按相关度顺序分批读取候选文件并确认匹配，直到显示的文件数或输出长度达到上限
+        results, matched_files, checked, output_length = [], 0, 0, 0
+        truncated = False
+        with ThreadPoolExecutor(max_workers=max(1, index_read_workers)) as executor:
+            while checked < len(candidates) and not truncated:
+                batch = candidates[checked:checked + VERIFY_BATCH_SIZE]
+                for (path, score), (blocks, hit_count) in zip(batch, executor.map(lambda item: find_matches(item[0], matcher, context), batch)):
+                    checked += 1
+                    if not hit_count:
+                        continue
+                    matched_files += 1
+                    if matched_files <= skip_files:
+                        continue
+                    section = f"===== {path} (匹配 {hit_count} 行{f'，相关度 {score:.2f}' if score else ''}) =====\n" + "\n".join(blocks)
+                    if len(results) >= file_limit or (results and output_length + len(section) > max_output_chars):
+                        truncated = True
+                        checked -= 1
+                        break
+                    results.append(section)
+                    output_length += len(section)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        mode = "正则" if regex else "子串"
+        case_note = "区分大小写" if case_sensitive else "不区分大小写"
+        scope_note = f"'{scope}' 下" if scope else "可搜索目录中"
+        if not results:
+            if skip_files and matched_files:
+                return f"{scope_note}匹配 '{query}' 的文件只有 {matched_files} 个，没有更多结果。"
+            return f"在{scope_note}没有找到 '{query}' ({mode}，{case_note}，共检查 {len(candidates)} 个候选文件，索引中共 {index.document_count} 个文本文件)。"
+        output = f"在{scope_note}搜索 '{query}' 的结果 ({mode}，{case_note}，按相关度排列，> 标记匹配行)：\n\n"
+        output += "\n\n".join(results)
+        output += (f"\n\n[显示第 {skip_files + 1}-{skip_files + len(results)} 个匹配的文件，已检查 {checked}/{len(candidates)} 个候选文件 "
+                   f"(索引中共 {index.document_count} 个文本文件)，耗时 {elapsed_ms:.0f} ms]")
+        if truncated:
+            next_request = {key: value for key, value in options.items() if key != "skip_files"}
+            next_request["query"] = query
+            next_request["skip_files"] = skip_files + len(results)
+            output += f"\n[还有更多匹配的文件，可使用 {json.dumps(next_request, ensure_ascii=False)} 继续查看]"
+        return output
+
+    except Exception as e:
+        return f"搜索 '{query}' 时发生未知错误: {type(e).__name__}: {e}"
+
+
+if __name__ == "__main__":
+    query_param = read_plugin_argument()
+    if query_param is not None:
+        print(search_files(query_param))
+    else:
+        print("错误：搜索文件插件需要搜索内容作为参数。请使用格式：[搜索文件]要查找的文字[/搜索文件]")
+    sys.stdout.flush()
@@ -1,112 +1,384 @@
-import os
-import sys
-import json
-
-# 默认配置
-DEFAULT_MAX_FILE_SIZE_MB_WRITE = 5
-
-# 加载插件自身配置
-max_file_size_mb_write = DEFAULT_MAX_FILE_SIZE_MB_WRITE
-allow_arbitrary_paths = True # 从插件配置中获取，确保其意图
-try:
-    plugin_config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.json")
-    if os.path.exists(plugin_config_path):
-        with open(plugin_config_path, 'r', encoding='utf-8') as f:
-            plugin_config_data = json.load(f)
-            psc = plugin_config_data.get("plugin_specific_config", {})
-            max_file_size_mb_write = psc.get("max_file_size_mb_write", DEFAULT_MAX_FILE_SIZE_MB_WRITE)
-            allow_arbitrary_paths = psc.get("allow_arbitrary_paths", True) 
-    if not allow_arbitrary_paths:
-        print("严重警告: 文件更新插件 (file_updater) 被配置为不允许任意路径，但其代码逻辑当前是允许的。存在配置与行为不一致的风险！", file=sys.stderr)
-except Exception as e:
-    print(f"警告: 读取插件 file_updater 配置失败: {e}. 将使用默认值。", file=sys.stderr)
-
-
-def update_files_unsafe(operations_json_str: str):
-    """
-    根据JSON字符串描述更新一个或多个文件内容。
-    如果 allow_arbitrary_paths 为 true (来自插件配置)，则允许AI指定任意路径。
-    """
-    if not allow_arbitrary_paths:
-        return json.dumps([{"path": "配置错误", "status": "失败", "message": "插件被配置为不允许任意路径操作，但此功能被调用。请检查插件配置。"}], ensure_ascii=False, indent=2)
-    
-    print("警告: 文件更新插件正在以不安全模式运行，允许在AI指定的任意路径更新文件。", file=sys.stderr)
-    results = []
-    try:
-        operations = json.loads(operations_json_str)
-        if not isinstance(operations, list):
-            return json.dumps([{"path": "参数错误", "status": "失败", "message": "输入参数必须是一个JSON数组。"}], ensure_ascii=False, indent=2)
-
-        if not operations:
-            return json.dumps([{"path": "无操作", "status": "信息", "message": "没有提供任何文件更新操作。"}], ensure_ascii=False, indent=2)
-
-        for op in operations:
-            if not isinstance(op, dict) or "path" not in op or "content" not in op:
-                results.append({"path": op.get("path", "未知路径"), "status": "失败", "message": "操作格式错误，缺少'path'或'content'字段。"})
-                continue
-
-            file_path_from_ai = op["path"]
-            content = op["content"]
-            op_result = {"path": file_path_from_ai, "status": "失败"}
-
-            try:
-                resolved_path = os.path.realpath(os.path.expanduser(os.path.expandvars(file_path_from_ai)))
-            except Exception as e:
-                op_result["message"] = f"解析路径 '{file_path_from_ai}' 失败: {str(e)}"
-                results.append(op_result)
-                continue
-            
-            try:
-                dir_name = os.path.dirname(resolved_path)
-                if dir_name and not os.path.exists(dir_name):
-                    print(f"信息: 尝试为文件 '{resolved_path}' 创建父目录: {dir_name}", file=sys.stderr)
-                    os.makedirs(dir_name, exist_ok=True)
-            except PermissionError:
-                op_result["message"] = f"权限错误：无法创建目录 '{os.path.dirname(resolved_path)}'。"
-                results.append(op_result)
-                continue
-            except Exception as e:
-                op_result["message"] = f"创建目录时发生错误 '{os.path.dirname(resolved_path)}': {str(e)}"
-                results.append(op_result)
-                continue
-
-            try:
-                content_bytes = str(content).encode('utf-8') 
-                if len(content_bytes) > max_file_size_mb_write * 1024 * 1024:
-                    op_result["message"] = f"内容大小超过 {max_file_size_mb_write}MB 限制。"
-                    results.append(op_result)
-                    continue
-            except Exception as e:
-                op_result["message"] = f"无法预估内容大小（可能不是文本）: {str(e)}"
-                results.append(op_result)
-                continue
-            
-            try:
-                with open(resolved_path, 'w', encoding='utf-8') as f:
-                    f.write(str(content)) #确保写入的是字符串
-                op_result["status"] = "成功"
-                op_result["message"] = f"文件 '{resolved_path}' 已更新。"
-            except PermissionError:
-                op_result["message"] = f"权限错误：无法写入文件 '{resolved_path}'。"
-            except IsADirectoryError:
-                 op_result["message"] = f"路径错误：'{resolved_path}' 是一个目录，不能作为文件写入。"
-            except Exception as e:
-                op_result["message"] = f"写入文件 '{resolved_path}' 时发生错误: {str(e)}"
-            results.append(op_result)
-            
-        return json.dumps(results, ensure_ascii=False, indent=2)
-
-    except json.JSONDecodeError:
-        return json.dumps([{"path": "JSON解析错误", "status": "失败", "message": "输入参数不是有效的JSON字符串。"}], ensure_ascii=False, indent=2)
-    except Exception as e:
-        return json.dumps([{"path": "未知错误", "status": "失败", "message": f"处理文件更新时发生未知错误: {str(e)}"}], ensure_ascii=False, indent=2)
-
-if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        json_param = sys.argv[1]
-        result = update_files_unsafe(json_param)
-        print(result)
-    else:
-        print(json.dumps([{"path": "调用错误", "status": "失败", "message": "文件更新插件需要一个JSON字符串作为参数。"}]))
-        print("警告：此模式允许在任意指定路径更新文件，请谨慎使用！")
-    sys.stdout.flush()
+import os
+import re
+import sys
+import json
+import mmap
+import shutil
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+PROJECT_ROOT = os.path.realpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+from plugin_common import directory_index
+from plugin_common.atomic_file import atomic_write
+from plugin_common.plugin_protocol import read_plugin_argument
+
+# 默认配置
+DEFAULT_MAX_FILE_SIZE_MB_WRITE = 5
+DEFAULT_WRITE_WORKERS = 8
+
+# 加载插件自身配置
+max_file_size_mb_write = DEFAULT_MAX_FILE_SIZE_MB_WRITE
+write_workers = DEFAULT_WRITE_WORKERS
+allow_arbitrary_paths = True # 从插件配置中获取，确保其意图
+try:
+    plugin_config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.json")
+    if os.path.exists(plugin_config_path):
+        with open(plugin_config_path, 'r', encoding='utf-8') as f:
+            plugin_config_data = json.load(f)
+            psc = plugin_config_data.get("plugin_specific_config", {})
+            max_file_size_mb_write = psc.get("max_file_size_mb_write", DEFAULT_MAX_FILE_SIZE_MB_WRITE)
+            allow_arbitrary_paths = psc.get("allow_arbitrary_paths", True) 
+            write_workers = psc.get("write_workers", DEFAULT_WRITE_WORKERS)
+    if not allow_arbitrary_paths:
+        print("严重警告: 文件更新插件 (file_updater) 被配置为不允许任意路径，但其代码逻辑当前是允许的。存在配置与行为不一致的风险！", file=sys.stderr)
+except Exception as e:
+    print(f"警告: 读取插件 file_updater 配置失败: {e}. 将使用默认值。", file=sys.stderr)
+
+# 补丁中的一个修改块 (hunk)。old_start 为原文件中的起始行号 (从 1 开始，@@ 行中未给出时为 None)；
+# lines 中每项为 (标记, 文本, 是否以换行结束)，标记为 ' ' (上下文)、'-' (删除) 或 '+' (新增)
+Hunk = namedtuple("Hunk", ["old_start", "lines"])
+HUNK_HEADER_RE = re.compile(r"^@@(?:\s+-(\d+)(?:,\d+)?\s+\+\d+(?:,\d+)?)?\s+@@")
+
+
+class PatchError(Exception):
+    pass
+
+
+def parse_unified_diff(patch_text: str) -> list:
+    """解析统一格式 (unified diff) 的补丁。忽略 diff/---/+++ 文件头；hunk 的行数以实际内容为准，不要求 @@ 行中的行数准确。"""
+    lines = patch_text.splitlines()
+    while lines and not lines[-1].strip():
+        lines.pop()
+    hunks = []
+    current = None
+    for number, raw in enumerate(lines):
+        header = HUNK_HEADER_RE.match(raw)
+        if header:
+            current = Hunk(int(header.group(1)) if header.group(1) is not None else None, [])
+            hunks.append(current)
+            continue
+        if current is None or raw.startswith("diff ") or (raw.startswith("--- ") and number + 1 < len(lines) and lines[number + 1].startswith("+++ ")):
+            current = None  # 文件头
+            continue
+        if raw.startswith("\\"):
+            # "\ No newline at end of file": 上一行没有换行符
+            if current.lines:
+                tag, text, _ = current.lines[-1]
+                current.lines[-1] = (tag, text, False)
+            continue
+        tag = raw[:1] or ' '  # 部分工具会去掉空白上下文行的前导空格
+        if tag not in ' -+':
+            raise PatchError(f"无法识别的补丁行: {raw[:80]}")
+        current.lines.append((tag, raw[1:], True))
+    if not any(hunk.lines for hunk in hunks):
+        raise PatchError("补丁中没有以 @@ 开头的修改块。")
+    return [hunk for hunk in hunks if hunk.lines]
+
+
+def exact_line(line: bytes) -> bytes:
+    return line.rstrip(b'\r\n')
+
+
+def loose_line(line: bytes) -> bytes:
+    return line.rstrip()
+
+
+def write_hunk(hunk: Hunk, number: int, original_lines, target, newline: bytes, normalize):
+    """写出一个修改块修改后的内容。original_lines 依次给出被上下文行和删除行覆盖的原始行，与补丁不一致时抛出 PatchError。"""
+    for position, (tag, text, has_newline) in enumerate(hunk.lines):
+        if tag == '+':
+            target.write(text.encode('utf-8') + (newline if has_newline else b''))
+            continue
+        line = next(original_lines, b'')
+        if not line or normalize(line) != normalize(text.encode('utf-8')):
+            actual = line.decode('utf-8', 'replace').rstrip('\r\n') if line else "(文件结束)"
+            raise PatchError(f"第 {number} 个修改块与文件内容不一致: 期望 {text[:120]!r}，实际为 {actual[:120]!r}。")
+        if tag == ' ':
+            if not line.endswith(b'\n') and position < len(hunk.lines) - 1:
+                line += newline  # 原文件最后一行没有换行符，其后还有新增的行
+            target.write(line)
+
+
+def apply_patch_streaming(source, target, hunks: list, newline: bytes):
+    """按 @@ 行中的行号逐行复制原文件并应用修改，只占用一行的内存。行号或内容对不上时抛出 PatchError。"""
+    original_lines = iter(source.readline, b'')
+    line_number = 1
+    for number, hunk in enumerate(hunks, 1):
+        if hunk.old_start is None:
+            raise PatchError(f"第 {number} 个修改块没有行号。")
+        old_count = sum(1 for tag, _, _ in hunk.lines if tag != '+')
+        start = hunk.old_start + 1 if old_count == 0 else max(1, hunk.old_start)  # 只有新增行时插入在 old_start 行之后
+        if start < line_number:
+            raise PatchError(f"第 {number} 个修改块与前一个重叠或顺序颠倒。")
+        while line_number < start:
+            line = next(original_lines, b'')
+            if not line:
+                raise PatchError(f"第 {number} 个修改块的起始行 {start} 超出文件末尾。")
+            target.write(line)
+            line_number += 1
+        write_hunk(hunk, number, original_lines, target, newline, exact_line)
+        line_number += old_count
+    shutil.copyfileobj(source, target)
+
+
+def locate_block(lines: list, block: list, expected: int, lower: int):
+    """从 expected 开始向两侧查找与 block 一致的位置 (不早于 lower)。先精确比较，再忽略行尾空白比较。返回 (位置, 比较方式) 或 None。"""
+    last = len(lines) - len(block)
+    if last < lower:
+        return None
+    expected = min(max(expected, lower), last)
+    for normalize in (exact_line, loose_line):
+        wanted = [normalize(line) for line in block]
+        for distance in range(max(expected - lower, last - expected) + 1):
+            for index in ((expected,) if distance == 0 else (expected - distance, expected + distance)):
+                if lower <= index <= last and normalize(lines[index]) == wanted[0] \
+                        and all(normalize(lines[index + k]) == wanted[k] for k in range(1, len(wanted))):
+                    return index, normalize
+    return None
+
+
+def apply_patch_relocating(data: bytes, target, hunks: list, newline: bytes) -> bool:
+    """按上下文在文件中重新定位每个修改块后应用 (行号有偏移、行尾空白不同或没有行号时)。返回是否有修改块被重新定位。"""
+    lines = data.splitlines(keepends=True)
+    position = offset = 0
+    relocated = False
+    for number, hunk in enumerate(hunks, 1):
+        block = [text.encode('utf-8') for tag, text, _ in hunk.lines if tag != '+']
+        expected = hunk.old_start - 1 + offset if hunk.old_start else position
+        if not block:
+            index, normalize = min(max(expected + 1 if hunk.old_start else expected, position), len(lines)), exact_line
+        else:
+            found = locate_block(lines, block, expected, position)
+            if found is None:
+                preview = " / ".join(line.decode('utf-8', 'replace').strip() for line in block[:3])
+                raise PatchError(f"第 {number} 个修改块的上下文在文件中找不到 (开头为: {preview[:200]})。请先读取文件的最新内容再生成补丁。")
+            index, normalize = found
+            relocated = relocated or (hunk.old_start is not None and index != expected) or normalize is not exact_line
+            if hunk.old_start:
+                offset = index - (hunk.old_start - 1)
+        target.writelines(lines[position:index])
+        write_hunk(hunk, number, iter(lines[index:index + len(block)]), target, newline, normalize)
+        position = index + len(block)
+    target.writelines(lines[position:])
+    return relocated
+
+
+def find_edit_spans(data, edits: list) -> list:
+    """为每个 search/replace 找到在原文件中的位置，返回按位置排序的 [(起始, 结束, 替换内容)]。"""
+    crlf = data.find(b'\r\n') != -1
+    spans = []
+    for number, edit in enumerate(edits, 1):
+        if not isinstance(edit, dict) or not isinstance(edit.get("search"), str) or not edit["search"] or not isinstance(edit.get("replace"), str):
+            raise PatchError(f"第 {number} 个替换格式错误，需要非空的 'search' 字符串和 'replace' 字符串。")
+        search, replace = edit["search"].encode('utf-8'), edit["replace"].encode('utf-8')
+        candidates = [(search, replace)]
+        if crlf and b'\n' in search and b'\r\n' not in search:
+            # 文件使用 CRLF 换行而 search 中为 LF
+            candidates.append((search.replace(b'\n', b'\r\n'), replace.replace(b'\n', b'\r\n')))
+        for search, replace in candidates:
+            start = data.find(search)
+            if start != -1:
+                break
+        else:
+            raise PatchError(f"第 {number} 个替换的 search 内容在文件中找不到。请先读取文件的最新内容，search 需与文件内容 (包括缩进) 完全一致。")
+        if edit.get("replace_all"):
+            while start != -1:
+                spans.append((start, start + len(search), replace))
+                start = data.find(search, start + len(search))
+        elif data.find(search, start + 1) != -1:
+            raise PatchError(f"第 {number} 个替换的 search 内容在文件中出现多次，请加入更多上下文使其唯一，或设置 \"replace_all\": true。")
+        else:
+            spans.append((start, start + len(search), replace))
+    spans.sort(key=lambda span: span[0])
+    for previous, span in zip(spans, spans[1:]):
+        if span[0] < previous[1]:
+            raise PatchError("多个替换的 search 内容相互重叠，请合并为一个替换。")
+    return spans
+
+
+def detect_newline(path: str) -> bytes:
+    try:
+        with open(path, 'rb') as f:
+            first_line = f.readline(65536)
+    except FileNotFoundError:
+        return os.linesep.encode('ascii')
+    return b'\r\n' if first_line.endswith(b'\r\n') else b'\n'
+
+
+def check_size(target):
+    if target.tell() > max_file_size_mb_write * 1024 * 1024:
+        raise PatchError(f"修改后的文件大小超过 {max_file_size_mb_write}MB 限制。")
+
+
+def write_content(resolved_path: str, content: str) -> tuple:
+    # 与原先以文本模式写入时一致，换行符转换为系统默认的换行符
+    content_bytes = (content.replace('\n', os.linesep) if os.linesep != '\n' else content).encode('utf-8')
+    if len(content_bytes) > max_file_size_mb_write * 1024 * 1024:
+        raise PatchError(f"内容大小超过 {max_file_size_mb_write}MB 限制。")
+    with atomic_write(resolved_path) as target:
+        target.write(content_bytes)
+    return len(content_bytes), f"文件 '{resolved_path}' 已更新。"
+
+
+def write_patch(resolved_path: str, patch_text: str) -> tuple:
+    hunks = parse_unified_diff(patch_text)
+    newline = detect_newline(resolved_path)
+    if not os.path.exists(resolved_path):
+        if any(tag != '+' for hunk in hunks for tag, _, _ in hunk.lines):
+            raise PatchError(f"文件 '{resolved_path}' 不存在，补丁中却包含上下文或删除的行。")
+        with atomic_write(resolved_path) as target:
+            apply_patch_relocating(b'', target, hunks, newline)
+            written = target.tell()
+        return written, f"已按补丁创建文件 '{resolved_path}'。"
+    try:
+        # 原文件在替换前关闭 (Windows 上无法替换仍被打开的文件)
+        with atomic_write(resolved_path) as target:
+            with open(resolved_path, 'rb') as source:
+                apply_patch_streaming(source, target, hunks, newline)
+            check_size(target)
+            written = target.tell()
+        return written, f"已对文件 '{resolved_path}' 应用 {len(hunks)} 个修改块。"
+    except PatchError as streaming_error:
+        # 行号不准确时按上下文重新定位 (需要把文件读入内存)
+        if os.path.getsize(resolved_path) > max_file_size_mb_write * 1024 * 1024:
+            raise streaming_error
+        with open(resolved_path, 'rb') as f:
+            data = f.read()
+        with atomic_write(resolved_path) as target:
+            relocated = apply_patch_relocating(data, target, hunks, newline)
+            check_size(target)
+            written = target.tell()
+        note = "，部分修改块的行号与文件不一致，已按上下文重新定位" if relocated else ""
+        return written, f"已对文件 '{resolved_path}' 应用 {len(hunks)} 个修改块{note}。"
+
+
+def write_edits(resolved_path: str, edits: list) -> tuple:
+    if not isinstance(edits, list) or not edits:
+        raise PatchError("'edits' 必须是非空数组，每个元素包含 'search' 和 'replace'。")
+    if not os.path.isfile(resolved_path):
+        raise PatchError(f"文件 '{resolved_path}' 不存在，无法进行替换。创建新文件请使用 'content'。")
+    with atomic_write(resolved_path) as target:
+        with open(resolved_path, 'rb') as source:
+            size = os.fstat(source.fileno()).st_size
+            data = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+            try:
+                spans = find_edit_spans(data, edits)
+                # 未修改的部分直接从内存映射中复制，不解码整个文件
+                position = 0
+                for start, end, replace in spans:
+                    target.write(data[position:start])
+                    target.write(replace)
+                    position = end
+                target.write(data[position:])
+            finally:
+                if size:
+                    data.close()
+        check_size(target)
+        written = target.tell()
+    return written, f"已在文件 '{resolved_path}' 中完成 {len(spans)} 处替换。"
+
+
+def bytes_received(op: dict) -> int:
+    if "content" in op:
+        return len(str(op["content"]).encode('utf-8'))
+    if "patch" in op:
+        return len(str(op["patch"]).encode('utf-8'))
+    return sum(len(str(edit.get(key, "")).encode('utf-8')) for edit in op.get("edits") or [] if isinstance(edit, dict) for key in ("search", "replace"))
+
+
+def execute_operation(op: dict, resolved_path: str) -> dict:
+    op_result = {"path": op["path"], "status": "失败", "bytes_received": bytes_received(op)}
+    try:
+        dir_name = os.path.dirname(resolved_path)
+        if dir_name and not os.path.exists(dir_name):
+            print(f"信息: 尝试为文件 '{resolved_path}' 创建父目录: {dir_name}", file=sys.stderr)
+            os.makedirs(dir_name, exist_ok=True)
+    except PermissionError:
+        op_result["message"] = f"权限错误：无法创建目录 '{os.path.dirname(resolved_path)}'。"
+        return op_result
+    except Exception as e:
+        op_result["message"] = f"创建目录时发生错误 '{os.path.dirname(resolved_path)}': {str(e)}"
+        return op_result
+
+    try:
+        if "content" in op:
+            written, message = write_content(resolved_path, str(op["content"]))
+        elif "patch" in op:
+            written, message = write_patch(resolved_path, str(op["patch"]))
+        else:
+            written, message = write_edits(resolved_path, op["edits"])
+        op_result.update({"status": "成功", "message": message, "bytes_written": written})
+    except PatchError as e:
+        op_result["message"] = f"{e} 文件未被修改。"
+    except PermissionError:
+        op_result["message"] = f"权限错误：无法写入文件 '{resolved_path}'。"
+    except IsADirectoryError:
+        op_result["message"] = f"路径错误：'{resolved_path}' 是一个目录，不能作为文件写入。"
+    except Exception as e:
+        op_result["message"] = f"写入文件 '{resolved_path}' 时发生错误: {str(e)}"
+    return op_result
+
+
+def update_files_unsafe(operations_json_str: str):
+    """
+    根据JSON字符串描述更新一个或多个文件内容。
+    每个操作包含 'path' 以及以下之一: 'content' (完整内容)、'patch' (统一格式的补丁) 或 'edits' (search/replace 列表)。
+    文件通过临时文件 + 重命名原子写入；不同文件的操作并行执行，同一文件的多个操作按顺序执行。
+    如果 allow_arbitrary_paths 为 true (来自插件配置)，则允许AI指定任意路径。
+    """
+    if not allow_arbitrary_paths:
+        return json.dumps([{"path": "配置错误", "status": "失败", "message": "插件被配置为不允许任意路径操作，但此功能被调用。请检查插件配置。"}], ensure_ascii=False, indent=2)
+
+    print("警告: 文件更新插件正在以不安全模式运行，允许在AI指定的任意路径更新文件。", file=sys.stderr)
+    try:
+        operations = json.loads(operations_json_str)
+        if not isinstance(operations, list):
+            return json.dumps([{"path": "参数错误", "status": "失败", "message": "输入参数必须是一个JSON数组。"}], ensure_ascii=False, indent=2)
+
+        if not operations:
+            return json.dumps([{"path": "无操作", "status": "信息", "message": "没有提供任何文件更新操作。"}], ensure_ascii=False, indent=2)
+
+        results = [None] * len(operations)
+        groups = {}  # 解析后的路径 -> 该文件的操作下标 (按原顺序)
+        for index, op in enumerate(operations):
+            if not isinstance(op, dict) or "path" not in op or not any(key in op for key in ("content", "patch", "edits")):
+                path = op.get("path", "未知路径") if isinstance(op, dict) else "未知路径"
+                results[index] = {"path": path, "status": "失败", "message": "操作格式错误，需要 'path' 以及 'content'、'patch' 或 'edits' 之一。"}
+                continue
+            try:
+                resolved_path = os.path.realpath(os.path.expanduser(os.path.expandvars(op["path"])))
+            except Exception as e:
+                results[index] = {"path": op["path"], "status": "失败", "message": f"解析路径 '{op['path']}' 失败: {str(e)}"}
+                continue
+            groups.setdefault(resolved_path, []).append(index)
+
+        def run_group(resolved_path, indices):
+            for index in indices:
+                results[index] = execute_operation(operations[index], resolved_path)
+
+        if groups:
+            with ThreadPoolExecutor(max_workers=max(1, min(write_workers, len(groups)))) as executor:
+                for future in [executor.submit(run_group, path, indices) for path, indices in groups.items()]:
+                    future.result()
+
+        written_paths = [path for path, indices in groups.items() if any(results[index]["status"] == "成功" for index in indices)]
+        if written_paths:
+            directory_index.notify_paths_changed(written_paths)  # 使目录索引立即反映本次修改
+        return json.dumps(results, ensure_ascii=False, indent=2)
+
+    except json.JSONDecodeError:
+        return json.dumps([{"path": "JSON解析错误", "status": "失败", "message": "输入参数不是有效的JSON字符串。"}], ensure_ascii=False, indent=2)
+    except Exception as e:
+        return json.dumps([{"path": "未知错误", "status": "失败", "message": f"处理文件更新时发生未知错误: {str(e)}"}], ensure_ascii=False, indent=2)
+
+if __name__ == "__main__":
+    json_param = read_plugin_argument()
+    if json_param is not None:
+        result = update_files_unsafe(json_param)
+        print(result)
+    else:
+        print(json.dumps([{"path": "调用错误", "status": "失败", "message": "文件更新插件需要一个JSON字符串作为参数。"}]))
+        print("警告：此模式允许在任意指定路径更新文件，请谨慎使用！")
+    sys.stdout.flush()
@@ -1,281 +1,391 @@
-import sys
-import asyncio
-from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError, Error as PlaywrightError
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse, quote_plus, parse_qs
-import traceback
-import os
-import platform
-import json # 新增
-
-# --- 默认配置 ---
-DEFAULT_USER_DATA_DIRECTORY_PATH = ""
-DEFAULT_BROWSER_EXECUTABLE = "chromium" # playwright的浏览器类型名
-DEFAULT_PAGE_LOAD_TIMEOUT_MS = 45 * 1000
-DEFAULT_WAIT_AFTER_LOAD_S = 3
-DEFAULT_LAUNCH_BROWSER_HEADLESS = False # 使用用户配置时，建议 False (有头)
-DEFAULT_MAX_TEXT_LENGTH = 25000
-DEFAULT_MAX_LINKS = 30
-
-# --- 加载插件配置 ---
-user_data_directory_path = DEFAULT_USER_DATA_DIRECTORY_PATH
-browser_executable = DEFAULT_BROWSER_EXECUTABLE
-page_load_timeout_ms = DEFAULT_PAGE_LOAD_TIMEOUT_MS
-wait_after_load_s = DEFAULT_WAIT_AFTER_LOAD_S
-launch_browser_headless = DEFAULT_LAUNCH_BROWSER_HEADLESS
-max_results_text_length = DEFAULT_MAX_TEXT_LENGTH
-max_links_to_extract = DEFAULT_MAX_LINKS
-
-try:
-    plugin_config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.json")
-    if os.path.exists(plugin_config_path):
-        with open(plugin_config_path, 'r', encoding='utf-8') as f:
-            plugin_config_data = json.load(f)
-            psc = plugin_config_data.get("plugin_specific_config", {})
-            user_data_directory_path = psc.get("user_data_directory_path", DEFAULT_USER_DATA_DIRECTORY_PATH)
-            # browser_executable 现在指Playwright的浏览器类型，如chromium, firefox, webkit
-            browser_executable = psc.get("default_browser_type", DEFAULT_BROWSER_EXECUTABLE).lower() 
-            page_load_timeout_ms = psc.get("page_load_timeout_ms", DEFAULT_PAGE_LOAD_TIMEOUT_MS)
-            wait_after_load_s = psc.get("wait_after_load_seconds", DEFAULT_WAIT_AFTER_LOAD_S)
-            launch_browser_headless = psc.get("launch_browser_headless", DEFAULT_LAUNCH_BROWSER_HEADLESS)
-            max_results_text_length = psc.get("max_results_text_length", DEFAULT_MAX_TEXT_LENGTH)
-            max_links_to_extract = psc.get("max_links_to_extract", DEFAULT_MAX_LINKS)
-            
-            # 确保 browser_executable 是 playwright 支持的类型
-            if browser_executable not in ["chromium", "firefox", "webkit"]:
-                print(f"警告: 插件配置中指定的浏览器类型 '{browser_executable}' 无效，将回退到 'chromium'。", file=sys.stderr)
-                browser_executable = "chromium"
-
-except Exception as e:
-    print(f"警告: 读取插件 google_search 配置 ({plugin_config_path}) 失败: {e}. 将使用默认值。", file=sys.stderr)
-
-
-def get_browser_type_and_kill_command(user_data_path: str):
-    path_lower = user_data_path.lower()
-    os_platform = platform.system().lower()
-    
-    browser_name_for_kill = None
-    kill_cmd_list = []
-
-    if "google/chrome" in path_lower or "google-chrome" in path_lower:
-        browser_name_for_kill = "Chrome"
-        if "windows" in os_platform: kill_cmd_list = ["taskkill", "/F", "/IM", "chrome.exe"]
-        elif "darwin" in os_platform: kill_cmd_list = ["pkill", "-f", "Google Chrome"]
-        elif "linux" in os_platform: kill_cmd_list = ["pkill", "-f", "chrome"]
-    elif "microsoft/edge" in path_lower or "microsoft-edge" in path_lower or "msedge" in path_lower:
-        browser_name_for_kill = "Edge"
-        if "windows" in os_platform: kill_cmd_list = ["taskkill", "/F", "/IM", "msedge.exe"]
-        elif "darwin" in os_platform: kill_cmd_list = ["pkill", "-f", "Microsoft Edge"]
-        elif "linux" in os_platform: kill_cmd_list = ["pkill", "-f", "msedge"]
-    # 可以为Firefox等添加更多判断
-    # elif "firefox" in path_lower or "mozilla" in path_lower:
-    #     browser_name_for_kill = "Firefox"
-    # ...
-
-    if not browser_name_for_kill:
-        print(f"[Google Search Plugin] 警告: 无法从路径 '{user_data_path}' 明确识别浏览器类型以关闭进程。", file=sys.stderr)
-        return "未知浏览器", None
-        
-    return browser_name_for_kill, kill_cmd_list
-
-async def close_browser_processes(kill_cmd_list: list, browser_type: str):
-    if not kill_cmd_list: return
-    print(f"[Google Search Plugin] 警告: 即将尝试关闭所有 {browser_type} 进程以使用用户配置文件。", file=sys.stderr)
-    try:
-        process = await asyncio.create_subprocess_shell(
-            " ".join(kill_cmd_list),
-            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
-        )
-        stdout, stderr = await process.communicate()
-        if process.returncode == 0:
-            print(f"[Google Search Plugin] 成功执行关闭 {browser_type} 进程的命令。", file=sys.stderr)
-        else:
-            print(f"[Google Search Plugin] 关闭 {browser_type} 进程的命令返回码 {process.returncode}.", file=sys.stderr)
-            if stdout: print(f"  [STDOUT]: {stdout.decode(errors='replace').strip()}", file=sys.stderr)
-            if stderr: print(f"  [STDERR]: {stderr.decode(errors='replace').strip()}", file=sys.stderr)
-        await asyncio.sleep(1)
-    except FileNotFoundError:
-        print(f"[Google Search Plugin] 错误: 关闭命令 '{kill_cmd_list[0]}' 未找到。", file=sys.stderr)
-    except Exception as e:
-        print(f"[Google Search Plugin] 关闭 {browser_type} 进程时出错: {e}", file=sys.stderr)
-
-
-async def perform_google_search(keywords: str):
-    search_url = f"https://www.google.com/search?q={quote_plus(keywords)}&hl=zh-CN&gl=CN"
-    print(f"[Google Search Plugin] 构造的搜索URL: {search_url}", file=sys.stderr)
-
-    playwright_instance = None
-    browser_context = None
-    page = None
-    mode_description = ""
-    browser_closed_by_plugin = False
-
-    try:
-        playwright_instance = await async_playwright().start()
-        
-        effective_user_data_dir = None
-        if user_data_directory_path and isinstance(user_data_directory_path, str) and os.path.isdir(user_data_directory_path):
-            effective_user_data_dir = user_data_directory_path
-            browser_type_guess, kill_cmd = get_browser_type_and_kill_command(effective_user_data_dir)
-            if kill_cmd:
-                await close_browser_processes(kill_cmd, browser_type_guess)
-                browser_closed_by_plugin = True
-            mode_description = f"本地用户配置: {effective_user_data_dir} (尝试关闭 {browser_type_guess})"
-        else:
-            if user_data_directory_path: # 如果配置了但无效
-                print(f"[Google Search Plugin] 警告: 配置的 user_data_directory_path 无效。使用常规模式。", file=sys.stderr)
-            mode_description = "常规模式 (无用户配置)"
-        
-        print(f"[Google Search Plugin] 启动模式: {mode_description}", file=sys.stderr)
-
-        common_browser_args = ['--no-sandbox', '--disable-setuid-sandbox', '--disable-blink-features=AutomationControlled']
-        
-        browser_launcher = None
-        if browser_executable == "chromium": browser_launcher = playwright_instance.chromium
-        elif browser_executable == "firefox": browser_launcher = playwright_instance.firefox
-        elif browser_executable == "webkit": browser_launcher = playwright_instance.webkit
-        else: # Fallback, should not happen due to earlier check
-            print(f"错误: 不支持的浏览器类型 '{browser_executable}' for Playwright. 使用 Chromium.", file=sys.stderr)
-            browser_launcher = playwright_instance.chromium
-
-
-        if effective_user_data_dir:
-            try:
-                # launch_persistent_context 只支持 chromium
-                if browser_executable != "chromium":
-                     print(f"[Google Search Plugin] 警告: 使用用户数据目录 (launch_persistent_context) 当前仅 Playwright 的 Chromium 支持。配置的浏览器是 {browser_executable}。将尝试常规模式启动 {browser_executable}。", file=sys.stderr)
-                     # 回退到常规模式
-                     browser_instance = await browser_launcher.launch(headless=launch_browser_headless, args=common_browser_args)
-                     browser_context = await browser_instance.new_context(
-                        user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36 Xice_Aitoolbox/SearchPlugin-Regular',
-                        locale='zh-CN', timezone_id='Asia/Shanghai'
-                     )
-                     mode_description += " (回退到常规模式)"
-                else:
-                    browser_context = await browser_launcher.launch_persistent_context(
-                        user_data_dir=effective_user_data_dir,
-                        headless=launch_browser_headless,
-                        args=common_browser_args,
-                        user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36 Edg/114.0.1823.43',
-                        locale='zh-CN', timezone_id='Asia/Shanghai',
-                    )
-                page = await browser_context.new_page()
-            except PlaywrightError as pe_persistent:
-                err_msg = f"错误：使用本地用户配置 '{effective_user_data_dir}' ({browser_executable}) 启动浏览器失败: {str(pe_persistent)}"
-                if browser_closed_by_plugin: err_msg += " (即使在尝试关闭相关进程后依然失败)"
-                traceback.print_exc(file=sys.stderr)
-                return err_msg
-        else: # 常规模式
-            browser_instance = await browser_launcher.launch(headless=True, args=common_browser_args) # 常规模式强制headless=True
-            browser_context = await browser_instance.new_context(
-                user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36 Xice_Aitoolbox/SearchPlugin-Regular',
-                locale='zh-CN', timezone_id='Asia/Shanghai'
-            )
-            page = await browser_context.new_page()
-
-        page_content_html = ""
-        final_url_visited = search_url
-
-        try:
-            await page.goto(search_url, timeout=page_load_timeout_ms, wait_until='domcontentloaded')
-            final_url_visited = page.url
-            if wait_after_load_s > 0:
-                await page.wait_for_timeout(wait_after_load_s * 1000)
-            
-            # 尝试处理Cookie弹窗 (仅在非用户配置模式下更可能需要)
-            if not effective_user_data_dir:
-                consent_selectors = ["button:has-text('Accept all')", "button:has-text('全部同意')", "button:has-text('Reject all')", "button:has-text('全部拒绝')"]
-                for selector in consent_selectors:
-                    try:
-                        button = page.locator(selector).first
-                        if await button.is_visible(timeout=1000):
-                            await button.click(timeout=1500, force=True)
-                            await page.wait_for_timeout(700)
-                            break 
-                    except Exception: pass
-            
-            page_content_html = await page.content()
-        except PlaywrightTimeoutError:
-            page_content_html = await page.content() 
-            if not page_content_html: return f"错误({mode_description})：请求谷歌 '{keywords}' 超时 ({page_load_timeout_ms / 1000}s) 且无内容。"
-        except PlaywrightError as pe_page:
-            traceback.print_exc(file=sys.stderr)
-            return f"错误({mode_description})：访问谷歌 '{keywords}' 页面操作失败: {str(pe_page)}"
-        
-        if not page_content_html: return f"错误({mode_description})：未能从谷歌 '{keywords}' 获取HTML内容。"
-
-        soup = BeautifulSoup(page_content_html, 'html.parser')
-        page_title = soup.find('title').string.strip() if soup.find('title') and soup.find('title').string else "未找到标题"
-
-        for s in soup(["script", "style", "noscript", "meta", "link", "header", "footer", "nav", "aside", "form", "input", "button"]): s.decompose()
-        
-        main_area = soup.find(id="main") or soup.find(id="rcnt") or soup.find("body")
-        full_text = main_area.get_text(separator='\n', strip=True) if main_area else soup.get_text(separator='\n', strip=True)
-        
-        full_text = "\n".join([line.strip() for line in full_text.splitlines() if line.strip()])
-        if len(full_text) > max_results_text_length:
-            full_text = full_text[:max_results_text_length] + f"...\n[截断至 {max_results_text_length} 字符]"
-        if not full_text.strip(): full_text = "未能提取到有效文本。"
-
-        links, extracted_urls = [], set()
-        all_a = main_area.find_all('a', href=True) if main_area else soup.find_all('a', href=True)
-        for a in all_a:
-            href, text = a['href'], ' '.join(a.get_text(strip=True).split())
-            if not href or href.startswith(('#', 'javascript:', 'mailto:', 'tel:')): continue
-            
-            # 过滤谷歌内部链接
-            parsed_href_host = urlparse(urljoin(final_url_visited, href)).netloc
-            if "google.com" in parsed_href_host and ("/search?" in href or "/advanced_search" in href or \
-                any(s in href for s in ["preferences", "accounts.", "support.", "policies.", "setprefs"])):
-                if not text or text.isdigit() or text.lower() in ["images", "videos", "news", "shopping", "maps", "books", "flights", "finance", "图片", "视频", "新闻", "购物", "地图", "图书", "更多", "设置", "工具", "隐私", "条款", "反馈", "登录"]:
-                    continue
-            
-            abs_href = urljoin(final_url_visited, href)
-            # 处理谷歌跳转
-            if "google.com" in urlparse(abs_href).netloc and ("/url?q=" in abs_href or "/search?sa=U&url=" in abs_href):
-                qs_params = parse_qs(urlparse(abs_href).query)
-                real_url = (qs_params.get('q') or qs_params.get('url'))
-                if real_url and real_url[0]: abs_href = real_url[0]
-                else: continue
-            
-            if urlparse(abs_href).netloc and "google.com" not in urlparse(abs_href).netloc and "googleusercontent.com" not in urlparse(abs_href).netloc:
-                 if abs_href not in extracted_urls:
-                    links.append({"text": text or "N/A", "url": abs_href})
-                    extracted_urls.add(abs_href)
-        
-        links_output = links[:max_links_to_extract]
-        if len(links) > max_links_to_extract: links_output.append({"text": f"... [截断至前 {max_links_to_extract} 条]", "url": ""})
-        elif not links: links_output = [{"text": "未找到核心外部链接。", "url": ""}]
-        
-        links_formatted = "\n".join([f"- {l['text']}: {l['url']}" for l in links_output if l['url']]) or "未找到核心外部链接。"
-
-        output = f"[谷歌搜索关键词]: {keywords}\n[搜索模式]: {mode_description}\n"
-        output += f"[结果页标题]: {page_title}\n[实际搜索URL]: {final_url_visited}\n\n"
-        output += "[主要文本内容]:\n" + full_text + "\n\n"
-        output += "[相关超链接]:\n" + links_formatted
-            
-        return output.strip()
-
-    except Exception as e:
-        traceback.print_exc(file=sys.stderr)
-        return f"执行谷歌搜索 '{keywords}' (模式: {mode_description}) 时发生顶层错误: {str(e)}"
-    finally:
-        if page: await page.close()
-        if browser_context: await browser_context.close()
-        if playwright_instance: await playwright_instance.stop()
-
-if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        keywords_param = sys.argv[1]
-        print(f"[Plugin Log] Google Search: Keywords '{keywords_param}', UserDataPath: '{user_data_directory_path}'", file=sys.stderr)
-        try:
-            result = asyncio.run(perform_google_search(keywords_param))
-            print(result)
-        except Exception as e:
-            print(f"谷歌搜索插件主线程错误: {str(e)}", file=sys.stderr)
-            traceback.print_exc(file=sys.stderr)
-            print(f"错误：执行谷歌搜索时发生内部错误。")
-    else:
-        print(json.dumps({"status": "错误", "message": "谷歌搜索插件需要关键词参数。"}))
-    sys.stdout.flush()
-    sys.stderr.flush()
+import sys
+import time
+import asyncio
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError, Error as PlaywrightError
+from urllib.parse import urljoin, urlparse, quote_plus, parse_qs
+import traceback
+import os
+import json # 新增
+
+PROJECT_ROOT = os.path.realpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+from plugin_common import browser_service, page_readiness
+from plugin_common.disk_cache import DiskCache
+from plugin_common.html_extract import extract_page
+from plugin_common.plugin_protocol import read_plugin_argument
+
+# --- 默认配置 ---
+DEFAULT_USER_DATA_DIRECTORY_PATH = ""
+DEFAULT_BROWSER_EXECUTABLE = "chromium" # playwright的浏览器类型名
+DEFAULT_PAGE_LOAD_TIMEOUT_MS = 45 * 1000
+DEFAULT_WAIT_AFTER_LOAD_S = 3
+DEFAULT_LAUNCH_BROWSER_HEADLESS = False # 使用用户配置时，建议 False (有头)
+DEFAULT_MAX_TEXT_LENGTH = 25000
+DEFAULT_MAX_LINKS = 30
+DEFAULT_USE_SHARED_BROWSER_SERVICE = True
+DEFAULT_CACHE_ENABLED = True
+DEFAULT_CACHE_TTL_SECONDS = 1800
+DEFAULT_CACHE_MAX_TOTAL_MB = 50
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache")
+DEFAULT_HTML_EXTRACTION_BACKEND = "auto" # auto / lxml / bs4
+DEFAULT_BLOCKED_RESOURCE_TYPES = page_readiness.DEFAULT_BLOCKED_RESOURCE_TYPES
+DEFAULT_DOM_STABLE_MS = page_readiness.DEFAULT_DOM_STABLE_MS
+REMOVED_TAGS = ["script", "style", "noscript", "meta", "link", "header", "footer", "nav", "aside", "form", "input", "button"]
+MAIN_AREA_CANDIDATES = ["#main", "#rcnt", "body"]
+
+COMMON_BROWSER_ARGS = browser_service.COMMON_BROWSER_ARGS
+REGULAR_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36 Xice_Aitoolbox/SearchPlugin-Regular'
+PERSISTENT_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36 Edg/114.0.1823.43'
+CONSENT_SELECTORS = ["button:has-text('Accept all')", "button:has-text('全部同意')", "button:has-text('Reject all')", "button:has-text('全部拒绝')"]
+
+# --- 加载插件配置 ---
+user_data_directory_path = DEFAULT_USER_DATA_DIRECTORY_PATH
+browser_executable = DEFAULT_BROWSER_EXECUTABLE
+page_load_timeout_ms = DEFAULT_PAGE_LOAD_TIMEOUT_MS
+wait_after_load_s = DEFAULT_WAIT_AFTER_LOAD_S
+launch_browser_headless = DEFAULT_LAUNCH_BROWSER_HEADLESS
+max_results_text_length = DEFAULT_MAX_TEXT_LENGTH
+max_links_to_extract = DEFAULT_MAX_LINKS
+use_shared_browser_service = DEFAULT_USE_SHARED_BROWSER_SERVICE
+cache_enabled = DEFAULT_CACHE_ENABLED
+cache_ttl_seconds = DEFAULT_CACHE_TTL_SECONDS
+cache_max_total_mb = DEFAULT_CACHE_MAX_TOTAL_MB
+html_extraction_backend = DEFAULT_HTML_EXTRACTION_BACKEND
+blocked_resource_types = DEFAULT_BLOCKED_RESOURCE_TYPES
+dom_stable_ms = DEFAULT_DOM_STABLE_MS
+
+try:
+    plugin_config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.json")
+    if os.path.exists(plugin_config_path):
+        with open(plugin_config_path, 'r', encoding='utf-8') as f:
+            plugin_config_data = json.load(f)
+            psc = plugin_config_data.get("plugin_specific_config", {})
+            user_data_directory_path = psc.get("user_data_directory_path", DEFAULT_USER_DATA_DIRECTORY_PATH)
+            # browser_executable 现在指Playwright的浏览器类型，如chromium, firefox, webkit
+            browser_executable = psc.get("default_browser_type", DEFAULT_BROWSER_EXECUTABLE).lower() 
+            page_load_timeout_ms = psc.get("page_load_timeout_ms", DEFAULT_PAGE_LOAD_TIMEOUT_MS)
+            wait_after_load_s = psc.get("wait_after_load_seconds", DEFAULT_WAIT_AFTER_LOAD_S)
+            launch_browser_headless = psc.get("launch_browser_headless", DEFAULT_LAUNCH_BROWSER_HEADLESS)
+            max_results_text_length = psc.get("max_results_text_length", DEFAULT_MAX_TEXT_LENGTH)
+            max_links_to_extract = psc.get("max_links_to_extract", DEFAULT_MAX_LINKS)
+            use_shared_browser_service = psc.get("use_shared_browser_service", DEFAULT_USE_SHARED_BROWSER_SERVICE)
+            cache_enabled = psc.get("cache_enabled", DEFAULT_CACHE_ENABLED)
+            cache_ttl_seconds = psc.get("cache_ttl_seconds", DEFAULT_CACHE_TTL_SECONDS)
+            cache_max_total_mb = psc.get("cache_max_total_mb", DEFAULT_CACHE_MAX_TOTAL_MB)
+            html_extraction_backend = psc.get("html_extraction_backend", DEFAULT_HTML_EXTRACTION_BACKEND)
+            blocked_resource_types = psc.get("blocked_resource_types", DEFAULT_BLOCKED_RESOURCE_TYPES)
+            dom_stable_ms = psc.get("dom_stable_ms", DEFAULT_DOM_STABLE_MS)
+            
+            # 确保 browser_executable 是 playwright 支持的类型
+            if browser_executable not in ["chromium", "firefox", "webkit"]:
+                print(f"警告: 插件配置中指定的浏览器类型 '{browser_executable}' 无效，将回退到 'chromium'。", file=sys.stderr)
+                browser_executable = "chromium"
+
+except Exception as e:
+    print(f"警告: 读取插件 google_search 配置 ({plugin_config_path}) 失败: {e}. 将使用默认值。", file=sys.stderr)
+
+
+async def close_browser_processes(kill_cmd_list: list, browser_type: str):
+    if not kill_cmd_list: return
+    print(f"[Google Search Plugin] 警告: 即将尝试关闭所有 {browser_type} 进程以使用用户配置文件。", file=sys.stderr)
+    try:
+        process = await asyncio.create_subprocess_shell(
+            " ".join(kill_cmd_list),
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+        )
+        stdout, stderr = await process.communicate()
+        if process.returncode == 0:
+            print(f"[Google Search Plugin] 成功执行关闭 {browser_type} 进程的命令。", file=sys.stderr)
+        else:
+            print(f"[Google Search Plugin] 关闭 {browser_type} 进程的命令返回码 {process.returncode}.", file=sys.stderr)
+            if stdout: print(f"  [STDOUT]: {stdout.decode(errors='replace').strip()}", file=sys.stderr)
+            if stderr: print(f"  [STDERR]: {stderr.decode(errors='replace').strip()}", file=sys.stderr)
+        await asyncio.sleep(1)
+    except FileNotFoundError:
+        print(f"[Google Search Plugin] 错误: 关闭命令 '{kill_cmd_list[0]}' 未找到。", file=sys.stderr)
+    except Exception as e:
+        print(f"[Google Search Plugin] 关闭 {browser_type} 进程时出错: {e}", file=sys.stderr)
+
+
+async def fetch_search_html_with_browser_service(search_url: str, keywords: str, effective_user_data_dir, mode_description: str):
+    """
+    通过常驻浏览器服务租用页面获取搜索结果HTML。返回 (最终URL, HTML, 错误信息, 模式描述)。
+    浏览器启动方式 (含用户配置目录与关闭浏览器的命令) 由服务按本插件的配置决定，见 browser_service.build_launch；
+    持久化用户配置模式下，关闭浏览器进程的命令只在服务首次启动该配置时执行。
+    服务不可用时抛出 ConnectionError。
+    """
+    context_options = {"user_agent": REGULAR_USER_AGENT, "locale": 'zh-CN', "timezone_id": 'Asia/Shanghai'}
+    if effective_user_data_dir and browser_executable == "chromium":
+        context_options["user_agent"] = PERSISTENT_USER_AGENT
+    elif effective_user_data_dir:
+        mode_description += " (回退到常规模式)"  # launch_persistent_context 只支持 chromium
+
+    response = await browser_service.fetch_page(
+        search_url, profile="google_search", context_options=context_options,
+        timeout_ms=page_load_timeout_ms,
+        wait_after_load_ms=int(wait_after_load_s * 1000),
+        blocked_resource_types=blocked_resource_types,
+        dom_stable_ms=dom_stable_ms,
+        # 尝试处理Cookie弹窗 (仅在非用户配置模式下更可能需要)
+        consent_selectors=None if effective_user_data_dir else CONSENT_SELECTORS,
+    )
+    if not response.get("ok"):
+        if response.get("error_kind") == "launch" and effective_user_data_dir:
+            return search_url, "", f"错误：使用本地用户配置 '{effective_user_data_dir}' ({browser_executable}) 启动浏览器失败: {response.get('error')}", mode_description
+        if response.get("error_kind") == "page":
+            return search_url, "", f"错误({mode_description})：访问谷歌 '{keywords}' 页面操作失败: {response.get('error')}", mode_description
+        return search_url, "", f"错误({mode_description})：浏览器服务处理谷歌搜索 '{keywords}' 失败: {response.get('error')}", mode_description
+    page_readiness.log_timing("[Google Search Plugin]", search_url, response.get("timing"))
+    page_content_html = response.get("html", "")
+    if response.get("timed_out") and not page_content_html:
+        return search_url, "", f"错误({mode_description})：请求谷歌 '{keywords}' 超时 ({page_load_timeout_ms / 1000}s) 且无内容。", mode_description
+    return response.get("final_url") or search_url, page_content_html, None, mode_description
+
+
+async def fetch_search_html_with_local_browser(search_url: str, keywords: str, effective_user_data_dir, browser_type_guess, kill_cmd, mode_description: str):
+    """在本进程内启动浏览器获取搜索结果HTML (不使用浏览器服务时的方式)。返回 (最终URL, HTML, 错误信息, 模式描述)。"""
+    playwright_instance = None
+    browser_context = None
+    page = None
+    browser_closed_by_plugin = False
+
+    try:
+        playwright_instance = await async_playwright().start()
+
+        if effective_user_data_dir and kill_cmd:
+            await close_browser_processes(kill_cmd, browser_type_guess)
+            browser_closed_by_plugin = True
+        
+        browser_launcher = None
+        if browser_executable == "chromium": browser_launcher = playwright_instance.chromium
+        elif browser_executable == "firefox": browser_launcher = playwright_instance.firefox
+        elif browser_executable == "webkit": browser_launcher = playwright_instance.webkit
+        else: # Fallback, should not happen due to earlier check
+            print(f"错误: 不支持的浏览器类型 '{browser_executable}' for Playwright. 使用 Chromium.", file=sys.stderr)
+            browser_launcher = playwright_instance.chromium
+
+
+        if effective_user_data_dir:
+            try:
+                # launch_persistent_context 只支持 chromium
+                if browser_executable != "chromium":
+                     print(f"[Google Search Plugin] 警告: 使用用户数据目录 (launch_persistent_context) 当前仅 Playwright 的 Chromium 支持。配置的浏览器是 {browser_executable}。将尝试常规模式启动 {browser_executable}。", file=sys.stderr)
+                     # 回退到常规模式
+                     browser_instance = await browser_launcher.launch(headless=launch_browser_headless, args=COMMON_BROWSER_ARGS)
+                     browser_context = await browser_instance.new_context(
+                        user_agent=REGULAR_USER_AGENT,
+                        locale='zh-CN', timezone_id='Asia/Shanghai'
+                     )
+                     mode_description += " (回退到常规模式)"
+                else:
+                    browser_context = await browser_launcher.launch_persistent_context(
+                        user_data_dir=effective_user_data_dir,
+                        headless=launch_browser_headless,
+                        args=COMMON_BROWSER_ARGS,
+                        user_agent=PERSISTENT_USER_AGENT,
+                        locale='zh-CN', timezone_id='Asia/Shanghai',
+                    )
+                page = await browser_context.new_page()
+            except PlaywrightError as pe_persistent:
+                err_msg = f"错误：使用本地用户配置 '{effective_user_data_dir}' ({browser_executable}) 启动浏览器失败: {str(pe_persistent)}"
+                if browser_closed_by_plugin: err_msg += " (即使在尝试关闭相关进程后依然失败)"
+                traceback.print_exc(file=sys.stderr)
+                return search_url, "", err_msg, mode_description
+        else: # 常规模式
+            browser_instance = await browser_launcher.launch(headless=True, args=COMMON_BROWSER_ARGS) # 常规模式强制headless=True
+            browser_context = await browser_instance.new_context(
+                user_agent=REGULAR_USER_AGENT,
+                locale='zh-CN', timezone_id='Asia/Shanghai'
+            )
+            page = await browser_context.new_page()
+
+        page_content_html = ""
+        final_url_visited = search_url
+
+        try:
+            blocker = await page_readiness.attach_resource_blocker(page, blocked_resource_types)
+            started = time.monotonic()
+            await page.goto(search_url, timeout=page_load_timeout_ms, wait_until='domcontentloaded')
+            final_url_visited = page.url
+            timing = {"goto_ms": round((time.monotonic() - started) * 1000)}
+            timing["ready_reason"], timing["ready_ms"] = await page_readiness.wait_until_ready(page, int(wait_after_load_s * 1000), dom_stable_ms)
+            
+            # 尝试处理Cookie弹窗 (仅在非用户配置模式下更可能需要)
+            if not effective_user_data_dir:
+                for selector in CONSENT_SELECTORS:
+                    try:
+                        button = page.locator(selector).first
+                        if await button.is_visible(timeout=1000):
+                            await button.click(timeout=1500, force=True)
+                            await page.wait_for_timeout(700)
+                            break 
+                    except Exception: pass
+            
+            page_content_html = await page.content()
+            timing["blocked_requests"] = blocker.blocked_count if blocker else 0
+            timing["total_ms"] = round((time.monotonic() - started) * 1000)
+            page_readiness.log_timing("[Google Search Plugin]", final_url_visited, timing)
+        except PlaywrightTimeoutError:
+            page_content_html = await page.content() 
+            if not page_content_html: return final_url_visited, "", f"错误({mode_description})：请求谷歌 '{keywords}' 超时 ({page_load_timeout_ms / 1000}s) 且无内容。", mode_description
+        except PlaywrightError as pe_page:
+            traceback.print_exc(file=sys.stderr)
+            return final_url_visited, "", f"错误({mode_description})：访问谷歌 '{keywords}' 页面操作失败: {str(pe_page)}", mode_description
+        return final_url_visited, page_content_html, None, mode_description
+    finally:
+        if page: await page.close()
+        if browser_context: await browser_context.close()
+        if playwright_instance: await playwright_instance.stop()
+
+
+def get_search_cache():
+    # 搜索结果以 gzip 压缩存储，单条结果通常只有几 KB
+    return DiskCache(CACHE_DIR, ttl_seconds=cache_ttl_seconds, max_total_bytes=int(cache_max_total_mb * 1024 * 1024), compress=True)
+
+
+def normalize_keywords(keywords: str) -> str:
+    return " ".join(keywords.split()).casefold()
+
+
+def parse_request_argument(argument: str):
+    """
+    参数可以是关键词字符串，也可以是JSON对象:
+    {"keywords": "...", "bypass_cache": true} 跳过缓存读取 (结果仍会写入缓存)；{"cache_stats": true} 返回缓存统计。
+    返回 (关键词, bypass_cache, cache_stats)。
+    """
+    stripped = argument.strip()
+    if stripped.startswith("{"):
+        try:
+            params = json.loads(stripped)
+            if isinstance(params, dict):
+                return str(params.get("keywords", "")).strip(), bool(params.get("bypass_cache", False)), bool(params.get("cache_stats", False))
+        except json.JSONDecodeError:
+            pass
+    return stripped, False, False
+
+
+def parse_search_results(page_content_html: str, final_url_visited: str):
+    """解析搜索结果页。返回 (页面标题, 主要文本, 外部链接列表)，文本与链接均未截断。"""
+    page = extract_page(page_content_html, REMOVED_TAGS, MAIN_AREA_CANDIDATES, backend=html_extraction_backend)
+    page_title = page.title or "未找到标题"
+    full_text = page.text
+
+    links, extracted_urls = [], set()
+    for text, href in page.anchors:
+        text = ' '.join(text.split())
+        if not href or href.startswith(('#', 'javascript:', 'mailto:', 'tel:')): continue
+        
+        # 过滤谷歌内部链接
+        parsed_href_host = urlparse(urljoin(final_url_visited, href)).netloc
+        if "google.com" in parsed_href_host and ("/search?" in href or "/advanced_search" in href or \
+            any(s in href for s in ["preferences", "accounts.", "support.", "policies.", "setprefs"])):
+            if not text or text.isdigit() or text.lower() in ["images", "videos", "news", "shopping", "maps", "books", "flights", "finance", "图片", "视频", "新闻", "购物", "地图", "图书", "更多", "设置", "工具", "隐私", "条款", "反馈", "登录"]:
+                continue
+        
+        abs_href = urljoin(final_url_visited, href)
+        # 处理谷歌跳转
+        if "google.com" in urlparse(abs_href).netloc and ("/url?q=" in abs_href or "/search?sa=U&url=" in abs_href):
+            qs_params = parse_qs(urlparse(abs_href).query)
+            real_url = (qs_params.get('q') or qs_params.get('url'))
+            if real_url and real_url[0]: abs_href = real_url[0]
+            else: continue
+        
+        if urlparse(abs_href).netloc and "google.com" not in urlparse(abs_href).netloc and "googleusercontent.com" not in urlparse(abs_href).netloc:
+             if abs_href not in extracted_urls:
+                links.append({"text": text or "N/A", "url": abs_href})
+                extracted_urls.add(abs_href)
+    return page_title, full_text, links
+
+
+def format_search_output(keywords: str, mode_description: str, page_title: str, final_url_visited: str, full_text: str, links: list) -> str:
+    if len(full_text) > max_results_text_length:
+        full_text = full_text[:max_results_text_length] + f"...\n[截断至 {max_results_text_length} 字符]"
+    if not full_text.strip(): full_text = "未能提取到有效文本。"
+
+    links_output = links[:max_links_to_extract]
+    if len(links) > max_links_to_extract: links_output.append({"text": f"... [截断至前 {max_links_to_extract} 条]", "url": ""})
+    elif not links: links_output = [{"text": "未找到核心外部链接。", "url": ""}]
+    
+    links_formatted = "\n".join([f"- {l['text']}: {l['url']}" for l in links_output if l['url']]) or "未找到核心外部链接。"
+
+    output = f"[谷歌搜索关键词]: {keywords}\n[搜索模式]: {mode_description}\n"
+    output += f"[结果页标题]: {page_title}\n[实际搜索URL]: {final_url_visited}\n\n"
+    output += "[主要文本内容]:\n" + full_text + "\n\n"
+    output += "[相关超链接]:\n" + links_formatted
+    return output.strip()
+
+
+async def perform_google_search(keywords: str):
+    keywords, bypass_cache, want_cache_stats = parse_request_argument(keywords)
+    if want_cache_stats:
+        return "[谷歌搜索缓存统计]:\n" + json.dumps(get_search_cache().stats(), ensure_ascii=False, indent=2)
+    if not keywords: return "错误：未提供搜索关键词。"
+
+    search_url = f"https://www.google.com/search?q={quote_plus(' '.join(keywords.split()))}&hl=zh-CN&gl=CN"
+    print(f"[Google Search Plugin] 构造的搜索URL: {search_url}", file=sys.stderr)
+
+    mode_description = ""
+
+    try:
+        effective_user_data_dir = None
+        browser_type_guess, kill_cmd = None, None
+        if user_data_directory_path and isinstance(user_data_directory_path, str) and os.path.isdir(user_data_directory_path):
+            effective_user_data_dir = user_data_directory_path
+            browser_type_guess, kill_cmd = browser_service.get_browser_type_and_kill_command(effective_user_data_dir)
+            mode_description = f"本地用户配置: {effective_user_data_dir} (尝试关闭 {browser_type_guess})"
+        else:
+            if user_data_directory_path: # 如果配置了但无效
+                print(f"[Google Search Plugin] 警告: 配置的 user_data_directory_path 无效。使用常规模式。", file=sys.stderr)
+            mode_description = "常规模式 (无用户配置)"
+
+        # 用户配置模式下的结果可能带有个性化内容，按模式分开缓存
+        search_cache = get_search_cache() if cache_enabled else None
+        cache_key = json.dumps([normalize_keywords(keywords), effective_user_data_dir or ""], ensure_ascii=False)
+        if search_cache and not bypass_cache:
+            cached = search_cache.get(cache_key)
+            if cached:
+                print(f"[Google Search Plugin] 搜索结果缓存命中: '{keywords}'", file=sys.stderr)
+                return format_search_output(keywords, cached["mode_description"] + " (缓存结果)", cached["page_title"],
+                                            cached["final_url"], cached["full_text"], cached["links"])
+        
+        print(f"[Google Search Plugin] 启动模式: {mode_description}", file=sys.stderr)
+
+        fetch_result = None
+        if use_shared_browser_service:
+            try:
+                fetch_result = await fetch_search_html_with_browser_service(search_url, keywords, effective_user_data_dir, mode_description)
+            except ConnectionError as ce:
+                print(f"[Google Search Plugin] 浏览器服务不可用，改为本地启动浏览器: {ce}", file=sys.stderr)
+        if fetch_result is None:
+            fetch_result = await fetch_search_html_with_local_browser(search_url, keywords, effective_user_data_dir, browser_type_guess, kill_cmd, mode_description)
+        final_url_visited, page_content_html, fetch_error, mode_description = fetch_result
+        if fetch_error: return fetch_error
+        
+        if not page_content_html: return f"错误({mode_description})：未能从谷歌 '{keywords}' 获取HTML内容。"
+
+        page_title, full_text, links = parse_search_results(page_content_html, final_url_visited)
+        if search_cache and (full_text or links):
+            search_cache.put(cache_key, {"mode_description": mode_description, "page_title": page_title,
+                                         "final_url": final_url_visited, "full_text": full_text, "links": links})
+        return format_search_output(keywords, mode_description, page_title, final_url_visited, full_text, links)
+
+    except Exception as e:
+        traceback.print_exc(file=sys.stderr)
+        return f"执行谷歌搜索 '{keywords}' (模式: {mode_description}) 时发生顶层错误: {str(e)}"
+
+if __name__ == "__main__":
+    keywords_param = read_plugin_argument()
+    if keywords_param is not None:
+        print(f"[Plugin Log] Google Search: Keywords '{keywords_param}', UserDataPath: '{user_data_directory_path}'", file=sys.stderr)
+        try:
+            result = asyncio.run(perform_google_search(keywords_param))
+            print(result)
+        except Exception as e:
+            print(f"谷歌搜索插件主线程错误: {str(e)}", file=sys.stderr)
+            traceback.print_exc(file=sys.stderr)
+            print(f"错误：执行谷歌搜索时发生内部错误。")
+    else:
+        print(json.dumps({"status": "错误", "message": "谷歌搜索插件需要关键词参数。"}))
+    sys.stdout.flush()
+    sys.stderr.flush()
@@ -0,0 +1,346 @@
+import os
+import sys
+import json
+import time
+import signal
+import asyncio
+import secrets
+import threading
+import traceback
+import subprocess
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import program_runner_plugin as runner
+
+# 程序运行插件的常驻后台任务服务 (supervisor)。
+# 带 "background": true 的命令不再阻塞插件调用直到结束或超时，而是由本服务启动后立即返回任务 ID；
+# 之后通过任务 ID 查询状态、从指定偏移量读取新增输出、等待结束 (有超时) 或终止任务。适合构建、测试和开发服务器等长时间运行的命令。
+#   - 每个任务的 stdout 与 stderr 合并为一个输出流，只保留最后 job_max_output_bytes 字节 (裁剪前最多为其 2 倍)，偏移量是从任务开始计算的字节数，
+#     读取的偏移量早于保留范围时从保留的最早位置开始读取，并返回跳过的字节数；
+#   - 同时运行的任务数不超过 job_max_concurrent；运行超过 job_max_runtime_seconds (大于 0 时) 的任务会被终止；
+#   - 已结束的任务保留 job_retention_seconds 秒，最多保留 job_max_finished 个；
+#   - 任务在独立的进程组中运行，终止时连同其启动的子进程一起终止；
+#   - 没有运行中的任务并且空闲超过 job_service_idle_timeout_seconds 后服务自行退出。
+# 由插件在首次启动后台任务时以独立进程启动 (program_runner_plugin.start_job_service)。
+# 服务只监听 127.0.0.1；启动时生成随机令牌并写入 cache/job_service.token (仅当前用户可读)，请求必须带有该令牌。
+#
+# 请求: {"op": "start", "token": "...", "command": [...], "cwd": "...", "owner": "对话标识"}
+# 响应: {"ok": true, "job": {"job_id": "...", "state": "running", ...}}
+# 请求: {"op": "output", "job_id": "...", "offset": 0, "max_bytes": 65536}
+#       {"op": "wait", "job_id": "...", "timeout": 30, "offset": 0, "max_bytes": 65536}  等待结束，最多 timeout 秒
+# 响应: {"ok": true, "job": {...}, "output": "...", "offset": 0, "next_offset": 1234, "skipped_bytes": 0}
+# 其他操作: {"op": "status", "job_id": "..."}, {"op": "kill", "job_id": "..."}, {"op": "list", "owner": "..."},
+#          {"op": "stats"}, {"op": "shutdown"}
+# 出错时: {"ok": false, "error": "...", "error_kind": "auth" | "not_found" | "limit" | "os" | "internal"}
+
+STREAM_LIMIT_BYTES = 16 * 1024 * 1024
+MAINTENANCE_INTERVAL_S = 5
+KILL_GRACE_SECONDS = 3  # 终止任务时先发送 SIGTERM，超过这么久仍未退出再强制终止
+READ_CHUNK_BYTES = 65536
+
+
+def write_token_file(token: str):
+    os.makedirs(os.path.dirname(runner.JOB_TOKEN_FILE), exist_ok=True)
+    temp_path = f"{runner.JOB_TOKEN_FILE}.{os.getpid()}.tmp"
+    fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(token)
+    os.replace(temp_path, runner.JOB_TOKEN_FILE)
+
+
+class JobOutput:
+    """任务的输出流，只保留最后 max_bytes 字节；偏移量从任务开始计算。"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max(1, max_bytes)
+        self.data = bytearray()
+        self.start_offset = 0  # data[0] 对应的偏移量，之前的字节已被丢弃
+
+    @property
+    def end_offset(self) -> int:
+        return self.start_offset + len(self.data)
+
+    def append(self, chunk: bytes):
+        self.data += chunk
+        if len(self.data) > 2 * self.max_bytes:  # 超过 2 倍时才裁剪，均摊为线性时间
+            dropped = len(self.data) - self.max_bytes
+            del self.data[:dropped]
+            self.start_offset += dropped
+
+    def read(self, offset: int, max_bytes: int):
+        """返回 (文本, 实际起始偏移量, 下一次读取的偏移量, 跳过的字节数)。不会在多字节字符中间截断。"""
+        requested = min(max(0, offset), self.end_offset)
+        begin = max(requested, self.start_offset) - self.start_offset
+        if requested < self.start_offset:
+            # 请求的部分已被丢弃，从保留的最早位置开始；该位置可能落在多字节字符中间
+            limit = min(len(self.data), begin + 3)
+            while begin < limit and self.data[begin] & 0xC0 == 0x80:
+                begin += 1
+        end = min(len(self.data), begin + max(1, max_bytes))
+        if end < len(self.data):
+            cut = end
+            while cut > begin and end - cut < 3 and self.data[cut] & 0xC0 == 0x80:
+                cut -= 1
+            if cut > begin:
+                end = cut
+        start = self.start_offset + begin
+        return bytes(self.data[begin:end]).decode('utf-8', errors='replace'), start, self.start_offset + end, start - requested
+
+
+class Job:
+    def __init__(self, job_id: str, command: list, cwd: str, owner: str, max_output_bytes: int):
+        self.job_id = job_id
+        self.command = command
+        self.cwd = cwd
+        self.owner = owner
+        self.output = JobOutput(max_output_bytes)
+        self.condition = threading.Condition()
+        self.started_at = time.time()
+        self.finished_at = None
+        self.return_code = None
+        self.killed = False
+        kwargs = {}
+        if sys.platform == "win32":
+            kwargs["creationflags"] = subprocess.CREATE_NEW_PROCESS_GROUP
+        else:
+            kwargs["start_new_session"] = True  # 独立的进程组，终止时连同子进程一起终止
+        self.process = subprocess.Popen(command, cwd=cwd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, **kwargs)
+        threading.Thread(target=self._read_output, daemon=True).start()
+        threading.Thread(target=self._wait_exit, daemon=True).start()
+
+    @property
+    def running(self) -> bool:
+        return self.return_code is None
+
+    def _read_output(self):
+        try:
+            with self.process.stdout as pipe:
+                for chunk in iter(lambda: pipe.read1(READ_CHUNK_BYTES), b''):
+                    with self.condition:
+                        self.output.append(chunk)
+                        self.condition.notify_all()
+        except (OSError, ValueError):
+            pass
+
+    def _wait_exit(self):
+        # 与读取输出分开: 命令退出后，它启动的后台进程可能仍持有输出管道
+        return_code = self.process.wait()
+        with self.condition:
+            self.return_code = return_code
+            self.finished_at = time.time()
+            self.condition.notify_all()
+
+    def kill(self):
+        if not self.running:
+            return
+        self.killed = True
+        try:
+            if sys.platform == "win32":
+                subprocess.run(["taskkill", "/F", "/T", "/PID", str(self.process.pid)], capture_output=True)
+            else:
+                os.killpg(self.process.pid, signal.SIGTERM)
+                try:
+                    self.process.wait(timeout=KILL_GRACE_SECONDS)
+                except subprocess.TimeoutExpired:
+                    os.killpg(self.process.pid, signal.SIGKILL)
+        except (OSError, subprocess.SubprocessError):
+            self.process.kill()
+
+    def describe(self, brief: bool = False) -> dict:
+        """任务状态；brief 时省略命令和工作目录 (读取输出时每次都返回状态，不必重复)。"""
+        with self.condition:
+            ended = self.finished_at or time.time()
+            description = {"job_id": self.job_id, "state": "running" if self.running else ("killed" if self.killed else "exited"),
+                           "return_code": self.return_code, "runtime_seconds": round(ended - self.started_at, 1),
+                           "output_bytes": self.output.end_offset}
+        if not brief:
+            description.update(command=self.command, cwd=self.cwd, pid=self.process.pid)
+        return description
+
+    def read(self, offset: int, max_bytes: int) -> dict:
+        with self.condition:
+            text, offset, next_offset, skipped = self.output.read(offset, max_bytes)
+        return {"output": text, "offset": offset, "next_offset": next_offset, "skipped_bytes": skipped}
+
+
+class JobManager:
+    def __init__(self):
+        self.max_concurrent = max(1, runner.job_max_concurrent)
+        self.max_finished = max(0, runner.job_max_finished)
+        self.retention_s = runner.job_retention_seconds
+        self.max_runtime_s = runner.job_max_runtime_seconds
+        self.max_output_bytes = runner.job_max_output_bytes
+        self.lock = threading.Lock()
+        self.jobs = OrderedDict()  # 任务 ID -> Job，按启动时间排序
+        self.stats = {"started": 0, "killed": 0, "expired": 0, "rejected": 0}
+
+    def running_count(self) -> int:
+        with self.lock:
+            return sum(1 for job in self.jobs.values() if job.running)
+
+    def _get(self, request: dict):
+        with self.lock:
+            return self.jobs.get(str(request.get("job_id", "")))
+
+    def start(self, request: dict) -> dict:
+        with self.lock:
+            running = sum(1 for job in self.jobs.values() if job.running)
+            if running >= self.max_concurrent:
+                self.stats["rejected"] += 1
+                return {"ok": False, "error": f"已有 {running} 个后台任务在运行，达到上限 (job_max_concurrent = {self.max_concurrent})。"
+                                              "请等待或终止已有任务后再试。", "error_kind": "limit"}
+            job_id = secrets.token_hex(4)
+            while job_id in self.jobs:
+                job_id = secrets.token_hex(4)
+            job = Job(job_id, request["command"], request["cwd"], request.get("owner") or "", self.max_output_bytes)
+            self.jobs[job_id] = job
+            self.stats["started"] += 1
+        print(f"[Program Jobs] 已启动任务 {job_id} (PID: {job.process.pid}): {job.command}", file=sys.stderr)
+        return {"ok": True, "job": job.describe()}
+
+    def status(self, request: dict) -> dict:
+        job = self._get(request)
+        if job is None:
+            return self._not_found(request)
+        return {"ok": True, "job": job.describe()}
+
+    def output(self, request: dict) -> dict:
+        job = self._get(request)
+        if job is None:
+            return self._not_found(request)
+        return {"ok": True, "job": job.describe(brief=True), **job.read(int(request.get("offset", 0)), int(request.get("max_bytes", READ_CHUNK_BYTES)))}
+
+    def wait(self, request: dict) -> dict:
+        job = self._get(request)
+        if job is None:
+            return self._not_found(request)
+        with job.condition:
+            job.condition.wait_for(lambda: not job.running, timeout=max(0, float(request.get("timeout", 0))))
+        return self.output(request)
+
+    def kill(self, request: dict) -> dict:
+        job = self._get(request)
+        if job is None:
+            return self._not_found(request)
+        if job.running:
+            job.kill()
+            self.stats["killed"] += 1
+            with job.condition:
+                job.condition.wait_for(lambda: not job.running, timeout=KILL_GRACE_SECONDS)
+        return {"ok": True, "job": job.describe()}
+
+    def list_jobs(self, request: dict) -> dict:
+        owner = request.get("owner")
+        with self.lock:
+            jobs = [job for job in self.jobs.values() if owner is None or job.owner == owner]
+        return {"ok": True, "jobs": [job.describe() for job in jobs]}
+
+    def _not_found(self, request: dict) -> dict:
+        return {"ok": False, "error": f"后台任务 '{request.get('job_id')}' 不存在 (可能已结束并超过保留时间，或任务服务已重启)。",
+                "error_kind": "not_found"}
+
+    def maintain(self):
+        """终止运行超时的任务，清理超过保留时间或数量的已结束任务。"""
+        now = time.time()
+        with self.lock:
+            jobs = list(self.jobs.values())
+        if self.max_runtime_s > 0:
+            for job in jobs:
+                if job.running and now - job.started_at > self.max_runtime_s:
+                    print(f"[Program Jobs] 任务 {job.job_id} 运行超过 {self.max_runtime_s} 秒，终止。", file=sys.stderr)
+                    job.kill()
+                    self.stats["killed"] += 1
+        with self.lock:
+            finished = [job for job in self.jobs.values() if not job.running]
+            expired = [job for job in finished if self.retention_s > 0 and now - job.finished_at > self.retention_s]
+            expired += [job for job in finished[:max(0, len(finished) - self.max_finished)] if job not in expired]
+            for job in expired:
+                del self.jobs[job.job_id]
+            self.stats["expired"] += len(expired)
+
+    def describe(self) -> dict:
+        with self.lock:
+            jobs = list(self.jobs.values())
+        return {**self.stats, "running": sum(1 for job in jobs if job.running), "retained": len(jobs),
+                "max_concurrent": self.max_concurrent}
+
+    def close(self):
+        with self.lock:
+            jobs = list(self.jobs.values())
+        for job in jobs:
+            job.kill()
+
+
+async def serve(port: int):
+    manager = JobManager()
+    loop = asyncio.get_running_loop()
+    # wait 请求会占用线程直到任务结束或超时
+    executor = ThreadPoolExecutor(max_workers=16)
+    stop_event = asyncio.Event()
+    last_activity = [time.monotonic()]
+    token = secrets.token_hex(16)
+    handlers = {"start": manager.start, "status": manager.status, "output": manager.output, "wait": manager.wait,
+                "kill": manager.kill, "list": manager.list_jobs}
+
+    async def handle_client(reader, writer):
+        try:
+            line = await reader.readline()
+            if not line:
+                return
+            request = json.loads(line)
+            last_activity[0] = time.monotonic()
+            op = request.get("op")
+            if not secrets.compare_digest(str(request.get("token", "")), token):
+                response = {"ok": False, "error": "任务服务令牌无效。", "error_kind": "auth"}
+            elif op in handlers:
+                response = await loop.run_in_executor(executor, handlers[op], request)
+            elif op == "stats":
+                response = {"ok": True, "stats": manager.describe()}
+            elif op == "shutdown":
+                response = {"ok": True}
+                stop_event.set()
+            else:
+                response = {"ok": False, "error": f"未知操作 '{op}'", "error_kind": "internal"}
+            last_activity[0] = time.monotonic()
+        except OSError as e:
+            response = {"ok": False, "error": f"{type(e).__name__}: {e}", "error_kind": "os"}
+        except Exception as e:
+            traceback.print_exc(file=sys.stderr)
+            response = {"ok": False, "error": f"{type(e).__name__}: {e}", "error_kind": "internal"}
+        try:
+            writer.write((json.dumps(response, ensure_ascii=False) + "\n").encode('utf-8'))
+            await writer.drain()
+            writer.close()
+        except Exception:
+            pass
+
+    async def maintenance():
+        idle_timeout_s = runner.job_service_idle_timeout
+        while not stop_event.is_set():
+            await asyncio.sleep(MAINTENANCE_INTERVAL_S)
+            await loop.run_in_executor(executor, manager.maintain)
+            if idle_timeout_s > 0 and not manager.running_count() and time.monotonic() - last_activity[0] > idle_timeout_s:
+                print(f"[Program Jobs] 没有运行中的任务且空闲超过 {idle_timeout_s} 秒，关闭任务服务。", file=sys.stderr)
+                stop_event.set()
+
+    server = await asyncio.start_server(handle_client, "127.0.0.1", port, limit=STREAM_LIMIT_BYTES)
+    write_token_file(token)
+    print(f"[Program Jobs] 已在 127.0.0.1:{port} 上启动 (PID: {os.getpid()})，最多同时运行 {manager.max_concurrent} 个任务", file=sys.stderr)
+    maintenance_task = asyncio.create_task(maintenance())
+    async with server:
+        await stop_event.wait()
+    maintenance_task.cancel()
+    manager.close()
+    executor.shutdown(wait=False)
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(serve(runner.job_service_port))
+    except OSError as e:
+        # 端口已被占用，通常意味着另一个服务实例已在运行
+        print(f"[Program Jobs] 启动失败: {e}", file=sys.stderr)
+        sys.exit(1)
+    except KeyboardInterrupt:
+        pass
@@ -1,115 +1,322 @@
-import os
-import sys
-import json
-import subprocess
-import shlex
-
-# 默认配置
-DEFAULT_PROGRAM_EXECUTION_TIMEOUT = 30
-DEFAULT_ALLOW_ARBITRARY = True
-
-# 加载插件自身配置
-program_execution_timeout = DEFAULT_PROGRAM_EXECUTION_TIMEOUT
-allow_arbitrary_paths_and_commands = DEFAULT_ALLOW_ARBITRARY
-try:
-    plugin_config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.json")
-    if os.path.exists(plugin_config_path):
-        with open(plugin_config_path, 'r', encoding='utf-8') as f:
-            plugin_config_data = json.load(f)
-            psc = plugin_config_data.get("plugin_specific_config", {})
-            program_execution_timeout = psc.get("program_execution_timeout_seconds", DEFAULT_PROGRAM_EXECUTION_TIMEOUT)
-            allow_arbitrary_paths_and_commands = psc.get("allow_arbitrary_paths_and_commands", DEFAULT_ALLOW_ARBITRARY)
-    if not allow_arbitrary_paths_and_commands:
-         print("严重警告: 程序运行插件 (program_runner) 被配置为不允许任意路径/命令，但其代码逻辑当前是允许的。存在配置与行为不一致的风险！", file=sys.stderr)
-except Exception as e:
-    print(f"警告: 读取插件 program_runner 配置失败: {e}. 将使用默认值。", file=sys.stderr)
-
-
-def run_program_unsafe(params_json_str: str):
-    """
-    在AI指定的任意工作目录中执行AI指定的任意程序。
-    """
-    if not allow_arbitrary_paths_and_commands:
-        return json.dumps({"status": "错误", "message": "插件被配置为不允许任意路径/命令操作。"})
-
-    print("警告: 程序运行插件正在以不安全模式运行，允许在AI指定的任意CWD执行任意命令。", file=sys.stderr)
-    results = {}
-    try:
-        params = json.loads(params_json_str)
-        cwd_from_ai = params.get("cwd", None) # cwd 是可选的
-        command_input = params.get("command")
-
-        if not command_input:
-            return json.dumps({"status": "错误", "message": "请求JSON必须包含 'command'。"})
-
-        actual_cwd = None
-        if cwd_from_ai is None or cwd_from_ai == "":
-            actual_cwd = os.path.dirname(os.path.abspath(__file__)) # 默认为插件脚本所在目录
-            print(f"信息: AI未提供CWD或为空，将使用插件脚本目录: {actual_cwd}", file=sys.stderr)
-        elif isinstance(cwd_from_ai, str):
-            try:
-                actual_cwd = os.path.realpath(os.path.expanduser(os.path.expandvars(cwd_from_ai)))
-                print(f"信息: AI提供的CWD为 '{cwd_from_ai}', 解析为: {actual_cwd}", file=sys.stderr)
-            except Exception as e:
-                return json.dumps({"status": "错误", "message": f"解析工作目录 '{cwd_from_ai}' 失败: {str(e)}"})
-        else:
-            return json.dumps({"status": "错误", "message": "'cwd' 必须是一个字符串或留空/null。"})
-
-        if not os.path.exists(actual_cwd):
-            return json.dumps({"status": "错误", "message": f"指定的工作目录 '{actual_cwd}' 不存在。"})
-        if not os.path.isdir(actual_cwd):
-            return json.dumps({"status": "错误", "message": f"指定的工作目录 '{actual_cwd}' 不是一个目录。"})
-
-        if isinstance(command_input, str):
-            command_list = shlex.split(command_input)
-        elif isinstance(command_input, list):
-            command_list = command_input
-        else:
-            return json.dumps({"status": "错误", "message": "'command' 必须是字符串或列表。"})
-
-        if not command_list:
-            return json.dumps({"status": "错误", "message": "命令不能为空。"})
-
-        print(f"信息: 准备在CWD '{actual_cwd}' 中执行命令: {command_list}", file=sys.stderr)
-
-        try:
-            process = subprocess.run(
-                command_list,
-                cwd=actual_cwd,
-                capture_output=True,
-                text=True,
-                timeout=program_execution_timeout,
-                check=False, 
-                encoding='utf-8',
-                errors='replace',
-                shell=False # 安全起见，通常不使用shell=True除非明确需要且理解风险
-            )
-            results["status"] = "成功" if process.returncode == 0 else "执行失败"
-            results["return_code"] = process.returncode
-            results["stdout"] = process.stdout
-            results["stderr"] = process.stderr
-        except FileNotFoundError:
-            results = {"status": "错误", "message": f"命令或程序 '{command_list[0]}' 未找到。", "return_code": -1}
-        except PermissionError:
-            results = {"status": "错误", "message": f"权限错误：无法执行命令 '{command_list[0]}'", "return_code": -1}
-        except subprocess.TimeoutExpired:
-            results = {"status": "错误", "message": f"程序执行超时 ({program_execution_timeout}秒)。", "return_code": -1}
-        except Exception as e:
-            results = {"status": "错误", "message": f"执行程序时发生内部错误: {str(e)}", "return_code": -1}
-
-        return json.dumps(results, ensure_ascii=False)
-
-    except json.JSONDecodeError:
-        return json.dumps({"status": "错误", "message": "输入参数不是有效的JSON字符串。"})
-    except Exception as e:
-        return json.dumps({"status": "错误", "message": f"程序运行插件发生未知错误: {str(e)}"})
-
-if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        json_param = sys.argv[1]
-        result = run_program_unsafe(json_param)
-        print(result)
-    else:
-        print(json.dumps({"status": "错误", "message": "程序运行插件需要JSON参数。"}))
-        print("警告：此模式允许在任意指定CWD执行任意命令，请谨慎使用！")
-    sys.stdout.flush()
+import os
+import sys
+import json
+import time
+import socket
+import subprocess
+import shlex
+
+PROJECT_ROOT = os.path.realpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+from plugin_common.plugin_protocol import read_plugin_argument, current_conversation_id
+from plugin_common.output_capture import BoundedOutput, PipeReader, omitted_bytes_summary
+
+# 默认配置
+DEFAULT_PROGRAM_EXECUTION_TIMEOUT = 30
+DEFAULT_ALLOW_ARBITRARY = True
+DEFAULT_OUTPUT_HEAD_BYTES = 32768
+DEFAULT_OUTPUT_TAIL_BYTES = 32768
+DEFAULT_JOB_SERVICE_PORT = 3015
+DEFAULT_JOB_MAX_CONCURRENT = 4
+DEFAULT_JOB_MAX_OUTPUT_BYTES = 1048576
+DEFAULT_JOB_MAX_RUNTIME = 0
+DEFAULT_JOB_MAX_FINISHED = 20
+DEFAULT_JOB_RETENTION = 3600
+DEFAULT_JOB_SERVICE_IDLE_TIMEOUT = 1800
+DEFAULT_JOB_OUTPUT_CHUNK_BYTES = 32768
+DEFAULT_JOB_WAIT_MAX = 120
+OUTPUT_JOIN_TIMEOUT_SECONDS = 2  # 程序退出后其启动的后台进程仍持有输出管道时，最多再等待这么久
+
+PLUGIN_DIR = os.path.dirname(os.path.abspath(__file__))
+JOB_SERVICE_SCRIPT = os.path.join(PLUGIN_DIR, "job_service.py")
+JOB_TOKEN_FILE = os.path.join(PLUGIN_DIR, "cache", "job_service.token")
+JOB_SERVICE_LOG_FILE = os.path.join(PROJECT_ROOT, "program_runner_job_service.log")
+JOB_SERVICE_START_TIMEOUT_S = 10
+JOB_REQUEST_MARGIN_S = 10
+JOB_ACTIONS = ("status", "output", "wait", "kill", "list")
+
+# 加载插件自身配置
+program_execution_timeout = DEFAULT_PROGRAM_EXECUTION_TIMEOUT
+allow_arbitrary_paths_and_commands = DEFAULT_ALLOW_ARBITRARY
+output_head_bytes = DEFAULT_OUTPUT_HEAD_BYTES
+output_tail_bytes = DEFAULT_OUTPUT_TAIL_BYTES
+job_service_port = DEFAULT_JOB_SERVICE_PORT
+job_max_concurrent = DEFAULT_JOB_MAX_CONCURRENT
+job_max_output_bytes = DEFAULT_JOB_MAX_OUTPUT_BYTES
+job_max_runtime_seconds = DEFAULT_JOB_MAX_RUNTIME
+job_max_finished = DEFAULT_JOB_MAX_FINISHED
+job_retention_seconds = DEFAULT_JOB_RETENTION
+job_service_idle_timeout = DEFAULT_JOB_SERVICE_IDLE_TIMEOUT
+job_output_chunk_bytes = DEFAULT_JOB_OUTPUT_CHUNK_BYTES
+job_wait_max_seconds = DEFAULT_JOB_WAIT_MAX
+try:
+    plugin_config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.json")
+    if os.path.exists(plugin_config_path):
+        with open(plugin_config_path, 'r', encoding='utf-8') as f:
+            plugin_config_data = json.load(f)
+            psc = plugin_config_data.get("plugin_specific_config", {})
+            program_execution_timeout = psc.get("program_execution_timeout_seconds", DEFAULT_PROGRAM_EXECUTION_TIMEOUT)
+            allow_arbitrary_paths_and_commands = psc.get("allow_arbitrary_paths_and_commands", DEFAULT_ALLOW_ARBITRARY)
+            output_head_bytes = psc.get("output_head_bytes", DEFAULT_OUTPUT_HEAD_BYTES)
+            output_tail_bytes = psc.get("output_tail_bytes", DEFAULT_OUTPUT_TAIL_BYTES)
+            job_service_port = psc.get("job_service_port", DEFAULT_JOB_SERVICE_PORT)
+            job_max_concurrent = psc.get("job_max_concurrent", DEFAULT_JOB_MAX_CONCURRENT)
+            job_max_output_bytes = psc.get("job_max_output_bytes", DEFAULT_JOB_MAX_OUTPUT_BYTES)
+            job_max_runtime_seconds = psc.get("job_max_runtime_seconds", DEFAULT_JOB_MAX_RUNTIME)
+            job_max_finished = psc.get("job_max_finished", DEFAULT_JOB_MAX_FINISHED)
+            job_retention_seconds = psc.get("job_retention_seconds", DEFAULT_JOB_RETENTION)
+            job_service_idle_timeout = psc.get("job_service_idle_timeout_seconds", DEFAULT_JOB_SERVICE_IDLE_TIMEOUT)
+            job_output_chunk_bytes = psc.get("job_output_chunk_bytes", DEFAULT_JOB_OUTPUT_CHUNK_BYTES)
+            job_wait_max_seconds = psc.get("job_wait_max_seconds", DEFAULT_JOB_WAIT_MAX)
+    if not allow_arbitrary_paths_and_commands:
+         print("严重警告: 程序运行插件 (program_runner) 被配置为不允许任意路径/命令，但其代码逻辑当前是允许的。存在配置与行为不一致的风险！", file=sys.stderr)
+except Exception as e:
+    print(f"警告: 读取插件 program_runner 配置失败: {e}. 将使用默认值。", file=sys.stderr)
+
+
+def output_text(output: BoundedOutput) -> str:
+    # 与原先 text=True 的读取方式一致，统一换行符
+    return output.text().replace('\r\n', '\n').replace('\r', '\n')
+
+
+def run_captured(command_list: list, cwd: str, timeout: float) -> dict:
+    """
+    执行命令，边读边丢地捕获 stdout/stderr (每个流保留开头 output_head_bytes 与结尾 output_tail_bytes 字节)。
+    超时时终止进程，结果中 timed_out 为 True，stdout/stderr 为超时前的输出。
+    """
+    process = subprocess.Popen(command_list, cwd=cwd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               shell=False)  # 安全起见，通常不使用shell=True除非明确需要且理解风险
+    stdout, stderr = BoundedOutput(output_head_bytes, output_tail_bytes), BoundedOutput(output_head_bytes, output_tail_bytes)
+    readers = [PipeReader(process.stdout, stdout), PipeReader(process.stderr, stderr)]
+    for reader in readers:
+        reader.start()
+    timed_out = False
+    try:
+        process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        timed_out = True
+        process.kill()
+        process.wait()
+    for reader in readers:
+        reader.join(OUTPUT_JOIN_TIMEOUT_SECONDS)
+    return {"return_code": process.returncode, "stdout": output_text(stdout), "stderr": output_text(stderr),
+            "timed_out": timed_out, "omitted_bytes": omitted_bytes_summary(stdout=stdout, stderr=stderr)}
+
+
+# --- 后台任务 (见 job_service.py) ---
+
+def start_job_service():
+    """以独立进程启动后台任务服务，使任务在插件进程退出后继续运行。"""
+    kwargs = {}
+    if sys.platform == "win32":
+        kwargs["creationflags"] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        kwargs["start_new_session"] = True
+    with open(JOB_SERVICE_LOG_FILE, 'a', encoding='utf-8') as log_file:
+        subprocess.Popen([sys.executable, JOB_SERVICE_SCRIPT], cwd=PLUGIN_DIR,
+                         stdin=subprocess.DEVNULL, stdout=log_file, stderr=log_file, **kwargs)
+
+
+def _connect_job_service():
+    return socket.create_connection(("127.0.0.1", job_service_port), timeout=2)
+
+
+def _read_job_token() -> str:
+    try:
+        with open(JOB_TOKEN_FILE, 'r', encoding='utf-8') as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+
+def request_job_service(request: dict, timeout_s: float, start_if_needed: bool = False) -> dict:
+    """向后台任务服务发送请求。服务未运行时，start_if_needed 为 True 则启动服务，否则抛出 ConnectionError。"""
+    for attempt in range(2):
+        try:
+            connection = _connect_job_service()
+        except OSError:
+            if not start_if_needed:
+                raise ConnectionError("后台任务服务未运行 (没有后台任务，或任务服务空闲后已退出)。")
+            print("[Program Jobs] 后台任务服务未运行，正在启动...", file=sys.stderr)
+            start_job_service()
+            deadline = time.monotonic() + JOB_SERVICE_START_TIMEOUT_S
+            while True:
+                time.sleep(0.2)
+                try:
+                    connection = _connect_job_service()
+                    break
+                except OSError:
+                    if time.monotonic() > deadline:
+                        raise ConnectionError(f"后台任务服务在 {JOB_SERVICE_START_TIMEOUT_S} 秒内未能启动，详见 {JOB_SERVICE_LOG_FILE}。")
+        try:
+            connection.settimeout(timeout_s)
+            connection.sendall((json.dumps({**request, "token": _read_job_token()}, ensure_ascii=False) + "\n").encode('utf-8'))
+            with connection.makefile('rb') as stream:
+                line = stream.readline()
+            if not line:
+                raise ConnectionError("后台任务服务未返回响应。")
+            response = json.loads(line)
+        except (OSError, ValueError) as e:
+            raise ConnectionError(f"与后台任务服务通信失败: {e}")
+        finally:
+            connection.close()
+        # 服务刚启动时令牌文件可能尚未写入，稍后重新读取令牌再试一次
+        if response.get("error_kind") != "auth" or attempt:
+            return response
+        time.sleep(0.2)
+
+
+def job_response(response: dict) -> str:
+    if not response.get("ok"):
+        return json.dumps({"status": "错误", "message": response.get("error", "")}, ensure_ascii=False)
+    result = {"status": "成功", **{key: value for key, value in response.items() if key != "ok"}}
+    job = response.get("job")
+    if "output" in response and job:
+        result["output"] = response["output"].replace('\r\n', '\n').replace('\r', '\n')
+        if response.get("skipped_bytes"):
+            result["message"] = f"偏移量之前的 {response['skipped_bytes']} 字节输出已被丢弃 (只保留最后 {job_max_output_bytes} 字节)。"
+        if response["next_offset"] < job["output_bytes"]:
+            result["has_more_output"] = True  # 本次返回的输出已达 job_output_chunk_bytes，用 next_offset 继续读取
+    return json.dumps(result, ensure_ascii=False)
+
+
+def start_background_job(command_list: list, cwd: str) -> str:
+    try:
+        response = request_job_service({"op": "start", "command": command_list, "cwd": cwd, "owner": current_conversation_id() or ""},
+                                       JOB_REQUEST_MARGIN_S, start_if_needed=True)
+    except ConnectionError as e:
+        return json.dumps({"status": "错误", "message": f"无法启动后台任务: {e}"}, ensure_ascii=False)
+    if response.get("ok"):
+        response["message"] = (f"已在后台启动任务 {response['job']['job_id']}。使用 {{\"job_id\": \"...\", \"action\": \"output\" / \"wait\" / \"kill\"}} "
+                               f"读取输出、等待结束或终止任务。")
+    return job_response(response)
+
+
+def handle_job_action(params: dict) -> str:
+    """处理针对后台任务的操作: status / output / wait / kill / list。"""
+    action = params.get("action", "status")
+    if action not in JOB_ACTIONS:
+        return json.dumps({"status": "错误", "message": f"未知的任务操作 '{action}'，可用: {', '.join(JOB_ACTIONS)}。"}, ensure_ascii=False)
+    if action == "list":
+        request = {"op": "list", "owner": current_conversation_id() or ""}
+    else:
+        job_id = params.get("job_id")
+        if not isinstance(job_id, str) or not job_id:
+            return json.dumps({"status": "错误", "message": f"操作 '{action}' 需要 'job_id'。"}, ensure_ascii=False)
+        request = {"op": action, "job_id": job_id}
+    timeout_s = JOB_REQUEST_MARGIN_S
+    if action in ("output", "wait"):
+        try:
+            request["offset"] = int(params.get("offset", 0))
+            request["max_bytes"] = min(int(params.get("max_bytes", job_output_chunk_bytes)), job_output_chunk_bytes)
+        except (TypeError, ValueError):
+            return json.dumps({"status": "错误", "message": "'offset' 和 'max_bytes' 必须是整数。"}, ensure_ascii=False)
+    if action == "wait":
+        try:
+            request["timeout"] = max(0.0, min(float(params.get("timeout", job_wait_max_seconds)), job_wait_max_seconds))
+        except (TypeError, ValueError):
+            return json.dumps({"status": "错误", "message": "'timeout' 必须是数字。"}, ensure_ascii=False)
+        timeout_s += request["timeout"]
+    try:
+        response = request_job_service(request, timeout_s)
+    except ConnectionError as e:
+        if action == "list":
+            return json.dumps({"status": "成功", "jobs": []}, ensure_ascii=False)
+        return json.dumps({"status": "错误", "message": str(e)}, ensure_ascii=False)
+    return job_response(response)
+
+
+def run_program_unsafe(params_json_str: str):
+    """
+    在AI指定的任意工作目录中执行AI指定的任意程序。
+    'background': true 时命令由后台任务服务启动并立即返回任务 ID；
+    带 'action' (status / output / wait / kill / list) 和 'job_id' 的请求操作已有的后台任务。
+    """
+    if not allow_arbitrary_paths_and_commands:
+        return json.dumps({"status": "错误", "message": "插件被配置为不允许任意路径/命令操作。"})
+
+    print("警告: 程序运行插件正在以不安全模式运行，允许在AI指定的任意CWD执行任意命令。", file=sys.stderr)
+    results = {}
+    try:
+        params = json.loads(params_json_str)
+        if not isinstance(params, dict):
+            return json.dumps({"status": "错误", "message": "参数必须是JSON对象。"})
+        if "action" in params or ("job_id" in params and "command" not in params):
+            return handle_job_action(params)
+        cwd_from_ai = params.get("cwd", None) # cwd 是可选的
+        command_input = params.get("command")
+
+        if not command_input:
+            return json.dumps({"status": "错误", "message": "请求JSON必须包含 'command'。"})
+
+        actual_cwd = None
+        if cwd_from_ai is None or cwd_from_ai == "":
+            actual_cwd = os.path.dirname(os.path.abspath(__file__)) # 默认为插件脚本所在目录
+            print(f"信息: AI未提供CWD或为空，将使用插件脚本目录: {actual_cwd}", file=sys.stderr)
+        elif isinstance(cwd_from_ai, str):
+            try:
+                actual_cwd = os.path.realpath(os.path.expanduser(os.path.expandvars(cwd_from_ai)))
+                print(f"信息: AI提供的CWD为 '{cwd_from_ai}', 解析为: {actual_cwd}", file=sys.stderr)
+            except Exception as e:
+                return json.dumps({"status": "错误", "message": f"解析工作目录 '{cwd_from_ai}' 失败: {str(e)}"})
+        else:
+            return json.dumps({"status": "错误", "message": "'cwd' 必须是一个字符串或留空/null。"})
+
+        if not os.path.exists(actual_cwd):
+            return json.dumps({"status": "错误", "message": f"指定的工作目录 '{actual_cwd}' 不存在。"})
+        if not os.path.isdir(actual_cwd):
+            return json.dumps({"status": "错误", "message": f"指定的工作目录 '{actual_cwd}' 不是一个目录。"})
+
+        if isinstance(command_input, str):
+            command_list = shlex.split(command_input)
+        elif isinstance(command_input, list):
+            command_list = command_input
+        else:
+            return json.dumps({"status": "错误", "message": "'command' 必须是字符串或列表。"})
+
+        if not command_list:
+            return json.dumps({"status": "错误", "message": "命令不能为空。"})
+
+        if params.get("background") is True:
+            print(f"信息: 准备在CWD '{actual_cwd}' 中启动后台任务: {command_list}", file=sys.stderr)
+            return start_background_job(command_list, actual_cwd)
+
+        print(f"信息: 准备在CWD '{actual_cwd}' 中执行命令: {command_list}", file=sys.stderr)
+
+        try:
+            captured = run_captured(command_list, actual_cwd, program_execution_timeout)
+            if captured["timed_out"]:
+                results["status"] = "错误"
+                results["message"] = f"程序执行超时 ({program_execution_timeout}秒)，stdout/stderr 为超时前的输出。"
+                results["return_code"] = -1
+            else:
+                results["status"] = "成功" if captured["return_code"] == 0 else "执行失败"
+                results["return_code"] = captured["return_code"]
+            results["stdout"] = captured["stdout"]
+            results["stderr"] = captured["stderr"]
+            if captured["omitted_bytes"]:
+                results["omitted_bytes"] = captured["omitted_bytes"]
+        except FileNotFoundError:
+            results = {"status": "错误", "message": f"命令或程序 '{command_list[0]}' 未找到。", "return_code": -1}
+        except PermissionError:
+            results = {"status": "错误", "message": f"权限错误：无法执行命令 '{command_list[0]}'", "return_code": -1}
+        except Exception as e:
+            results = {"status": "错误", "message": f"执行程序时发生内部错误: {str(e)}", "return_code": -1}
+
+        return json.dumps(results, ensure_ascii=False)
+
+    except json.JSONDecodeError:
+        return json.dumps({"status": "错误", "message": "输入参数不是有效的JSON字符串。"})
+    except Exception as e:
+        return json.dumps({"status": "错误", "message": f"程序运行插件发生未知错误: {str(e)}"})
+
+if __name__ == "__main__":
+    json_param = read_plugin_argument()
+    if json_param is not None:
+        result = run_program_unsafe(json_param)
+        print(result)
+    else:
+        print(json.dumps({"status": "错误", "message": "程序运行插件需要JSON参数。"}))
+        print("警告：此模式允许在任意指定CWD执行任意命令，请谨慎使用！")
+    sys.stdout.flush()
@@ -1,135 +1,194 @@
-import os
-import sys
-import json
-
-# 加载插件自身配置
-allow_arbitrary_paths = True # 从插件配置中获取，确保其意图
-try:
-    plugin_config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.json")
-    if os.path.exists(plugin_config_path):
-        with open(plugin_config_path, 'r', encoding='utf-8') as f:
-            plugin_config_data = json.load(f)
-            psc = plugin_config_data.get("plugin_specific_config", {})
-            allow_arbitrary_paths = psc.get("allow_arbitrary_paths", True)
-    if not allow_arbitrary_paths:
-        print("严重警告: 项目生成插件 (project_generator) 被配置为不允许任意路径，但其代码逻辑当前是允许的。存在配置与行为不一致的风险！", file=sys.stderr)
-except Exception as e:
-    print(f"警告: 读取插件 project_generator 配置失败: {e}. 将使用默认行为（允许任意路径）。", file=sys.stderr)
-
-
-def create_project_structure_recursive(base_path_from_ai: str, structure: dict, current_path_relative_to_base="", results_list=None):
-    """
-    递归创建目录和文件。
-    base_path_from_ai: AI直接提供的绝对或相对基础路径。
-    structure: {'dirname': {'filename': 'content', 'subdir': {...}}, 'file2': 'content2'}
-    results_list: 用于收集操作结果的列表。
-    """
-    if results_list is None:
-        results_list = []
-
-    try:
-        actual_base_path_root = os.path.realpath(os.path.expanduser(os.path.expandvars(base_path_from_ai)))
-    except Exception as e:
-        results_list.append({"item": base_path_from_ai, "status": "失败", "message": f"错误：解析基础路径 '{base_path_from_ai}' 失败: {str(e)}"})
-        return results_list # 基础路径解析失败，无法继续
-
-    current_full_path_segment_root = os.path.join(actual_base_path_root, current_path_relative_to_base)
-
-    # 确保当前递归段的根目录存在
-    if not os.path.exists(current_full_path_segment_root):
-        try:
-            os.makedirs(current_full_path_segment_root, exist_ok=True)
-            # results_list.append({"item": os.path.join(base_path_from_ai, current_path_relative_to_base) or base_path_from_ai, 
-            #                      "status": "成功", "message": "目录已创建 (或已存在)。"})
-        except Exception as e:
-            results_list.append({"item": os.path.join(current_path_relative_to_base, "<directory_creation_failed>"), "status": "失败", "message": f"创建目录 '{current_full_path_segment_root}' 失败: {str(e)}"})
-            return results_list 
-
-    for name, item_content in structure.items():
-        # 对文件名/目录名进行基本检查
-        if ".." in name or "/" in name or "\\" in name or not name.strip():
-            results_list.append({"item": os.path.join(current_path_relative_to_base, name), "status": "失败", "message": "名称非法 (不允许路径分隔符、'..'或空名称)。"})
-            continue
-
-        item_path_full = os.path.join(current_full_path_segment_root, name)
-        relative_item_display_path = os.path.join(current_path_relative_to_base, name)
-
-        if isinstance(item_content, dict): 
-            create_project_structure_recursive(base_path_from_ai, item_content, relative_item_display_path, results_list)
-        elif isinstance(item_content, str): 
-            try:
-                parent_dir = os.path.dirname(item_path_full)
-                if not os.path.exists(parent_dir): # 确保父目录存在 (理论上外层已创建)
-                    os.makedirs(parent_dir, exist_ok=True)
-                with open(item_path_full, 'w', encoding='utf-8') as f:
-                    f.write(item_content)
-                results_list.append({"item": relative_item_display_path, "status": "成功", "message": "文件已创建/更新。"})
-            except PermissionError:
-                results_list.append({"item": relative_item_display_path, "status": "失败", "message": f"权限错误：无法写入文件 '{item_path_full}'。"})
-            except Exception as e:
-                results_list.append({"item": relative_item_display_path, "status": "失败", "message": f"创建文件 '{item_path_full}' 失败: {str(e)}"})
-        elif item_content is None: 
-             try:
-                if not os.path.exists(item_path_full):
-                    os.makedirs(item_path_full, exist_ok=True)
-                results_list.append({"item": relative_item_display_path, "status": "成功", "message": "空目录已创建。"})
-             except PermissionError:
-                results_list.append({"item": relative_item_display_path, "status": "失败", "message": f"权限错误：无法创建目录 '{item_path_full}'。"})
-             except Exception as e:
-                results_list.append({"item": relative_item_display_path, "status": "失败", "message": f"创建空目录 '{item_path_full}' 失败: {str(e)}"})
-        else:
-            results_list.append({"item": os.path.join(current_path_relative_to_base, name), "status": "失败", "message": "项目结构中存在无法识别的项类型。"})
-            
-    return results_list
-
-def generate_project_unsafe(params_json_str: str):
-    """
-    允许AI指定任意基础路径来创建项目结构。
-    JSON参数: '{"base_path": "C:/path/to/create/project", "structure": {...}}'
-    """
-    if not allow_arbitrary_paths:
-        return json.dumps([{"item": "配置错误", "status": "失败", "message": "插件被配置为不允许任意路径操作。"}], ensure_ascii=False, indent=2)
-
-    print("警告: 项目生成插件正在以不安全模式运行，允许在AI指定的任意路径创建文件/目录。", file=sys.stderr)
-    try:
-        params = json.loads(params_json_str)
-        base_path_from_ai = params.get("base_path") 
-        structure = params.get("structure")
-
-        if not base_path_from_ai or not isinstance(base_path_from_ai, str) or not base_path_from_ai.strip():
-            return json.dumps([{"item": "参数错误", "status": "失败", "message": "JSON必须包含有效的非空字符串 'base_path'。"}], ensure_ascii=False, indent=2)
-        if not isinstance(structure, dict):
-             return json.dumps([{"item": "参数错误", "status": "失败", "message": "JSON必须包含有效的字典 'structure'。"}], ensure_ascii=False, indent=2)
-        
-        initial_results = []
-        # 确保基础目录存在
-        try:
-            actual_base_path = os.path.realpath(os.path.expanduser(os.path.expandvars(base_path_from_ai)))
-            if not os.path.exists(actual_base_path):
-                os.makedirs(actual_base_path, exist_ok=True)
-                initial_results.append({"item": base_path_from_ai, "status": "成功", "message": f"基础目录 '{actual_base_path}' 已创建。"})
-            else:
-                initial_results.append({"item": base_path_from_ai, "status": "信息", "message": f"基础目录 '{actual_base_path}' 已存在。"})
-
-        except Exception as e:
-            return json.dumps([{"item": base_path_from_ai, "status": "失败", "message": f"创建或验证基础目录 '{base_path_from_ai}' 失败: {str(e)}"}], ensure_ascii=False, indent=2)
-
-
-        final_results = create_project_structure_recursive(base_path_from_ai, structure, results_list=initial_results)
-        return json.dumps(final_results, ensure_ascii=False, indent=2)
-
-    except json.JSONDecodeError:
-        return json.dumps([{"item": "JSON解析错误", "status": "失败", "message": "输入参数不是有效的JSON字符串。"}], ensure_ascii=False, indent=2)
-    except Exception as e:
-        return json.dumps([{"item": "未知错误", "status": "失败", "message": f"生成项目时发生未知错误: {str(e)}"}], ensure_ascii=False, indent=2)
-
-
-if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        json_param = sys.argv[1]
-        result = generate_project_unsafe(json_param)
-        print(result)
-    else:
-        print(json.dumps([{"item": "调用错误", "status": "失败", "message": "项目生成插件需要JSON参数。"}]))
-        print("警告：此模式允许在任意指定路径创建文件和目录，请谨慎使用！")
-    sys.stdout.flush()
+import os
+import sys
+import json
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+PROJECT_ROOT = os.path.realpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+from plugin_common import directory_index
+from plugin_common.atomic_file import write_bytes_atomic
+from plugin_common.plugin_protocol import read_plugin_argument
+
+# 默认配置
+DEFAULT_WRITE_WORKERS = 8
+
+# 加载插件自身配置
+allow_arbitrary_paths = True # 从插件配置中获取，确保其意图
+write_workers = DEFAULT_WRITE_WORKERS
+try:
+    plugin_config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.json")
+    if os.path.exists(plugin_config_path):
+        with open(plugin_config_path, 'r', encoding='utf-8') as f:
+            plugin_config_data = json.load(f)
+            psc = plugin_config_data.get("plugin_specific_config", {})
+            allow_arbitrary_paths = psc.get("allow_arbitrary_paths", True)
+            write_workers = psc.get("write_workers", DEFAULT_WRITE_WORKERS)
+    if not allow_arbitrary_paths:
+        print("严重警告: 项目生成插件 (project_generator) 被配置为不允许任意路径，但其代码逻辑当前是允许的。存在配置与行为不一致的风险！", file=sys.stderr)
+except Exception as e:
+    print(f"警告: 读取插件 project_generator 配置失败: {e}. 将使用默认行为（允许任意路径）。", file=sys.stderr)
+
+
+HASH_CHUNK_BYTES = 1024 * 1024
+
+
+def plan_project_structure(base_path: str, structure: dict):
+    """
+    展开整个项目结构，不访问文件系统。
+    structure: {'dirname': {'filename': 'content', 'subdir': {...}}, 'file2': 'content2', 'empty_dir': None}
+    返回 (需要存在的目录列表, 文件列表 [(相对路径, 完整路径, 内容)], 失败列表)。
+    """
+    directories, files, failures = [base_path], [], []
+    stack = [(structure, base_path, "")]
+    while stack:
+        node, directory, relative_directory = stack.pop()
+        for name, item_content in node.items():
+            relative_path = os.path.join(relative_directory, name)
+            # 对文件名/目录名进行基本检查
+            if ".." in name or "/" in name or "\\" in name or not name.strip():
+                failures.append({"item": relative_path, "message": "名称非法 (不允许路径分隔符、'..'或空名称)。"})
+                continue
+            full_path = os.path.join(directory, name)
+            if isinstance(item_content, dict):
+                directories.append(full_path)
+                stack.append((item_content, full_path, relative_path))
+            elif isinstance(item_content, str):
+                files.append((relative_path, full_path, item_content))
+            elif item_content is None:
+                directories.append(full_path)
+            else:
+                failures.append({"item": relative_path, "message": "项目结构中存在无法识别的项类型。"})
+    return directories, files, failures
+
+
+def create_directories(directories: list, base_path: str):
+    """一次创建全部目录 (父目录排在子目录之前)，返回 (新建的目录列表, 失败列表)。"""
+    created, failures = [], []
+    for directory in sorted(set(directories)):
+        if os.path.isdir(directory):
+            continue
+        relative_path = os.path.relpath(directory, base_path)
+        try:
+            os.makedirs(directory)
+            created.append(directory)
+        except FileExistsError:
+            failures.append({"item": relative_path, "message": f"无法创建目录 '{directory}'：已存在同名文件。"})
+        except PermissionError:
+            failures.append({"item": relative_path, "message": f"权限错误：无法创建目录 '{directory}'。"})
+        except Exception as e:
+            failures.append({"item": relative_path, "message": f"创建目录 '{directory}' 失败: {str(e)}"})
+    return created, failures
+
+
+def file_sha256(path: str) -> bytes:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b''):
+            digest.update(chunk)
+    return digest.digest()
+
+
+def write_file_if_changed(full_path: str, content: str, force: bool) -> str:
+    """内容与现有文件相同时跳过写入。返回 'created'、'updated' 或 'unchanged'。"""
+    # 与原先以文本模式写入时一致，换行符转换为系统默认的换行符
+    data = (content.replace('\n', os.linesep) if os.linesep != '\n' else content).encode('utf-8')
+    try:
+        existing_size = os.stat(full_path).st_size
+    except FileNotFoundError:
+        existing_size = None
+    # 大小不同时内容必然不同，只有大小相同时才计算现有文件的哈希
+    if existing_size == len(data) and not force and file_sha256(full_path) == hashlib.sha256(data).digest():
+        return "unchanged"
+    write_bytes_atomic(full_path, data)
+    return "created" if existing_size is None else "updated"
+
+
+def write_planned_file(planned_file: tuple, force: bool):
+    relative_path, full_path, content = planned_file
+    try:
+        return write_file_if_changed(full_path, content, force), None
+    except PermissionError:
+        return None, {"item": relative_path, "message": f"权限错误：无法写入文件 '{full_path}'。"}
+    except IsADirectoryError:
+        return None, {"item": relative_path, "message": f"路径错误：'{full_path}' 是一个目录，不能作为文件写入。"}
+    except Exception as e:
+        return None, {"item": relative_path, "message": f"创建文件 '{full_path}' 失败: {str(e)}"}
+
+
+def generate_project_unsafe(params_json_str: str):
+    """
+    允许AI指定任意基础路径来创建项目结构。
+    JSON参数: '{"base_path": "C:/path/to/create/project", "structure": {...}, "force_rewrite": false}'
+    先展开整个结构并一次创建全部目录，再在线程池中写入文件；内容与现有文件相同的文件不会重写 (force_rewrite 为 true 时全部重写)。
+    返回新建、更新、未变化的数量汇总以及失败的条目。
+    """
+    if not allow_arbitrary_paths:
+        return json.dumps([{"item": "配置错误", "status": "失败", "message": "插件被配置为不允许任意路径操作。"}], ensure_ascii=False, indent=2)
+
+    print("警告: 项目生成插件正在以不安全模式运行，允许在AI指定的任意路径创建文件/目录。", file=sys.stderr)
+    try:
+        params = json.loads(params_json_str)
+        base_path_from_ai = params.get("base_path")
+        structure = params.get("structure")
+        force = bool(params.get("force_rewrite", False))
+
+        if not base_path_from_ai or not isinstance(base_path_from_ai, str) or not base_path_from_ai.strip():
+            return json.dumps([{"item": "参数错误", "status": "失败", "message": "JSON必须包含有效的非空字符串 'base_path'。"}], ensure_ascii=False, indent=2)
+        if not isinstance(structure, dict):
+             return json.dumps([{"item": "参数错误", "status": "失败", "message": "JSON必须包含有效的字典 'structure'。"}], ensure_ascii=False, indent=2)
+
+        # 基础路径只解析一次
+        try:
+            actual_base_path = os.path.realpath(os.path.expanduser(os.path.expandvars(base_path_from_ai)))
+        except Exception as e:
+            return json.dumps([{"item": base_path_from_ai, "status": "失败", "message": f"错误：解析基础路径 '{base_path_from_ai}' 失败: {str(e)}"}], ensure_ascii=False, indent=2)
+
+        directories, files, failures = plan_project_structure(actual_base_path, structure)
+        created_directories, directory_failures = create_directories(directories, actual_base_path)
+        if not os.path.isdir(actual_base_path):
+            return json.dumps([{"item": base_path_from_ai, "status": "失败", "message": directory_failures[0]["message"] if directory_failures else f"创建或验证基础目录 '{base_path_from_ai}' 失败。"}], ensure_ascii=False, indent=2)
+        failures.extend(directory_failures)
+
+        counts = {"created": 0, "updated": 0, "unchanged": 0}
+        changed_paths = list(created_directories)
+        if files:
+            with ThreadPoolExecutor(max_workers=max(1, min(write_workers, len(files)))) as executor:
+                for planned_file, (outcome, failure) in zip(files, executor.map(lambda item: write_planned_file(item, force), files)):
+                    if failure:
+                        failures.append(failure)
+                        continue
+                    counts[outcome] += 1
+                    if outcome != "unchanged":
+                        changed_paths.append(planned_file[1])
+        if changed_paths:
+            directory_index.notify_paths_changed(changed_paths)  # 使目录索引立即反映本次修改
+
+        result = {
+            "status": "部分失败" if failures else "成功",
+            "base_path": actual_base_path,
+            "message": f"项目框架已生成：新建 {counts['created']} 个文件，更新 {counts['updated']} 个文件，"
+                       f"{counts['unchanged']} 个文件内容未变化已跳过，新建 {len(created_directories)} 个目录"
+                       + (f"，{len(failures)} 项失败。" if failures else "。"),
+            "summary": {"files_created": counts["created"], "files_updated": counts["updated"], "files_unchanged": counts["unchanged"],
+                        "directories_created": len(created_directories), "failed": len(failures)},
+        }
+        if failures:
+            result["failures"] = failures
+        return json.dumps(result, ensure_ascii=False, indent=2)
+
+    except json.JSONDecodeError:
+        return json.dumps([{"item": "JSON解析错误", "status": "失败", "message": "输入参数不是有效的JSON字符串。"}], ensure_ascii=False, indent=2)
+    except Exception as e:
+        return json.dumps([{"item": "未知错误", "status": "失败", "message": f"生成项目时发生未知错误: {str(e)}"}], ensure_ascii=False, indent=2)
+
+if __name__ == "__main__":
+    json_param = read_plugin_argument()
+    if json_param is not None:
+        result = generate_project_unsafe(json_param)
+        print(result)
+    else:
+        print(json.dumps([{"item": "调用错误", "status": "失败", "message": "项目生成插件需要JSON参数。"}]))
+        print("警告：此模式允许在任意指定路径创建文件和目录，请谨慎使用！")
+    sys.stdout.flush()
@@ -1,154 +1,385 @@
-import sys
-import asyncio
-from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError, Error as PlaywrightError
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
-import traceback
-import os
-import json # 新增
-
-# --- 默认配置 ---
-DEFAULT_BROWSER_EXECUTABLE = "chromium"
-DEFAULT_PAGE_LOAD_TIMEOUT_MS = 30 * 1000
-DEFAULT_WAIT_AFTER_LOAD_S = 3
-DEFAULT_MAX_TEXT_LENGTH = 20000
-DEFAULT_MAX_LINKS = 25
-
-# --- 加载插件配置 ---
-browser_executable = DEFAULT_BROWSER_EXECUTABLE
-page_load_timeout_ms = DEFAULT_PAGE_LOAD_TIMEOUT_MS
-wait_after_load_s = DEFAULT_WAIT_AFTER_LOAD_S
-max_text_length = DEFAULT_MAX_TEXT_LENGTH
-max_links_to_extract = DEFAULT_MAX_LINKS
-
-try:
-    plugin_config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.json")
-    if os.path.exists(plugin_config_path):
-        with open(plugin_config_path, 'r', encoding='utf-8') as f:
-            plugin_config_data = json.load(f)
-            psc = plugin_config_data.get("plugin_specific_config", {})
-            browser_executable = psc.get("default_browser_type", DEFAULT_BROWSER_EXECUTABLE).lower()
-            page_load_timeout_ms = psc.get("page_load_timeout_ms", DEFAULT_PAGE_LOAD_TIMEOUT_MS)
-            wait_after_load_s = psc.get("wait_after_load_seconds", DEFAULT_WAIT_AFTER_LOAD_S)
-            max_text_length = psc.get("max_text_length", DEFAULT_MAX_TEXT_LENGTH)
-            max_links_to_extract = psc.get("max_links_to_extract", DEFAULT_MAX_LINKS)
-
-            if browser_executable not in ["chromium", "firefox", "webkit"]:
-                print(f"警告: 插件配置中指定的浏览器类型 '{browser_executable}' 无效，将回退到 'chromium'。", file=sys.stderr)
-                browser_executable = "chromium"
-except Exception as e:
-    print(f"警告: 读取插件 web_content_reader 配置 ({plugin_config_path}) 失败: {e}. 将使用默认值。", file=sys.stderr)
-
-
-async def get_dynamic_webpage_content_with_playwright(url: str):
-    resolved_url_for_error_msg = url
-    playwright_instance = None
-    browser_context = None
-    page = None
-
-    try:
-        parsed_url = urlparse(url)
-        if not parsed_url.scheme: url_with_scheme = 'http://' + url.lstrip('/')
-        elif not parsed_url.netloc: return f"错误：URL '{url}' 格式不正确 (无域名)。"
-        else: url_with_scheme = url
-        
-        final_parsed_url = urlparse(url_with_scheme)
-        if not all([final_parsed_url.scheme, final_parsed_url.netloc]):
-            return f"错误：URL '{url}' (修正为 '{url_with_scheme}') 格式不正确。"
-        resolved_url_for_error_msg = url_with_scheme
-
-        playwright_instance = await async_playwright().start()
-        
-        browser_launcher = None
-        if browser_executable == "chromium": browser_launcher = playwright_instance.chromium
-        elif browser_executable == "firefox": browser_launcher = playwright_instance.firefox
-        elif browser_executable == "webkit": browser_launcher = playwright_instance.webkit
-        else: # Fallback
-            browser_launcher = playwright_instance.chromium
-
-        browser_instance = await browser_launcher.launch(headless=True) # 通常网页读取用headless
-        browser_context = await browser_instance.new_context(
-            user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/100.0.0.0 Safari/537.36 Xice_Aitoolbox/WebReader',
-            java_script_enabled=True,
-        )
-        page = await browser_context.new_page()
-
-        page_content_html = ""
-        final_url_visited = url_with_scheme
-
-        try:
-            await page.goto(url_with_scheme, timeout=page_load_timeout_ms, wait_until='domcontentloaded')
-            final_url_visited = page.url
-            if wait_after_load_s > 0:
-                await page.wait_for_timeout(wait_after_load_s * 1000)
-            page_content_html = await page.content()
-        except PlaywrightTimeoutError:
-            page_content_html = await page.content()
-            if not page_content_html: return f"错误：请求URL '{url_with_scheme}' 超时 ({page_load_timeout_ms / 1000}s) 且无内容。"
-        except PlaywrightError as pe_page:
-            traceback.print_exc(file=sys.stderr)
-            return f"错误：访问URL '{url_with_scheme}' 页面操作失败: {str(pe_page)}"
-        
-        if not page_content_html: return f"错误：未能从URL '{url_with_scheme}' 获取HTML内容。"
-
-        soup = BeautifulSoup(page_content_html, 'html.parser')
-        title = soup.find('title').string.strip() if soup.find('title') and soup.find('title').string else "未找到标题"
-
-        for s in soup(["script", "style", "header", "footer", "nav", "aside", "form", "noscript", "iframe", "button", "input", "select", "textarea", "link", "meta"]):
-            s.decompose()
-        
-        main_area = soup.find('article') or soup.find('main') or soup.body or soup
-        body_text_content = main_area.get_text(separator='\n', strip=True) if main_area else ""
-        
-        if not body_text_content.strip(): body_text_content = soup.get_text(separator='\n', strip=True) # Fallback
-
-        full_text = "\n".join([line.strip() for line in body_text_content.splitlines() if line.strip()])
-        if len(full_text) > max_text_length:
-            full_text = full_text[:max_text_length] + f"...\n[内容过长，截断至 {max_text_length} 字符]"
-        if not full_text.strip(): full_text = "未能提取到有效文本内容。"
-
-        links = []
-        if main_area:
-            for a_tag in main_area.find_all('a', href=True):
-                link_text, raw_href = a_tag.get_text(strip=True), a_tag['href']
-                if not raw_href or raw_href.startswith(('#', 'javascript:', 'mailto:', 'tel:')): continue
-                try:
-                    absolute_href = urljoin(final_url_visited, raw_href)
-                    parsed_abs_href = urlparse(absolute_href)
-                    if not parsed_abs_href.scheme or not parsed_abs_href.netloc: continue
-                except Exception: continue
-                if link_text and absolute_href: links.append(f"- {link_text}: {absolute_href}")
-        
-        links_output_str = "\n".join(links[:max_links_to_extract])
-        if len(links) > max_links_to_extract: links_output_str += f"\n- ... [链接列表过长，截断至前 {max_links_to_extract} 条]"
-        elif not links: links_output_str = "未找到有效超链接。"
-
-        output = f"[网页标题]: {title}\n[原始请求URL]: {url}\n[最终访问URL]: {final_url_visited}\n\n"
-        output += "[主要文本内容]:\n" + full_text + "\n\n"
-        output += "[提取到的超链接]:\n" + links_output_str
-            
-        return output.strip()
-
-    except Exception as e:
-        traceback.print_exc(file=sys.stderr)
-        return f"处理URL '{resolved_url_for_error_msg}' 时发生顶层错误: {str(e)}"
-    finally:
-        if page: await page.close()
-        if browser_context: await browser_context.close()
-        if playwright_instance: await playwright_instance.stop()
-
-if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        url_param = sys.argv[1]
-        print(f"[Plugin Log] Web Content Reader: URL '{url_param}'", file=sys.stderr)
-        try:
-            result = asyncio.run(get_dynamic_webpage_content_with_playwright(url_param))
-            print(result)
-        except Exception as e:
-            print(f"网页读取插件主线程错误: {str(e)}", file=sys.stderr)
-            traceback.print_exc(file=sys.stderr)
-            print(f"错误：执行网页读取插件时发生内部错误。")
-    else:
-        print(json.dumps({"status": "错误", "message": "网页读取插件需要URL参数。"}))
-    sys.stdout.flush()
-    sys.stderr.flush()
+import sys
+import re
+import time
+import asyncio
+import requests
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError, Error as PlaywrightError
+from urllib.parse import urljoin, urlparse, urlunparse, parse_qsl, urlencode
+import traceback
+import os
+import json # 新增
+
+PROJECT_ROOT = os.path.realpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+from plugin_common import browser_service, page_readiness
+from plugin_common.disk_cache import DiskCache
+from plugin_common.html_extract import extract_page
+from plugin_common.plugin_protocol import read_plugin_argument
+
+# --- 默认配置 ---
+DEFAULT_BROWSER_EXECUTABLE = "chromium"
+DEFAULT_PAGE_LOAD_TIMEOUT_MS = 30 * 1000
+DEFAULT_WAIT_AFTER_LOAD_S = 3
+DEFAULT_MAX_TEXT_LENGTH = 20000
+DEFAULT_MAX_LINKS = 25
+DEFAULT_USE_SHARED_BROWSER_SERVICE = True
+DEFAULT_CACHE_ENABLED = True
+DEFAULT_CACHE_TTL_SECONDS = 3600
+DEFAULT_CACHE_MAX_TOTAL_MB = 200
+DEFAULT_HTML_EXTRACTION_BACKEND = "auto" # auto / lxml / bs4
+DEFAULT_BLOCKED_RESOURCE_TYPES = page_readiness.DEFAULT_BLOCKED_RESOURCE_TYPES
+DEFAULT_DOM_STABLE_MS = page_readiness.DEFAULT_DOM_STABLE_MS
+DEFAULT_FETCH_STRATEGY = "auto" # auto: 先静态请求，内容不足时再用浏览器 / static: 只用静态请求 / browser: 总是用浏览器
+DEFAULT_STATIC_FETCH_TIMEOUT_S = 10
+DEFAULT_STATIC_FETCH_MAX_BYTES = 5 * 1024 * 1024
+DEFAULT_STATIC_MIN_TEXT_LENGTH = 200
+REMOVED_TAGS = ["script", "style", "header", "footer", "nav", "aside", "form", "noscript", "iframe", "button", "input", "select", "textarea", "link", "meta"]
+MAIN_AREA_CANDIDATES = ["article", "main", "body"]
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache")
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/100.0.0.0 Safari/537.36 Xice_Aitoolbox/WebReader'
+
+# --- 加载插件配置 ---
+browser_executable = DEFAULT_BROWSER_EXECUTABLE
+page_load_timeout_ms = DEFAULT_PAGE_LOAD_TIMEOUT_MS
+wait_after_load_s = DEFAULT_WAIT_AFTER_LOAD_S
+max_text_length = DEFAULT_MAX_TEXT_LENGTH
+max_links_to_extract = DEFAULT_MAX_LINKS
+use_shared_browser_service = DEFAULT_USE_SHARED_BROWSER_SERVICE
+cache_enabled = DEFAULT_CACHE_ENABLED
+cache_ttl_seconds = DEFAULT_CACHE_TTL_SECONDS
+cache_max_total_mb = DEFAULT_CACHE_MAX_TOTAL_MB
+html_extraction_backend = DEFAULT_HTML_EXTRACTION_BACKEND
+blocked_resource_types = DEFAULT_BLOCKED_RESOURCE_TYPES
+dom_stable_ms = DEFAULT_DOM_STABLE_MS
+fetch_strategy = DEFAULT_FETCH_STRATEGY
+static_fetch_timeout_s = DEFAULT_STATIC_FETCH_TIMEOUT_S
+static_fetch_max_bytes = DEFAULT_STATIC_FETCH_MAX_BYTES
+static_min_text_length = DEFAULT_STATIC_MIN_TEXT_LENGTH
+
+try:
+    plugin_config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.json")
+    if os.path.exists(plugin_config_path):
+        with open(plugin_config_path, 'r', encoding='utf-8') as f:
+            plugin_config_data = json.load(f)
+            psc = plugin_config_data.get("plugin_specific_config", {})
+            browser_executable = psc.get("default_browser_type", DEFAULT_BROWSER_EXECUTABLE).lower()
+            page_load_timeout_ms = psc.get("page_load_timeout_ms", DEFAULT_PAGE_LOAD_TIMEOUT_MS)
+            wait_after_load_s = psc.get("wait_after_load_seconds", DEFAULT_WAIT_AFTER_LOAD_S)
+            max_text_length = psc.get("max_text_length", DEFAULT_MAX_TEXT_LENGTH)
+            max_links_to_extract = psc.get("max_links_to_extract", DEFAULT_MAX_LINKS)
+            use_shared_browser_service = psc.get("use_shared_browser_service", DEFAULT_USE_SHARED_BROWSER_SERVICE)
+            cache_enabled = psc.get("cache_enabled", DEFAULT_CACHE_ENABLED)
+            cache_ttl_seconds = psc.get("cache_ttl_seconds", DEFAULT_CACHE_TTL_SECONDS)
+            cache_max_total_mb = psc.get("cache_max_total_mb", DEFAULT_CACHE_MAX_TOTAL_MB)
+            html_extraction_backend = psc.get("html_extraction_backend", DEFAULT_HTML_EXTRACTION_BACKEND)
+            blocked_resource_types = psc.get("blocked_resource_types", DEFAULT_BLOCKED_RESOURCE_TYPES)
+            dom_stable_ms = psc.get("dom_stable_ms", DEFAULT_DOM_STABLE_MS)
+            fetch_strategy = psc.get("fetch_strategy", DEFAULT_FETCH_STRATEGY).lower()
+            static_fetch_timeout_s = psc.get("static_fetch_timeout_seconds", DEFAULT_STATIC_FETCH_TIMEOUT_S)
+            static_fetch_max_bytes = psc.get("static_fetch_max_bytes", DEFAULT_STATIC_FETCH_MAX_BYTES)
+            static_min_text_length = psc.get("static_min_text_length", DEFAULT_STATIC_MIN_TEXT_LENGTH)
+
+            if browser_executable not in ["chromium", "firefox", "webkit"]:
+                print(f"警告: 插件配置中指定的浏览器类型 '{browser_executable}' 无效，将回退到 'chromium'。", file=sys.stderr)
+                browser_executable = "chromium"
+            if fetch_strategy not in ["auto", "static", "browser"]:
+                print(f"警告: 插件配置中指定的获取方式 '{fetch_strategy}' 无效，将回退到 'auto'。", file=sys.stderr)
+                fetch_strategy = "auto"
+except Exception as e:
+    print(f"警告: 读取插件 web_content_reader 配置 ({plugin_config_path}) 失败: {e}. 将使用默认值。", file=sys.stderr)
+
+
+# 静态请求使用同一个 Session，在常驻插件宿主中可以复用到同一站点的连接
+http_session = requests.Session()
+http_session.headers.update({"User-Agent": USER_AGENT, "Accept": "text/html,application/xhtml+xml;q=0.9,*/*;q=0.8",
+                             "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8"})
+
+META_CHARSET_PATTERN = re.compile(rb'<meta[^>]+charset=["\']?\s*([\w-]+)', re.IGNORECASE)
+# 单页应用的空挂载点: 页面内容完全由脚本渲染
+EMPTY_APP_ROOT_PATTERN = re.compile(r'<div\s+id=["\'](?:root|app|__next|__nuxt|q-app)["\'][^>]*>\s*</div>', re.IGNORECASE)
+
+TIER_STATIC = "静态HTTP请求"
+TIER_BROWSER_SERVICE = "浏览器渲染 (常驻浏览器服务)"
+TIER_LOCAL_BROWSER = "浏览器渲染 (本地浏览器)"
+
+
+def get_page_cache():
+    return DiskCache(CACHE_DIR, ttl_seconds=cache_ttl_seconds, max_total_bytes=int(cache_max_total_mb * 1024 * 1024))
+
+
+def normalize_url(url: str) -> str:
+    """规范化URL作为缓存键: 协议与域名小写、去掉默认端口和片段、查询参数排序。"""
+    parsed = urlparse(url)
+    scheme = parsed.scheme.lower()
+    netloc = parsed.netloc.lower()
+    if (scheme == "http" and netloc.endswith(":80")) or (scheme == "https" and netloc.endswith(":443")):
+        netloc = netloc.rsplit(":", 1)[0]
+    query = urlencode(sorted(parse_qsl(parsed.query, keep_blank_values=True)))
+    return urlunparse((scheme, netloc, parsed.path or "/", parsed.params, query, ""))
+
+
+def parse_request_argument(argument: str):
+    """
+    参数可以是URL字符串，也可以是JSON对象:
+    {"url": "...", "bypass_cache": true} 跳过缓存读取 (结果仍会写入缓存)；{"cache_stats": true} 返回缓存统计。
+    返回 (url, bypass_cache, cache_stats)。
+    """
+    stripped = argument.strip()
+    if stripped.startswith("{"):
+        try:
+            params = json.loads(stripped)
+            if isinstance(params, dict):
+                return str(params.get("url", "")).strip(), bool(params.get("bypass_cache", False)), bool(params.get("cache_stats", False))
+        except json.JSONDecodeError:
+            pass
+    return stripped, False, False
+
+
+def extract_page_content(page_content_html: str, final_url_visited: str):
+    """从HTML中提取标题、主要文本与超链接。返回 (标题, 主要文本, 超链接文本)。"""
+    page = extract_page(page_content_html, REMOVED_TAGS, MAIN_AREA_CANDIDATES, backend=html_extraction_backend, text_fallback_to_document=True)
+    title = page.title or "未找到标题"
+
+    full_text = page.text
+    if len(full_text) > max_text_length:
+        full_text = full_text[:max_text_length] + f"...\n[内容过长，截断至 {max_text_length} 字符]"
+    if not full_text.strip(): full_text = "未能提取到有效文本内容。"
+
+    links = []
+    for link_text, raw_href in page.anchors:
+        if not raw_href or raw_href.startswith(('#', 'javascript:', 'mailto:', 'tel:')): continue
+        try:
+            absolute_href = urljoin(final_url_visited, raw_href)
+            parsed_abs_href = urlparse(absolute_href)
+            if not parsed_abs_href.scheme or not parsed_abs_href.netloc: continue
+        except Exception: continue
+        if link_text and absolute_href: links.append(f"- {link_text}: {absolute_href}")
+    
+    links_output_str = "\n".join(links[:max_links_to_extract])
+    if len(links) > max_links_to_extract: links_output_str += f"\n- ... [链接列表过长，截断至前 {max_links_to_extract} 条]"
+    elif not links: links_output_str = "未找到有效超链接。"
+    return title, full_text, links_output_str
+
+
+def format_page_output(url: str, final_url_visited: str, title: str, full_text: str, links_output_str: str, fetch_tier: str) -> str:
+    output = f"[网页标题]: {title}\n[原始请求URL]: {url}\n[最终访问URL]: {final_url_visited}\n[获取方式]: {fetch_tier}\n\n"
+    output += "[主要文本内容]:\n" + full_text + "\n\n"
+    output += "[提取到的超链接]:\n" + links_output_str
+    return output.strip()
+
+
+def fetch_html_static(url_with_scheme: str):
+    """
+    不启动浏览器，直接以 HTTP GET 获取HTML。返回 (最终URL, HTML, 未能使用的原因)。
+    非HTML内容、超过大小上限或请求失败时 HTML 为空，由调用方决定是否改用浏览器。
+    """
+    try:
+        with http_session.get(url_with_scheme, timeout=static_fetch_timeout_s, stream=True, allow_redirects=True) as response:
+            final_url = response.url
+            if response.status_code >= 400:
+                return final_url, "", f"HTTP状态码 {response.status_code}"
+            content_type = response.headers.get("Content-Type", "").lower()
+            if content_type and "html" not in content_type:
+                return final_url, "", f"非HTML内容 ({content_type})"
+            declared_length = response.headers.get("Content-Length")
+            if declared_length and declared_length.isdigit() and int(declared_length) > static_fetch_max_bytes:
+                return final_url, "", f"页面大小 {declared_length} 字节超过上限"
+            body = bytearray()
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                body.extend(chunk)
+                if len(body) > static_fetch_max_bytes:
+                    return final_url, "", f"页面大小超过上限 {static_fetch_max_bytes} 字节"
+            # requests 在响应头未声明编码时会默认 ISO-8859-1，因此只采用明确声明的编码
+            encoding = requests.utils.get_encoding_from_headers(response.headers) if "charset" in content_type else None
+    except requests.RequestException as e:
+        return url_with_scheme, "", f"请求失败: {e}"
+    if not body.strip():
+        return final_url, "", "页面内容为空"
+
+    if not encoding:
+        meta_match = META_CHARSET_PATTERN.search(bytes(body[:4096]))
+        encoding = meta_match.group(1).decode('ascii', errors='ignore') if meta_match else "utf-8"
+    try:
+        return final_url, bytes(body).decode(encoding, errors='replace'), None
+    except LookupError:
+        return final_url, bytes(body).decode("utf-8", errors='replace'), None
+
+
+def static_page_needs_browser(page_content_html: str, full_text: str):
+    """判断静态请求得到的页面是否需要浏览器渲染。需要时返回原因，否则返回 None。"""
+    if EMPTY_APP_ROOT_PATTERN.search(page_content_html):
+        return "页面为脚本渲染的单页应用"
+    if len(full_text) < static_min_text_length:
+        return f"提取到的正文少于 {static_min_text_length} 字符"
+    return None
+
+
+async def fetch_html_with_browser_service(url_with_scheme: str):
+    """
+    通过常驻浏览器服务租用页面获取HTML。返回 (最终URL, HTML, 错误信息)。
+    服务不可用时抛出 ConnectionError。
+    """
+    response = await browser_service.fetch_page(
+        url_with_scheme,
+        profile="web_content_reader",
+        context_options={"user_agent": USER_AGENT, "java_script_enabled": True},
+        timeout_ms=page_load_timeout_ms,
+        wait_after_load_ms=int(wait_after_load_s * 1000),
+        blocked_resource_types=blocked_resource_types,
+        dom_stable_ms=dom_stable_ms,
+    )
+    if not response.get("ok"):
+        if response.get("error_kind") == "page":
+            return url_with_scheme, "", f"错误：访问URL '{url_with_scheme}' 页面操作失败: {response.get('error')}"
+        return url_with_scheme, "", f"错误：浏览器服务处理URL '{url_with_scheme}' 失败: {response.get('error')}"
+    page_readiness.log_timing("[Plugin Log]", url_with_scheme, response.get("timing"))
+    page_content_html = response.get("html", "")
+    if response.get("timed_out") and not page_content_html:
+        return url_with_scheme, "", f"错误：请求URL '{url_with_scheme}' 超时 ({page_load_timeout_ms / 1000}s) 且无内容。"
+    return response.get("final_url") or url_with_scheme, page_content_html, None
+
+
+async def fetch_html_with_local_browser(url_with_scheme: str):
+    """在本进程内启动浏览器获取HTML (不使用浏览器服务时的方式)。返回 (最终URL, HTML, 错误信息)。"""
+    playwright_instance = None
+    browser_context = None
+    page = None
+    try:
+        playwright_instance = await async_playwright().start()
+        
+        browser_launcher = None
+        if browser_executable == "chromium": browser_launcher = playwright_instance.chromium
+        elif browser_executable == "firefox": browser_launcher = playwright_instance.firefox
+        elif browser_executable == "webkit": browser_launcher = playwright_instance.webkit
+        else: # Fallback
+            browser_launcher = playwright_instance.chromium
+
+        browser_instance = await browser_launcher.launch(headless=True) # 通常网页读取用headless
+        browser_context = await browser_instance.new_context(
+            user_agent=USER_AGENT,
+            java_script_enabled=True,
+        )
+        page = await browser_context.new_page()
+
+        page_content_html = ""
+        final_url_visited = url_with_scheme
+
+        try:
+            blocker = await page_readiness.attach_resource_blocker(page, blocked_resource_types)
+            started = time.monotonic()
+            await page.goto(url_with_scheme, timeout=page_load_timeout_ms, wait_until='domcontentloaded')
+            final_url_visited = page.url
+            timing = {"goto_ms": round((time.monotonic() - started) * 1000)}
+            timing["ready_reason"], timing["ready_ms"] = await page_readiness.wait_until_ready(page, int(wait_after_load_s * 1000), dom_stable_ms)
+            page_content_html = await page.content()
+            timing["blocked_requests"] = blocker.blocked_count if blocker else 0
+            timing["total_ms"] = round((time.monotonic() - started) * 1000)
+            page_readiness.log_timing("[Plugin Log]", final_url_visited, timing)
+        except PlaywrightTimeoutError:
+            page_content_html = await page.content()
+            if not page_content_html: return final_url_visited, "", f"错误：请求URL '{url_with_scheme}' 超时 ({page_load_timeout_ms / 1000}s) 且无内容。"
+        except PlaywrightError as pe_page:
+            traceback.print_exc(file=sys.stderr)
+            return final_url_visited, "", f"错误：访问URL '{url_with_scheme}' 页面操作失败: {str(pe_page)}"
+        return final_url_visited, page_content_html, None
+    finally:
+        if page: await page.close()
+        if browser_context: await browser_context.close()
+        if playwright_instance: await playwright_instance.stop()
+
+
+async def get_dynamic_webpage_content_with_playwright(url: str):
+    resolved_url_for_error_msg = url
+
+    try:
+        url, bypass_cache, want_cache_stats = parse_request_argument(url)
+        if want_cache_stats:
+            return "[网页缓存统计]:\n" + json.dumps(get_page_cache().stats(), ensure_ascii=False, indent=2)
+        if not url: return "错误：未提供要读取的URL。"
+        resolved_url_for_error_msg = url
+
+        parsed_url = urlparse(url)
+        if not parsed_url.scheme: url_with_scheme = 'http://' + url.lstrip('/')
+        elif not parsed_url.netloc: return f"错误：URL '{url}' 格式不正确 (无域名)。"
+        else: url_with_scheme = url
+        
+        final_parsed_url = urlparse(url_with_scheme)
+        if not all([final_parsed_url.scheme, final_parsed_url.netloc]):
+            return f"错误：URL '{url}' (修正为 '{url_with_scheme}') 格式不正确。"
+        resolved_url_for_error_msg = url_with_scheme
+
+        page_cache = get_page_cache() if cache_enabled else None
+        extraction_settings = {"max_text_length": max_text_length, "max_links_to_extract": max_links_to_extract}
+        if page_cache and not bypass_cache:
+            cached = page_cache.get(normalize_url(url_with_scheme))
+            if cached:
+                print(f"[Plugin Log] 网页缓存命中: {cached['final_url']}", file=sys.stderr)
+                if cached.get("extraction_settings") != extraction_settings:
+                    # 提取参数已修改，用缓存的原始HTML重新提取，仍然无需重新加载页面
+                    cached["title"], cached["text"], cached["links"] = extract_page_content(cached["html"], cached["final_url"])
+                return format_page_output(url, cached["final_url"], cached["title"], cached["text"], cached["links"],
+                                          f"缓存 (原获取方式: {cached.get('fetch_tier', '未知')})")
+
+        extracted = None
+        if fetch_strategy != "browser":
+            final_url_visited, page_content_html, static_problem = fetch_html_static(url_with_scheme)
+            if page_content_html:
+                extracted = extract_page_content(page_content_html, final_url_visited)
+                if fetch_strategy == "auto":
+                    static_problem = static_page_needs_browser(page_content_html, extracted[1])
+            if static_problem and fetch_strategy == "static":
+                if not page_content_html: return f"错误：静态请求URL '{url_with_scheme}' 失败: {static_problem}"
+                static_problem = None  # 只允许静态请求时，内容不足也直接返回
+            if static_problem:
+                print(f"[Plugin Log] 静态请求 '{url_with_scheme}' 不足以获取内容 ({static_problem})，改用浏览器渲染。", file=sys.stderr)
+                extracted = None
+            else:
+                fetch_tier = TIER_STATIC
+
+        if extracted is None:
+            fetch_result = None
+            fetch_tier = TIER_BROWSER_SERVICE
+            if use_shared_browser_service:
+                try:
+                    fetch_result = await fetch_html_with_browser_service(url_with_scheme)
+                except ConnectionError as ce:
+                    print(f"[Plugin Log] 浏览器服务不可用，改为本地启动浏览器: {ce}", file=sys.stderr)
+            if fetch_result is None:
+                fetch_tier = TIER_LOCAL_BROWSER
+                fetch_result = await fetch_html_with_local_browser(url_with_scheme)
+            final_url_visited, page_content_html, fetch_error = fetch_result
+            if fetch_error: return fetch_error
+            
+            if not page_content_html: return f"错误：未能从URL '{url_with_scheme}' 获取HTML内容。"
+            extracted = extract_page_content(page_content_html, final_url_visited)
+
+        print(f"[Plugin Log] 网页 '{final_url_visited}' 获取方式: {fetch_tier}", file=sys.stderr)
+        title, full_text, links_output_str = extracted
+        if page_cache:
+            page_cache.put(normalize_url(final_url_visited), {
+                "final_url": final_url_visited, "html": page_content_html, "fetch_tier": fetch_tier,
+                "title": title, "text": full_text, "links": links_output_str,
+                "extraction_settings": extraction_settings,
+            }, aliases=[normalize_url(url_with_scheme)])
+        return format_page_output(url, final_url_visited, title, full_text, links_output_str, fetch_tier)
+
+    except Exception as e:
+        traceback.print_exc(file=sys.stderr)
+        return f"处理URL '{resolved_url_for_error_msg}' 时发生顶层错误: {str(e)}"
+
+if __name__ == "__main__":
+    url_param = read_plugin_argument()
+    if url_param is not None:
+        print(f"[Plugin Log] Web Content Reader: URL '{url_param}'", file=sys.stderr)
+        try:
+            result = asyncio.run(get_dynamic_webpage_content_with_playwright(url_param))
+            print(result)
+        except Exception as e:
+            print(f"网页读取插件主线程错误: {str(e)}", file=sys.stderr)
+            traceback.print_exc(file=sys.stderr)
+            print(f"错误：执行网页读取插件时发生内部错误。")
+    else:
+        print(json.dumps({"status": "错误", "message": "网页读取插件需要URL参数。"}))
+    sys.stdout.flush()
+    sys.stderr.flush()
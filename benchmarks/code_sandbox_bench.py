@@ -0,0 +1,78 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+import statistics
+
+# 代码沙盒基准测试: 比较原先的方式 (代码写入临时文件，每次启动新的 python / node 进程) 与
+# 预启动工作进程池 (code_sandbox_plugin) 执行短代码片段的延迟。
+# 插件调用默认相隔 --gap-ms 毫秒 (AI 两次调用之间总有间隔，工作进程池在此期间补充空闲进程)；--gap-ms 0 测量连续调用。
+#
+# 用法: python benchmarks/code_sandbox_bench.py [--runs 20] [--gap-ms 300]
+
+PROJECT_ROOT = os.path.realpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "Plugin", "code_sandbox"))
+import code_sandbox_plugin
+
+SNIPPETS = [
+    ("python", "打印", "print('hello')"),
+    ("python", "计算", "print(sum(i * i for i in range(100000)))"),
+    ("python", "导入 json/re", "import json, re\nprint(json.dumps({'a': re.findall(r'\\d+', 'a1b22c333')}))"),
+    ("javascript_node", "打印", "console.log('hello')"),
+    ("javascript_node", "计算", "let s = 0; for (let i = 0; i < 100000; i++) s += i * i; console.log(s)"),
+]
+
+
+def legacy_run(language: str, code: str) -> str:
+    # 原先的实现: 临时文件 + 新进程
+    suffix, command = ('.py', [sys.executable]) if language == "python" else ('.js', ["node"])
+    with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix=suffix, encoding='utf-8') as tmp_script:
+        tmp_script.write(code)
+        script_path = tmp_script.name
+    try:
+        process = subprocess.run(command + [script_path], capture_output=True, text=True, timeout=30, encoding='utf-8', errors='replace')
+        return process.stdout
+    finally:
+        os.remove(script_path)
+
+
+def pooled_run(language: str, code: str) -> str:
+    return json.loads(code_sandbox_plugin.run_code_sandbox(json.dumps({"language": language, "code": code})))["stdout"]
+
+
+def measure(runs: int, gap_s: float, fn):
+    samples, output = [], None
+    for _ in range(runs):
+        time.sleep(gap_s)
+        start = time.perf_counter()
+        output = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[min(len(samples) - 1, int(len(samples) * 0.95))], output
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--gap-ms", type=float, default=300)
+    args = parser.parse_args()
+    gap_s = args.gap_ms / 1000
+
+    print(f"每项 {args.runs} 次，插件调用间隔 {args.gap_ms:.0f} ms，工作进程池: Python {code_sandbox_plugin.python_pool_size} 个，"
+          f"Node.js {code_sandbox_plugin.node_pool_size} 个，每个进程执行 {code_sandbox_plugin.worker_max_runs} 次后替换")
+    print(f"\n  {'代码':<24}{'原方式 中位数/p95':>20}{'进程池 中位数/p95':>20}{'加速':>8}")
+    for language, label, code in SNIPPETS:
+        pooled_run(language, code)  # 首次调用创建进程池
+        legacy_median, legacy_p95, legacy_output = measure(args.runs, 0, lambda: legacy_run(language, code))
+        pooled_median, pooled_p95, pooled_output = measure(args.runs, gap_s, lambda: pooled_run(language, code))
+        check = "" if legacy_output == pooled_output else "  (输出不一致!)"
+        print(f"  {language + ' ' + label:<24}{legacy_median:>10.1f} /{legacy_p95:>6.1f} ms{pooled_median:>10.1f} /{pooled_p95:>6.1f} ms"
+              f"{legacy_median / pooled_median:>7.1f}x{check}")
+    code_sandbox_plugin.shutdown_pools()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+
+# 目录列出基准测试: 比较原先 os.listdir + 逐项 os.path.isdir 的方式与基于 os.scandir 的 walk_directory，
+# 以及列出目录插件按 cursor 分页时每页的耗时 (后面的页需要沿 cursor 所在路径重新定位)。
+# 默认生成两种合成目录 (各约 100k 个条目): flat 为单个文件夹中的大量文件，tree 为多层嵌套的项目结构。
+#
+# 用法: python benchmarks/directory_listing_bench.py [--entries 100000] [--runs 3] [--page-size 300] [--max-pages 20] [--path 已有目录]
+
+PROJECT_ROOT = os.path.realpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "Plugin", "directory_lister"))
+from plugin_common.directory_walk import walk_directory
+import directory_lister_plugin
+
+
+def generate_flat(root: str, entries: int):
+    os.makedirs(root)
+    for i in range(entries):
+        open(os.path.join(root, f"file_{i:06d}.txt"), 'w').close()
+
+
+def generate_tree(root: str, entries: int):
+    # 每个文件夹 20 个文件、5 个子文件夹，按广度优先生成，直到条目数达到 entries
+    os.makedirs(root)
+    with open(os.path.join(root, ".gitignore"), 'w') as f:
+        f.write("*.log\nbuild/\n")
+    created = 0
+    queue = [root]
+    while queue and created < entries:
+        directory = queue.pop(0)
+        for i in range(20):
+            if created >= entries:
+                break
+            open(os.path.join(directory, f"module_{i}.{'log' if i % 10 == 9 else 'py'}"), 'w').close()
+            created += 1
+        for i in range(5):
+            if created >= entries:
+                break
+            child = os.path.join(directory, "build" if i == 4 else f"pkg_{i}")
+            os.mkdir(child)
+            queue.append(child)
+            created += 1
+
+
+def legacy_walk(path: str) -> int:
+    # 原插件每次只列出一层；这里用同样的方式递归列出整棵树，对应 AI 逐个文件夹调用的总工作量
+    count = 0
+    for item in os.listdir(path):
+        count += 1
+        item_path = os.path.join(path, item)
+        if os.path.isdir(item_path) and not os.path.islink(item_path):
+            count += legacy_walk(item_path)
+    return count
+
+
+def legacy_one_level(path: str) -> int:
+    directories, files = [], []
+    for item in os.listdir(path):
+        (directories if os.path.isdir(os.path.join(path, item)) else files).append(item)
+    return len(directories) + len(files)
+
+
+def scandir_walk(path: str, max_depth=None, respect_gitignore=False) -> int:
+    return sum(1 for _ in walk_directory(path, max_depth=max_depth, respect_gitignore=respect_gitignore))
+
+
+def paginate(path: str, page_size: int, max_pages: int):
+    # 返回每页耗时 (毫秒) 与列出的条目数，最多 max_pages 页
+    request = {"path": path, "max_depth": 1000, "max_entries": page_size, "no_ignore": True}
+    timings, total = [], 0
+    while len(timings) < max_pages:
+        start = time.perf_counter()
+        output = directory_lister_plugin.list_directory(json.dumps(request))
+        timings.append((time.perf_counter() - start) * 1000)
+        counts = re.search(r"本次列出 (\d+) 个文件夹，(\d+) 个文件", output)
+        total += int(counts.group(1)) + int(counts.group(2)) if counts else 0
+        match = re.search(r"可使用 (\{.*\}) 继续列出", output)
+        if not match:
+            return timings, total
+        request = json.loads(match.group(1))
+    return timings, total
+
+
+def measure(runs: int, fn):
+    fn()  # 预热 (使目录项进入系统缓存)
+    timings, result = [], None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), result
+
+
+def run_layout(name: str, path: str, runs: int, page_size: int, max_pages: int):
+    print(f"\n== {name}: {path}")
+    rows = []
+    if name == "flat":
+        rows.append(("listdir + isdir (一层)", *measure(runs, lambda: legacy_one_level(path))))
+        rows.append(("scandir (一层)", *measure(runs, lambda: scandir_walk(path, max_depth=1))))
+    else:
+        rows.append(("listdir + isdir (递归)", *measure(runs, lambda: legacy_walk(path))))
+        rows.append(("scandir (递归)", *measure(runs, lambda: scandir_walk(path))))
+        rows.append(("scandir (递归, .gitignore)", *measure(runs, lambda: scandir_walk(path, respect_gitignore=True))))
+    for label, ms, count in rows:
+        print(f"  {label:<28}{ms:>10.1f} ms  {count:>8} 项")
+
+    timings, total = paginate(path, page_size, max_pages)
+    print(f"  插件分页 ({page_size} 项/页): {len(timings)} 页, 共 {total} 项, 首页 {timings[0]:.1f} ms, "
+          f"末页 {timings[-1]:.1f} ms, 中位数 {statistics.median(timings):.1f} ms, 合计 {sum(timings):.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=100000)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--page-size", type=int, default=300)
+    parser.add_argument("--max-pages", type=int, default=20)
+    parser.add_argument("--path", help="使用已有目录代替合成目录")
+    args = parser.parse_args()
+
+    if args.path:
+        run_layout("tree", os.path.realpath(args.path), args.runs, args.page_size, args.max_pages)
+        return
+
+    workdir = tempfile.mkdtemp(prefix="dirlist-bench-")
+    try:
+        for name, generate in (("flat", generate_flat), ("tree", generate_tree)):
+            path = os.path.join(workdir, name)
+            start = time.perf_counter()
+            generate(path, args.entries)
+            print(f"已生成 {name} 目录 ({args.entries} 项)，耗时 {time.perf_counter() - start:.1f}s")
+            run_layout(name, path, args.runs, args.page_size, args.max_pages)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import statistics
+import subprocess
+
+# HTML 提取后端基准测试: 比较 bs4 与 lxml 两种后端在语料页面上的耗时与峰值内存，并检查两者输出是否一致。
+# 语料为 benchmarks/html_corpus/ 中已提交的真实文档页面 (来源与许可证见该目录下的 SOURCES.md)。
+# 加 --synthetic 时另外生成几种合成页面 (synthetic_*.html，不纳入版本管理) 一并测量，用于观察超大页面与深层嵌套等极端情况。
+#
+# 用法: python benchmarks/html_extraction_bench.py [--runs 5] [--synthetic]
+
+PROJECT_ROOT = os.path.realpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+from plugin_common import html_extract
+
+CORPUS_DIR = os.path.join(PROJECT_ROOT, "benchmarks", "html_corpus")
+
+# 与两个网页插件中的提取参数相同
+PROFILES = {
+    "web_content_reader": {
+        "remove_tags": ["script", "style", "header", "footer", "nav", "aside", "form", "noscript", "iframe", "button", "input", "select", "textarea", "link", "meta"],
+        "main_area_candidates": ["article", "main", "body"],
+        "text_fallback_to_document": True,
+    },
+    "google_search": {
+        "remove_tags": ["script", "style", "noscript", "meta", "link", "header", "footer", "nav", "aside", "form", "input", "button"],
+        "main_area_candidates": ["#main", "#rcnt", "body"],
+        "text_fallback_to_document": False,
+    },
+}
+
+
+# --- 合成语料 (可选) ---
+
+WORDS = "the of and to in is for on that with as by this are from be or at an it not which have data model system page 数据 模型 系统 插件 网页 搜索 结果 文件 服务".split()
+
+
+def _sentence(rng, n):
+    return " ".join(rng.choice(WORDS) for _ in range(n))
+
+
+def _boilerplate(rng):
+    head = "<meta charset='utf-8'>" + "".join(f"<link rel='stylesheet' href='/s{i}.css'>" for i in range(20))
+    head += "".join(f"<script>var x{i} = {json.dumps(_sentence(rng, 200))};</script>" for i in range(30))
+    nav = "<nav>" + "".join(f"<a href='/nav/{i}'>{_sentence(rng, 2)}</a>" for i in range(200)) + "</nav>"
+    return head, nav
+
+
+def generate_article_page(rng, paragraphs):
+    head, nav = _boilerplate(rng)
+    body = "".join(
+        f"<p>{_sentence(rng, 60)} <a href='https://example.org/ref/{i}'>{_sentence(rng, 3)}</a> {_sentence(rng, 30)}</p>"
+        + (f"<div class='ad'><script>ad({i})</script><iframe src='/ad/{i}'></iframe></div>" if i % 10 == 0 else "")
+        for i in range(paragraphs))
+    return (f"<!DOCTYPE html><html><head><title>Article {paragraphs}</title>{head}</head><body><header>{nav}</header>"
+            f"<article><h1>{_sentence(rng, 8)}</h1>{body}</article><aside>{_sentence(rng, 400)}</aside>"
+            f"<footer>{nav}</footer></body></html>")
+
+
+def generate_search_page(rng, results):
+    head, nav = _boilerplate(rng)
+    items = "".join(
+        f"<div class='g'><div><a href='/url?q=https://site{i}.example.com/page&sa=U'><h3>{_sentence(rng, 6)}</h3></a>"
+        f"<div><span>{_sentence(rng, 40)}</span></div><div><a href='/search?q=related+{i}'>{_sentence(rng, 2)}</a></div></div></div>"
+        for i in range(results))
+    return (f"<!DOCTYPE html><html><head><title>search - Google</title>{head}</head><body><div id='searchform'><form><input name='q'></form></div>"
+            f"<div id='rcnt'><div id='main'>{items}</div></div>{nav}</body></html>")
+
+
+def generate_nested_page(rng, depth, breadth):
+    def block(level):
+        if level == 0:
+            return f"<span>{_sentence(rng, 5)}</span><a href='/leaf/{rng.randint(0, 10**6)}'>{_sentence(rng, 2)}</a>"
+        return "<div>" + "".join(block(level - 1) for _ in range(breadth)) + "</div>"
+    head, nav = _boilerplate(rng)
+    return f"<html><head><title>Nested</title>{head}</head><body>{nav}<main>{block(depth)}</main></body></html>"
+
+
+SYNTHETIC_PREFIX = "synthetic_"
+
+
+def generate_synthetic_corpus():
+    rng = random.Random(42)
+    pages = {
+        "synthetic_article_small.html": generate_article_page(rng, 50),
+        "synthetic_article_heavy.html": generate_article_page(rng, 3000),
+        "synthetic_search_results.html": generate_search_page(rng, 100),
+        "synthetic_nested_dom.html": generate_nested_page(rng, 6, 5),
+    }
+    for name, html in pages.items():
+        with open(os.path.join(CORPUS_DIR, name), 'w', encoding='utf-8') as f:
+            f.write(html)
+    print(f"已在 {CORPUS_DIR} 生成 {len(pages)} 个合成页面。")
+
+
+def corpus_pages(include_synthetic: bool) -> list:
+    return sorted(f for f in os.listdir(CORPUS_DIR)
+                  if f.endswith(".html") and (include_synthetic or not f.startswith(SYNTHETIC_PREFIX)))
+
+
+# --- 测量 ---
+
+def _peak_rss_bytes():
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def measure_in_child(page_path: str, backend: str, profile: str, runs: int) -> dict:
+    """在子进程中测量，使每个后端的峰值内存互不干扰。lxml 的内存在 C 层分配，因此 POSIX 上使用峰值 RSS。"""
+    with open(page_path, 'r', encoding='utf-8', errors='replace') as f:
+        html = f.read()
+    params = PROFILES[profile]
+    timings = []
+
+    try:
+        baseline = _peak_rss_bytes()
+        memory_method = "rss"
+    except ImportError:  # Windows 没有 resource 模块，退而使用 tracemalloc (只能统计 Python 层分配)
+        import tracemalloc
+        tracemalloc.start()
+        baseline = 0
+        memory_method = "tracemalloc"
+
+    result = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = html_extract.extract_page(html, params["remove_tags"], params["main_area_candidates"], backend=backend,
+                                           text_fallback_to_document=params["text_fallback_to_document"])
+        timings.append(time.perf_counter() - start)
+
+    if memory_method == "rss":
+        peak = _peak_rss_bytes() - baseline
+    else:
+        import tracemalloc
+        peak = tracemalloc.get_traced_memory()[1]
+    return {"median_ms": statistics.median(timings) * 1000, "peak_bytes": peak, "memory_method": memory_method,
+            "result": [result.title, result.text, result.anchors]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTML 提取后端基准测试")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--synthetic", action="store_true", help="另外生成并测量合成页面")
+    parser.add_argument("--child", nargs=3, metavar=("PAGE", "BACKEND", "PROFILE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure_in_child(args.child[0], args.child[1], args.child[2], args.runs), ensure_ascii=False))
+        return
+
+    if not html_extract.LXML_AVAILABLE:
+        print("未安装 lxml，无法比较后端。请先执行 pip install lxml。")
+        return
+    if args.synthetic:
+        generate_synthetic_corpus()
+
+    print(f"{'页面':<34}{'配置':<20}{'大小KB':>8}{'bs4 ms':>10}{'lxml ms':>10}{'加速':>8}{'bs4 MB':>9}{'lxml MB':>9}  输出一致")
+    for name in corpus_pages(args.synthetic):
+        page_path = os.path.join(CORPUS_DIR, name)
+        for profile in PROFILES:
+            measured = {}
+            for backend in ("bs4", "lxml"):
+                completed = subprocess.run([sys.executable, os.path.abspath(__file__), "--runs", str(args.runs), "--child", page_path, backend, profile],
+                                           capture_output=True, text=True, encoding='utf-8', check=True)
+                measured[backend] = json.loads(completed.stdout)
+            bs4_result, lxml_result = measured["bs4"], measured["lxml"]
+            same = "是" if bs4_result["result"] == lxml_result["result"] else "否"
+            print(f"{name:<34}{profile:<20}{os.path.getsize(page_path) / 1024:>8.0f}"
+                  f"{bs4_result['median_ms']:>10.1f}{lxml_result['median_ms']:>10.1f}"
+                  f"{bs4_result['median_ms'] / max(lxml_result['median_ms'], 1e-6):>7.1f}x"
+                  f"{bs4_result['peak_bytes'] / 2**20:>9.1f}{lxml_result['peak_bytes'] / 2**20:>9.1f}  {same}")
+    print(f"\n内存测量方式: {measured['bs4']['memory_method']} (峰值相对于开始测量时的增量)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+// 占位符扫描基准测试: 比较原先逐个插件构造正则匹配的方式与预编译的 PlaceholderMatcher 自动机，
+// 回复文本为合成内容 (默认 100KB 与 1MB)，启用的插件为 Plugin/ 下的真实插件加上若干合成插件。
+// 同时测量流式转发时 IncrementalPlaceholderScanner 按小块输入的吞吐量。
+//
+// 用法: node benchmarks/placeholder_scan_bench.js [--plugins 50] [--sizes 100,1000] [--invocations 20] [--runs 20]
+
+const fs = require('fs');
+const path = require('path');
+const { PlaceholderMatcher, IncrementalPlaceholderScanner } = require('../placeholder_matcher');
+
+const PLUGINS_DIR = path.join(__dirname, '..', 'Plugin');
+
+function parseArgs(argv) {
+    const options = { plugins: 50, sizes: [100, 1000], invocations: 20, runs: 20 };
+    for (let i = 0; i < argv.length; i += 2) {
+        const value = argv[i + 1];
+        if (argv[i] === '--plugins') options.plugins = parseInt(value, 10);
+        else if (argv[i] === '--sizes') options.sizes = value.split(',').map(Number);
+        else if (argv[i] === '--invocations') options.invocations = parseInt(value, 10);
+        else if (argv[i] === '--runs') options.runs = parseInt(value, 10);
+    }
+    return options;
+}
+
+function loadPlugins(syntheticCount) {
+    const plugins = [];
+    for (const folder of fs.readdirSync(PLUGINS_DIR)) {
+        try {
+            const config = JSON.parse(fs.readFileSync(path.join(PLUGINS_DIR, folder, 'config.json'), 'utf-8'));
+            if (config.placeholder_start && config.placeholder_end) plugins.push({ name: config.plugin_name_cn, placeholder_start: config.placeholder_start, placeholder_end: config.placeholder_end });
+        } catch (e) { /* 没有 config.json 的目录 */ }
+    }
+    for (let i = 0; i < syntheticCount; i++) {
+        plugins.push({ name: `合成插件${i}`, placeholder_start: `[合成工具${i}]`, placeholder_end: `[/合成工具${i}]` });
+    }
+    return plugins;
+}
+
+// 确定性的伪随机数，使每次运行的语料相同
+function makeRandom(seed) {
+    let state = seed;
+    return () => { state = (state * 1103515245 + 12345) % 2147483648; return state / 2147483648; };
+}
+
+function generateReply(plugins, sizeKb, invocationCount, random) {
+    const filler = '这是一段普通的回复文本，其中包含 [方括号]、代码 a[i] = b[j] 以及 Markdown 链接 [示例](https://example.com)。\n';
+    const parts = [];
+    let length = 0;
+    const target = sizeKb * 1024;
+    const invocationEvery = Math.max(1, Math.floor(target / filler.length / Math.max(invocationCount, 1)));
+    for (let i = 0; length < target; i++) {
+        let part = filler;
+        if (invocationCount > 0 && i % invocationEvery === invocationEvery - 1) {
+            const plugin = plugins[Math.floor(random() * plugins.length)];
+            part = `${plugin.placeholder_start}参数 ${i}${plugin.placeholder_end}\n`;
+        }
+        parts.push(part);
+        length += part.length;
+    }
+    return parts.join('');
+}
+
+function escapeRegExp(text) {
+    return text.replace(/[.*+?^${}()|[\]\\]/g, '\\$&');
+}
+
+// 原先的方式: 每个回复对每个插件构造正则，按插件顺序取第一个匹配
+function legacyFirstMatch(text, plugins) {
+    for (const plugin of plugins) {
+        const regex = new RegExp(`${escapeRegExp(plugin.placeholder_start)}(.*?)${escapeRegExp(plugin.placeholder_end)}`, 's');
+        const match = text.match(regex);
+        if (match) return { plugin, start: match.index, argument: match[1] };
+    }
+    return null;
+}
+
+// 用逐插件正则找出全部调用 (按文档顺序)，作为与自动机 findAll 对比的基准
+function legacyFindAll(text, plugins) {
+    const found = [];
+    for (const plugin of plugins) {
+        const regex = new RegExp(`${escapeRegExp(plugin.placeholder_start)}(.*?)${escapeRegExp(plugin.placeholder_end)}`, 'gs');
+        for (const match of text.matchAll(regex)) found.push({ plugin, start: match.index, argument: match[1] });
+    }
+    return found.sort((a, b) => a.start - b.start);
+}
+
+function streamScan(text, matcher, chunkSize) {
+    const scanner = new IncrementalPlaceholderScanner(matcher);
+    let invocations = 0;
+    for (let i = 0; i < text.length; i += chunkSize) {
+        let input = text.substring(i, i + chunkSize);
+        for (;;) {
+            const result = scanner.push(input);
+            if (!result.invocation) break;
+            invocations++;
+            input = result.rest;
+        }
+    }
+    scanner.flush();
+    return invocations;
+}
+
+function median(values) {
+    const sorted = [...values].sort((a, b) => a - b);
+    return sorted[Math.floor(sorted.length / 2)];
+}
+
+function measure(runs, fn) {
+    fn(); // 预热
+    const timings = [];
+    let result;
+    for (let i = 0; i < runs; i++) {
+        const start = process.hrtime.bigint();
+        result = fn();
+        timings.push(Number(process.hrtime.bigint() - start) / 1e6);
+    }
+    return { ms: median(timings), result };
+}
+
+function main() {
+    const options = parseArgs(process.argv.slice(2));
+    const plugins = loadPlugins(options.plugins);
+    const compileStart = process.hrtime.bigint();
+    const matcher = new PlaceholderMatcher(plugins);
+    const compileMs = Number(process.hrtime.bigint() - compileStart) / 1e6;
+    console.log(`插件数: ${plugins.length}，自动机节点数: ${matcher.nodes.length}，编译耗时 ${compileMs.toFixed(2)}ms`);
+
+    const random = makeRandom(42);
+    const pad = (text, width) => String(text).padStart(width);
+    console.log(`${'回复KB'.padEnd(8)}${pad('调用数', 7)}${pad('逐插件正则(首个) ms', 22)}${pad('逐插件正则(全部) ms', 22)}${pad('自动机(全部) ms', 18)}${pad('流式 16字符/块 ms', 20)}  结果一致`);
+    for (const sizeKb of options.sizes) {
+        for (const invocationCount of [0, options.invocations]) {
+            const text = generateReply(plugins, sizeKb, invocationCount, random);
+            const legacyFirst = measure(options.runs, () => legacyFirstMatch(text, plugins));
+            const legacyAll = measure(options.runs, () => legacyFindAll(text, plugins));
+            const automaton = measure(options.runs, () => matcher.findAll(text));
+            const streaming = measure(options.runs, () => streamScan(text, matcher, 16));
+            const key = list => JSON.stringify(list.map(item => [item.plugin.placeholder_start, item.start, item.argument]));
+            const same = key(legacyAll.result) === key(automaton.result) && streaming.result === automaton.result.length ? '是' : '否';
+            console.log(`${String(sizeKb).padEnd(8)}${pad(automaton.result.length, 7)}${pad(legacyFirst.ms.toFixed(2), 22)}${pad(legacyAll.ms.toFixed(2), 22)}` +
+                        `${pad(automaton.ms.toFixed(2), 18)}${pad(streaming.ms.toFixed(2), 20)}  ${same}`);
+        }
+    }
+}
+
+main();
@@ -0,0 +1,134 @@
+// 插件参数传递基准测试: 比较三种方式传递数 MB 参数的耗时并校验结果完整:
+//   命令行参数 (原方式，单个参数超过约 128KB 时 Linux 上直接启动失败)、
+//   单独启动进程时通过 stdin 传递长度前缀帧 (argument_via_stdin)、常驻插件宿主池的帧协议。
+// 回声插件原样返回参数，因此结果同样经过数 MB 的回传；参数中混有中文、换行、引号和反斜杠。
+// 最后通过 file_updater 插件写入一个大文件，校验磁盘上的内容。
+//
+// 用法: node benchmarks/plugin_argument_bench.js [--sizes 0.05,1,4,16] [--runs 3]
+
+const fs = require('fs');
+const os = require('os');
+const path = require('path');
+const { PythonPluginHostPool } = require('../plugin_host_pool');
+const { spawnPluginProcess } = require('../plugin_process');
+
+const PROJECT_ROOT = path.join(__dirname, '..');
+const PLUGINS_DIR = path.join(PROJECT_ROOT, 'Plugin');
+
+function parseArgs(argv) {
+    const options = { sizes: [0.05, 1, 4, 16], runs: 3 };
+    for (let i = 0; i < argv.length; i += 2) {
+        const value = argv[i + 1];
+        if (argv[i] === '--sizes') options.sizes = value.split(',').map(Number);
+        else if (argv[i] === '--runs') options.runs = parseInt(value, 10);
+    }
+    return options;
+}
+
+function makePayload(megabytes) {
+    const pieces = ['def f(x):\n', '    return "引号\\"与反斜杠\\\\"\n', '中文内容，测试多字节字符。', '\t{"key": [1, 2, 3]}\r\n'];
+    const target = Math.floor(megabytes * 1024 * 1024);
+    const parts = [];
+    let size = 0;
+    for (let i = 0; size < target; i++) {
+        const piece = pieces[i % pieces.length] + i + '\n';
+        parts.push(piece);
+        size += Buffer.byteLength(piece);
+    }
+    return parts.join('');
+}
+
+function writeEchoPlugin(dir) {
+    const script = [
+        'import sys',
+        `sys.path.insert(0, ${JSON.stringify(PROJECT_ROOT)})`,
+        'from plugin_common.plugin_protocol import read_plugin_argument',
+        '',
+        'def echo(argument):',
+        '    return argument',
+        '',
+        'if __name__ == "__main__":',
+        '    sys.stdout.reconfigure(encoding="utf-8", newline="\\n")',
+        '    sys.stdout.write(echo(read_plugin_argument()))',
+        '',
+    ].join('\n');
+    fs.writeFileSync(path.join(dir, 'echo_plugin.py'), script);
+    fs.writeFileSync(path.join(dir, 'config.json'), '{}');
+}
+
+async function timed(fn) {
+    const start = process.hrtime.bigint();
+    try {
+        const result = await fn();
+        return { ms: Number(process.hrtime.bigint() - start) / 1e6, result };
+    } catch (err) {
+        return { ms: Number(process.hrtime.bigint() - start) / 1e6, error: err };
+    }
+}
+
+async function measure(runs, fn, expected) {
+    const times = [];
+    for (let i = 0; i < runs; i++) {
+        const { ms, result, error } = await timed(fn);
+        if (error) return { error: error.message.split('\n')[0].substring(0, 60) };
+        // 插件输出会被 trim()，比较时同样去掉首尾空白
+        if (result !== expected.trim()) return { error: `结果不一致 (收到 ${result.length} 个字符，应为 ${expected.trim().length})` };
+        times.push(ms);
+    }
+    times.sort((a, b) => a - b);
+    return { ms: times[Math.floor(times.length / 2)] };
+}
+
+function formatCell(outcome) {
+    return outcome.error ? `失败: ${outcome.error}` : `${outcome.ms.toFixed(0)} ms`;
+}
+
+async function main() {
+    const options = parseArgs(process.argv.slice(2));
+    const workdir = fs.mkdtempSync(path.join(os.tmpdir(), 'plugin-arg-bench-'));
+    const pool = new PythonPluginHostPool({ poolSize: 1 });
+    try {
+        writeEchoPlugin(workdir);
+        const echoPlugin = { name: '回声', id: 'echo', executable_name: 'echo_plugin.py', python_entry_function: 'echo', is_python_script: true };
+        const viaArgv = { ...echoPlugin, argument_via_stdin: false };
+        const viaStdin = { ...echoPlugin, argument_via_stdin: true };
+        await pool.execute(echoPlugin, workdir, 'warmup');
+
+        console.log(`\n  ${'参数大小'.padEnd(10)}${'命令行参数'.padEnd(18)}${'stdin 帧'.padEnd(14)}${'宿主池帧'}`);
+        for (const megabytes of options.sizes) {
+            const payload = makePayload(megabytes);
+            const argvOutcome = await measure(options.runs, () => spawnPluginProcess(viaArgv, workdir, payload), payload);
+            const stdinOutcome = await measure(options.runs, () => spawnPluginProcess(viaStdin, workdir, payload), payload);
+            const hostOutcome = await measure(options.runs, () => pool.execute(echoPlugin, workdir, payload), payload);
+            const label = `${(Buffer.byteLength(payload) / 1024 / 1024).toFixed(2)} MB`;
+            console.log(`  ${label.padEnd(12)}${formatCell(argvOutcome).padEnd(22)}${formatCell(stdinOutcome).padEnd(16)}${formatCell(hostOutcome)}`);
+        }
+
+        // 真实插件: 通过 file_updater 写入一个大文件 (两种传递方式各一次)，校验磁盘内容
+        const updaterDir = path.join(PLUGINS_DIR, 'file_updater');
+        const updaterConfig = JSON.parse(fs.readFileSync(path.join(updaterDir, 'config.json'), 'utf-8'));
+        const updater = {
+            name: updaterConfig.plugin_name_cn, id: updaterConfig.plugin_id, executable_name: updaterConfig.executable_name,
+            python_entry_function: updaterConfig.python_entry_function, is_python_script: true, argument_via_stdin: true,
+        };
+        const content = makePayload(Math.min(4, Math.max(...options.sizes))).replace(/\r\n/g, '\n');
+        const expected = os.EOL === '\n' ? content : content.replace(/\n/g, os.EOL);
+        const target = path.join(workdir, 'large_file.txt');
+        const argument = JSON.stringify([{ path: target, content }]);
+        console.log(`\nfile_updater 写入 ${(Buffer.byteLength(content) / 1024 / 1024).toFixed(2)} MB 文件 (参数 ${(Buffer.byteLength(argument) / 1024 / 1024).toFixed(2)} MB):`);
+        for (const [label, run] of [['stdin 帧', () => spawnPluginProcess(updater, updaterDir, argument)], ['宿主池帧', () => pool.execute(updater, updaterDir, argument)]]) {
+            fs.rmSync(target, { force: true });
+            const { ms, result, error } = await timed(run);
+            const intact = !error && fs.existsSync(target) && fs.readFileSync(target, 'utf-8') === expected;
+            console.log(`  ${label}: ${error ? `失败: ${error.message}` : `${ms.toFixed(0)} ms，文件内容${intact ? '一致' : '不一致'}`}${error || intact ? '' : `\n${result}`}`);
+        }
+    } finally {
+        pool.shutdown();
+        fs.rmSync(workdir, { recursive: true, force: true });
+    }
+}
+
+main().catch(err => {
+    console.error(err);
+    process.exit(1);
+});
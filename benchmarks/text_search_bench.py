@@ -0,0 +1,145 @@
+import os
+import re
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import statistics
+
+# 全文搜索基准测试: 在合成的代码目录 (默认 50k 个文件) 上测量搜索插件倒排索引的建立、加载、增量更新耗时，
+# 以及查询耗时 (候选文件筛选 + TF-IDF 排序，和包含逐行确认匹配的插件完整调用)，
+# 并与不使用索引、逐个读取全部文件逐行查找的方式比较。
+#
+# 用法: python benchmarks/text_search_bench.py [--files 50000] [--runs 3] [--modify 100] [--path 已有目录]
+
+PROJECT_ROOT = os.path.realpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "Plugin", "file_searcher"))
+from plugin_common.text_index import TextIndex, query_literals, read_text_file
+from plugin_common.directory_walk import walk_directory
+import file_searcher_plugin
+
+RARE_MARKER = "unique_marker_target"
+QUERIES = [
+    ("罕见标识符", RARE_MARKER, False),
+    ("常见词", "return", False),
+    ("多词子串", "config.get(", False),
+    ("正则", r"def\s+handler_\d+\(", True),
+]
+
+
+def generate_tree(root: str, files: int, seed: int = 42):
+    # 每个文件夹 100 个文件；内容为从约 20k 个标识符中按 Zipf 分布抽取的类 Python 代码，每个约 40 行
+    rng = random.Random(seed)
+    words = [f"{rng.choice(['get', 'set', 'load', 'parse', 'build', 'handle', 'make'])}_{rng.choice(['user', 'item', 'config', 'path', 'node', 'cache'])}_{i}"
+             for i in range(20000)]
+    weights = [1 / (rank + 1) for rank in range(len(words))]
+    marked = set(rng.sample(range(files), 5))
+    for i in range(files):
+        directory = os.path.join(root, f"pkg_{i // 1000:03d}", f"mod_{i // 100 % 10}")
+        if i % 100 == 0:
+            os.makedirs(directory, exist_ok=True)
+        picked = rng.choices(words, weights=weights, k=120)
+        lines = []
+        for line_number in range(0, len(picked), 3):
+            a, b, c = picked[line_number:line_number + 3]
+            if line_number % 15 == 0:
+                lines.append(f"def handler_{rng.randrange(1000)}({a}, {b}):")
+            lines.append(f"    {a} = config.get('{b}', {c})" if line_number % 2 else f"    return {a}({b}, {c})")
+        if i in marked:
+            lines.insert(rng.randrange(len(lines)), f"    # TODO: {RARE_MARKER}")
+        with open(os.path.join(directory, f"module_{i}.py"), 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+
+
+def brute_force_search(root: str, query: str, regex: bool) -> int:
+    # 不使用索引: 读取每个文件逐行查找，返回包含匹配的文件数
+    matcher = re.compile(query, re.IGNORECASE).search if regex else (lambda line, needle=query.lower(): needle in line.lower())
+    matched = 0
+    for entry in walk_directory(root, respect_gitignore=False):
+        if entry.is_dir:
+            continue
+        text = read_text_file(entry.dir_entry.path, 1024 * 1024)
+        if text is not None and any(matcher(line) for line in text.splitlines()):
+            matched += 1
+    return matched
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return (time.perf_counter() - start) * 1000, result
+
+
+def median_ms(runs: int, fn):
+    return statistics.median(timed(fn)[0] for _ in range(runs))
+
+
+def directory_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def run(root: str, workdir: str, runs: int, modify: int):
+    index_dir = os.path.join(workdir, "index")
+    index = TextIndex(index_dir)
+    build_ms, stats = timed(lambda: index.refresh([root]))
+    save_ms, _ = timed(index.save)
+    postings = len(index.base_docs) + index.delta_postings
+    print(f"\n建立索引: {stats['added']} 个文件，{build_ms:.0f} ms (保存 {save_ms:.0f} ms)；"
+          f"{len(index.vocab)} 个词，{postings} 条倒排记录，磁盘占用 {directory_size(index_dir) / 1024 / 1024:.1f} MB")
+
+    load_ms = median_ms(runs, lambda: TextIndex.load(index_dir))
+    index = TextIndex.load(index_dir)
+    refresh_ms = median_ms(runs, lambda: index.refresh([root]))
+    print(f"加载索引: {load_ms:.0f} ms；无变化时的增量检查 (遍历并比较大小/修改时间): {refresh_ms:.0f} ms")
+
+    if modify:
+        files = [entry.dir_entry.path for entry in walk_directory(root, respect_gitignore=False) if not entry.is_dir]
+        for path in random.Random(1).sample(files, min(modify, len(files))):
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write("    return appended_line\n")
+        incremental_ms, stats = timed(lambda: index.refresh([root]))
+        print(f"修改 {stats['updated']} 个文件后的增量更新: {incremental_ms:.0f} ms")
+
+    # 插件完整调用使用同一份索引，且不在每次查询前重新检查文件
+    file_searcher_plugin.SEARCH_ROOTS = [root]
+    file_searcher_plugin._index = index
+    file_searcher_plugin._last_refresh = time.monotonic()
+    file_searcher_plugin.refresh_interval_s = float("inf")
+
+    print(f"\n  {'查询':<22}{'候选+排序':>10}{'插件调用':>10}{'逐文件扫描':>12}{'候选文件':>10}{'匹配文件':>10}")
+    for label, query, regex in QUERIES:
+        candidates = index.search(query_literals(query, regex))
+        rank_ms = median_ms(runs, lambda: index.search(query_literals(query, regex)))
+        argument = json.dumps({"query": query, "regex": regex})
+        plugin_ms = median_ms(runs, lambda: file_searcher_plugin.search_files(argument))
+        brute_ms, matched = timed(lambda: brute_force_search(root, query, regex))
+        print(f"  {label + ' ' + query:<24}{rank_ms:>8.1f} ms{plugin_ms:>8.1f} ms{brute_ms:>10.0f} ms{len(candidates):>10}{matched:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=50000)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--modify", type=int, default=100)
+    parser.add_argument("--path", help="使用已有目录代替合成目录 (不修改其中的文件，跳过增量更新测试)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="search-bench-")
+    try:
+        root = os.path.realpath(args.path) if args.path else os.path.join(workdir, "tree")
+        if not args.path:
+            start = time.perf_counter()
+            generate_tree(root, args.files)
+            print(f"已生成 {args.files} 个文件，耗时 {time.perf_counter() - start:.1f}s")
+        run(root, workdir, args.runs, 0 if args.path else args.modify)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
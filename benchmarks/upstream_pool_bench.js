@@ -0,0 +1,148 @@
+// 上游连接池基准测试: 模拟一次用户请求中与插件交替进行的多轮上游请求，比较每轮新建连接 (原方式，
+// node-fetch 未指定 agent 时发送 Connection: close) 与共享 keep-alive 连接池 (upstream_pool.js) 的每轮延迟。
+// 上游是本地的替身服务器，返回一个固定的 chat completion；前面可加一层 TCP 中继模拟网络往返:
+// 每个数据块单向延迟 rtt/2，建立连接额外等待 connect-rtts 个往返 (1 = TCP，2 = TCP + TLS 1.3，3 = TCP + TLS 1.2)。
+// 请求直接通过 http.request 发出，使用与代理相同的 Agent (node-fetch v2 会把 agent 原样交给 http.request)。
+//
+// 用法: node benchmarks/upstream_pool_bench.js [--rounds 20] [--chains 5] [--rtt-ms 20] [--connect-rtts 2]
+//                                            [--server-ms 5] [--concurrency 8] [--max-sockets 8]
+// --max-sockets 小于 --concurrency 时可观察连接池排队 (峰值排队数)。
+
+const http = require('http');
+const net = require('net');
+const { UpstreamAgentPool } = require('../upstream_pool');
+
+function parseArgs(argv) {
+    const options = { rounds: 20, chains: 5, rttMs: 20, connectRtts: 2, serverMs: 5, concurrency: 8, maxSockets: 8 };
+    const keys = {
+        '--rounds': 'rounds', '--chains': 'chains', '--rtt-ms': 'rttMs', '--connect-rtts': 'connectRtts',
+        '--server-ms': 'serverMs', '--concurrency': 'concurrency', '--max-sockets': 'maxSockets',
+    };
+    for (let i = 0; i < argv.length; i += 2) {
+        if (keys[argv[i]]) options[keys[argv[i]]] = Number(argv[i + 1]);
+    }
+    return options;
+}
+
+const sleep = (ms) => new Promise(resolve => setTimeout(resolve, ms));
+
+function startUpstream(serverMs) {
+    const server = http.createServer((req, res) => {
+        const chunks = [];
+        req.on('data', chunk => chunks.push(chunk));
+        req.on('end', async () => {
+            if (serverMs > 0) await sleep(serverMs);
+            const body = JSON.stringify({
+                id: 'chatcmpl-bench', object: 'chat.completion',
+                choices: [{ index: 0, message: { role: 'assistant', content: `收到 ${Buffer.concat(chunks).length} 字节。` }, finish_reason: 'stop' }],
+            });
+            res.writeHead(200, { 'Content-Type': 'application/json', 'Content-Length': Buffer.byteLength(body) });
+            res.end(body);
+        });
+    });
+    return new Promise(resolve => server.listen(0, '127.0.0.1', () => resolve(server)));
+}
+
+// 在客户端与上游之间转发数据，每个方向每个数据块延迟 rtt/2；新连接先等待 connectRtts 个往返再连上游
+function startLatencyRelay(upstreamPort, rttMs, connectRtts) {
+    const server = net.createServer(client => {
+        client.pause();
+        const upstream = net.connect(upstreamPort, '127.0.0.1');
+        const forward = (from, to) => {
+            from.on('data', chunk => setTimeout(() => to.destroyed || to.write(chunk), rttMs / 2));
+            from.on('end', () => setTimeout(() => to.end(), rttMs / 2));
+            from.on('error', () => to.destroy());
+        };
+        forward(upstream, client);
+        setTimeout(() => {
+            forward(client, upstream);
+            client.resume();
+        }, rttMs * connectRtts);
+    });
+    return new Promise(resolve => server.listen(0, '127.0.0.1', () => resolve(server)));
+}
+
+function postOnce(port, body, agent) {
+    return new Promise((resolve, reject) => {
+        const headers = { 'Content-Type': 'application/json', 'Content-Length': Buffer.byteLength(body) };
+        if (!agent) headers.Connection = 'close';
+        const req = http.request({ host: '127.0.0.1', port, path: '/v1/chat/completions', method: 'POST', headers, agent: agent || false }, res => {
+            const chunks = [];
+            res.on('data', chunk => chunks.push(chunk));
+            res.on('end', () => resolve(JSON.parse(Buffer.concat(chunks).toString('utf-8'))));
+            res.on('error', reject);
+        });
+        req.on('error', reject);
+        req.end(body);
+    });
+}
+
+// 一次用户请求: 连续 rounds 轮上游请求，每轮的消息比上一轮多一条插件结果
+async function runChain(port, rounds, agent, roundTimes) {
+    const messages = [{ role: 'system', content: '插件规则说明。'.repeat(200) }, { role: 'user', content: '请列出目录并读取文件。' }];
+    for (let i = 0; i < rounds; i++) {
+        const start = process.hrtime.bigint();
+        const reply = await postOnce(port, JSON.stringify({ model: 'bench', messages }), agent);
+        roundTimes.push(Number(process.hrtime.bigint() - start) / 1e6);
+        messages.push(reply.choices[0].message, { role: 'user', content: `[插件结果 ${i}] ` + '输出内容。'.repeat(50) });
+    }
+}
+
+function summarize(times) {
+    const sorted = [...times].sort((a, b) => a - b);
+    return {
+        median: sorted[Math.floor(sorted.length / 2)],
+        p95: sorted[Math.min(sorted.length - 1, Math.floor(sorted.length * 0.95))],
+        mean: times.reduce((a, b) => a + b, 0) / times.length,
+    };
+}
+
+function formatRow(label, stats) {
+    return `  ${label.padEnd(18)}${stats.median.toFixed(1).padStart(9)} ms${stats.p95.toFixed(1).padStart(10)} ms${stats.mean.toFixed(1).padStart(10)} ms`;
+}
+
+async function compare(title, port, options, runOne) {
+    console.log(`\n${title}`);
+    console.log(`  ${''.padEnd(18)}${'每轮中位数'.padStart(7)}${'p95'.padStart(12)}${'平均'.padStart(12)}`);
+    const fresh = [];
+    await runOne(null, fresh);
+    const pool = new UpstreamAgentPool({ maxSockets: options.maxSockets });
+    const pooled = [];
+    try {
+        await runOne(pool.httpAgent, pooled);
+        const freshStats = summarize(fresh), pooledStats = summarize(pooled);
+        console.log(formatRow('每轮新建连接', freshStats));
+        console.log(formatRow('keep-alive 连接池', pooledStats));
+        console.log(`  每轮节省 ${(freshStats.mean - pooledStats.mean).toFixed(1)} ms (平均)，共 ${pooled.length} 轮`);
+        const stats = pool.stats();
+        console.log(`  连接池: 请求 ${stats.requests}，新建连接 ${stats.sockets_created}，复用 ${stats.sockets_reused} (复用率 ${(stats.reuse_ratio * 100).toFixed(1)}%)，` +
+            `峰值使用 ${stats.peak_active_sockets}/${stats.max_sockets_per_origin}，峰值排队 ${stats.peak_queued_requests}`);
+    } finally {
+        pool.destroy();
+    }
+}
+
+async function main() {
+    const options = parseArgs(process.argv.slice(2));
+    const upstream = await startUpstream(options.serverMs);
+    const relay = options.rttMs > 0 ? await startLatencyRelay(upstream.address().port, options.rttMs, options.connectRtts) : null;
+    const port = (relay || upstream).address().port;
+    console.log(`替身上游处理时间 ${options.serverMs} ms，模拟往返 ${options.rttMs} ms，建立连接 ${options.connectRtts} 个往返`);
+    try {
+        await compare(`顺序: ${options.chains} 次用户请求 × ${options.rounds} 轮`, port, options, async (agent, times) => {
+            for (let i = 0; i < options.chains; i++) await runChain(port, options.rounds, agent, times);
+        });
+        await compare(`并发: ${options.concurrency} 个用户请求同时进行 × ${options.rounds} 轮 (每个上游地址最多 ${options.maxSockets} 个连接)`, port, options, async (agent, times) => {
+            await Promise.all(Array.from({ length: options.concurrency }, () => runChain(port, options.rounds, agent, times)));
+        });
+    } finally {
+        if (relay) relay.close();
+        upstream.close();
+        upstream.closeAllConnections();
+    }
+}
+
+main().catch(err => {
+    console.error(err);
+    process.exit(1);
+});
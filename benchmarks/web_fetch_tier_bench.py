@@ -0,0 +1,134 @@
+import os
+import re
+import sys
+import time
+import asyncio
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+# web_content_reader 分级获取检查: 本地 http.server 提供一个静态页面和一个脚本渲染的单页应用页面，
+# 对每种 fetch_strategy (auto / static / browser) 读取两个页面，断言输出中 [获取方式] 报告的层级与提取到的正文，并给出每次读取的耗时。
+# 浏览器层被替换为桩函数 (返回预先渲染好的 HTML)，不需要安装浏览器；另外检查浏览器服务不可用时回退到本地浏览器。
+# 任何一项与预期不符时以非零状态退出。
+#
+# 用法: python benchmarks/web_fetch_tier_bench.py [--runs 5]
+
+PROJECT_ROOT = os.path.realpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "Plugin", "web_content_reader"))
+import web_content_reader_plugin as reader
+
+PARAGRAPH = "分级获取先用普通的 HTTP 请求读取页面，只有正文不足或页面由脚本渲染时才启动浏览器。这段文字重复多次，使静态页面的正文超过判断阈值。"
+STATIC_PAGE = f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>静态文章</title></head>
+<body><nav><a href="/">首页</a></nav>
+<article><h1>静态文章</h1>{''.join(f'<p>{PARAGRAPH}</p>' for _ in range(6))}<a href="/more.html">更多</a></article>
+</body></html>"""
+SPA_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>单页应用</title></head>
+<body><div id="root"></div>
+<script>document.getElementById('root').innerHTML = '<main><h1>渲染后的内容</h1></main>';</script>
+</body></html>"""
+# 浏览器桩返回的页面: 相当于执行脚本后的 DOM
+SPA_RENDERED = SPA_PAGE.replace('<div id="root"></div>', f'<div id="root"><main><h1>渲染后的内容</h1><p>{PARAGRAPH}</p></main></div>')
+FIXTURES = {"/static.html": STATIC_PAGE, "/spa.html": SPA_PAGE}
+
+ARTICLE_MARKER = PARAGRAPH[:20]
+RENDERED_MARKER = "渲染后的内容"
+# (fetch_strategy, 页面, 浏览器服务是否可用, 预期的 [获取方式], 正文中应出现的文字)
+EXPECTED_TIERS = [
+    ("auto", "/static.html", True, reader.TIER_STATIC, ARTICLE_MARKER),
+    ("auto", "/spa.html", True, reader.TIER_BROWSER_SERVICE, RENDERED_MARKER),
+    ("auto", "/spa.html", False, reader.TIER_LOCAL_BROWSER, RENDERED_MARKER),
+    ("static", "/static.html", True, reader.TIER_STATIC, ARTICLE_MARKER),
+    ("static", "/spa.html", True, reader.TIER_STATIC, ""),  # 只允许静态请求时内容不足也直接返回
+    ("browser", "/static.html", True, reader.TIER_BROWSER_SERVICE, ARTICLE_MARKER),
+    ("browser", "/spa.html", True, reader.TIER_BROWSER_SERVICE, RENDERED_MARKER),
+]
+TIER_PATTERN = re.compile(r"^\[获取方式\]: (.*)$", re.MULTILINE)
+
+
+class FixtureHandler(SimpleHTTPRequestHandler):
+    def do_GET(self):
+        body = FIXTURES.get(self.path)
+        if body is None:
+            self.send_error(404)
+            return
+        data = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class BrowserStub:
+    """替换插件的两个浏览器层，记录调用次数。"""
+
+    def __init__(self):
+        self.service_available = True
+        self.calls = {"service": 0, "local": 0}
+
+    def rendered(self, url: str):
+        html = SPA_RENDERED if url.endswith("/spa.html") else STATIC_PAGE
+        return url, html, None
+
+    async def service(self, url: str):
+        self.calls["service"] += 1
+        if not self.service_available:
+            raise ConnectionError("浏览器服务已停用 (桩)")
+        return self.rendered(url)
+
+    async def local(self, url: str):
+        self.calls["local"] += 1
+        return self.rendered(url)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    stub = BrowserStub()
+    reader.fetch_html_with_browser_service = stub.service
+    reader.fetch_html_with_local_browser = stub.local
+    reader.cache_enabled = False
+    reader.use_shared_browser_service = True
+
+    failures = 0
+    print(f"\n  {'fetch_strategy':<16}{'页面':<14}{'浏览器服务':<10}{'获取方式':<34}{'中位耗时':>8}")
+    try:
+        for strategy, path, service_available, expected, marker in EXPECTED_TIERS:
+            reader.fetch_strategy = strategy
+            stub.service_available = service_available
+            samples, tier, output = [], None, ""
+            for _ in range(args.runs):
+                started = time.perf_counter()
+                output = asyncio.run(reader.get_dynamic_webpage_content_with_playwright(base_url + path))
+                samples.append((time.perf_counter() - started) * 1000)
+                match = TIER_PATTERN.search(output)
+                tier = match.group(1) if match else None
+            samples.sort()
+            ok = tier == expected and marker in output
+            failures += not ok
+            status = "" if ok else f"  <- 预期 {expected}，正文包含 '{marker}'"
+            print(f"  {strategy:<16}{path:<14}{'可用' if service_available else '不可用':<12}{str(tier):<30}{samples[len(samples) // 2]:>8.1f} ms{status}")
+    finally:
+        server.shutdown()
+
+    print(f"\n浏览器桩调用次数: 常驻服务 {stub.calls['service']}，本地浏览器 {stub.calls['local']}")
+    if failures:
+        print(f"{failures} 项获取方式与预期不符。")
+        sys.exit(1)
+    print("全部获取方式与预期一致。")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+const fs = require('fs').promises;
+const path = require('path');
+const crypto = require('crypto');
+
+// 单个客户端请求的对话聚合 (取代原先全局共用的 conformchat.txt)。
+// 内容保存在内存中，随请求在插件递归中传递，并发的请求互不影响。
+// 启用镜像时，每次追加的内容会异步写入 <镜像目录>/<请求ID>.txt；写入按追加顺序排队，不阻塞请求处理。
+class ConformChatTranscript {
+    constructor(requestId, mirrorDirectory = null) {
+        this.requestId = requestId;
+        this.parts = [];
+        this.mirrorPath = mirrorDirectory ? path.join(mirrorDirectory, `${requestId}.txt`) : null;
+        this.mirrorQueue = mirrorDirectory ? fs.mkdir(mirrorDirectory, { recursive: true }) : Promise.resolve();
+        this.mirrorFailed = false;
+    }
+
+    static createRequestId() {
+        const timestamp = new Date().toISOString().replace(/[-:]/g, '').replace(/\..*$/, '');
+        return `${timestamp}-${crypto.randomBytes(4).toString('hex')}`;
+    }
+
+    get content() {
+        return this.parts.join('');
+    }
+
+    append(text) {
+        if (!text) return;
+        this.parts.push(text);
+        if (this.mirrorPath) {
+            this.mirrorQueue = this.mirrorQueue
+                .then(() => fs.appendFile(this.mirrorPath, text, 'utf-8'))
+                .catch(error => {
+                    if (!this.mirrorFailed) console.error(`[NodeJS] 写入对话聚合镜像 ${this.mirrorPath} 失败: ${error.message}`);
+                    this.mirrorFailed = true;
+                });
+        }
+    }
+
+    // 等待已排队的镜像写入完成
+    flush() {
+        return this.mirrorQueue;
+    }
+}
+
+module.exports = { ConformChatTranscript };
@@ -0,0 +1,226 @@
+const fs = require('fs');
+const fsp = fs.promises;
+const path = require('path');
+const zlib = require('zlib');
+const readline = require('readline');
+const { pipeline } = require('stream/promises');
+
+const ACTIVE_SEGMENT_NAME = 'exchange.jsonl';
+const ROTATED_SEGMENT_PATTERN = /^exchange-([0-9TZ.]+)(?:-(\d+))?\.jsonl(\.gz)?$/; // 时间戳，同一时间戳的第 n 个文件
+const REDACTED_HEADERS = new Set(['authorization', 'proxy-authorization', 'cookie', 'set-cookie', 'x-api-key', 'api-key']);
+const FLUSH_BATCH_BYTES = 256 * 1024;
+const LARGE_BODY_PREVIEW_CHARS = 500;
+
+// 与上游之间的请求/响应日志 (取代每轮整体重写一次的 send.json / received.json)。
+// 每条记录为一行 JSON，追加到 <日志目录>/exchange.jsonl:
+//   - write() 只在内存中序列化记录并放入队列，由后台定时批量追加到文件，调用方不等待磁盘；
+//   - 当前文件超过大小上限或轮换间隔后改名为 exchange-<时间>.jsonl，可选 gzip 压缩，只保留最近若干个；
+//   - 超过阈值的请求/响应体只保留开头部分 (可按比例抽样保留完整内容)，认证相关的请求头被隐藏。
+class ExchangeLogWriter {
+    constructor({ directory, maxSegmentBytes = 10 * 1024 * 1024, rotateIntervalMs = 24 * 3600 * 1000, compressRotated = true,
+                  maxRotatedSegments = 10, maxBodyBytes = 1024 * 1024, largeBodySampleRate = 0, flushIntervalMs = 200 }) {
+        this.directory = directory;
+        this.activePath = path.join(directory, ACTIVE_SEGMENT_NAME);
+        this.maxSegmentBytes = maxSegmentBytes;
+        this.rotateIntervalMs = rotateIntervalMs;
+        this.compressRotated = compressRotated;
+        this.maxRotatedSegments = maxRotatedSegments;
+        this.maxBodyBytes = maxBodyBytes;
+        this.largeBodySampleRate = largeBodySampleRate;
+        this.flushIntervalMs = flushIntervalMs;
+        this.queue = [];
+        this.queuedBytes = 0;
+        this.flushTimer = null;
+        this.flushing = null;
+        this.maintenance = Promise.resolve(); // 轮换后的压缩与清理
+        this.segmentBytes = null; // 首次写入时从现有文件读取
+        this.segmentStartedAt = null;
+        this.writeFailed = false;
+    }
+
+    // 记录一条日志。entry.headers 中的认证信息会被隐藏，entry.body 按大小截断或抽样。
+    write(entry) {
+        const { body, ...record } = entry;
+        if (record.headers) record.headers = redactHeaders(record.headers);
+        let line;
+        try {
+            const head = JSON.stringify({ timestamp: new Date().toISOString(), ...record });
+            line = body === undefined ? head : `${head.slice(0, -1)},"body":${this._serializeBody(body)}}`;
+        } catch (error) {
+            line = JSON.stringify({ timestamp: new Date().toISOString(), type: record.type, request_id: record.request_id, error: `日志记录无法序列化: ${error.message}` });
+        }
+        line += '\n';
+        this.queue.push(line);
+        this.queuedBytes += Buffer.byteLength(line);
+
+        if (this.queuedBytes >= FLUSH_BATCH_BYTES) {
+            this.flush();
+        } else if (!this.flushTimer && !this.flushing) {
+            this.flushTimer = setTimeout(() => this.flush(), this.flushIntervalMs);
+            this.flushTimer.unref();
+        }
+    }
+
+    // 把队列中的记录写入文件。写入过程中再次调用时返回正在进行的写入，结束后会自动继续写入新的记录。
+    flush() {
+        if (this.flushTimer) {
+            clearTimeout(this.flushTimer);
+            this.flushTimer = null;
+        }
+        if (this.flushing) return this.flushing;
+        if (this.queue.length === 0) return Promise.resolve();
+        this.flushing = this._drain().finally(() => {
+            this.flushing = null;
+            if (this.queue.length > 0) this.flush();
+        });
+        return this.flushing;
+    }
+
+    // 写完所有排队的记录并等待后台压缩完成
+    async close() {
+        while (this.queue.length > 0 || this.flushing) await (this.flushing || this.flush());
+        await this.maintenance;
+    }
+
+    _serializeBody(body) {
+        if (body === null) return 'null';
+        if (Buffer.isBuffer(body)) return JSON.stringify(`[二进制内容，${body.length} bytes]`);
+        const serialized = JSON.stringify(body);
+        const size = Buffer.byteLength(serialized);
+        if (size <= this.maxBodyBytes || Math.random() < this.largeBodySampleRate) return serialized;
+        const text = typeof body === 'string' ? body : serialized;
+        return JSON.stringify(`[内容过大，已截断，原始大小: ${size} bytes] ${text.substring(0, LARGE_BODY_PREVIEW_CHARS)}...`);
+    }
+
+    async _drain() {
+        const data = this.queue.join('');
+        const bytes = this.queuedBytes;
+        this.queue = [];
+        this.queuedBytes = 0;
+        try {
+            await this._prepareSegment(bytes);
+            await fsp.appendFile(this.activePath, data, 'utf-8');
+            this.segmentBytes += bytes;
+            this.writeFailed = false;
+        } catch (error) {
+            if (!this.writeFailed) console.error(`[NodeJS] 写入日志 ${this.activePath} 失败: ${error.message}`);
+            this.writeFailed = true;
+        }
+    }
+
+    async _prepareSegment(incomingBytes) {
+        if (this.segmentBytes === null) {
+            await fsp.mkdir(this.directory, { recursive: true });
+            try {
+                const stat = await fsp.stat(this.activePath);
+                this.segmentBytes = stat.size;
+                this.segmentStartedAt = stat.birthtimeMs || stat.ctimeMs;
+            } catch (e) {
+                this.segmentBytes = 0;
+                this.segmentStartedAt = Date.now();
+            }
+        }
+        if (this.segmentBytes === 0) return;
+        const tooLarge = this.maxSegmentBytes > 0 && this.segmentBytes + incomingBytes > this.maxSegmentBytes;
+        const tooOld = this.rotateIntervalMs > 0 && Date.now() - this.segmentStartedAt >= this.rotateIntervalMs;
+        if (tooLarge || tooOld) await this._rotate();
+    }
+
+    async _rotate() {
+        const stamp = new Date().toISOString().replace(/[-:]/g, '');
+        let rotatedPath = path.join(this.directory, `exchange-${stamp}.jsonl`);
+        for (let n = 1; await pathExists(rotatedPath) || await pathExists(rotatedPath + '.gz'); n++) {
+            rotatedPath = path.join(this.directory, `exchange-${stamp}-${n}.jsonl`);
+        }
+        await fsp.rename(this.activePath, rotatedPath);
+        this.segmentBytes = 0;
+        this.segmentStartedAt = Date.now();
+        this.maintenance = this.maintenance
+            .then(() => this._finishRotation(rotatedPath))
+            .catch(error => console.error(`[NodeJS] 处理轮换的日志文件 ${path.basename(rotatedPath)} 失败: ${error.message}`));
+    }
+
+    async _finishRotation(rotatedPath) {
+        if (this.compressRotated) {
+            const temporaryPath = `${rotatedPath}.gz.tmp`;
+            await pipeline(fs.createReadStream(rotatedPath), zlib.createGzip(), fs.createWriteStream(temporaryPath));
+            await fsp.rename(temporaryPath, `${rotatedPath}.gz`);
+            await fsp.unlink(rotatedPath);
+        }
+        const rotated = await listRotatedSegments(this.directory);
+        for (const name of rotated.slice(0, Math.max(0, rotated.length - this.maxRotatedSegments))) {
+            await fsp.unlink(path.join(this.directory, name)).catch(() => {});
+        }
+    }
+}
+
+function redactHeaders(headers) {
+    const redacted = {};
+    for (const [name, value] of Object.entries(headers)) {
+        redacted[name] = REDACTED_HEADERS.has(name.toLowerCase()) ? '[已隐藏]' : value;
+    }
+    return redacted;
+}
+
+async function pathExists(filePath) {
+    try {
+        await fsp.access(filePath);
+        return true;
+    } catch (e) {
+        return false;
+    }
+}
+
+// 已轮换的日志文件名，按时间从旧到新排列。压缩过程中同时存在的未压缩文件优先，避免重复读取。
+async function listRotatedSegments(directory) {
+    let names;
+    try {
+        names = await fsp.readdir(directory);
+    } catch (e) {
+        return [];
+    }
+    const rotated = names.filter(name => ROTATED_SEGMENT_PATTERN.test(name));
+    const plain = new Set(rotated.filter(name => !name.endsWith('.gz')));
+    return rotated.filter(name => !(name.endsWith('.gz') && plain.has(name.slice(0, -3)))).sort(compareSegmentNames);
+}
+
+// 按 (时间戳, 序号) 排序。不能直接按文件名排序: "exchange-<时间戳>-1.jsonl" 中的 '-' 排在 "exchange-<时间戳>.jsonl" 的 '.' 之前
+function compareSegmentNames(a, b) {
+    const [, stampA, nA = '0'] = ROTATED_SEGMENT_PATTERN.exec(a);
+    const [, stampB, nB = '0'] = ROTATED_SEGMENT_PATTERN.exec(b);
+    if (stampA !== stampB) return stampA < stampB ? -1 : 1;
+    return Number(nA) - Number(nB);
+}
+
+async function readSegment(filePath, filter) {
+    const records = [];
+    if (!(await pathExists(filePath))) return records;
+    let input = fs.createReadStream(filePath);
+    if (filePath.endsWith('.gz')) input = input.pipe(zlib.createGunzip());
+    for await (const line of readline.createInterface({ input, crlfDelay: Infinity })) {
+        if (!line || (filter.requestId && !line.includes(filter.requestId))) continue;
+        let record;
+        try { record = JSON.parse(line); } catch (e) { continue; } // 例如进程退出时写了一半的行
+        if (filter.requestId && record.request_id !== filter.requestId) continue;
+        if (filter.type && record.type !== filter.type) continue;
+        records.push(record);
+    }
+    return records;
+}
+
+/**
+ * 读取日志记录 (包括已轮换和压缩的文件)，返回满足条件的最近 limit 条，按时间顺序排列。
+ * requestId / type 为空时不按该条件过滤。
+ */
+async function readExchangeLog(directory, { requestId = null, type = null, limit = 100, includeRotated = true } = {}) {
+    const files = includeRotated ? (await listRotatedSegments(directory)).map(name => path.join(directory, name)) : [];
+    files.push(path.join(directory, ACTIVE_SEGMENT_NAME));
+    let result = [];
+    for (let i = files.length - 1; i >= 0 && result.length < limit; i--) {
+        const records = await readSegment(files[i], { requestId, type });
+        result = records.slice(Math.max(0, records.length - (limit - result.length))).concat(result);
+    }
+    return result;
+}
+
+module.exports = { ExchangeLogWriter, readExchangeLog };
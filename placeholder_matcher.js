@@ -0,0 +1,201 @@
+// 插件占位符匹配。
+// 所有已启用插件的 placeholder_start / placeholder_end 在加载插件时编译为一个 Aho-Corasick 自动机，
+// 一次扫描即可按文档顺序找出回复中的全部插件调用，不再为每个插件分别构造正则并重复扫描整段文本。
+
+class PlaceholderMatcher {
+    constructor(plugins) {
+        this.plugins = plugins;
+        // 节点: next 为转移表 (UTF-16 码元 -> 节点)，outputs 为在此结束的模式 (按长度从长到短)，
+        // startPrefix 表示该节点对应的字符串是某个 placeholder_start 的前缀
+        this.nodes = [{ next: new Map(), fail: 0, outputs: [], depth: 0, startPrefix: true }];
+        plugins.forEach((plugin, index) => {
+            this._addPattern(plugin.placeholder_start, { index, kind: 'start' });
+            this._addPattern(plugin.placeholder_end, { index, kind: 'end' });
+        });
+        this._buildFailureLinks();
+
+        // 在根状态下可以直接跳到下一个可能开始某个模式的字符 (占位符通常都以 "[" 开头)
+        const firstChars = [...this.nodes[0].next.keys()].map(code => String.fromCharCode(code));
+        this.singleFirstChar = firstChars.length === 1 ? firstChars[0] : null;
+        this.firstCharPattern = firstChars.length > 1 ? new RegExp(`[${firstChars.map(ch => ch.replace(/[\]\\^-]/g, '\\$&')).join('')}]`, 'g') : null;
+    }
+
+    // 返回 from 之后第一个可能开始某个模式的位置，没有时返回 text.length
+    nextCandidate(text, from) {
+        if (this.singleFirstChar !== null) {
+            const index = text.indexOf(this.singleFirstChar, from);
+            return index === -1 ? text.length : index;
+        }
+        if (this.firstCharPattern === null) return text.length;
+        this.firstCharPattern.lastIndex = from;
+        const match = this.firstCharPattern.exec(text);
+        return match ? match.index : text.length;
+    }
+
+    _addPattern(pattern, output) {
+        let state = 0;
+        for (let i = 0; i < pattern.length; i++) {
+            const code = pattern.charCodeAt(i);
+            let next = this.nodes[state].next.get(code);
+            if (next === undefined) {
+                next = this.nodes.length;
+                this.nodes.push({ next: new Map(), fail: 0, outputs: [], depth: i + 1, startPrefix: false });
+                this.nodes[state].next.set(code, next);
+            }
+            state = next;
+            if (output.kind === 'start') this.nodes[state].startPrefix = true;
+        }
+        this.nodes[state].outputs.push({ ...output, length: pattern.length });
+    }
+
+    _buildFailureLinks() {
+        const queue = [];
+        for (const child of this.nodes[0].next.values()) queue.push(child);
+        while (queue.length > 0) {
+            const state = queue.shift();
+            const node = this.nodes[state];
+            for (const [code, child] of node.next) {
+                let fail = node.fail;
+                while (fail !== 0 && !this.nodes[fail].next.has(code)) fail = this.nodes[fail].fail;
+                const failTarget = this.nodes[fail].next.get(code);
+                this.nodes[child].fail = (failTarget !== undefined && failTarget !== child) ? failTarget : 0;
+                queue.push(child);
+            }
+            // 合并后缀节点的输出，使每个节点直接包含所有在此结束的模式
+            node.outputs = node.outputs.concat(this.nodes[node.fail].outputs).sort((a, b) => b.length - a.length);
+        }
+    }
+
+    step(state, code) {
+        while (state !== 0 && !this.nodes[state].next.has(code)) state = this.nodes[state].fail;
+        const next = this.nodes[state].next.get(code);
+        return next === undefined ? 0 : next;
+    }
+
+    // 当前状态下，已扫描文本末尾可能成为某个 placeholder_start 开头的最长长度
+    pendingStartLength(state) {
+        while (state !== 0 && !this.nodes[state].startPrefix) state = this.nodes[state].fail;
+        return this.nodes[state].depth;
+    }
+
+    startMatchAt(state) {
+        return this.nodes[state].outputs.find(output => output.kind === 'start') || null;
+    }
+
+    endMatchAt(state, pluginIndex) {
+        return this.nodes[state].outputs.find(output => output.kind === 'end' && output.index === pluginIndex) || null;
+    }
+
+    /**
+     * 按文档顺序返回文本中的全部插件调用:
+     * [{ plugin, start: 占位符起始下标, end: 占位符结束后的下标, argument: 原始参数文本 }]
+     * 未闭合的开始标记会被跳过，其后的调用仍能被找到。
+     */
+    findAll(text) {
+        const invocations = [];
+        let from = 0;
+        while (from < text.length) {
+            const unterminatedStart = this._scan(text, from, invocations);
+            if (unterminatedStart === null) break;
+            from = unterminatedStart + 1;
+        }
+        return invocations;
+    }
+
+    _scan(text, from, invocations) {
+        let state = 0;
+        let current = null; // { output, start, argumentStart }
+        for (let i = from; i < text.length; i++) {
+            if (state === 0) {
+                i = this.nextCandidate(text, i);
+                if (i === text.length) break;
+            }
+            state = this.step(state, text.charCodeAt(i));
+            if (this.nodes[state].outputs.length === 0) continue;
+            if (!current) {
+                const startMatch = this.startMatchAt(state);
+                if (startMatch) {
+                    current = { output: startMatch, start: i + 1 - startMatch.length, argumentStart: i + 1 };
+                    state = 0; // 结束标记必须完整出现在开始标记之后
+                }
+            } else {
+                const endMatch = this.endMatchAt(state, current.output.index);
+                if (endMatch) {
+                    invocations.push({
+                        plugin: this.plugins[current.output.index], start: current.start, end: i + 1,
+                        argument: text.substring(current.argumentStart, i + 1 - endMatch.length),
+                    });
+                    current = null;
+                    state = 0;
+                }
+            }
+        }
+        return current ? current.start : null;
+    }
+}
+
+// 增量占位符扫描器 (流式转发使用)。
+// 文本按到达顺序输入，扫描器立即返回可以转发给客户端的部分，只保留可能是某个 placeholder_start 开头的尾部文本；
+// 进入占位符后缓冲参数，直到对应的 placeholder_end 到达时返回一次插件调用。自动机状态在多次输入之间保持。
+class IncrementalPlaceholderScanner {
+    constructor(matcher) {
+        this.matcher = matcher;
+        this.state = 0;
+        this.pending = '';    // 已扫描但尚未转发的文本 (占位符外) 或已收到的参数 (占位符内)
+        this.current = null;  // 当前所在占位符的开始标记输出
+    }
+
+    // 返回 { text: 可转发的文本, invocation: { plugin, argument } | null, rest: 调用之后同一段输入中剩余的文本 }
+    push(text) {
+        const matcher = this.matcher;
+        const combined = this.pending + text;
+        let output = '';
+        let segmentStart = 0;
+        for (let i = this.pending.length; i < combined.length; i++) {
+            if (this.state === 0) {
+                i = matcher.nextCandidate(combined, i);
+                if (i === combined.length) break;
+            }
+            this.state = matcher.step(this.state, combined.charCodeAt(i));
+            if (!this.current) {
+                const startMatch = matcher.startMatchAt(this.state);
+                if (startMatch) {
+                    output += combined.substring(segmentStart, i + 1 - startMatch.length);
+                    this.current = startMatch;
+                    segmentStart = i + 1;
+                    this.state = 0;
+                }
+            } else {
+                const endMatch = matcher.endMatchAt(this.state, this.current.index);
+                if (endMatch) {
+                    const invocation = { plugin: matcher.plugins[this.current.index], argument: combined.substring(segmentStart, i + 1 - endMatch.length) };
+                    this.current = null;
+                    this.state = 0;
+                    this.pending = '';
+                    return { text: output, invocation, rest: combined.substring(i + 1) };
+                }
+            }
+        }
+
+        if (this.current) {
+            this.pending = combined.substring(segmentStart);
+        } else {
+            const holdStart = Math.max(segmentStart, combined.length - matcher.pendingStartLength(this.state));
+            output += combined.substring(segmentStart, holdStart);
+            this.pending = combined.substring(holdStart);
+        }
+        return { text: output, invocation: null, rest: '' };
+    }
+
+    // 上游结束时调用，返回仍被保留的文本。未闭合的占位符按原样返回。
+    flush() {
+        const startText = this.current ? this.matcher.plugins[this.current.index].placeholder_start : '';
+        const remaining = startText + this.pending;
+        this.pending = '';
+        this.current = null;
+        this.state = 0;
+        return remaining;
+    }
+}
+
+module.exports = { PlaceholderMatcher, IncrementalPlaceholderScanner };
@@ -0,0 +1,65 @@
+// 同一个 AI 回复中多个插件调用的执行批次。
+// 调用按文档顺序加入批次并立即开始调度:
+//   - 只读插件并发执行，同时运行的调用数不超过 parallelismLimit；
+//   - 会修改状态的插件 (mutates_state) 要等排在它前面的所有调用完成后才开始，
+//     排在它后面的调用也要等它完成后才开始，因此修改操作之间以及修改与读取之间都保持文档顺序。
+// 每个调用的结果为 { plugin, argument, result, error }，插件出错时 error 为异常对象，批次本身不会失败。
+
+class PluginCallBatch {
+    constructor(executePlugin, parallelismLimit) {
+        this.executePlugin = executePlugin;
+        this.parallelismLimit = Math.max(1, parallelismLimit || 1);
+        this.running = 0;
+        this.waiting = [];
+        this.calls = [];
+        this.barrier = Promise.resolve(); // 最近一个修改状态的调用
+    }
+
+    get size() {
+        return this.calls.length;
+    }
+
+    add(plugin, argument) {
+        let call;
+        if (plugin.mutates_state) {
+            call = Promise.all(this.calls).then(() => this._run(plugin, argument));
+            this.barrier = call;
+        } else {
+            call = this.barrier.then(() => this._run(plugin, argument));
+        }
+        this.calls.push(call);
+        return call;
+    }
+
+    // 按文档顺序返回全部调用的结果
+    results() {
+        return Promise.all(this.calls);
+    }
+
+    async _run(plugin, argument) {
+        await this._acquire();
+        try {
+            return { plugin, argument, result: await this.executePlugin(plugin, argument), error: null };
+        } catch (error) {
+            return { plugin, argument, result: null, error };
+        } finally {
+            this._release();
+        }
+    }
+
+    _acquire() {
+        if (this.running < this.parallelismLimit) {
+            this.running++;
+            return Promise.resolve();
+        }
+        return new Promise(resolve => this.waiting.push(resolve));
+    }
+
+    _release() {
+        const next = this.waiting.shift();
+        if (next) next(); // 名额直接交给等待中的调用
+        else this.running--;
+    }
+}
+
+module.exports = { PluginCallBatch };
@@ -0,0 +1,18 @@
+# 插件共享的辅助模块。
+# 插件脚本位于 Plugin/<插件名>/ 下，需先把项目根目录加入 sys.path 再导入本包。
+import os
+import sys
+import json
+
+PROJECT_ROOT = os.path.realpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+ROOT_CONFIG_FILE = os.path.join(PROJECT_ROOT, "config.json")
+
+
+def load_root_config() -> dict:
+    """读取根目录 config.json，失败时返回空字典。"""
+    try:
+        with open(ROOT_CONFIG_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"警告: 读取根配置文件 {ROOT_CONFIG_FILE} 失败: {e}. 将使用默认值。", file=sys.stderr)
+        return {}
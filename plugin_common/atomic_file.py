@@ -0,0 +1,52 @@
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+# 原子写文件: 先写入同一文件夹中的临时文件，刷新到磁盘后重命名为目标文件。
+# 写入过程中出错或进程崩溃时目标文件保持原样，不会留下只写了一半的内容。
+
+# mkstemp 创建的文件权限为 0600；新建文件时改为与 open() 相同的默认权限 (0666 去掉 umask)。
+# os.umask() 只能在设置新值的同时返回旧值，多线程进程中临时改动 umask 会影响其他线程同时创建的文件，
+# 因此从 /proc/self/status 读取 (Linux 4.7 起提供)，读取不到时使用常见的默认值。
+DEFAULT_UMASK = 0o022
+
+
+def _current_umask() -> int:
+    try:
+        with open("/proc/self/status", 'r', encoding='ascii') as f:
+            for line in f:
+                if line.startswith("Umask:"):
+                    return int(line.split()[1], 8)
+    except (OSError, ValueError, IndexError):
+        pass
+    return DEFAULT_UMASK
+
+
+@contextmanager
+def atomic_write(path: str):
+    """
+    返回以二进制方式打开的临时文件对象，with 块正常结束后替换 path；出错时删除临时文件，path 不变。
+    path 已存在时保留其权限位，否则使用与 open() 新建文件相同的默认权限。
+    """
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(path):
+            shutil.copymode(path, tmp_path)
+        else:
+            os.chmod(tmp_path, 0o666 & ~_current_umask())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try: os.remove(tmp_path)
+        except OSError: pass
+        raise
+
+
+def write_bytes_atomic(path: str, data: bytes):
+    with atomic_write(path) as f:
+        f.write(data)
@@ -0,0 +1,488 @@
+import sys
+import os
+import json
+import time
+import asyncio
+import secrets
+import platform
+import subprocess
+import traceback
+
+from plugin_common import PROJECT_ROOT, load_root_config
+
+# 常驻浏览器服务。
+# 服务进程保持一个已启动的 Playwright 浏览器以及预先创建好的 context/page 池，
+# google_search 和 web_content_reader 通过本地 socket (JSON 行协议) 租用页面完成导航，
+# 从而避免每次查询都冷启动浏览器。
+#
+# 服务只监听 127.0.0.1；启动时生成随机令牌并写入 browser_service.token (仅当前用户可读)，请求必须带有该令牌。
+# 浏览器启动参数、持久化用户配置目录以及启动前关闭浏览器的命令由服务按插件配置生成 (见 build_launch)，不从请求中读取。
+#
+# 请求: {"op": "fetch", "token": "...", "url": "...", "profile": "google_search" | "web_content_reader", "context": {...},
+#        "timeout_ms": 30000, "wait_after_load_ms": 3000, "dom_stable_ms": 500, "blocked_resource_types": [...], "consent_selectors": [...]}
+#        context 中只接受 CONTEXT_OPTION_KEYS 中的选项；wait_after_load_ms 为就绪等待的上限，详见 page_readiness.py
+# 响应: {"ok": true, "final_url": "...", "html": "...", "timed_out": false, "timing": {...}}
+#       或 {"ok": false, "error": "...", "error_kind": "page" | "launch" | "auth" | "internal"}
+# 其他操作: {"op": "stats"}, {"op": "shutdown"}
+# 参数完全相同的 fetch 请求同时到达时只进行一次页面导航，结果共享给所有等待的客户端。
+
+DEFAULT_PORT = 3012
+DEFAULT_IDLE_TIMEOUT_S = 600
+DEFAULT_MAX_CONCURRENT_PAGES = 4
+DEFAULT_CONTEXT_RECYCLE_USES = 20
+DEFAULT_PREWARM_PAGES = 1
+SERVICE_START_TIMEOUT_S = 20
+STREAM_LIMIT_BYTES = 64 * 1024 * 1024
+SERVICE_LOG_FILE = os.path.join(PROJECT_ROOT, "browser_service.log")
+SERVICE_TOKEN_FILE = os.path.join(PROJECT_ROOT, "browser_service.token")
+COMMON_BROWSER_ARGS = ['--no-sandbox', '--disable-setuid-sandbox', '--disable-blink-features=AutomationControlled']
+CONTEXT_OPTION_KEYS = ("user_agent", "locale", "timezone_id", "java_script_enabled")
+BROWSER_TYPES = ("chromium", "firefox", "webkit")
+
+
+def load_service_config() -> dict:
+    root_config = load_root_config()
+    return {
+        "port": root_config.get("browser_service_port", DEFAULT_PORT),
+        "idle_timeout_s": root_config.get("browser_service_idle_timeout_seconds", DEFAULT_IDLE_TIMEOUT_S),
+        "max_concurrent_pages": root_config.get("browser_service_max_concurrent_pages", DEFAULT_MAX_CONCURRENT_PAGES),
+        "context_recycle_uses": root_config.get("browser_service_context_recycle_uses", DEFAULT_CONTEXT_RECYCLE_USES),
+        "prewarm_pages": root_config.get("browser_service_prewarm_pages", DEFAULT_PREWARM_PAGES),
+    }
+
+
+def _plugin_specific_config(plugin_folder: str) -> dict:
+    config_path = os.path.join(PROJECT_ROOT, "Plugin", plugin_folder, "config.json")
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            return json.load(f).get("plugin_specific_config", {})
+    except (OSError, ValueError) as e:
+        print(f"[Browser Service] 警告: 读取插件配置 {config_path} 失败: {e}. 将使用默认值。", file=sys.stderr)
+        return {}
+
+
+def _configured_browser_type(psc: dict) -> str:
+    browser_type = str(psc.get("default_browser_type", "chromium")).lower()
+    return browser_type if browser_type in BROWSER_TYPES else "chromium"
+
+
+def get_browser_type_and_kill_command(user_data_path: str):
+    """根据用户数据目录推断浏览器，返回 (浏览器名称, 关闭该浏览器全部进程的命令)；无法识别时命令为 None。"""
+    path_lower = user_data_path.lower()
+    os_platform = platform.system().lower()
+
+    browser_name_for_kill = None
+    kill_cmd_list = []
+
+    if "google/chrome" in path_lower or "google-chrome" in path_lower:
+        browser_name_for_kill = "Chrome"
+        if "windows" in os_platform: kill_cmd_list = ["taskkill", "/F", "/IM", "chrome.exe"]
+        elif "darwin" in os_platform: kill_cmd_list = ["pkill", "-f", "Google Chrome"]
+        elif "linux" in os_platform: kill_cmd_list = ["pkill", "-f", "chrome"]
+    elif "microsoft/edge" in path_lower or "microsoft-edge" in path_lower or "msedge" in path_lower:
+        browser_name_for_kill = "Edge"
+        if "windows" in os_platform: kill_cmd_list = ["taskkill", "/F", "/IM", "msedge.exe"]
+        elif "darwin" in os_platform: kill_cmd_list = ["pkill", "-f", "Microsoft Edge"]
+        elif "linux" in os_platform: kill_cmd_list = ["pkill", "-f", "msedge"]
+
+    if not browser_name_for_kill:
+        print(f"[Browser Service] 警告: 无法从路径 '{user_data_path}' 明确识别浏览器类型以关闭进程。", file=sys.stderr)
+        return "未知浏览器", None
+
+    return browser_name_for_kill, kill_cmd_list
+
+
+def build_launch(profile: str) -> dict:
+    """按插件配置生成浏览器启动参数。与插件在本进程内启动浏览器时的方式一致。"""
+    if profile == "web_content_reader":
+        psc = _plugin_specific_config("web_content_reader")
+        return {"browser_type": _configured_browser_type(psc), "headless": True}
+    if profile != "google_search":
+        raise ValueError(f"未知的浏览器启动配置 '{profile}'")
+
+    psc = _plugin_specific_config("google_search")
+    browser_type = _configured_browser_type(psc)
+    user_data_dir = psc.get("user_data_directory_path") or ""
+    if not (isinstance(user_data_dir, str) and os.path.isdir(user_data_dir)):
+        return {"browser_type": browser_type, "headless": True, "args": COMMON_BROWSER_ARGS}  # 常规模式强制 headless
+    headless = psc.get("launch_browser_headless", False)
+    if browser_type != "chromium":
+        # launch_persistent_context 只支持 chromium，回退到常规模式
+        return {"browser_type": browser_type, "headless": headless, "args": COMMON_BROWSER_ARGS}
+    _, kill_command = get_browser_type_and_kill_command(user_data_dir)
+    return {"browser_type": "chromium", "headless": headless, "args": COMMON_BROWSER_ARGS,
+            "user_data_dir": user_data_dir, "kill_command": kill_command}
+
+
+def write_token_file(token: str):
+    temp_path = f"{SERVICE_TOKEN_FILE}.{os.getpid()}.tmp"
+    fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(token)
+    os.replace(temp_path, SERVICE_TOKEN_FILE)
+
+
+def _read_token() -> str:
+    try:
+        with open(SERVICE_TOKEN_FILE, 'r', encoding='utf-8') as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+
+# --- 服务端 ---
+
+class PageSlot:
+    """一个可租用的页面及其所属 context。"""
+    def __init__(self, key, context, page, owns_context):
+        self.key = key
+        self.context = context
+        self.page = page
+        self.owns_context = owns_context  # 持久化用户配置模式下 context 为共享，不随页面关闭
+        self.uses = 0
+        self.blocker = None  # 首次需要拦截资源时挂上的 ResourceBlocker
+
+
+class BrowserPool:
+    def __init__(self, service_config: dict):
+        self.max_concurrent_pages = max(1, service_config["max_concurrent_pages"])
+        self.context_recycle_uses = max(1, service_config["context_recycle_uses"])
+        self.prewarm_pages = max(0, min(service_config["prewarm_pages"], self.max_concurrent_pages))
+        self.page_semaphore = asyncio.Semaphore(self.max_concurrent_pages)
+        self.playwright = None
+        self.browsers = {}             # launch_key -> Browser
+        self.persistent_contexts = {}  # launch_key -> BrowserContext (launch_persistent_context)
+        self.idle_slots = {}           # slot_key -> [PageSlot]
+        self.launch_lock = asyncio.Lock()
+        self.active_leases = 0
+        self.last_activity = time.monotonic()
+        self.inflight_fetches = {}     # 请求参数 -> 正在进行的 fetch 任务
+        self.stats = {"requests": 0, "browser_launches": 0, "contexts_created": 0, "contexts_recycled": 0, "slot_reuses": 0, "coalesced": 0}
+
+    @staticmethod
+    def _launch_key(launch: dict) -> str:
+        return json.dumps(launch, sort_keys=True, ensure_ascii=False)
+
+    async def _ensure_playwright(self):
+        if self.playwright is None:
+            from playwright.async_api import async_playwright
+            self.playwright = await async_playwright().start()
+        return self.playwright
+
+    def _browser_type(self, launch: dict):
+        name = launch.get("browser_type", "chromium")
+        return getattr(self.playwright, name if name in ("chromium", "firefox", "webkit") else "chromium")
+
+    async def _run_kill_command(self, launch: dict):
+        kill_cmd = launch.get("kill_command")
+        if not kill_cmd:
+            return
+        print(f"[Browser Service] 启动持久化用户配置前执行关闭命令: {kill_cmd}", file=sys.stderr)
+        try:
+            process = await asyncio.create_subprocess_exec(*kill_cmd, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL)
+            await process.wait()
+            await asyncio.sleep(1)
+        except Exception as e:
+            print(f"[Browser Service] 执行关闭命令失败: {e}", file=sys.stderr)
+
+    async def _new_slot(self, launch: dict, context_options: dict, slot_key: str) -> PageSlot:
+        launch_key = self._launch_key(launch)
+        async with self.launch_lock:
+            await self._ensure_playwright()
+            user_data_dir = launch.get("user_data_dir")
+            if user_data_dir:
+                context = self.persistent_contexts.get(launch_key)
+                if context is None:
+                    await self._run_kill_command(launch)
+                    context = await self._browser_type(launch).launch_persistent_context(
+                        user_data_dir=user_data_dir,
+                        headless=launch.get("headless", True),
+                        args=launch.get("args") or [],
+                        **context_options,
+                    )
+                    self.persistent_contexts[launch_key] = context
+                    self.stats["browser_launches"] += 1
+                page = await context.new_page()
+                return PageSlot(slot_key, context, page, owns_context=False)
+
+            browser = self.browsers.get(launch_key)
+            if browser is None or not browser.is_connected():
+                browser = await self._browser_type(launch).launch(headless=launch.get("headless", True), args=launch.get("args") or [])
+                self.browsers[launch_key] = browser
+                self.stats["browser_launches"] += 1
+        context = await browser.new_context(**context_options)
+        self.stats["contexts_created"] += 1
+        page = await context.new_page()
+        return PageSlot(slot_key, context, page, owns_context=True)
+
+    async def _close_slot(self, slot: PageSlot):
+        try:
+            await slot.page.close()
+            if slot.owns_context:
+                await slot.context.close()
+        except Exception as e:
+            print(f"[Browser Service] 关闭页面失败: {e}", file=sys.stderr)
+
+    async def lease(self, launch: dict, context_options: dict) -> PageSlot:
+        slot_key = self._launch_key(launch) + "|" + json.dumps(context_options, sort_keys=True, ensure_ascii=False)
+        idle = self.idle_slots.setdefault(slot_key, [])
+        while idle:
+            slot = idle.pop()
+            if not slot.page.is_closed():
+                self.stats["slot_reuses"] += 1
+                return slot
+            await self._close_slot(slot)
+        slot = await self._new_slot(launch, context_options, slot_key)
+        # 首次使用某组配置时预先创建额外的页面，供后续并发请求直接使用
+        while len(idle) + 1 < self.prewarm_pages:
+            idle.append(await self._new_slot(launch, context_options, slot_key))
+        return slot
+
+    async def release(self, slot: PageSlot, broken: bool):
+        slot.uses += 1
+        if broken or slot.uses >= self.context_recycle_uses or slot.page.is_closed():
+            self.stats["contexts_recycled"] += 1
+            await self._close_slot(slot)
+            return
+        try:
+            await slot.page.goto("about:blank")
+        except Exception:
+            await self._close_slot(slot)
+            return
+        self.idle_slots.setdefault(slot.key, []).append(slot)
+
+    async def fetch(self, request: dict) -> dict:
+        from playwright.async_api import TimeoutError as PlaywrightTimeoutError, Error as PlaywrightError
+        from plugin_common import page_readiness
+        self.stats["requests"] += 1
+        async with self.page_semaphore:
+            self.active_leases += 1
+            self.last_activity = time.monotonic()
+            try:
+                try:
+                    launch = build_launch(request.get("profile"))
+                except ValueError as e:
+                    return {"ok": False, "error": str(e), "error_kind": "internal"}
+                context_options = {key: value for key, value in (request.get("context") or {}).items() if key in CONTEXT_OPTION_KEYS}
+                try:
+                    slot = await self.lease(launch, context_options)
+                except PlaywrightError as e:
+                    traceback.print_exc(file=sys.stderr)
+                    return {"ok": False, "error": str(e), "error_kind": "launch"}
+
+                page = slot.page
+                broken = False
+                timing = {}
+                try:
+                    blocked_types = request.get("blocked_resource_types") or []
+                    if slot.blocker:
+                        slot.blocker.start_request(blocked_types)
+                    else:
+                        slot.blocker = await page_readiness.attach_resource_blocker(page, blocked_types)
+                    started = time.monotonic()
+                    await page.goto(request["url"], timeout=request.get("timeout_ms", 30000), wait_until='domcontentloaded')
+                    final_url = page.url
+                    timing["goto_ms"] = round((time.monotonic() - started) * 1000)
+                    timing["ready_reason"], timing["ready_ms"] = await page_readiness.wait_until_ready(
+                        page, request.get("wait_after_load_ms", 0), request.get("dom_stable_ms", page_readiness.DEFAULT_DOM_STABLE_MS))
+                    for selector in request.get("consent_selectors") or []:
+                        try:
+                            button = page.locator(selector).first
+                            if await button.is_visible(timeout=1000):
+                                await button.click(timeout=1500, force=True)
+                                await page.wait_for_timeout(700)
+                                break
+                        except Exception:
+                            pass
+                    html = await page.content()
+                    timing["blocked_requests"] = slot.blocker.blocked_count if slot.blocker else 0
+                    timing["total_ms"] = round((time.monotonic() - started) * 1000)
+                    page_readiness.log_timing("[Browser Service]", final_url, timing)
+                    return {"ok": True, "final_url": final_url, "html": html, "timed_out": False, "timing": timing}
+                except PlaywrightTimeoutError:
+                    broken = True
+                    return {"ok": True, "final_url": page.url, "html": await page.content(), "timed_out": True}
+                except PlaywrightError as e:
+                    broken = True
+                    traceback.print_exc(file=sys.stderr)
+                    return {"ok": False, "error": str(e), "error_kind": "page"}
+                finally:
+                    await self.release(slot, broken)
+            finally:
+                self.active_leases -= 1
+                self.last_activity = time.monotonic()
+
+    async def fetch_coalesced(self, request: dict) -> dict:
+        """相同参数的 fetch 正在进行时直接等待其结果，不再重复导航。"""
+        key = json.dumps({k: v for k, v in request.items() if k not in ("op", "token")}, sort_keys=True, ensure_ascii=False)
+        task = self.inflight_fetches.get(key)
+        if task:
+            self.stats["coalesced"] += 1
+        else:
+            task = asyncio.ensure_future(self.fetch(request))
+            self.inflight_fetches[key] = task
+            task.add_done_callback(lambda _: self.inflight_fetches.pop(key, None))
+        # shield: 某个客户端断开不应取消其他客户端共享的导航
+        return await asyncio.shield(task)
+
+    def describe(self) -> dict:
+        return {
+            **self.stats,
+            "active_leases": self.active_leases,
+            "inflight_fetches": len(self.inflight_fetches),
+            "idle_pages": sum(len(v) for v in self.idle_slots.values()),
+            "browsers": len(self.browsers) + len(self.persistent_contexts),
+            "max_concurrent_pages": self.max_concurrent_pages,
+            "context_recycle_uses": self.context_recycle_uses,
+        }
+
+    async def close(self):
+        for slots in self.idle_slots.values():
+            for slot in slots:
+                await self._close_slot(slot)
+        self.idle_slots.clear()
+        for context in self.persistent_contexts.values():
+            try: await context.close()
+            except Exception: pass
+        for browser in self.browsers.values():
+            try: await browser.close()
+            except Exception: pass
+        self.persistent_contexts.clear()
+        self.browsers.clear()
+        if self.playwright:
+            await self.playwright.stop()
+            self.playwright = None
+
+
+async def serve(service_config: dict):
+    pool = BrowserPool(service_config)
+    stop_event = asyncio.Event()
+    token = secrets.token_hex(16)
+
+    async def handle_client(reader, writer):
+        try:
+            line = await reader.readline()
+            if not line:
+                return
+            request = json.loads(line)
+            op = request.get("op")
+            if not secrets.compare_digest(str(request.get("token", "")), token):
+                response = {"ok": False, "error": "浏览器服务令牌无效。", "error_kind": "auth"}
+            elif op == "fetch":
+                response = await pool.fetch_coalesced(request)
+            elif op == "stats":
+                response = {"ok": True, "stats": pool.describe()}
+            elif op == "shutdown":
+                response = {"ok": True}
+                stop_event.set()
+            else:
+                response = {"ok": False, "error": f"未知操作 '{op}'", "error_kind": "internal"}
+        except Exception as e:
+            traceback.print_exc(file=sys.stderr)
+            response = {"ok": False, "error": f"{type(e).__name__}: {e}", "error_kind": "internal"}
+        try:
+            writer.write((json.dumps(response, ensure_ascii=False) + "\n").encode('utf-8'))
+            await writer.drain()
+            writer.close()
+        except Exception:
+            pass
+
+    async def idle_watchdog():
+        idle_timeout_s = service_config["idle_timeout_s"]
+        while not stop_event.is_set():
+            await asyncio.sleep(5)
+            if idle_timeout_s > 0 and pool.active_leases == 0 and time.monotonic() - pool.last_activity > idle_timeout_s:
+                print(f"[Browser Service] 空闲超过 {idle_timeout_s} 秒，关闭浏览器服务。", file=sys.stderr)
+                stop_event.set()
+
+    server = await asyncio.start_server(handle_client, "127.0.0.1", service_config["port"], limit=STREAM_LIMIT_BYTES)
+    write_token_file(token)
+    print(f"[Browser Service] 已在 127.0.0.1:{service_config['port']} 上启动 (PID: {os.getpid()})。", file=sys.stderr)
+    watchdog = asyncio.create_task(idle_watchdog())
+    async with server:
+        await stop_event.wait()
+    watchdog.cancel()
+    await pool.close()
+
+
+# --- 客户端 ---
+
+async def _connect(port: int):
+    return await asyncio.wait_for(asyncio.open_connection("127.0.0.1", port, limit=STREAM_LIMIT_BYTES), timeout=2)
+
+
+async def _exchange(reader, writer, request: dict, timeout_s: float) -> dict:
+    try:
+        writer.write((json.dumps(request, ensure_ascii=False) + "\n").encode('utf-8'))
+        await writer.drain()
+        line = await asyncio.wait_for(reader.readline(), timeout=timeout_s)
+        if not line:
+            return {"ok": False, "error": "浏览器服务未返回响应。", "error_kind": "internal"}
+        return json.loads(line)
+    except asyncio.TimeoutError:
+        return {"ok": False, "error": f"浏览器服务在 {timeout_s:.0f} 秒内未返回响应。", "error_kind": "internal"}
+    finally:
+        writer.close()
+
+
+def start_service_process():
+    """以独立进程启动浏览器服务，使其在插件进程退出后继续常驻。"""
+    kwargs = {}
+    if sys.platform == "win32":
+        kwargs["creationflags"] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        kwargs["start_new_session"] = True
+    with open(SERVICE_LOG_FILE, 'a', encoding='utf-8') as log_file:
+        subprocess.Popen([sys.executable, "-m", "plugin_common.browser_service"], cwd=PROJECT_ROOT,
+                         stdin=subprocess.DEVNULL, stdout=log_file, stderr=log_file, **kwargs)
+
+
+async def request_service(request: dict, timeout_s: float) -> dict:
+    """
+    向浏览器服务发送请求，服务未运行时自动启动。
+    服务无法启动时抛出 ConnectionError，调用方应回退到本地启动浏览器的方式。
+    """
+    port = load_service_config()["port"]
+    for attempt in range(2):
+        try:
+            reader, writer = await _connect(port)
+        except (OSError, asyncio.TimeoutError):
+            print("[Browser Service] 浏览器服务未运行，正在启动...", file=sys.stderr)
+            start_service_process()
+            deadline = time.monotonic() + SERVICE_START_TIMEOUT_S
+            while True:
+                await asyncio.sleep(0.3)
+                try:
+                    reader, writer = await _connect(port)
+                    break
+                except (OSError, asyncio.TimeoutError):
+                    if time.monotonic() > deadline:
+                        raise ConnectionError(f"浏览器服务在 {SERVICE_START_TIMEOUT_S} 秒内未能启动，详见 {SERVICE_LOG_FILE}。")
+        response = await _exchange(reader, writer, {**request, "token": _read_token()}, timeout_s)
+        # 服务刚启动时令牌文件可能尚未写入，稍后重新读取令牌再试一次
+        if response.get("error_kind") != "auth" or attempt:
+            return response
+        await asyncio.sleep(0.2)
+
+
+async def fetch_page(url: str, profile: str, context_options: dict, timeout_ms: int, wait_after_load_ms: int, consent_selectors=None,
+                     blocked_resource_types=None, dom_stable_ms: int = 500) -> dict:
+    """profile 为使用服务的插件名 (google_search / web_content_reader)，服务按该插件的配置启动浏览器。"""
+    request = {
+        "op": "fetch", "url": url, "profile": profile, "context": context_options,
+        "timeout_ms": timeout_ms, "wait_after_load_ms": wait_after_load_ms, "dom_stable_ms": dom_stable_ms,
+        "blocked_resource_types": blocked_resource_types or [], "consent_selectors": consent_selectors or [],
+    }
+    # 额外留出排队等待空闲页面与启动浏览器的时间
+    return await request_service(request, timeout_s=(timeout_ms + wait_after_load_ms) / 1000 + 60)
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(serve(load_service_config()))
+    except OSError as e:
+        # 端口已被占用，通常意味着另一个服务实例已在运行
+        print(f"[Browser Service] 启动失败: {e}", file=sys.stderr)
+        sys.exit(1)
+    except KeyboardInterrupt:
+        pass
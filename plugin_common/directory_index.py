@@ -0,0 +1,592 @@
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import secrets
+import threading
+import subprocess
+import traceback
+from collections import deque
+
+from plugin_common import PROJECT_ROOT, load_root_config
+from plugin_common.directory_walk import CachedDirEntry, WalkEntry, walk_directory, scandir_list
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+    WATCHDOG_AVAILABLE = True
+except ImportError:
+    WATCHDOG_AVAILABLE = False
+
+# 常驻目录索引服务。
+# 对 file_operations_allowed_base_paths 下的目录建立内存索引 (每个文件夹一份目录项快照)，
+# 列出目录插件通过本地 socket (JSON 行协议) 查询，重复列出同一目录时不再遍历文件系统。
+#   - 索引按需建立: 只有被列出过的文件夹才会被扫描并保存快照；
+#   - 安装了 watchdog 时通过文件系统通知 (inotify / ReadDirectoryChangesW / FSEvents) 发现变化，
+#     否则定期检查已索引文件夹的修改时间，并每隔一段时间完整重新扫描一次，以发现文件内容的修改；
+#   - 写文件的插件在写入后发送 invalidate 通知，下一次查询前会先重新扫描这些文件夹，结果立即反映修改；
+#   - 每个检测到的变化分配一个递增序号，查询结果附带变更令牌，之后可以只查询该令牌之后的变化。
+# 服务只监听 127.0.0.1；启动时生成随机令牌并写入 directory_index_service.token (仅当前用户可读)，每个请求都必须带有该令牌 ("token")。
+#
+# 请求: {"op": "list", "path": "...", "max_depth": 2, "include": [...], "exclude": [...], "ignore_names": [...],
+#        "respect_gitignore": true, "cursor_key": [...], "limit": 301}
+# 响应: {"ok": true, "entries": [...], "has_more": false, "token": "..."}
+# 请求: {"op": "changes", "path": "...", "since": "令牌", "limit": 500}
+# 响应: {"ok": true, "expired": false, "changes": [{"path": 相对路径, "change": "added" | "removed" | "modified", "is_dir": false}],
+#        "has_more": false, "token": "..."}
+# 其他操作: {"op": "invalidate", "paths": [...]}, {"op": "stats"}, {"op": "shutdown"}
+# 出错时: {"ok": false, "error": "...", "error_kind": "not_indexed" | "auth" | "os" | "internal"}
+
+DEFAULT_PORT = 3013
+DEFAULT_IDLE_TIMEOUT_S = 1800
+DEFAULT_POLL_INTERVAL_S = 2
+DEFAULT_FULL_RESCAN_INTERVAL_S = 30
+DEFAULT_MAX_DIRECTORIES = 50000
+DEFAULT_MAX_EVENTS = 20000
+SERVICE_START_TIMEOUT_S = 10
+REQUEST_TIMEOUT_S = 120
+STREAM_LIMIT_BYTES = 64 * 1024 * 1024
+WATCH_DEBOUNCE_S = 0.2
+SERVICE_LOG_FILE = os.path.join(PROJECT_ROOT, "directory_index_service.log")
+SERVICE_TOKEN_FILE = os.path.join(PROJECT_ROOT, "directory_index_service.token")
+IGNORED_WATCH_EVENTS = ("opened", "closed_no_write")
+
+
+def load_service_config() -> dict:
+    root_config = load_root_config()
+    return {
+        "enabled": root_config.get("directory_index_enabled", True),
+        "port": root_config.get("directory_index_port", DEFAULT_PORT),
+        "idle_timeout_s": root_config.get("directory_index_idle_timeout_seconds", DEFAULT_IDLE_TIMEOUT_S),
+        "use_watchdog": root_config.get("directory_index_use_watchdog", True),
+        "poll_interval_s": root_config.get("directory_index_poll_interval_seconds", DEFAULT_POLL_INTERVAL_S),
+        "full_rescan_interval_s": root_config.get("directory_index_full_rescan_interval_seconds", DEFAULT_FULL_RESCAN_INTERVAL_S),
+        "max_directories": root_config.get("directory_index_max_directories", DEFAULT_MAX_DIRECTORIES),
+        "max_events": root_config.get("directory_index_max_events", DEFAULT_MAX_EVENTS),
+        # 相对路径相对于项目根目录解析
+        "roots": [os.path.realpath(os.path.join(PROJECT_ROOT, path)) for path in root_config.get("file_operations_allowed_base_paths", [])],
+    }
+
+
+def is_within(path: str, root: str) -> bool:
+    return path == root or path.startswith(root.rstrip(os.sep) + os.sep)
+
+
+def write_token_file(token: str):
+    temp_path = f"{SERVICE_TOKEN_FILE}.{os.getpid()}.tmp"
+    fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(token)
+    os.replace(temp_path, SERVICE_TOKEN_FILE)
+
+
+def _read_token() -> str:
+    try:
+        with open(SERVICE_TOKEN_FILE, 'r', encoding='utf-8') as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+
+# --- 服务端 ---
+
+class DirectorySnapshot:
+    __slots__ = ("entries", "mtime_ns", "last_used")
+
+    def __init__(self, entries: dict, mtime_ns: int):
+        self.entries = entries  # 名称 -> CachedDirEntry
+        self.mtime_ns = mtime_ns
+        self.last_used = time.monotonic()
+
+
+class DirectoryIndex:
+    def __init__(self, service_config: dict):
+        self.roots = [root for root in service_config["roots"]]
+        self.max_directories = max(1, service_config["max_directories"])
+        self.max_events = max(1, service_config["max_events"])
+        self.use_watchdog = service_config["use_watchdog"] and WATCHDOG_AVAILABLE
+        self.poll_interval_s = service_config["poll_interval_s"]
+        self.full_rescan_interval_s = service_config["full_rescan_interval_s"]
+        self.lock = threading.RLock()
+        self.directories = {}      # 文件夹绝对路径 -> DirectorySnapshot
+        self.dirty = set()         # 待重新扫描的文件夹 (文件系统通知或插件通知)
+        self.events = deque()      # (序号, 绝对路径, 变化类型, 是否文件夹)
+        self.sequence = 0
+        self.expired_through = 0   # 序号不大于此值的事件已被丢弃
+        self.instance = secrets.token_hex(4)  # 服务重启后旧令牌失效
+        self.watched_roots = set()
+        self.observer = None
+        self.stop_event = threading.Event()
+        self.stats = {"list_requests": 0, "change_requests": 0, "directories_scanned": 0, "rescans": 0, "watch_events": 0, "evictions": 0}
+
+    # 令牌为 "<服务实例>-<序号>"
+    @property
+    def token(self) -> str:
+        return f"{self.instance}-{self.sequence}"
+
+    def _parse_token(self, token: str):
+        instance, _, sequence = str(token).partition('-')
+        if instance != self.instance or not sequence.isdigit():
+            return None
+        sequence = int(sequence)
+        return sequence if self.expired_through <= sequence <= self.sequence else None
+
+    def root_of(self, path: str):
+        for root in self.roots:
+            if is_within(path, root):
+                return root
+        return None
+
+    def _record(self, path: str, change: str, is_dir: bool):
+        self.sequence += 1
+        self.events.append((self.sequence, path, change, is_dir))
+        if len(self.events) > self.max_events:
+            self.expired_through = self.events.popleft()[0]
+
+    @staticmethod
+    def _read_directory(path: str) -> DirectorySnapshot:
+        mtime_ns = os.stat(path).st_mtime_ns
+        entries = {dir_entry.name: CachedDirEntry.from_dir_entry(dir_entry) for dir_entry in scandir_list(path)}
+        return DirectorySnapshot(entries, mtime_ns)
+
+    def _scan(self, path: str) -> DirectorySnapshot:
+        snapshot = self._read_directory(path)
+        self.stats["directories_scanned"] += 1
+        return snapshot
+
+    def list_dir(self, path: str) -> list:
+        """
+        walk_directory 使用的 list_dir: 返回文件夹的快照，尚未索引时扫描并保存。
+        首次扫描在锁外进行，大文件夹的冷扫描不会阻塞文件系统通知的处理和其他请求；只在保存快照时持锁。
+        """
+        with self.lock:
+            snapshot = self.directories.get(path)
+            if snapshot is not None:
+                snapshot.last_used = time.monotonic()
+                return list(snapshot.entries.values())
+            sequence_before = self.sequence
+        scanned = self._read_directory(path)
+        with self.lock:
+            self.stats["directories_scanned"] += 1
+            snapshot = self.directories.get(path)
+            if snapshot is None:
+                snapshot = self.directories[path] = scanned
+                if self.sequence != sequence_before:
+                    # 扫描期间记录过变化 (可能发生在该文件夹中，而快照是在变化之前读取的)，下次查询前重新扫描
+                    self.dirty.add(path)
+                self._ensure_watch(path)
+                self._evict_if_needed()
+            snapshot.last_used = time.monotonic()
+            return list(snapshot.entries.values())
+
+    def _drop_subtree(self, path: str):
+        for directory in [directory for directory in self.directories if is_within(directory, path)]:
+            del self.directories[directory]
+
+    def _index_new_tree(self, path: str):
+        """新出现的文件夹: 扫描其整个子树并把其中的条目记录为新增。"""
+        pending = [path]
+        while pending and len(self.directories) < self.max_directories:
+            directory = pending.pop()
+            try:
+                snapshot = self._scan(directory)
+            except OSError:
+                continue
+            self.directories[directory] = snapshot
+            for entry in snapshot.entries.values():
+                self._record(entry.path, "added", entry.is_dir())
+                if entry.is_dir() and not entry.is_symlink():
+                    pending.append(entry.path)
+
+    def _rescan(self, path: str):
+        """重新扫描已索引的文件夹，与快照比较并记录变化。"""
+        old = self.directories.get(path)
+        if old is None:
+            return
+        self.stats["rescans"] += 1
+        try:
+            new = self._scan(path)
+        except OSError:
+            self._drop_subtree(path)
+            if os.path.dirname(path) not in self.directories:
+                self._record(path, "removed", True)  # 上级文件夹未索引时由这里记录删除
+            return
+        new.last_used = old.last_used
+        self.directories[path] = new
+        for name, entry in new.entries.items():
+            previous = old.entries.get(name)
+            if previous is None:
+                self._record(entry.path, "added", entry.is_dir())
+                if entry.is_dir() and not entry.is_symlink():
+                    self._index_new_tree(entry.path)
+            elif previous.signature() != entry.signature():
+                if previous.is_dir() != entry.is_dir():
+                    self._drop_subtree(entry.path)
+                    self._record(entry.path, "removed", previous.is_dir())
+                    self._record(entry.path, "added", entry.is_dir())
+                else:
+                    self._record(entry.path, "modified", entry.is_dir())
+        for name, previous in old.entries.items():
+            if name not in new.entries:
+                self._drop_subtree(previous.path)
+                self._record(previous.path, "removed", previous.is_dir())
+
+    def _evict_if_needed(self):
+        if len(self.directories) <= self.max_directories:
+            return
+        # 淘汰最久未被列出的文件夹 (约 10%)，它们的后续变化不再被跟踪，直到再次被列出
+        count = len(self.directories) - self.max_directories + self.max_directories // 10
+        for directory, _ in sorted(self.directories.items(), key=lambda item: item[1].last_used)[:count]:
+            del self.directories[directory]
+        self.stats["evictions"] += count
+
+    def invalidate(self, paths):
+        with self.lock:
+            for path in paths:
+                path = os.path.realpath(path)
+                self.dirty.add(os.path.dirname(path))
+                self.dirty.add(path)
+
+    def flush(self):
+        """处理所有待重新扫描的文件夹 (每次查询前调用)。"""
+        with self.lock:
+            while self.dirty:
+                pending, self.dirty = self.dirty, set()
+                for path in sorted(pending):
+                    self._rescan(path)
+
+    # --- 文件系统通知与轮询 ---
+
+    def _ensure_watch(self, path: str):
+        root = self.root_of(path)
+        if not self.use_watchdog or root is None or root in self.watched_roots:
+            return
+        self.watched_roots.add(root)
+        try:
+            if self.observer is None:
+                self.observer = Observer()
+                self.observer.daemon = True
+                self.observer.start()
+            self.observer.schedule(WatchHandler(self), root, recursive=True)
+            print(f"[Directory Index] 已开始监视 {root}", file=sys.stderr)
+        except Exception as e:
+            # 例如 inotify 监视数达到上限，该根目录改为轮询
+            self.watched_roots.discard(root)
+            self.use_watchdog = False
+            print(f"[Directory Index] 无法监视 {root} ({e})，改为轮询。", file=sys.stderr)
+
+    def on_watch_event(self, event_type: str, path: str, is_directory: bool):
+        if event_type in IGNORED_WATCH_EVENTS:
+            return
+        path = os.path.realpath(path)
+        parent = os.path.dirname(path)
+        with self.lock:
+            self.stats["watch_events"] += 1
+            if is_directory and event_type == "modified":
+                self.dirty.add(path)
+            elif parent in self.directories:
+                self.dirty.add(parent)
+            elif self.root_of(path):
+                # 未索引的文件夹中的变化直接记录
+                change = {"created": "added", "deleted": "removed"}.get(event_type, "modified")
+                self._record(path, change, is_directory)
+
+    def _is_watched(self, path: str) -> bool:
+        root = self.root_of(path)
+        return root is not None and root in self.watched_roots
+
+    def maintenance_loop(self):
+        last_poll = last_full_rescan = time.monotonic()
+        while not self.stop_event.wait(WATCH_DEBOUNCE_S):
+            try:
+                now = time.monotonic()
+                if self.poll_interval_s > 0 and now - last_poll >= self.poll_interval_s:
+                    last_poll = now
+                    full = self.full_rescan_interval_s > 0 and now - last_full_rescan >= self.full_rescan_interval_s
+                    if full:
+                        last_full_rescan = now
+                    self._poll(full)
+                self.flush()
+            except Exception:
+                traceback.print_exc(file=sys.stderr)
+
+    def _poll(self, full: bool):
+        """轮询未被监视的已索引文件夹: 修改时间变化的文件夹重新扫描；full 时全部重新扫描，以发现文件内容的修改。"""
+        with self.lock:
+            directories = [(path, snapshot.mtime_ns) for path, snapshot in self.directories.items() if not self._is_watched(path)]
+        for path, mtime_ns in directories:
+            try:
+                changed = full or os.stat(path).st_mtime_ns != mtime_ns
+            except OSError:
+                changed = True
+            if changed:
+                with self.lock:
+                    self.dirty.add(path)
+
+    # --- 请求处理 ---
+
+    def handle_list(self, request: dict) -> dict:
+        path = os.path.realpath(request["path"])
+        if self.root_of(path) is None:
+            return {"ok": False, "error": f"'{path}' 不在索引的根目录下。", "error_kind": "not_indexed"}
+        with self.lock:
+            self.stats["list_requests"] += 1
+        self.flush()
+        limit = max(1, int(request.get("limit", 300)))
+        # 遍历时不持锁 (list_dir 只在读取或保存快照时加锁)。令牌在遍历前取得: 遍历期间发生的变化序号更大，之后查询变化时不会遗漏
+        with self.lock:
+            token = self.token
+        entries = []
+        walker = walk_directory(
+            path, max_depth=request.get("max_depth"), include=request.get("include"), exclude=request.get("exclude"),
+            ignore_names=request.get("ignore_names") or (), respect_gitignore=request.get("respect_gitignore", True),
+            cursor_key=request.get("cursor_key"), list_dir=self.list_dir)
+        for entry in walker:
+            if len(entries) >= limit:
+                return {"ok": True, "entries": entries, "has_more": True, "token": token}
+            entries.append(serialize_entry(entry))
+        return {"ok": True, "entries": entries, "has_more": False, "token": token}
+
+    def handle_changes(self, request: dict) -> dict:
+        path = os.path.realpath(request["path"])
+        if self.root_of(path) is None:
+            return {"ok": False, "error": f"'{path}' 不在索引的根目录下。", "error_kind": "not_indexed"}
+        self.stats["change_requests"] += 1
+        self.flush()
+        limit = max(1, int(request.get("limit", 500)))
+        with self.lock:
+            since = self._parse_token(request.get("since", ""))
+            if since is None:
+                return {"ok": True, "expired": True, "changes": [], "has_more": False, "token": self.token}
+            # 同一路径的多次变化合并为一次: 新增后删除的不显示，删除后又新增的视为修改
+            merged = {}
+            for sequence, event_path, change, is_dir in self.events:
+                if sequence <= since or not is_within(event_path, path) or event_path == path:
+                    continue
+                first = merged.get(event_path, (change, change, is_dir))[0]
+                merged[event_path] = (first, change, is_dir)
+            changes = []
+            for event_path, (first, last, is_dir) in sorted(merged.items()):
+                if first == "added":
+                    if last == "removed":
+                        continue
+                    change = "added"
+                elif last == "removed":
+                    change = "removed"
+                else:
+                    change = "modified"
+                changes.append({"path": os.path.relpath(event_path, path).replace(os.sep, '/'), "change": change, "is_dir": is_dir})
+            return {"ok": True, "expired": False, "changes": changes[:limit], "has_more": len(changes) > limit, "token": self.token}
+
+    def describe(self) -> dict:
+        with self.lock:
+            return {**self.stats, "indexed_directories": len(self.directories), "events": len(self.events),
+                    "watched_roots": sorted(self.watched_roots), "watchdog_available": WATCHDOG_AVAILABLE, "token": self.token}
+
+    def close(self):
+        self.stop_event.set()
+        if self.observer is not None:
+            self.observer.stop()
+
+
+class WatchHandler(FileSystemEventHandler if WATCHDOG_AVAILABLE else object):
+    def __init__(self, index: DirectoryIndex):
+        super().__init__()
+        self.index = index
+
+    def on_any_event(self, event):
+        self.index.on_watch_event(event.event_type, event.src_path, event.is_directory)
+        dest_path = getattr(event, "dest_path", None)
+        if dest_path:
+            self.index.on_watch_event("created", dest_path, event.is_directory)
+
+
+def serialize_entry(entry: WalkEntry) -> dict:
+    stat = entry.dir_entry.stat(follow_symlinks=False)
+    return {"k": entry.path_keys, "y": entry.is_symlink, "e": entry.error, "l": entry.depth_limited,
+            "s": stat.st_size, "m": stat.st_mtime_ns, "t": getattr(entry.dir_entry, "link_target", None)}
+
+
+def deserialize_entry(root: str, data: dict) -> WalkEntry:
+    path_keys = tuple((flag, name) for flag, name in data["k"])
+    rel_path = '/'.join(name for _, name in path_keys)
+    name = path_keys[-1][1]
+    is_dir = path_keys[-1][0] == 0
+    dir_entry = CachedDirEntry(name, os.path.join(root, *rel_path.split('/')), is_dir, data["y"], data["s"], data["m"], data["t"])
+    return WalkEntry(name, rel_path, path_keys, len(path_keys), is_dir, data["y"], dir_entry, data["e"], data["l"])
+
+
+async def serve(service_config: dict):
+    index = DirectoryIndex(service_config)
+    loop = asyncio.get_running_loop()
+    stop_event = asyncio.Event()
+    last_activity = [time.monotonic()]
+    token = secrets.token_hex(16)
+    handlers = {"list": index.handle_list, "changes": index.handle_changes}
+
+    async def handle_client(reader, writer):
+        try:
+            line = await reader.readline()
+            if not line:
+                return
+            request = json.loads(line)
+            last_activity[0] = time.monotonic()
+            op = request.get("op")
+            if not secrets.compare_digest(str(request.get("token", "")), token):
+                response = {"ok": False, "error": "目录索引服务令牌无效。", "error_kind": "auth"}
+            elif op in handlers:
+                # 扫描文件系统可能较慢，在线程中执行，避免阻塞其他连接
+                response = await loop.run_in_executor(None, handlers[op], request)
+            elif op == "invalidate":
+                index.invalidate(request.get("paths") or [])
+                response = {"ok": True}
+            elif op == "stats":
+                response = {"ok": True, "stats": index.describe()}
+            elif op == "shutdown":
+                response = {"ok": True}
+                stop_event.set()
+            else:
+                response = {"ok": False, "error": f"未知操作 '{op}'", "error_kind": "internal"}
+        except OSError as e:
+            response = {"ok": False, "error": f"{type(e).__name__}: {e}", "error_kind": "os"}
+        except Exception as e:
+            traceback.print_exc(file=sys.stderr)
+            response = {"ok": False, "error": f"{type(e).__name__}: {e}", "error_kind": "internal"}
+        try:
+            writer.write((json.dumps(response, ensure_ascii=False) + "\n").encode('utf-8'))
+            await writer.drain()
+            writer.close()
+        except Exception:
+            pass
+
+    async def idle_watchdog():
+        idle_timeout_s = service_config["idle_timeout_s"]
+        while not stop_event.is_set():
+            await asyncio.sleep(5)
+            if idle_timeout_s > 0 and time.monotonic() - last_activity[0] > idle_timeout_s:
+                print(f"[Directory Index] 空闲超过 {idle_timeout_s} 秒，关闭目录索引服务。", file=sys.stderr)
+                stop_event.set()
+
+    server = await asyncio.start_server(handle_client, "127.0.0.1", service_config["port"], limit=STREAM_LIMIT_BYTES)
+    write_token_file(token)
+    mode = "watchdog 文件系统通知" if index.use_watchdog else f"轮询 (每 {service_config['poll_interval_s']} 秒)"
+    print(f"[Directory Index] 已在 127.0.0.1:{service_config['port']} 上启动 (PID: {os.getpid()}，{mode})，根目录: {index.roots}", file=sys.stderr)
+    maintenance = threading.Thread(target=index.maintenance_loop, daemon=True)
+    maintenance.start()
+    watchdog_task = asyncio.create_task(idle_watchdog())
+    async with server:
+        await stop_event.wait()
+    watchdog_task.cancel()
+    index.close()
+
+
+# --- 客户端 (同步，供插件使用) ---
+
+def start_service_process():
+    """以独立进程启动目录索引服务，使其在插件进程退出后继续常驻。"""
+    kwargs = {}
+    if sys.platform == "win32":
+        kwargs["creationflags"] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        kwargs["start_new_session"] = True
+    with open(SERVICE_LOG_FILE, 'a', encoding='utf-8') as log_file:
+        subprocess.Popen([sys.executable, "-m", "plugin_common.directory_index"], cwd=PROJECT_ROOT,
+                         stdin=subprocess.DEVNULL, stdout=log_file, stderr=log_file, **kwargs)
+
+
+def _connect(port: int):
+    return socket.create_connection(("127.0.0.1", port), timeout=2)
+
+
+def request_service(request: dict, start_if_needed: bool = True, timeout_s: float = REQUEST_TIMEOUT_S) -> dict:
+    """
+    向目录索引服务发送请求，服务未运行时自动启动 (start_if_needed 为 False 时不启动)。
+    无法连接时抛出 ConnectionError，调用方应回退到直接遍历文件系统。
+    """
+    port = load_service_config()["port"]
+    for attempt in range(2):
+        try:
+            connection = _connect(port)
+        except OSError:
+            if not start_if_needed:
+                raise ConnectionError("目录索引服务未运行。")
+            print("[Directory Index] 目录索引服务未运行，正在启动...", file=sys.stderr)
+            start_service_process()
+            deadline = time.monotonic() + SERVICE_START_TIMEOUT_S
+            while True:
+                time.sleep(0.2)
+                try:
+                    connection = _connect(port)
+                    break
+                except OSError:
+                    if time.monotonic() > deadline:
+                        raise ConnectionError(f"目录索引服务在 {SERVICE_START_TIMEOUT_S} 秒内未能启动，详见 {SERVICE_LOG_FILE}。")
+        try:
+            connection.settimeout(timeout_s)
+            connection.sendall((json.dumps({**request, "token": _read_token()}, ensure_ascii=False) + "\n").encode('utf-8'))
+            with connection.makefile('rb') as stream:
+                line = stream.readline()
+            if not line:
+                raise ConnectionError("目录索引服务未返回响应。")
+            response = json.loads(line)
+        except (OSError, ValueError) as e:
+            raise ConnectionError(f"与目录索引服务通信失败: {e}")
+        finally:
+            connection.close()
+        # 服务刚启动时令牌文件可能尚未写入，稍后重新读取令牌再试一次
+        if response.get("error_kind") != "auth" or attempt:
+            return response
+        time.sleep(0.2)
+
+
+def is_indexed_path(path: str) -> bool:
+    """path 是否由目录索引服务负责 (服务已启用且位于 file_operations_allowed_base_paths 之下)。"""
+    service_config = load_service_config()
+    if not service_config["enabled"]:
+        return False
+    path = os.path.realpath(path)
+    return any(is_within(path, root) for root in service_config["roots"])
+
+
+def list_entries(path: str, limit: int, **walk_options):
+    """
+    从索引中按 walk_directory 的参数列出条目，最多 limit 个。
+    返回 (WalkEntry 列表, 是否还有更多条目, 变更令牌)。服务不可用时抛出 ConnectionError，路径无法访问时抛出 OSError。
+    """
+    path = os.path.realpath(path)
+    response = request_service({"op": "list", "path": path, "limit": limit, **walk_options})
+    if not response.get("ok"):
+        if response.get("error_kind") == "os":
+            raise OSError(response.get("error"))
+        raise ConnectionError(response.get("error"))
+    return [deserialize_entry(path, data) for data in response["entries"]], response["has_more"], response["token"]
+
+
+def changes_since(path: str, token: str, limit: int) -> dict:
+    """查询 path 下自 token 以来的变化，返回服务的响应 (见文件开头的协议说明)。服务不可用时抛出 ConnectionError。"""
+    response = request_service({"op": "changes", "path": os.path.realpath(path), "since": token, "limit": limit})
+    if not response.get("ok"):
+        raise ConnectionError(response.get("error"))
+    return response
+
+
+def notify_paths_changed(paths):
+    """写文件的插件在写入后调用，使索引立即重新扫描相关文件夹。服务未运行时什么也不做。"""
+    try:
+        if load_service_config()["enabled"]:
+            request_service({"op": "invalidate", "paths": [os.path.realpath(path) for path in paths]}, start_if_needed=False, timeout_s=2)
+    except ConnectionError:
+        pass
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(serve(load_service_config()))
+    except OSError as e:
+        # 端口已被占用，通常意味着另一个服务实例已在运行
+        print(f"[Directory Index] 启动失败: {e}", file=sys.stderr)
+        sys.exit(1)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,306 @@
+import os
+import re
+import sys
+from bisect import bisect_left
+from operator import itemgetter
+from collections import namedtuple
+
+# 基于 os.scandir 的目录遍历。
+# 直接使用 DirEntry 中缓存的类型信息判断文件/文件夹，不再对每个条目额外调用 os.path.isdir；
+# 只有需要大小或修改时间时才调用 DirEntry.stat()。
+# 遍历为前序 (每个文件夹内先文件夹后文件，按名称排序)，顺序确定，可以用最后一个条目的位置 (cursor_key) 从中间继续遍历。
+# 支持最大深度、include/exclude glob、按名称忽略 (如 node_modules) 以及 .gitignore 规则。
+
+# path_keys: 从遍历根目录到该条目的每一级 (是否文件夹的排序标记, 名称)，最后一级即条目本身
+# error: 文件夹无法打开时的错误信息；depth_limited: 文件夹因达到最大深度而未展开
+WalkEntry = namedtuple("WalkEntry", ["name", "rel_path", "path_keys", "depth", "is_dir", "is_symlink", "dir_entry", "error", "depth_limited"])
+
+
+class CachedDirEntry:
+    """
+    与 os.DirEntry 接口相同的目录项快照 (name、path、is_dir()、is_symlink()、stat())，
+    由目录索引服务在内存中保存，或从服务返回的结果重建；stat() 只提供 st_size 与 st_mtime。
+    """
+    __slots__ = ("name", "path", "_is_dir", "_is_symlink", "st_size", "st_mtime_ns", "link_target")
+
+    def __init__(self, name: str, path: str, is_dir: bool, is_symlink: bool, st_size: int, st_mtime_ns: int, link_target=None):
+        self.name = name
+        self.path = path
+        self._is_dir = is_dir
+        self._is_symlink = is_symlink
+        self.st_size = st_size
+        self.st_mtime_ns = st_mtime_ns
+        self.link_target = link_target
+
+    @classmethod
+    def from_dir_entry(cls, dir_entry):
+        try:
+            is_symlink = dir_entry.is_symlink()
+            is_dir = dir_entry.is_dir()
+            stat = dir_entry.stat(follow_symlinks=False)
+            size, mtime_ns = stat.st_size, stat.st_mtime_ns
+        except OSError:
+            is_symlink, is_dir, size, mtime_ns = False, False, 0, 0
+        link_target = None
+        if is_symlink:
+            try:
+                link_target = os.readlink(dir_entry.path)
+            except OSError:
+                pass
+        return cls(dir_entry.name, dir_entry.path, is_dir, is_symlink, size, mtime_ns, link_target)
+
+    @property
+    def st_mtime(self) -> float:
+        return self.st_mtime_ns / 1e9
+
+    def is_dir(self, follow_symlinks: bool = True) -> bool:
+        return self._is_dir and (follow_symlinks or not self._is_symlink)
+
+    def is_symlink(self) -> bool:
+        return self._is_symlink
+
+    def stat(self, follow_symlinks: bool = True):
+        return self
+
+    def signature(self):
+        """用于判断条目是否变化: (类型, 大小, 修改时间)。文件夹的大小与修改时间不参与比较。"""
+        return (self._is_dir, self._is_symlink) if self._is_dir else (self._is_dir, self._is_symlink, self.st_size, self.st_mtime_ns)
+
+
+def scandir_list(directory: str) -> list:
+    with os.scandir(directory) as iterator:
+        return list(iterator)
+
+
+def sort_key(dir_flag: int, name: str) -> str:
+    # 拼成单个字符串比较，比元组键排序快得多 (大文件夹中排序是主要开销)
+    return f"{dir_flag}{name.casefold()}\x00{name}"
+
+
+def _translate_segment(segment: str) -> str:
+    regex = ''
+    i = 0
+    while i < len(segment):
+        ch = segment[i]
+        if ch == '*':
+            regex += '[^/]*'
+        elif ch == '?':
+            regex += '[^/]'
+        elif ch == '[':
+            end = segment.find(']', i + 2 if segment[i + 1:i + 2] in ('!', '^') else i + 1)
+            if end == -1:
+                regex += re.escape(ch)
+            else:
+                body = segment[i + 1:end]
+                if body.startswith('!'):
+                    body = '^' + body[1:]
+                regex += '[' + body.replace('\\', '\\\\') + ']'
+                i = end
+        else:
+            regex += re.escape(ch)
+        i += 1
+    return regex
+
+
+def translate_glob(pattern: str) -> str:
+    """把 glob 模式转换为正则: * 和 ? 不跨越 "/"，** 匹配任意层级。"""
+    segments = pattern.split('/')
+    regex = ''
+    for index, segment in enumerate(segments):
+        last = index == len(segments) - 1
+        if segment == '**':
+            regex += '.*' if last else '(?:.*/)?'
+        else:
+            regex += _translate_segment(segment) + ('' if last else '/')
+    return regex
+
+
+class GlobRule:
+    """
+    一条 gitignore 风格的模式。不含 "/" 的模式匹配任意层级的条目名称，含 "/" 的模式匹配相对路径；
+    以 "/" 结尾的模式只匹配文件夹，以 "!" 开头的模式表示重新包含。
+    """
+    __slots__ = ("regex", "negated", "dir_only", "anchored")
+
+    def __init__(self, pattern: str):
+        self.negated = pattern.startswith('!')
+        if self.negated:
+            pattern = pattern[1:]
+        if pattern.startswith('\\'):
+            pattern = pattern[1:]
+        self.dir_only = pattern.endswith('/')
+        pattern = pattern.rstrip('/')
+        self.anchored = '/' in pattern
+        self.regex = re.compile(translate_glob(pattern.lstrip('/')), re.DOTALL)
+
+    def matches(self, rel_path: str, name: str, is_dir: bool) -> bool:
+        if self.dir_only and not is_dir:
+            return False
+        return self.regex.fullmatch(rel_path if self.anchored else name) is not None
+
+
+class PathMatcher:
+    """include / exclude 使用的一组模式，任意一个匹配即为匹配。"""
+
+    def __init__(self, patterns):
+        self.rules = [GlobRule(str(pattern)) for pattern in patterns if str(pattern).strip()]
+
+    def matches(self, rel_path: str, name: str, is_dir: bool) -> bool:
+        return any(rule.matches(rel_path, name, is_dir) for rule in self.rules)
+
+
+class IgnoreFile:
+    """一个 .gitignore 文件中的规则，最后一条匹配的规则决定结果。"""
+
+    def __init__(self, lines):
+        self.rules = []
+        for line in lines:
+            line = line.rstrip('\r\n')
+            if not line.strip() or line.startswith('#'):
+                continue
+            self.rules.append(GlobRule(line.rstrip(' ')))
+
+    @classmethod
+    def load(cls, path: str):
+        try:
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                ignore_file = cls(f.readlines())
+        except OSError:
+            return None
+        return ignore_file if ignore_file.rules else None
+
+    def match(self, rel_path: str, name: str, is_dir: bool):
+        """返回 True (忽略)、False (被 "!" 规则重新包含) 或 None (没有规则匹配)。"""
+        for rule in reversed(self.rules):
+            if rule.matches(rel_path, name, is_dir):
+                return not rule.negated
+        return None
+
+
+def find_parent_ignore_files(root: str):
+    """
+    遍历根目录位于 git 工作区的子目录中时，加载工作区根目录到遍历根目录之间 (不含遍历根目录) 的 .gitignore。
+    返回 [(相对路径前缀, 0, IgnoreFile)]，格式与 walk_directory 内部使用的规则列表相同。
+    """
+    ancestors = []
+    current = root
+    while True:
+        parent = os.path.dirname(current)
+        if parent == current:
+            return []  # 不在 git 工作区中
+        ancestors.append(parent)
+        if os.path.exists(os.path.join(parent, '.git')):
+            break
+        current = parent
+    rules = []
+    for ancestor in reversed(ancestors):
+        ignore_file = IgnoreFile.load(os.path.join(ancestor, '.gitignore'))
+        if ignore_file:
+            lead = os.path.relpath(root, ancestor).replace(os.sep, '/') + '/'
+            rules.append((lead, 0, ignore_file))
+    return rules
+
+
+def _is_ignored(rules, names, name: str, is_dir: bool) -> bool:
+    ignored = None
+    for lead, cut, ignore_file in rules:
+        result = ignore_file.match(lead + '/'.join(names[cut:]), name, is_dir)
+        if result is not None:
+            ignored = result  # 更深层的 .gitignore 覆盖上层的结果
+    return bool(ignored)
+
+
+def walk_directory(root: str, max_depth=None, include=None, exclude=None, ignore_names=(), respect_gitignore=True, cursor_key=None,
+                   list_dir=scandir_list):
+    """
+    前序遍历 root 下的条目，逐个产生 WalkEntry。
+    max_depth 为 1 时只列出 root 的直接子项，None 表示不限制；include 只过滤文件，文件夹总是被遍历；
+    exclude、ignore_names 与 .gitignore 忽略的文件夹不会被进入。符号链接的文件夹不会被跟随。
+    cursor_key 为上一次遍历最后一个条目的 path_keys，给出时从该条目之后继续。
+    list_dir 返回文件夹中的 DirEntry (或 CachedDirEntry) 列表，默认直接调用 os.scandir，目录索引服务传入读取内存快照的函数。
+    root 本身无法打开时抛出 OSError。
+    """
+    root = os.path.realpath(root)
+    include_matcher = PathMatcher(include) if include else None
+    exclude_matcher = PathMatcher(exclude) if exclude else None
+    ignore_names = frozenset(ignore_names or ())
+    cursor_key = [(int(flag), str(name)) for flag, name in cursor_key] if cursor_key else None
+
+    # 栈中每一帧为 [条目列表, 下一个条目下标, 该文件夹适用的 .gitignore 规则, 文件夹的 path_keys, 文件夹的各级名称]；
+    # 条目为 (排序键, 名称, DirEntry, 是否文件夹, 是否符号链接)，只有实际产生时才构造 WalkEntry
+    stack = []
+
+    def open_frame(directory: str, keys: tuple, rules: list):
+        names = tuple(key[1] for key in keys)
+        dir_entries = list_dir(directory)
+        if respect_gitignore and any(entry.name == '.gitignore' for entry in dir_entries):
+            ignore_file = IgnoreFile.load(os.path.join(directory, '.gitignore'))
+            if ignore_file:
+                rules = rules + [('', len(names), ignore_file)]
+        prefix = '/'.join(names) + '/' if names else ''
+        items = []
+        for dir_entry in dir_entries:
+            name = dir_entry.name
+            if name in ignore_names:
+                continue
+            try:
+                is_symlink = dir_entry.is_symlink()
+                is_dir = dir_entry.is_dir()
+            except OSError:
+                is_symlink, is_dir = False, False
+            if exclude_matcher and exclude_matcher.matches(prefix + name, name, is_dir):
+                continue
+            if rules and _is_ignored(rules, names + (name,), name, is_dir):
+                continue
+            if include_matcher and not is_dir and not include_matcher.matches(prefix + name, name, is_dir):
+                continue
+            items.append((f"{0 if is_dir else 1}{name.casefold()}\x00{name}", name, dir_entry, is_dir, is_symlink))  # 同 sort_key
+        items.sort(key=itemgetter(0))
+        frame = [items, 0, rules, keys, prefix]
+        stack.append(frame)
+        return frame
+
+    def make_entry(frame, item):
+        _, name, dir_entry, is_dir, is_symlink = item
+        depth = len(frame[3]) + 1
+        depth_limited = is_dir and not is_symlink and max_depth is not None and depth >= max_depth
+        return WalkEntry(name, frame[4] + name, frame[3] + ((0 if is_dir else 1, name),), depth, is_dir, is_symlink, dir_entry, None, depth_limited)
+
+    frame = open_frame(root, (), find_parent_ignore_files(root) if respect_gitignore else [])
+
+    # 定位到 cursor_key 之后: 沿着 cursor 所在的路径逐层打开文件夹，跳过已经输出过的条目
+    level = 0
+    while cursor_key and level < len(cursor_key):
+        items = frame[0]
+        target = sort_key(*cursor_key[level])
+        position = bisect_left(items, target, key=itemgetter(0)) if sys.version_info >= (3, 10) \
+            else bisect_left([item[0] for item in items], target)
+        frame[1] = position
+        if position >= len(items) or items[position][0] != target:
+            break  # 该条目已不存在，从其后的位置继续
+        frame[1] = position + 1
+        entry = make_entry(frame, items[position])
+        if not entry.is_dir or entry.is_symlink or entry.depth_limited:
+            break
+        try:
+            frame = open_frame(entry.dir_entry.path, entry.path_keys, frame[2])
+        except OSError:
+            break
+        if level == len(cursor_key) - 1:
+            break  # cursor 指向该文件夹本身，从它的第一个子项继续
+        level += 1
+
+    while stack:
+        frame = stack[-1]
+        items, index = frame[0], frame[1]
+        if index >= len(items):
+            stack.pop()
+            continue
+        frame[1] = index + 1
+        entry = make_entry(frame, items[index])
+        if entry.is_dir and not entry.is_symlink and not entry.depth_limited:
+            try:
+                open_frame(entry.dir_entry.path, entry.path_keys, frame[2])
+            except OSError as error:
+                entry = entry._replace(error=error.strerror or str(error))
+        yield entry
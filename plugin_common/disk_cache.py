@@ -0,0 +1,259 @@
+import os
+import re
+import sys
+import json
+import gzip
+import time
+import atexit
+import hashlib
+import tempfile
+import threading
+
+from plugin_common.file_lock import file_lock
+
+# 插件共用的磁盘缓存。
+# 每个条目按其键的 SHA-256 存为独立文件，index.json 记录条目元数据 (大小、创建与最近访问时间)、
+# 别名 (例如请求URL -> 最终URL) 以及命中统计。支持 TTL 过期、总大小上限和按最近访问时间的 LRU 淘汰。
+# 多个插件进程 (插件宿主池的工作进程与单独启动的插件进程) 会同时读写: 索引的每次读改写都在文件锁 (index.lock) 内完成，
+# 写入时顺带清理索引中没有记录的条目文件和残留的临时文件，使总大小上限对磁盘上的全部文件成立。
+# 读取不加锁也不写索引，命中统计与最近访问时间先记在内存中，攒够一批或进程退出时再合并写入。
+
+INDEX_FILE_NAME = "index.json"
+LOCK_FILE_NAME = "index.lock"
+TMP_PREFIX = ".tmp-"
+STAT_KEYS = ("hits", "misses", "stores", "evictions", "expired", "orphans_removed")
+STATS_FLUSH_LOOKUPS = 20  # 攒够这么多次读取后合并写入索引
+STATS_FLUSH_SECONDS = 30
+STALE_TMP_SECONDS = 600  # 超过这个时间的临时文件视为写入进程崩溃后的残留
+ENTRY_FILE_PATTERN = re.compile(r'^([0-9a-f]{64})\.json(\.gz)?$')
+
+
+def _hash_key(key: str) -> str:
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def _atomic_write_bytes(path: str, data: bytes):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=TMP_PREFIX)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try: os.remove(tmp_path)
+        except OSError: pass
+        raise
+
+
+class _PendingStats:
+    """一个缓存目录在本进程中尚未写入索引的读取统计。同一目录的所有 DiskCache 实例共用。"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = dict.fromkeys(STAT_KEYS, 0)
+        self.last_access = {}
+        self.lookups = 0
+        self.since = time.time()
+
+    def take(self):
+        with self.lock:
+            counts, last_access = self.counts, self.last_access
+            self.counts, self.last_access = dict.fromkeys(STAT_KEYS, 0), {}
+            self.lookups = 0
+            self.since = time.time()
+        return counts, last_access
+
+
+_pending_by_directory = {}
+_pending_guard = threading.Lock()
+
+
+def _pending_for(directory: str) -> _PendingStats:
+    with _pending_guard:
+        return _pending_by_directory.setdefault(os.path.realpath(directory), _PendingStats())
+
+
+class DiskCache:
+    def __init__(self, directory: str, ttl_seconds: float, max_total_bytes: int, compress: bool = False):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.max_total_bytes = max_total_bytes
+        self.compress = compress
+        self.index_path = os.path.join(directory, INDEX_FILE_NAME)
+        self.lock_path = os.path.join(directory, LOCK_FILE_NAME)
+        os.makedirs(directory, exist_ok=True)
+        self.pending = _pending_for(directory)
+
+    # --- 索引 ---
+    def _load_index(self) -> dict:
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            index = {}
+        index.setdefault("entries", {})
+        index.setdefault("aliases", {})
+        stats = index.setdefault("stats", {})
+        for name in STAT_KEYS:
+            stats.setdefault(name, 0)
+        return index
+
+    def _save_index(self, index: dict):
+        try:
+            _atomic_write_bytes(self.index_path, json.dumps(index, ensure_ascii=False).encode('utf-8'))
+        except OSError as e:
+            print(f"警告: 写入缓存索引 {self.index_path} 失败: {e}", file=sys.stderr)
+
+    def _merge_pending(self, index: dict):
+        counts, last_access = self.pending.take()
+        for name, count in counts.items():
+            index["stats"][name] += count
+        for entry_id, accessed in last_access.items():
+            meta = index["entries"].get(entry_id)
+            if meta:
+                meta["last_access"] = max(meta["last_access"], accessed)
+
+    def _entry_path(self, entry_id: str) -> str:
+        return os.path.join(self.directory, entry_id + (".json.gz" if self.compress else ".json"))
+
+    def _remove_entry(self, index: dict, entry_id: str):
+        index["entries"].pop(entry_id, None)
+        for alias, target in list(index["aliases"].items()):
+            if target == entry_id:
+                del index["aliases"][alias]
+        try:
+            os.remove(self._entry_path(entry_id))
+        except OSError:
+            pass
+
+    def _is_expired(self, meta: dict, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - meta.get("created", 0) > self.ttl_seconds
+
+    def _sweep(self, index: dict, now: float):
+        """删除过期条目、文件已丢失的索引项、索引中没有记录的条目文件以及残留的临时文件。调用方持有文件锁。"""
+        for entry_id, meta in list(index["entries"].items()):
+            if self._is_expired(meta, now):
+                self._remove_entry(index, entry_id)
+                index["stats"]["expired"] += 1
+        on_disk = set()
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    match = ENTRY_FILE_PATTERN.match(entry.name)
+                    if match and bool(match.group(2)) == self.compress:
+                        if match.group(1) in index["entries"]:
+                            on_disk.add(match.group(1))
+                            continue
+                        # 其他进程在没有加锁的旧版本中写入、或写入索引前崩溃留下的文件，不会再被淘汰，直接删除
+                        index["stats"]["orphans_removed"] += 1
+                    elif not (entry.name.startswith(TMP_PREFIX) and now - entry.stat().st_mtime > STALE_TMP_SECONDS):
+                        continue
+                    try: os.remove(entry.path)
+                    except OSError: pass
+        except OSError as e:
+            print(f"警告: 扫描缓存目录 {self.directory} 失败: {e}", file=sys.stderr)
+            return
+        for entry_id in set(index["entries"]) - on_disk:
+            self._remove_entry(index, entry_id)
+
+    # --- 读写 ---
+    def get(self, key: str):
+        """按键或别名读取条目，未命中或已过期时返回 None。不加锁也不写索引，统计稍后合并写入。"""
+        index = self._load_index()
+        now = time.time()
+        key_id = _hash_key(key)
+        entry_id = key_id if key_id in index["entries"] else index["aliases"].get(key_id)
+        meta = index["entries"].get(entry_id) if entry_id else None
+
+        value = None
+        expired = bool(meta) and self._is_expired(meta, now)
+        if meta and not expired:
+            try:
+                with open(self._entry_path(entry_id), 'rb') as f:
+                    raw = f.read()
+                value = json.loads(gzip.decompress(raw) if self.compress else raw)
+            except (OSError, ValueError):
+                value = None  # 文件已被其他进程淘汰或损坏，下次写入时清理索引
+
+        pending = self.pending
+        with pending.lock:
+            pending.counts["hits" if value is not None else "misses"] += 1
+            if expired:
+                pending.counts["expired"] += 1
+            if value is not None:
+                pending.last_access[entry_id] = now
+            pending.lookups += 1
+            due = pending.lookups >= STATS_FLUSH_LOOKUPS or now - pending.since >= STATS_FLUSH_SECONDS
+        if due:
+            self.flush()
+        return value
+
+    def put(self, key: str, value: dict, aliases=()):
+        """写入条目，aliases 中的键也会指向该条目。写入后按 TTL 与总大小上限清理旧条目。"""
+        data = json.dumps(value, ensure_ascii=False).encode('utf-8')
+        if self.compress:
+            data = gzip.compress(data)
+        if self.max_total_bytes > 0 and len(data) > self.max_total_bytes:
+            return  # 单个条目就超过上限，不缓存
+
+        entry_id = _hash_key(key)
+        with file_lock(self.lock_path):
+            try:
+                _atomic_write_bytes(self._entry_path(entry_id), data)
+            except OSError as e:
+                print(f"警告: 写入缓存条目失败: {e}", file=sys.stderr)
+                return
+
+            index = self._load_index()
+            self._merge_pending(index)
+            now = time.time()
+            index["entries"][entry_id] = {"key": key, "size": len(data), "created": now, "last_access": now}
+            for alias in aliases:
+                alias_id = _hash_key(alias)
+                if alias_id != entry_id:
+                    index["aliases"][alias_id] = entry_id
+            index["stats"]["stores"] += 1
+
+            self._sweep(index, now)
+            if self.max_total_bytes > 0:
+                total = sum(meta["size"] for meta in index["entries"].values())
+                for other_id, meta in sorted(index["entries"].items(), key=lambda item: item[1]["last_access"]):
+                    if total <= self.max_total_bytes:
+                        break
+                    if other_id == entry_id:
+                        continue
+                    total -= meta["size"]
+                    self._remove_entry(index, other_id)
+                    index["stats"]["evictions"] += 1
+            self._save_index(index)
+
+    def flush(self):
+        """把本进程尚未写入的读取统计与最近访问时间合并到索引。"""
+        with self.pending.lock:
+            if not self.pending.lookups:
+                return
+        with file_lock(self.lock_path):
+            index = self._load_index()
+            self._merge_pending(index)
+            self._save_index(index)
+
+    def stats(self) -> dict:
+        self.flush()
+        index = self._load_index()
+        stats = dict(index["stats"])
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats["entries"] = len(index["entries"])
+        stats["total_bytes"] = sum(meta["size"] for meta in index["entries"].values())
+        stats["max_total_bytes"] = self.max_total_bytes
+        stats["ttl_seconds"] = self.ttl_seconds
+        return stats
+
+
+@atexit.register
+def _flush_pending_stats():
+    # 单独启动的插件进程通常只读一次缓存，退出前写入这次的统计
+    for directory in list(_pending_by_directory):
+        try:
+            DiskCache(directory, ttl_seconds=0, max_total_bytes=0).flush()
+        except OSError as e:
+            print(f"警告: 写入缓存统计失败: {e}", file=sys.stderr)
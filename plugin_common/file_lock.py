@@ -0,0 +1,49 @@
+import os
+import time
+from contextlib import contextmanager
+
+# 进程间文件锁: 多个插件进程 (插件宿主池的各个工作进程以及单独启动的插件进程) 读改写同一份磁盘状态时使用。
+# POSIX 上使用 flock，Windows 上使用 msvcrt.locking 锁定锁文件的第一个字节。
+# 锁随文件描述符关闭而释放，进程崩溃时也不会留下无法释放的锁。同一进程的不同线程各自打开锁文件，因此线程之间同样互斥。
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+WINDOWS_RETRY_SECONDS = 0.05
+
+
+def _lock(fd: int):
+    if fcntl:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        return
+    while True:
+        try:
+            msvcrt.locking(fd, msvcrt.LK_LOCK, 1)  # 内部重试约 10 秒后抛出 OSError，继续等待
+            return
+        except OSError:
+            time.sleep(WINDOWS_RETRY_SECONDS)
+
+
+def _unlock(fd: int):
+    if fcntl:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def file_lock(path: str):
+    """独占锁定 path (不存在时创建)，with 块结束后释放。"""
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o666)
+    try:
+        _lock(fd)
+        try:
+            yield
+        finally:
+            _unlock(fd)
+    finally:
+        os.close(fd)
@@ -0,0 +1,73 @@
+import codecs
+import threading
+
+# 有上限的子进程输出捕获。
+# 执行命令或代码的插件原先把 stdout/stderr 全部读入内存，再原样返回给代理和 AI；输出很多的命令 (例如构建日志)
+# 会让几百 MB 的数据依次经过子进程、插件和代理。这里边读边丢: 每个流只保留开头 head_bytes 与结尾 tail_bytes 字节，
+# 中间部分只计数，返回的文本中用一行说明标出省略了多少字节。读取在后台线程中进行，
+# 超时终止进程后仍能拿到超时前的输出。
+
+READ_CHUNK_BYTES = 65536
+
+
+class BoundedOutput:
+    """保留写入数据的开头 head_bytes 与结尾 tail_bytes 字节，中间的字节只计数。"""
+
+    def __init__(self, head_bytes: int, tail_bytes: int):
+        self.head_bytes = max(0, head_bytes)
+        self.tail_bytes = max(0, tail_bytes)
+        self.head = bytearray()
+        self.tail = bytearray()  # 超过 2 倍 tail_bytes 时才裁剪，均摊为线性时间
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+
+    def write(self, data: bytes):
+        with self.lock:
+            self.total_bytes += len(data)
+            if len(self.head) < self.head_bytes:
+                taken = self.head_bytes - len(self.head)
+                self.head += data[:taken]
+                data = data[taken:]
+            if not data or not self.tail_bytes:
+                return
+            self.tail += data
+            if len(self.tail) > 2 * self.tail_bytes:
+                del self.tail[:len(self.tail) - self.tail_bytes]
+
+    @property
+    def omitted_bytes(self) -> int:
+        with self.lock:
+            return self.total_bytes - len(self.head) - min(len(self.tail), self.tail_bytes)
+
+    def text(self) -> str:
+        """按 UTF-8 解码保留的内容；有省略时在开头与结尾之间插入一行说明。截断处不完整的多字节字符会被去掉。"""
+        with self.lock:
+            head, tail = bytes(self.head), bytes(self.tail[-self.tail_bytes:] if self.tail_bytes else b'')
+        omitted = self.total_bytes - len(head) - len(tail)
+        if not omitted:
+            return (head + tail).decode('utf-8', errors='replace')
+        head_text = codecs.getincrementaldecoder('utf-8')(errors='replace').decode(head, final=False)
+        tail = tail[next((i for i, byte in enumerate(tail[:4]) if byte & 0xC0 != 0x80), 0):]  # 跳过开头的后续字节
+        return f"{head_text}\n... [中间省略 {omitted} 字节] ...\n{tail.decode('utf-8', errors='replace')}"
+
+
+class PipeReader(threading.Thread):
+    """在后台线程中把二进制管道读到 BoundedOutput，直到管道关闭。也避免输出较多时子进程因管道写满而阻塞。"""
+
+    def __init__(self, pipe, output: BoundedOutput):
+        super().__init__(daemon=True)
+        self.pipe = pipe
+        self.output = output
+
+    def run(self):
+        try:
+            with self.pipe:
+                for chunk in iter(lambda: self.pipe.read1(READ_CHUNK_BYTES), b''):
+                    self.output.write(chunk)
+        except (OSError, ValueError):
+            pass  # 管道被另一方关闭 (例如超时后终止进程)
+
+
+def omitted_bytes_summary(**outputs: BoundedOutput) -> dict:
+    """返回 {"stdout": 省略字节数, ...}，只包含有省略的流。"""
+    return {name: output.omitted_bytes for name, output in outputs.items() if output.omitted_bytes}
@@ -0,0 +1,99 @@
+import sys
+import time
+import asyncio
+
+from playwright.async_api import Error as PlaywrightError
+
+# 页面就绪判断与资源拦截，供浏览器服务和插件的本地浏览器方式共用。
+# 导航 (domcontentloaded) 之后不再固定等待 wait_after_load 秒，而是在以下任一条件满足时立即返回:
+#   - 网络空闲 (networkidle)；
+#   - 页面文本长度与元素数量在 dom_stable_ms 内保持不变；
+#   - 达到最长等待时间 (即原来的 wait_after_load)。
+# 图片、媒体、字体等与文本提取无关的资源通过请求路由直接拦截，使页面更快达到空闲。
+
+DEFAULT_BLOCKED_RESOURCE_TYPES = ["image", "media", "font"]
+DEFAULT_DOM_STABLE_MS = 500
+POLL_INTERVAL_MS = 100
+
+DOM_SNAPSHOT_JS = "() => document.body ? [document.body.textContent.length, document.body.getElementsByTagName('*').length] : null"
+
+
+class ResourceBlocker:
+    """页面上的请求路由。页面被复用时可以为每次请求重新设置拦截的资源类型。"""
+    def __init__(self):
+        self.blocked_types = set()
+        self.blocked_count = 0
+
+    async def attach(self, page):
+        # 注意: 启用路由后 Chromium 不再使用 HTTP 缓存，因此只在确实需要拦截时才挂上
+        await page.route("**/*", self._handle_route)
+
+    def start_request(self, blocked_types):
+        self.blocked_types = set(blocked_types or [])
+        self.blocked_count = 0
+
+    async def _handle_route(self, route):
+        try:
+            if route.request.resource_type in self.blocked_types:
+                self.blocked_count += 1
+                await route.abort()
+            else:
+                await route.continue_()
+        except PlaywrightError:
+            pass  # 页面已关闭或已导航到别处
+
+
+async def attach_resource_blocker(page, blocked_types):
+    """为页面挂上资源拦截，blocked_types 为空时不挂，返回 ResourceBlocker 或 None。"""
+    if not blocked_types:
+        return None
+    blocker = ResourceBlocker()
+    blocker.start_request(blocked_types)
+    await blocker.attach(page)
+    return blocker
+
+
+async def wait_until_ready(page, max_wait_ms: int, dom_stable_ms: int = DEFAULT_DOM_STABLE_MS):
+    """等待页面就绪。返回 (就绪原因, 等待毫秒数)，原因为 network_idle / dom_stable / max_wait / skipped。"""
+    if max_wait_ms <= 0:
+        return "skipped", 0
+    started = time.monotonic()
+    network_idle = asyncio.ensure_future(page.wait_for_load_state("networkidle", timeout=max_wait_ms))
+    last_snapshot, stable_since = None, started
+    try:
+        while True:
+            elapsed_ms = (time.monotonic() - started) * 1000
+            if network_idle.done() and not network_idle.cancelled() and network_idle.exception() is None:
+                return "network_idle", round(elapsed_ms)
+            if elapsed_ms >= max_wait_ms:
+                return "max_wait", round(elapsed_ms)
+
+            try:
+                snapshot = await page.evaluate(DOM_SNAPSHOT_JS)
+            except PlaywrightError:
+                snapshot = None  # 页面仍在跳转，执行上下文已销毁
+            now = time.monotonic()
+            if snapshot is None or snapshot != last_snapshot:
+                last_snapshot, stable_since = snapshot, now
+            elif (now - stable_since) * 1000 >= dom_stable_ms:
+                return "dom_stable", round((now - started) * 1000)
+
+            remaining_s = max(0.0, (max_wait_ms - (now - started) * 1000) / 1000)
+            await asyncio.wait({network_idle}, timeout=min(POLL_INTERVAL_MS / 1000, remaining_s))
+    finally:
+        if not network_idle.done():
+            network_idle.cancel()
+        try:
+            await network_idle
+        except (asyncio.CancelledError, PlaywrightError):
+            pass
+
+
+def format_timing(url: str, timing: dict) -> str:
+    return (f"{url} 导航 {timing.get('goto_ms')}ms, 就绪等待 {timing.get('ready_ms')}ms ({timing.get('ready_reason')}), "
+            f"拦截资源 {timing.get('blocked_requests', 0)} 个, 总计 {timing.get('total_ms')}ms")
+
+
+def log_timing(prefix: str, url: str, timing: dict):
+    if timing:
+        print(f"{prefix} 页面计时: {format_timing(url, timing)}", file=sys.stderr)
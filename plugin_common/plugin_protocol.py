@@ -0,0 +1,51 @@
+import os
+import sys
+import struct
+
+# 代理与插件进程之间的长度前缀帧: 4 字节大端无符号整数表示负载长度，其后为负载字节。
+# 常驻插件宿主池的请求/响应，以及单独启动的插件进程的参数都通过 stdin/stdout 上的帧传递，
+# 不再受命令行单个参数的长度限制 (Linux 约 128KB，Windows 整个命令行 32767 个字符)。
+# 帧格式与 plugin_frame.js 保持一致。
+
+FRAME_HEADER = struct.Struct(">I")
+ARGUMENT_STDIN_ENV = "XICE_PLUGIN_ARGUMENT_STDIN"
+CONVERSATION_ID_ENV = "XICE_PLUGIN_CONVERSATION_ID"
+
+
+def read_frame(stream):
+    """从二进制流读取一帧。流在帧边界处结束时返回 None，帧不完整时抛出 EOFError。"""
+    header = stream.read(FRAME_HEADER.size)
+    if not header:
+        return None
+    if len(header) < FRAME_HEADER.size:
+        raise EOFError("帧头不完整。")
+    (size,) = FRAME_HEADER.unpack(header)
+    payload = stream.read(size)
+    if len(payload) < size:
+        raise EOFError(f"帧不完整: 需要 {size} 字节，只收到 {len(payload)} 字节。")
+    return payload
+
+
+def write_frame(stream, payload: bytes):
+    """写入一帧 (不刷新)。负载单独写入，避免为拼接帧头再复制一份大负载。"""
+    stream.write(FRAME_HEADER.pack(len(payload)))
+    stream.write(payload)
+
+
+def read_plugin_argument():
+    """
+    单独启动的插件进程获取参数。代理设置了环境变量 XICE_PLUGIN_ARGUMENT_STDIN=1 时，参数以一帧 UTF-8 文本从 stdin 传入；
+    否则兼容原先的方式，使用 sys.argv[1]。没有参数时返回 None。
+    """
+    if os.environ.get(ARGUMENT_STDIN_ENV) == "1":
+        payload = read_frame(sys.stdin.buffer)
+        return payload.decode('utf-8') if payload is not None else None
+    return sys.argv[1] if len(sys.argv) > 1 else None
+
+
+def current_conversation_id():
+    """
+    当前调用所在对话的标识 (由代理根据 X-Conversation-Id 请求头或对话开头的消息得出)，未知时返回 None。
+    常驻插件宿主在每次调用前设置该环境变量，单独启动的插件进程由代理在启动时设置。
+    """
+    return os.environ.get(CONVERSATION_ID_ENV) or None
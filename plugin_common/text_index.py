@@ -0,0 +1,389 @@
+import os
+import re
+import sys
+import pickle
+import secrets
+import tempfile
+from array import array
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from plugin_common.directory_walk import walk_directory
+from plugin_common.directory_index import is_within
+from plugin_common.file_lock import file_lock
+
+try:
+    import re._parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse
+
+# 全文搜索使用的倒排索引。
+# 文档按小写后的词 (字母、数字、下划线组成的连续串，或单个汉字) 建立倒排表，记录每个词在每个文件中出现的次数。
+# 子串/正则查询先用查询中必然出现的字面量找出候选文件: 文件中包含子串 S，则 S 中的每个词都是文件中某个词的子串，
+# 因此在词表中查找包含该词的所有词即可得到不漏的候选集；再对候选文件按 TF-IDF 打分 (NumPy 向量化计算)，
+# 最后由调用方逐个读取候选文件确认匹配的行。
+#
+# 索引分为两段: base 为按词编号排列的 CSR 数组 (offsets / docs / tfs)，delta 为最近新增文档的倒排表 (Python 列表)。
+# 文件变化时按 (大小, 修改时间) 判断，删除或修改的文档只标记为失效，新内容作为新文档加入 delta；
+# delta 或失效文档占比过大时合并为新的 base 并重新编号文档。
+# 磁盘上保存为 state.pkl (词表、文档表、delta 等) 与 base-<编号>.npz，均通过临时文件 + 重命名写入。
+# 插件宿主池的每个工作进程各自在内存中持有一份索引: 更新与保存都在 index.lock 文件锁内进行，
+# 持锁后先检查 state.pkl 是否已被其他进程更新 (is_stale)，是则重新读取，保证 state.pkl 指向的 base 文件始终存在。
+
+INDEX_FORMAT_VERSION = 1
+TOKEN_RE = re.compile(r"[0-9a-z_]+|[㐀-䶿一-鿿]")
+BINARY_SNIFF_BYTES = 8192
+# 某个字面量对应的词超过此数量时 (例如单个字母)，该字面量几乎不缩小候选范围，不再用于筛选与打分
+MAX_EXPANDED_TERMS = 5000
+STATE_FILE_NAME = "state.pkl"
+LOCK_FILE_NAME = "index.lock"
+
+
+def tokenize(text: str) -> Counter:
+    return Counter(TOKEN_RE.findall(text.lower()))
+
+
+def decode_text(data: bytes):
+    """把文件内容解码为文本；含 NUL 字节 (二进制文件) 时返回 None。"""
+    if b'\0' in data[:BINARY_SNIFF_BYTES]:
+        return None
+    for encoding in ('utf-8-sig', 'gbk'):
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return data.decode('latin-1')
+
+
+def read_text_file(path: str, max_bytes: int):
+    """读取文本文件，超过 max_bytes、无法读取或为二进制文件时返回 None。"""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read(max_bytes + 1)
+    except OSError:
+        return None
+    if len(data) > max_bytes:
+        return None
+    return decode_text(data)
+
+
+def query_literals(query: str, regex: bool = False) -> list:
+    """
+    返回查询匹配时必然出现的词 (已转为小写)。
+    正则只取顶层 (及必须出现的分组、重复至少一次的部分) 中连续的字面字符，遇到分支 (|) 的部分不取。
+    """
+    if not regex:
+        return TOKEN_RE.findall(query.lower())
+    runs = []
+
+    def collect(items):
+        current = []
+        for op, value in items:
+            name = str(op)
+            if name == "LITERAL":
+                current.append(chr(value))
+                continue
+            runs.append(''.join(current))
+            current = []
+            if name == "SUBPATTERN":
+                collect(value[-1])
+            elif name in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT") and value[0] >= 1:
+                collect(value[2])
+            elif name == "ATOMIC_GROUP":
+                collect(value)
+        runs.append(''.join(current))
+
+    try:
+        collect(sre_parse.parse(query))
+    except (re.error, RecursionError, TypeError, ValueError):
+        return []
+    return [token for run in runs for token in TOKEN_RE.findall(run.lower())]
+
+
+def _atomic_write(path: str, write):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try: os.remove(tmp_path)
+        except OSError: pass
+        raise
+
+
+class TextIndex:
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.vocab = []                 # 词编号 -> 词
+        self.term_ids = {}              # 词 -> 词编号
+        self.paths = []                 # 文档编号 -> 绝对路径 (失效文档为 None)
+        self.files = {}                 # 绝对路径 -> (文档编号, 大小, 修改时间)；非文本文件的文档编号为 -1
+        self.doc_lengths = array('f')   # 文档编号 -> 词数
+        self.alive = bytearray()        # 文档编号 -> 是否有效
+        self.base_id = None
+        self.base_offsets = np.zeros(1, dtype=np.int64)
+        self.base_docs = np.zeros(0, dtype=np.int32)
+        self.base_tfs = np.zeros(0, dtype=np.float32)
+        self.delta = {}                 # 词编号 -> ([文档编号...], [次数...])
+        self.delta_postings = 0
+        self.dead_documents = 0
+        self._vocab_blob = None         # (词数, "\n词0\n词1\n...", 各词起始位置)
+        self._state_stat = None         # 读取或保存 state.pkl 时的 (inode, 大小, 修改时间)
+
+    # --- 持久化 ---
+
+    @staticmethod
+    def lock(directory: str):
+        """进程间互斥锁，在读取最新状态、refresh 与 save 期间持有。"""
+        os.makedirs(directory, exist_ok=True)
+        return file_lock(os.path.join(directory, LOCK_FILE_NAME))
+
+    def _stat_state_file(self):
+        try:
+            stat = os.stat(os.path.join(self.directory, STATE_FILE_NAME))
+        except OSError:
+            return None
+        return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+    def is_stale(self) -> bool:
+        """磁盘上的 state.pkl 是否已被其他进程替换 (内存中的索引不是最新的)。"""
+        return self._stat_state_file() != self._state_stat
+
+    @classmethod
+    def load(cls, directory: str):
+        """从 directory 读取索引；不存在或已损坏时返回空索引。"""
+        index = cls(directory)
+        try:
+            state_stat = index._stat_state_file()
+            with open(os.path.join(directory, STATE_FILE_NAME), 'rb') as f:
+                state = pickle.load(f)
+        except FileNotFoundError:
+            return index
+        except Exception as e:
+            print(f"警告: 读取搜索索引 {directory} 失败 ({type(e).__name__}: {e})，将重新建立索引。", file=sys.stderr)
+            return index
+        try:
+            if state.get("version") != INDEX_FORMAT_VERSION:
+                return index
+            if state["base_id"] is not None:
+                with np.load(os.path.join(directory, f"base-{state['base_id']}.npz")) as base:
+                    index.base_offsets, index.base_docs, index.base_tfs = base["offsets"], base["docs"], base["tfs"]
+            for key in ("vocab", "paths", "files", "doc_lengths", "alive", "base_id", "delta", "delta_postings", "dead_documents"):
+                setattr(index, key, state[key])
+            index.term_ids = {term: term_id for term_id, term in enumerate(index.vocab)}
+            index._state_stat = state_stat
+        except Exception as e:
+            print(f"警告: 读取搜索索引 {directory} 失败 ({type(e).__name__}: {e})，将重新建立索引。", file=sys.stderr)
+            index = cls(directory)
+        return index
+
+    def save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        state = {"version": INDEX_FORMAT_VERSION, "vocab": self.vocab, "paths": self.paths, "files": self.files,
+                 "doc_lengths": self.doc_lengths, "alive": self.alive, "base_id": self.base_id, "delta": self.delta,
+                 "delta_postings": self.delta_postings, "dead_documents": self.dead_documents}
+        _atomic_write(os.path.join(self.directory, STATE_FILE_NAME), lambda f: pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL))
+        self._state_stat = self._stat_state_file()
+        # 删除不再使用的 base 文件 (其他插件进程已加载到内存中的不受影响)。调用方持有 lock()，
+        # 刚写入的 state.pkl 就是磁盘上的当前状态，除它指向的 base 文件外都不再被引用
+        for name in os.listdir(self.directory):
+            if name.startswith("base-") and name != f"base-{self.base_id}.npz":
+                try: os.remove(os.path.join(self.directory, name))
+                except OSError: pass
+
+    def _save_base(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self.base_id = secrets.token_hex(6)
+        _atomic_write(os.path.join(self.directory, f"base-{self.base_id}.npz"),
+                      lambda f: np.savez(f, offsets=self.base_offsets, docs=self.base_docs, tfs=self.base_tfs))
+
+    # --- 文档增删 ---
+
+    @property
+    def document_count(self) -> int:
+        return len(self.paths) - self.dead_documents
+
+    def add_document(self, path: str, size: int, mtime_ns: int, text):
+        self.remove_document(path)
+        if text is None:
+            self.files[path] = (-1, size, mtime_ns)
+            return
+        doc_id = len(self.paths)
+        counts = tokenize(text)
+        self.paths.append(path)
+        self.files[path] = (doc_id, size, mtime_ns)
+        self.doc_lengths.append(sum(counts.values()))
+        self.alive.append(1)
+        term_ids, vocab, delta = self.term_ids, self.vocab, self.delta
+        for term, count in counts.items():
+            term_id = term_ids.get(term)
+            if term_id is None:
+                term_id = term_ids[term] = len(vocab)
+                vocab.append(term)
+            postings = delta.get(term_id)
+            if postings is None:
+                postings = delta[term_id] = ([], [])
+            postings[0].append(doc_id)
+            postings[1].append(count)
+        self.delta_postings += len(counts)
+
+    def remove_document(self, path: str):
+        info = self.files.pop(path, None)
+        if info is None or info[0] < 0:
+            return
+        self.alive[info[0]] = 0
+        self.paths[info[0]] = None
+        self.dead_documents += 1
+
+    def needs_compaction(self) -> bool:
+        return self.delta_postings > max(200000, len(self.base_docs) // 4) or self.dead_documents > max(1000, len(self.paths) // 4)
+
+    def compact(self):
+        """把 delta 合并进 base，丢弃失效文档并重新编号。"""
+        base_terms = np.repeat(np.arange(len(self.base_offsets) - 1, dtype=np.int32), np.diff(self.base_offsets))
+        delta_terms, delta_docs, delta_tfs = [], [], []
+        for term_id, (docs, tfs) in self.delta.items():
+            delta_terms.append(np.full(len(docs), term_id, dtype=np.int32))
+            delta_docs.append(np.asarray(docs, dtype=np.int32))
+            delta_tfs.append(np.asarray(tfs, dtype=np.float32))
+        terms = np.concatenate([base_terms, *delta_terms])
+        docs = np.concatenate([self.base_docs, *delta_docs])
+        tfs = np.concatenate([self.base_tfs, *delta_tfs])
+
+        alive = np.frombuffer(bytes(self.alive), dtype=np.uint8).astype(bool)
+        keep = alive[docs]
+        terms, docs, tfs = terms[keep], docs[keep], tfs[keep]
+        new_ids = np.cumsum(alive, dtype=np.int64) - 1
+        docs = new_ids[docs].astype(np.int32)
+        order = np.lexsort((docs, terms))
+        self.base_docs, self.base_tfs = docs[order], tfs[order]
+        self.base_offsets = np.zeros(len(self.vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms, minlength=len(self.vocab)), out=self.base_offsets[1:])
+
+        doc_lengths = np.frombuffer(self.doc_lengths, dtype=np.float32)[alive]
+        self.doc_lengths = array('f', doc_lengths.tobytes())
+        self.paths = [path for path in self.paths if path is not None]
+        self.alive = bytearray(b'\x01' * len(self.paths))
+        for doc_id, path in enumerate(self.paths):
+            _, size, mtime_ns = self.files[path]
+            self.files[path] = (doc_id, size, mtime_ns)
+        self.delta, self.delta_postings, self.dead_documents = {}, 0, 0
+        self._save_base()
+
+    # --- 与文件系统同步 ---
+
+    def refresh(self, roots, ignore_names=(), respect_gitignore=True, max_file_bytes=1024 * 1024, read_workers=8, exclude_paths=()):
+        """
+        遍历 roots，按 (大小, 修改时间) 找出新增、修改和删除的文件并更新索引。
+        返回 {"added": n, "updated": n, "removed": n, "scanned": n}。
+        """
+        seen = set()
+        pending = []
+        exclude_prefixes = tuple(path.rstrip(os.sep) + os.sep for path in exclude_paths)
+        for root in roots:
+            if not os.path.isdir(root):
+                continue
+            for entry in walk_directory(root, ignore_names=ignore_names, respect_gitignore=respect_gitignore):
+                if entry.is_dir or entry.is_symlink:
+                    continue
+                path = entry.dir_entry.path
+                if exclude_prefixes and path.startswith(exclude_prefixes):
+                    continue
+                try:
+                    stat = entry.dir_entry.stat()
+                except OSError:
+                    continue
+                seen.add(path)
+                info = self.files.get(path)
+                if info is None or info[1] != stat.st_size or info[2] != stat.st_mtime_ns:
+                    pending.append((path, stat.st_size, stat.st_mtime_ns, info is not None))
+
+        removed = [path for path in self.files if path not in seen and any(is_within(path, root) for root in roots)]
+        for path in removed:
+            self.remove_document(path)
+
+        def load(item):
+            path, size, _, _ = item
+            return read_text_file(path, max_file_bytes) if size <= max_file_bytes else None
+
+        with ThreadPoolExecutor(max_workers=max(1, read_workers)) as executor:
+            for item, text in zip(pending, executor.map(load, pending)):
+                self.add_document(item[0], item[1], item[2], text)
+        if self.needs_compaction():
+            self.compact()
+        updated = sum(1 for item in pending if item[3])
+        return {"added": len(pending) - updated, "updated": updated, "removed": len(removed), "scanned": len(seen)}
+
+    # --- 查询 ---
+
+    def _matching_terms(self, literal: str) -> np.ndarray:
+        """词表中包含 literal 的所有词的编号。"""
+        if self._vocab_blob is None or self._vocab_blob[0] != len(self.vocab):
+            blob = "\n" + "\n".join(self.vocab) + "\n"
+            lengths = np.fromiter((len(term) + 1 for term in self.vocab), dtype=np.int64, count=len(self.vocab))
+            starts = np.concatenate(([1], 1 + np.cumsum(lengths)))[:len(self.vocab)]
+            self._vocab_blob = (len(self.vocab), blob, starts)
+        _, blob, starts = self._vocab_blob
+        positions = np.fromiter((match.start() for match in re.finditer(re.escape(literal), blob)), dtype=np.int64)
+        if not len(positions):
+            return positions
+        return np.unique(np.searchsorted(starts, positions, side='right') - 1)
+
+    def _postings(self, term_ids) -> tuple:
+        """多个词的倒排表拼接: (文档编号, 次数, 所属词在 term_ids 中的下标)。"""
+        docs, tfs, owners = [], [], []
+        offsets = self.base_offsets
+        base_terms = len(offsets) - 1
+        for position, term_id in enumerate(term_ids):
+            if term_id < base_terms and offsets[term_id] != offsets[term_id + 1]:
+                start, end = offsets[term_id], offsets[term_id + 1]
+                docs.append(self.base_docs[start:end])
+                tfs.append(self.base_tfs[start:end])
+                owners.append(np.full(end - start, position, dtype=np.int32))
+            delta = self.delta.get(term_id)
+            if delta:
+                docs.append(np.asarray(delta[0], dtype=np.int32))
+                tfs.append(np.asarray(delta[1], dtype=np.float32))
+                owners.append(np.full(len(delta[0]), position, dtype=np.int32))
+        if not docs:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int32)
+        return np.concatenate(docs), np.concatenate(tfs), np.concatenate(owners)
+
+    def search(self, literals) -> list:
+        """
+        返回候选文件 [(路径, 得分)]，按 TF-IDF 得分从高到低排列。
+        候选文件一定包含每个字面量 (作为某个词的一部分)，但不一定包含完整的查询，需要调用方逐行确认。
+        没有可用于筛选的字面量时返回所有文件 (得分为 0，按路径排序)。
+        """
+        alive = np.frombuffer(bytes(self.alive), dtype=np.uint8).astype(bool)
+        candidates = alive.copy()
+        scores = np.zeros(len(self.paths), dtype=np.float64)
+        document_count = max(1, self.document_count)
+        selective = False
+        for literal in dict.fromkeys(literals):
+            term_ids = self._matching_terms(literal)
+            if len(term_ids) > MAX_EXPANDED_TERMS:
+                continue
+            selective = True
+            docs, tfs, owners = self._postings(term_ids)
+            candidates &= np.bincount(docs, minlength=len(self.paths)).astype(bool)
+            if not candidates.any():
+                return []
+            # 每个词的 idf 按其倒排表长度计算 (含尚未合并掉的失效文档，影响很小)
+            df = np.bincount(owners, minlength=len(term_ids)).astype(np.float64)
+            idf = np.log((document_count + 1) / (df + 1)) + 1
+            # 词只部分包含字面量时 (例如搜索 func_1 时的 func_10) 按覆盖比例降低权重，完整匹配的词排在前面
+            coverage = len(literal) / np.fromiter((len(self.vocab[term_id]) for term_id in term_ids), dtype=np.float64, count=len(term_ids))
+            weights = (1 + np.log(tfs.astype(np.float64))) * (idf * coverage)[owners]
+            scores += np.bincount(docs, weights=weights, minlength=len(self.paths))
+        doc_ids = np.flatnonzero(candidates)
+        if not selective:
+            return sorted((self.paths[doc_id], 0.0) for doc_id in doc_ids)
+        lengths = np.frombuffer(self.doc_lengths, dtype=np.float32)[doc_ids].astype(np.float64)
+        doc_scores = scores[doc_ids] / np.sqrt(np.maximum(lengths, 1))
+        order = np.argsort(-doc_scores, kind='stable')
+        return [(self.paths[doc_ids[i]], float(doc_scores[i])) for i in order]
+
@@ -0,0 +1,54 @@
+// 代理与插件进程之间的长度前缀帧: 4 字节大端无符号整数表示负载长度，其后为负载字节。
+// 格式与 plugin_common/plugin_protocol.py 保持一致。
+
+const FRAME_HEADER_BYTES = 4;
+const ARGUMENT_STDIN_ENV = 'XICE_PLUGIN_ARGUMENT_STDIN';
+const CONVERSATION_ID_ENV = 'XICE_PLUGIN_CONVERSATION_ID';
+
+function frameHeader(length) {
+    const header = Buffer.allocUnsafe(FRAME_HEADER_BYTES);
+    header.writeUInt32BE(length, 0);
+    return header;
+}
+
+// 把一帧写入可写流。帧头与负载分开写入，不为拼接再复制一份大负载。
+function writeFrame(stream, payload) {
+    const data = Buffer.isBuffer(payload) ? payload : Buffer.from(String(payload), 'utf-8');
+    stream.write(frameHeader(data.length));
+    return stream.write(data);
+}
+
+// 增量解码: push() 接收任意切分的数据块，返回其中已经完整的帧 (Buffer)。
+// 数据块只在一帧 (或帧头) 完整时合并一次，大负载不会因为分块到达而被反复复制。
+class FrameDecoder {
+    constructor() {
+        this.chunks = [];
+        this.buffered = 0;
+        this.expected = null; // 当前帧的负载长度，尚未读到帧头时为 null
+    }
+
+    push(chunk) {
+        this.chunks.push(chunk);
+        this.buffered += chunk.length;
+        const frames = [];
+        for (;;) {
+            if (this.expected === null) {
+                if (this.buffered < FRAME_HEADER_BYTES) break;
+                this.expected = this._take(FRAME_HEADER_BYTES).readUInt32BE(0);
+            }
+            if (this.buffered < this.expected) break;
+            frames.push(this._take(this.expected));
+            this.expected = null;
+        }
+        return frames;
+    }
+
+    _take(length) {
+        const data = this.chunks.length === 1 ? this.chunks[0] : Buffer.concat(this.chunks, this.buffered);
+        this.chunks = length < data.length ? [data.subarray(length)] : [];
+        this.buffered -= length;
+        return data.subarray(0, length);
+    }
+}
+
+module.exports = { FRAME_HEADER_BYTES, ARGUMENT_STDIN_ENV, CONVERSATION_ID_ENV, writeFrame, FrameDecoder };
@@ -0,0 +1,138 @@
+import sys
+import os
+import io
+import json
+import asyncio
+import importlib.util
+import traceback
+import contextlib
+
+from plugin_common.plugin_protocol import read_frame, write_frame, CONVERSATION_ID_ENV
+
+# 常驻 Python 插件宿主进程。
+# 由 proxy_server.js 的插件宿主池启动，每个插件模块只导入一次，
+# 之后通过 stdin/stdout 上的长度前缀帧 (见 plugin_common/plugin_protocol.py) 接收调用并返回结果。
+#
+# 请求: 一帧 JSON 头 {"id": 1, "plugin_dir": "...", "executable_name": "xxx_plugin.py", "entry_function": "func", "conversation_id": "...", "has_argument": true}，
+#       has_argument 为 true 时紧跟一帧 UTF-8 参数原文。
+# 响应: 一帧 JSON 头 {"id": 1, "ok": true} 后紧跟一帧 UTF-8 输出原文，或只有一帧 {"id": 1, "ok": false, "error": "..."}。
+# 参数和输出不放进 JSON，避免对数 MB 的负载进行转义和再解析。
+
+# 协议输出使用原先的 stdout 文件描述符的副本，文件描述符 1 本身和 sys.stdout 都指向 stderr:
+# 插件中任何遗留的 print、C 扩展直接写入 fd 1 的内容以及子进程继承的 stdout 都不会破坏协议帧。
+sys.stdout.flush()
+protocol_out = os.fdopen(os.dup(sys.stdout.fileno()), 'wb')
+os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+sys.stdout = sys.stderr
+
+loaded_plugin_modules = {}  # script_path -> (module, script_mtime, config_mtime)
+
+
+def _get_mtime(path: str):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+def load_plugin_module(plugin_dir: str, executable_name: str):
+    """
+    导入插件模块并缓存。插件脚本或其 config.json 被修改后会重新导入，
+    以便在 Web 配置界面中保存的 plugin_specific_config 立即生效。
+    """
+    script_path = os.path.realpath(os.path.join(plugin_dir, executable_name))
+    config_path = os.path.join(plugin_dir, "config.json")
+    script_mtime = _get_mtime(script_path)
+    config_mtime = _get_mtime(config_path)
+
+    cached = loaded_plugin_modules.get(script_path)
+    if cached and cached[1] == script_mtime and cached[2] == config_mtime:
+        return cached[0]
+
+    if script_mtime is None:
+        raise FileNotFoundError(f"插件脚本 '{script_path}' 不存在。")
+
+    module_name = "xice_plugin_" + os.path.basename(os.path.dirname(script_path))
+    spec = importlib.util.spec_from_file_location(module_name, script_path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    loaded_plugin_modules[script_path] = (module, script_mtime, config_mtime)
+    print(f"[Plugin Host {os.getpid()}] 已导入插件模块: {script_path}", file=sys.stderr)
+    return module
+
+
+def call_plugin(request: dict) -> str:
+    plugin_dir = request["plugin_dir"]
+    module = load_plugin_module(plugin_dir, request["executable_name"])
+    entry_function = getattr(module, request["entry_function"], None)
+    if not callable(entry_function):
+        raise AttributeError(f"插件模块中未找到入口函数 '{request['entry_function']}'。")
+
+    # 与单次进程模式保持一致: 工作目录为插件目录，插件打印到 stdout 的内容也属于输出，对话标识通过环境变量传递。
+    os.chdir(plugin_dir)
+    if request.get("conversation_id"):
+        os.environ[CONVERSATION_ID_ENV] = request["conversation_id"]
+    else:
+        os.environ.pop(CONVERSATION_ID_ENV, None)
+    captured_stdout = io.StringIO()
+    with contextlib.redirect_stdout(captured_stdout):
+        argument = request.get("argument")
+        result = entry_function(argument) if argument is not None else entry_function()
+        if asyncio.iscoroutine(result):
+            result = asyncio.run(result)
+
+    output = captured_stdout.getvalue()
+    if result is not None:
+        output += str(result)
+    return output
+
+
+def write_message(message: dict, output=None):
+    write_frame(protocol_out, json.dumps(message, ensure_ascii=False).encode('utf-8'))
+    if output is not None:
+        write_frame(protocol_out, output.encode('utf-8', errors='replace'))
+    protocol_out.flush()
+
+
+def main():
+    for stream in (sys.stdin, sys.stderr):
+        try:
+            stream.reconfigure(encoding='utf-8')
+        except (AttributeError, ValueError):
+            pass
+
+    write_message({"ready": True, "pid": os.getpid()})
+
+    request_in = sys.stdin.buffer
+    while True:
+        header = read_frame(request_in)
+        if header is None:
+            break
+        try:
+            request = json.loads(header)
+            if request.pop("has_argument", False):
+                argument = read_frame(request_in)
+                if argument is None:
+                    raise EOFError("请求缺少参数帧。")
+                request["argument"] = argument.decode('utf-8')
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            write_message({"id": None, "ok": False, "error": f"无效的请求帧: {e}"})
+            continue
+
+        request_id = request.get("id")
+        try:
+            output = call_plugin(request)
+            write_message({"id": request_id, "ok": True}, output)
+        except KeyboardInterrupt:
+            raise
+        except BaseException as e:  # 包括插件内部的 SystemExit
+            traceback.print_exc(file=sys.stderr)
+            write_message({"id": request_id, "ok": False, "error": f"{type(e).__name__}: {e}"})
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except (KeyboardInterrupt, EOFError):
+        pass
@@ -0,0 +1,193 @@
+const path = require('path');
+const { spawn } = require('child_process');
+const { writeFrame, FrameDecoder } = require('./plugin_frame');
+
+const PLUGIN_HOST_SCRIPT = path.join(__dirname, 'plugin_host.py');
+const MAX_RESTARTS_PER_MINUTE = 10;
+const UNAVAILABLE_MESSAGE = '插件宿主进程暂不可用 (一分钟内崩溃过于频繁，已暂停重启)。';
+
+// 常驻 Python 插件宿主进程池。
+// 每个 worker 是一个 plugin_host.py 进程，插件模块在其中只导入一次；
+// 调用通过 stdin/stdout 上的长度前缀帧传递 (格式见 plugin_host.py)。每个 worker 同时只处理一个调用。
+class PythonPluginHostPool {
+    constructor({ poolSize = 2, pythonCommand = 'python', callTimeoutMs = 0 } = {}) {
+        this.poolSize = Math.max(1, poolSize);
+        this.pythonCommand = pythonCommand;
+        this.callTimeoutMs = callTimeoutMs;
+        this.workers = [];
+        this.queue = [];
+        this.nextRequestId = 1;
+        this.restartTimestamps = [];
+        this.restartTimer = null; // 频繁崩溃暂停重启后，等一分钟窗口过去再恢复
+        this.closed = false;
+        for (let i = 0; i < this.poolSize; i++) this._startWorker();
+    }
+
+    _startWorker() {
+        const child = spawn(this.pythonCommand, [PLUGIN_HOST_SCRIPT], {
+            cwd: __dirname,
+            env: { ...process.env, PYTHONIOENCODING: 'utf-8', PYTHONUNBUFFERED: '1' },
+            stdio: ['pipe', 'pipe', 'pipe'],
+        });
+        // pendingResponse: 已收到响应头，正在等待其后的输出帧
+        const worker = { child, ready: false, current: null, pendingResponse: null };
+        this.workers.push(worker);
+
+        const decoder = new FrameDecoder();
+        child.stdout.on('data', (chunk) => decoder.push(chunk).forEach(frame => this._onWorkerFrame(worker, frame)));
+        child.stderr.on('data', (data) => process.stderr.write(data));
+        child.stdin.on('error', (err) => console.error(`[NodeJS] 写入插件宿主进程失败: ${err.message}`));
+        child.on('error', (err) => console.error(`[NodeJS] 插件宿主进程启动失败: ${err.message}`));
+        child.on('exit', (code, signal) => this._onWorkerExit(worker, code, signal));
+        return worker;
+    }
+
+    _onWorkerFrame(worker, frame) {
+        if (worker.pendingResponse) {
+            const message = worker.pendingResponse;
+            worker.pendingResponse = null;
+            this._completeCall(worker, message, frame.toString('utf-8'));
+            return;
+        }
+        let message;
+        try {
+            message = JSON.parse(frame.toString('utf-8'));
+        } catch (e) {
+            console.error(`[NodeJS] 插件宿主 (PID: ${worker.child.pid}) 输出了无效的协议帧，终止该宿主进程。`);
+            worker.child.kill();
+            return;
+        }
+        if (message.ready) {
+            worker.ready = true;
+            this._dispatch();
+            return;
+        }
+        if (message.ok) {
+            worker.pendingResponse = message; // 输出在下一帧
+            return;
+        }
+        this._completeCall(worker, message, null);
+    }
+
+    _completeCall(worker, message, output) {
+        const call = worker.current;
+        if (!call || message.id !== call.id) return;
+        worker.current = null;
+        clearTimeout(call.timer);
+        if (message.ok) {
+            call.resolve(output.trim());
+        } else {
+            call.reject(new Error(`插件 ${call.pluginInfo.name} 执行失败. ${message.error}`));
+        }
+        this._dispatch();
+    }
+
+    _onWorkerExit(worker, code, signal) {
+        this.workers = this.workers.filter(w => w !== worker);
+        const call = worker.current;
+        worker.current = null;
+        if (call) {
+            clearTimeout(call.timer);
+            const reason = call.timedOut ? `执行超时 (${this.callTimeoutMs / 1000}秒)` : `插件宿主进程意外退出 (退出码: ${code}, 信号: ${signal})`;
+            call.reject(new Error(`插件 ${call.pluginInfo.name} 执行失败. ${reason}`));
+        }
+        if (this.closed) return;
+
+        const now = Date.now();
+        this.restartTimestamps = this.restartTimestamps.filter(t => now - t < 60 * 1000);
+        if (this.restartTimestamps.length >= MAX_RESTARTS_PER_MINUTE) {
+            const delayMs = this.restartTimestamps[0] + 60 * 1000 - now;
+            console.error(`[NodeJS] 插件宿主进程在一分钟内崩溃过于频繁，暂停重启 ${Math.ceil(delayMs / 1000)} 秒。`);
+            this._scheduleRestart(delayMs);
+            if (this.workers.length === 0) this._failQueued(new Error(UNAVAILABLE_MESSAGE));
+            return;
+        }
+        this.restartTimestamps.push(now);
+        console.warn(`[NodeJS] 插件宿主进程 (PID: ${worker.child.pid}) 已退出，正在重启。`);
+        this._startWorker();
+    }
+
+    _scheduleRestart(delayMs) {
+        if (this.restartTimer) return;
+        this.restartTimer = setTimeout(() => {
+            this.restartTimer = null;
+            if (this.closed) return;
+            console.warn(`[NodeJS] 恢复启动插件宿主进程。`);
+            while (this.workers.length < this.poolSize) this._startWorker();
+        }, Math.max(0, delayMs));
+        this.restartTimer.unref();
+    }
+
+    _failQueued(error) {
+        const queued = this.queue;
+        this.queue = [];
+        queued.forEach(call => {
+            clearTimeout(call.timer);
+            call.reject(error);
+        });
+    }
+
+    // 宿主进程因频繁崩溃暂停重启时为 false，调用方应改为单独启动插件进程
+    get available() {
+        return !this.closed && this.workers.length > 0;
+    }
+
+    _dispatch() {
+        while (this.queue.length > 0) {
+            const worker = this.workers.find(w => w.ready && !w.current);
+            if (!worker) return;
+            const call = this.queue.shift();
+            worker.current = call;
+            clearTimeout(call.timer); // 排队超时计时结束，开始计算执行超时
+            if (this.callTimeoutMs > 0) {
+                call.timer = setTimeout(() => {
+                    call.timedOut = true;
+                    console.error(`[NodeJS] 插件 ${call.pluginInfo.name} 在插件宿主中执行超时，终止该宿主进程。`);
+                    worker.child.kill();
+                }, this.callTimeoutMs);
+            }
+            const { argument, ...header } = call.request;
+            writeFrame(worker.child.stdin, JSON.stringify({ ...header, has_argument: argument !== null && argument !== undefined }));
+            if (argument !== null && argument !== undefined) writeFrame(worker.child.stdin, argument);
+        }
+    }
+
+    execute(pluginInfo, pluginDir, pluginArgument, context = {}) {
+        return new Promise((resolve, reject) => {
+            if (this.closed) return reject(new Error('插件宿主池已关闭。'));
+            if (!this.available) return reject(new Error(UNAVAILABLE_MESSAGE));
+            const id = this.nextRequestId++;
+            const call = {
+                id, pluginInfo, resolve, reject, timer: null,
+                request: {
+                    id,
+                    plugin_dir: pluginDir,
+                    executable_name: pluginInfo.executable_name,
+                    entry_function: pluginInfo.python_entry_function,
+                    conversation_id: context.conversationId || null,
+                    argument: pluginArgument,
+                },
+            };
+            if (this.callTimeoutMs > 0) {
+                // 所有宿主进程都在执行其他调用时，排队等待同样受超时限制
+                call.timer = setTimeout(() => {
+                    this.queue = this.queue.filter(c => c !== call);
+                    reject(new Error(`插件 ${pluginInfo.name} 执行失败. 等待空闲的插件宿主进程超时 (${this.callTimeoutMs / 1000}秒)`));
+                }, this.callTimeoutMs);
+            }
+            this.queue.push(call);
+            this._dispatch();
+        });
+    }
+
+    shutdown() {
+        this.closed = true;
+        clearTimeout(this.restartTimer);
+        this.restartTimer = null;
+        this._failQueued(new Error('插件宿主池已关闭。'));
+        this.workers.forEach(w => w.child.kill());
+        this.workers = [];
+    }
+}
+
+module.exports = { PythonPluginHostPool };
@@ -0,0 +1,68 @@
+const path = require('path');
+const { spawn } = require('child_process');
+const { ARGUMENT_STDIN_ENV, CONVERSATION_ID_ENV, writeFrame } = require('./plugin_frame');
+
+// 每次调用单独启动一个插件进程。
+// 插件 config.json 中 argument_via_stdin 为 true 时，参数以一帧 UTF-8 文本写入子进程的 stdin
+// (插件通过 plugin_common.plugin_protocol.read_plugin_argument 读取)，不受命令行参数长度的限制；
+// 否则按原方式作为命令行的最后一个参数传递。输出为子进程 stdout 的全部内容。
+// context.conversationId 通过环境变量 XICE_PLUGIN_CONVERSATION_ID 传给插件。
+function spawnPluginProcess(pluginInfo, pluginDir, pluginArgument, context = {}) {
+    return new Promise((resolve, reject) => {
+        const pluginScriptPath = path.join(pluginDir, pluginInfo.executable_name);
+
+        let command;
+        let args = [];
+        let options = { cwd: pluginDir, env: { ...process.env } };
+        if (context.conversationId) options.env[CONVERSATION_ID_ENV] = context.conversationId;
+
+        if (pluginInfo.is_python_script) {
+            command = 'python';
+            args.push(pluginScriptPath);
+        } else {
+            command = pluginScriptPath;
+            options.shell = (process.platform === "win32" && pluginScriptPath.toLowerCase().endsWith(".bat"));
+        }
+
+        const argumentViaStdin = pluginArgument !== null && pluginInfo.argument_via_stdin;
+        if (argumentViaStdin) {
+            options.env[ARGUMENT_STDIN_ENV] = '1';
+        } else if (pluginArgument !== null) {
+            args.push(pluginArgument);
+        }
+
+        console.log(`[NodeJS] 执行插件: ${pluginInfo.name} (ID: ${pluginInfo.id})`);
+        // console.log(`  Cmd: ${command}, Args: ${JSON.stringify(args)}, CWD: ${options.cwd}, Shell: ${!!options.shell}`);
+
+        const child = spawn(command, args, options);
+        // 按字节收集输出，结束后再统一解码，避免多字节字符被数据块边界截断
+        const stdoutChunks = [];
+        const stderrChunks = [];
+        child.stdout.on('data', (data) => stdoutChunks.push(data));
+        child.stderr.on('data', (data) => stderrChunks.push(data));
+        child.stdin.on('error', (err) => console.warn(`[NodeJS] 向插件 ${pluginInfo.name} 写入参数失败: ${err.message}`));
+        if (argumentViaStdin) {
+            writeFrame(child.stdin, pluginArgument);
+            child.stdin.end();
+        }
+
+        child.on('close', (code) => {
+            const stdout = Buffer.concat(stdoutChunks).toString('utf-8');
+            const stderr = Buffer.concat(stderrChunks).toString('utf-8');
+            if (code === 0) {
+                // console.log(`[NodeJS] 插件 ${pluginInfo.name} 执行成功.`);
+                resolve(stdout.trim());
+            } else {
+                console.error(`[NodeJS] 插件 ${pluginInfo.name} 执行失败 (退出码: ${code}).`);
+                if (stderr) console.error(`[NodeJS] 插件错误输出: ${stderr.trim()}`);
+                reject(new Error(`插件 ${pluginInfo.name} 执行失败. ${stderr.trim() || `退出码: ${code}`}`));
+            }
+        });
+        child.on('error', (err) => {
+            console.error(`[NodeJS] 启动插件 ${pluginInfo.name} 失败:`, err);
+            reject(new Error(`启动插件 ${pluginInfo.name} 失败: ${err.message}`));
+        });
+    });
+}
+
+module.exports = { spawnPluginProcess };
@@ -1,500 +1,786 @@
-const express = require('express');
-const fs = require('fs').promises;
-const fsSync = require('fs'); // For synchronous checks like existsSync
-const path = require('path');
-const morgan = require('morgan');
-const fetch = require('node-fetch'); // Ensure node-fetch v2 for CJS
-const { spawn } = require('child_process');
-
-const ROOT_CONFIG_FILE_PATH = path.join(__dirname, 'config.json');
-const PLUGINS_DIR = path.join(__dirname, 'Plugin');
-const CONFORM_CHAT_FILE = path.join(__dirname, 'conformchat.txt');
-const SEND_LOG_FILE = path.join(__dirname, 'send.json');
-const RECEIVED_LOG_FILE = path.join(__dirname, 'received.json');
-
-let rootConfig;
-let activePlugins = [];
-let allDiscoveredPluginsInfo = []; 
-let systemPluginRulesDescription = "";
-
-// --- Configuration Loading ---
-function loadRootConfig() {
-    try {
-        const configFileContent = fsSync.readFileSync(ROOT_CONFIG_FILE_PATH, 'utf-8');
-        rootConfig = JSON.parse(configFileContent);
-        console.log("[NodeJS] 根配置文件已加载。");
-    } catch (error) {
-        console.error(`[NodeJS] 致命错误：无法加载或解析根配置文件 ${path.basename(ROOT_CONFIG_FILE_PATH)}: ${error.message}`);
-        process.exit(1);
-    }
-}
-
-async function discoverAndLoadPlugins() {
-    allDiscoveredPluginsInfo = [];
-    activePlugins = [];
-    systemPluginRulesDescription = "";
-    console.log("[NodeJS] 开始扫描插件目录:", PLUGINS_DIR);
-
-    try {
-        const pluginFolders = await fs.readdir(PLUGINS_DIR, { withFileTypes: true });
-        for (const dirent of pluginFolders) {
-            if (dirent.isDirectory()) {
-                const pluginFolderName = dirent.name;
-                const pluginConfigPath = path.join(PLUGINS_DIR, pluginFolderName, 'config.json');
-                try {
-                    if (!fsSync.existsSync(pluginConfigPath)) {
-                        console.warn(`[NodeJS] 插件 ${pluginFolderName}: 未找到 config.json，已跳过。`);
-                        continue;
-                    }
-                    const pluginConfigFileContent = await fs.readFile(pluginConfigPath, 'utf-8');
-                    const pluginConfig = JSON.parse(pluginConfigFileContent);
-
-                    if (!pluginConfig.plugin_id || !pluginConfig.plugin_name_cn || !pluginConfig.executable_name ||
-                        !pluginConfig.placeholder_start || !pluginConfig.placeholder_end) {
-                        console.warn(`[NodeJS] 插件 ${pluginFolderName}: config.json 缺少必要字段，已跳过。`);
-                        continue;
-                    }
-                    
-                    const pluginInfo = {
-                        id: pluginConfig.plugin_id,
-                        name: pluginConfig.plugin_name_cn,
-                        version: pluginConfig.version || "0.0.0",
-                        description: pluginConfig.description || "无描述",
-                        author: pluginConfig.author || "未知",
-                        enabled: pluginConfig.enabled === undefined ? true : pluginConfig.enabled,
-                        is_python_script: pluginConfig.is_python_script === undefined ? true : pluginConfig.is_python_script,
-                        executable_name: pluginConfig.executable_name,
-                        placeholder_start: pluginConfig.placeholder_start,
-                        placeholder_end: pluginConfig.placeholder_end,
-                        accepts_parameters: pluginConfig.accepts_parameters === undefined ? false : pluginConfig.accepts_parameters,
-                        is_internal_signal: pluginConfig.is_internal_signal === undefined ? false : pluginConfig.is_internal_signal,
-                        parameters_schema: pluginConfig.parameters || [],
-                        plugin_specific_config: pluginConfig.plugin_specific_config || {},
-                        folder_name: pluginFolderName
-                    };
-                    allDiscoveredPluginsInfo.push(pluginInfo);
-
-                    if (pluginInfo.enabled) {
-                        activePlugins.push(pluginInfo);
-                    }
-                    // console.log(`[NodeJS] 已加载插件: ${pluginInfo.name} (ID: ${pluginInfo.id}), 启用状态: ${pluginInfo.enabled}`);
-
-                } catch (err) {
-                    console.error(`[NodeJS] 加载插件 ${pluginFolderName} 的 config.json 失败: ${err.message}`);
-                }
-            }
-        }
-
-        if (activePlugins.length > 0) {
-            systemPluginRulesDescription = "你可以使用以下已启用的工具：\n";
-            activePlugins.forEach(p => {
-                systemPluginRulesDescription += `- ${p.name}: ${p.description}\n`;
-            });
-            systemPluginRulesDescription += "请严格按照占位符格式回复以调用工具。";
-        } else {
-            systemPluginRulesDescription = "当前没有已启用的插件工具。";
-        }
-        console.log(`[NodeJS] 插件扫描完成。发现 ${allDiscoveredPluginsInfo.length} 个插件定义，其中 ${activePlugins.length} 个已启用。`);
-
-    } catch (error) {
-        console.error(`[NodeJS] 扫描插件目录 ${PLUGINS_DIR} 失败: ${error.message}`);
-    }
-}
-
-
-// --- Utility Functions ---
-async function initializeConformChatFile() {
-    try {
-        await fs.writeFile(CONFORM_CHAT_FILE, '', 'utf-8');
-    } catch (error) {
-        console.error(`[NodeJS] 初始化 ${path.basename(CONFORM_CHAT_FILE)} 失败:`, error);
-    }
-}
-
-async function logRequest(req, bodyForLog, originalUrl, sourceIp) { // bodyForLog is expected to be an object or a raw string if not JSON
-    if (!rootConfig.log_intercepted_data) return;
-    const data = {
-        timestamp_sent_to_target: new Date().toISOString(),
-        method: req.method,
-        target_url: rootConfig.target_proxy_url + (req.originalUrl || originalUrl),
-        original_url_received_by_listener: originalUrl ? `${req.protocol || 'http'}://${req.headers?.host || 'localhost'}${originalUrl}` : `${req.protocol}://${req.headers.host}${req.originalUrl}`,
-        source_ip_of_original_request: sourceIp || req.ip || req.socket?.remoteAddress,
-        request_headers_sent_to_target: req.headers,
-        request_body_sent_to_target: bodyForLog, // Log the (potentially modified) object or raw string
-    };
-    try { await fs.writeFile(SEND_LOG_FILE, JSON.stringify(data, null, 2)); }
-    catch (e) { console.error(`[NodeJS] 写入 ${path.basename(SEND_LOG_FILE)} 失败`, e); }
-}
-
-async function logResponse(response, body) {
-    if (!rootConfig.log_intercepted_data) return;
-    let logBody = body;
-    if (!rootConfig.log_response_body_in_received_file) {
-        logBody = "[响应体日志已禁用]";
-    } else if (typeof body === 'string' && body.length > (rootConfig.max_log_response_size_kb_in_received_file * 1024)) {
-        logBody = `[响应体过大，已截断，原始大小: ${body.length} bytes] ` + body.substring(0, 200) + "...";
-    } else if (Buffer.isBuffer(body) && body.length > (rootConfig.max_log_response_size_kb_in_received_file * 1024)) {
-        logBody = `[Buffer响应体过大，已截断，原始大小: ${body.length} bytes]`;
-    }
-
-    const data = {
-        timestamp_received_from_target: new Date().toISOString(),
-        status_code: response.status,
-        response_headers_from_target: Object.fromEntries(response.headers.entries()),
-        response_body_from_target: logBody,
-    };
-    try { await fs.writeFile(RECEIVED_LOG_FILE, JSON.stringify(data, null, 2)); }
-    catch (e) { console.error(`[NodeJS] 写入 ${path.basename(RECEIVED_LOG_FILE)} 失败`, e); }
-}
-
-function executePlugin(pluginInfo, pluginArgument) {
-    return new Promise((resolve, reject) => {
-        const pluginScriptPath = path.join(PLUGINS_DIR, pluginInfo.folder_name, pluginInfo.executable_name);
-        
-        let command;
-        let args = [];
-        let options = { encoding: 'utf-8', cwd: path.join(PLUGINS_DIR, pluginInfo.folder_name) }; 
-
-        if (pluginInfo.is_python_script) {
-            command = 'python'; 
-            args.push(pluginScriptPath);
-        } else { 
-            command = pluginScriptPath;
-            options.shell = (process.platform === "win32" && pluginScriptPath.toLowerCase().endsWith(".bat"));
-        }
-
-        if (pluginInfo.accepts_parameters && pluginArgument !== null && pluginArgument !== undefined) {
-            args.push(String(pluginArgument)); 
-        }
-        
-        console.log(`[NodeJS] 执行插件: ${pluginInfo.name} (ID: ${pluginInfo.id})`);
-        // console.log(`  Cmd: ${command}, Args: ${JSON.stringify(args)}, CWD: ${options.cwd}, Shell: ${!!options.shell}`);
-
-        const child = spawn(command, args, options);
-        let stdout = '';
-        let stderr = '';
-        child.stdout.on('data', (data) => stdout += data);
-        child.stderr.on('data', (data) => stderr += data);
-
-        child.on('close', (code) => {
-            if (code === 0) {
-                // console.log(`[NodeJS] 插件 ${pluginInfo.name} 执行成功.`);
-                resolve(stdout.trim());
-            } else {
-                console.error(`[NodeJS] 插件 ${pluginInfo.name} 执行失败 (退出码: ${code}).`);
-                if (stderr) console.error(`[NodeJS] 插件错误输出: ${stderr.trim()}`);
-                reject(new Error(`插件 ${pluginInfo.name} 执行失败. ${stderr.trim() || `退出码: ${code}`}`));
-            }
-        });
-        child.on('error', (err) => {
-            console.error(`[NodeJS] 启动插件 ${pluginInfo.name} 失败:`, err);
-            reject(new Error(`启动插件 ${pluginInfo.name} 失败: ${err.message}`));
-        });
-    });
-}
-
-
-// --- Main Request Handling Logic ---
-async function handleRequestAndPlugins(req, res, originalRequestData, recursionDepth = 0, continuationDepth = 0) {
-    if (recursionDepth === 0 && continuationDepth === 0) {
-        await initializeConformChatFile();
-    }
-
-    const MAX_RECURSION = rootConfig.max_plugin_recursion_depth || 5;
-    const MAX_CONTINUATION = rootConfig.max_continuation_depth || 5;
-
-    if (recursionDepth > MAX_RECURSION || continuationDepth > MAX_CONTINUATION) {
-        const limitType = recursionDepth > MAX_RECURSION ? "插件递归" : "继续回复";
-        console.warn(`[NodeJS] ${limitType}达到最大深度，停止调用。`);
-        const conformContent = await fs.readFile(CONFORM_CHAT_FILE, 'utf-8').catch(() => "");
-        const finalContent = (conformContent.trim() || "[无内容]") + `\n\n[系统消息：已达到最大${limitType}深度]`;
-        const errorResponse = {
-            id: `error-${limitType.replace(" ", "-")}-limit-${Date.now()}`, object: "chat.completion",
-            choices: [{ message: { role: "assistant", content: finalContent }, finish_reason: "length" }],
-            model: (typeof originalRequestData.body === 'object' && originalRequestData.body?.model) ? originalRequestData.body.model : "unknown_model_limit"
-        };
-        if (res && !res.headersSent) res.status(200).json(errorResponse);
-        await initializeConformChatFile();
-        return;
-    }
-
-    const targetUrl = rootConfig.target_proxy_url + originalRequestData.url;
-    
-    // --- Refined Request Body Handling for Injection and Logging ---
-    let currentRequestBodyObject; // This will be an object if original body is JSON or becomes JSON
-    let originalBodyWasNonJsonString = false;
-
-    if (typeof originalRequestData.body === 'string') {
-        try {
-            currentRequestBodyObject = JSON.parse(originalRequestData.body);
-            // Deep clone to prevent modification of originalRequestData.body if it's parsed from string
-            currentRequestBodyObject = JSON.parse(JSON.stringify(currentRequestBodyObject));
-        } catch (e) {
-            console.warn("[NodeJS] 初始请求体是字符串但非有效JSON，无法注入规则:", originalRequestData.body.substring(0,100));
-            currentRequestBodyObject = null; // Indicate it's not a modifiable JSON object
-            originalBodyWasNonJsonString = true;
-        }
-    } else if (typeof originalRequestData.body === 'object' && originalRequestData.body !== null) {
-        currentRequestBodyObject = JSON.parse(JSON.stringify(originalRequestData.body)); // Deep copy
-    } else {
-        currentRequestBodyObject = { messages: [] }; // Default for null or other types, to allow injection
-    }
-
-    // Inject plugin rules if applicable, modifying 'currentRequestBodyObject'
-    if (currentRequestBodyObject && // Ensure it's a valid object for modification
-        rootConfig.inject_plugin_rules_on_first_request && 
-        systemPluginRulesDescription && 
-        activePlugins.length > 0 &&
-        currentRequestBodyObject.messages // And it has a messages array
-    ) {
-        const firstUserMsgIdx = currentRequestBodyObject.messages.findIndex(m => m.role === 'user');
-        const hasRuleInjected = currentRequestBodyObject.messages.some(m => m.role === 'system' && m.content && m.content.startsWith("你可以使用以下已启用的工具："));
-        
-        if (firstUserMsgIdx !== -1 && !hasRuleInjected) {
-             currentRequestBodyObject.messages.splice(firstUserMsgIdx, 0, { role: "system", content: systemPluginRulesDescription });
-             console.log("[NodeJS] 已注入插件规则描述。");
-        }
-    }
-    // --- End Refined Request Body Handling ---
-
-    // Log the request body that will be sent to the target
-    // If original was non-JSON string and couldn't be modified, log that original string. Otherwise, log the object.
-    if (rootConfig.log_intercepted_data) {
-        await logRequest(req, 
-            currentRequestBodyObject === null ? originalRequestData.body : currentRequestBodyObject, 
-            originalRequestData.url, 
-            originalRequestData.sourceIp
-        );
-    }
-
-    // Prepare the body for the fetch call
-    // If currentRequestBodyObject is null, it means original body was a non-JSON string and should be sent as is.
-    // Otherwise, stringify the (potentially modified) object.
-    const finalBodyForFetch = currentRequestBodyObject !== null ? JSON.stringify(currentRequestBodyObject) : originalRequestData.body;
-    
-    let responseFromTarget, responseBodyBuffer, aiResponseMessageContent = null, aiFullResponseObject = null;
-    try {
-        console.log(`[NodeJS] 转发请求 (递归 ${recursionDepth}, 继续 ${continuationDepth}): ${originalRequestData.method} ${targetUrl}`);
-        responseFromTarget = await fetch(targetUrl, {
-            method: originalRequestData.method, headers: originalRequestData.headers,
-            body: (originalRequestData.method !== 'GET' && originalRequestData.method !== 'HEAD') ? finalBodyForFetch : undefined,
-        });
-        responseBodyBuffer = await responseFromTarget.buffer();
-        const contentType = responseFromTarget.headers.get('content-type') || '';
-
-        if (contentType.includes('application/json')) {
-            const responseJsonString = responseBodyBuffer.toString('utf-8');
-            aiFullResponseObject = JSON.parse(responseJsonString);
-            aiResponseMessageContent = aiFullResponseObject?.choices?.[0]?.message?.content ||
-                                     aiFullResponseObject?.content?.[0]?.text || 
-                                     aiFullResponseObject?.message?.content;   
-        } else if (contentType.includes('text/')) {
-            aiResponseMessageContent = responseBodyBuffer.toString('utf-8');
-        }
-        if (rootConfig.log_intercepted_data) { await logResponse(responseFromTarget, aiFullResponseObject || aiResponseMessageContent || responseBodyBuffer); }
-
-        let pluginMatchedAndProcessed = false;
-        if (aiResponseMessageContent && activePlugins.length > 0) {
-            for (const plugin of activePlugins) { // plugin is from activePlugins (contains full info)
-                const regex = new RegExp(`${plugin.placeholder_start.replace(/[.*+?^${}()|[\]\\]/g, '\\$&')}(.*?)${plugin.placeholder_end.replace(/[.*+?^${}()|[\]\\]/g, '\\$&')}`, 's');
-                const match = aiResponseMessageContent.match(regex);
-
-                if (match) {
-                    pluginMatchedAndProcessed = true;
-                    const pluginArgument = plugin.accepts_parameters && match[1] ? match[1].trim() : null;
-                    const textBeforePlaceholder = aiResponseMessageContent.substring(0, match.index).trimEnd();
-                    
-                    if (textBeforePlaceholder) { await fs.appendFile(CONFORM_CHAT_FILE, textBeforePlaceholder + "\n", 'utf-8'); }
-                    console.log(`[NodeJS] 检测到插件调用: ${plugin.name}`);
-
-                    // Base for next request's messages: currentRequestBodyObject (if it was JSON-like)
-                    let baseMessagesForNextRequest = (currentRequestBodyObject && currentRequestBodyObject.messages) ? [...currentRequestBodyObject.messages] : [];
-                    
-                    // AI's message that triggered the plugin
-                    const aiMessageThatTriggeredPlugin = aiFullResponseObject?.choices?.[0]?.message || 
-                                                       (aiFullResponseObject?.content?.[0]?.text ? {role: "assistant", content: aiFullResponseObject.content[0].text} : null) || 
-                                                       { role: "assistant", content: aiResponseMessageContent };
-
-
-                    if (plugin.is_internal_signal && plugin.id === "continue_ai_reply") {
-                        baseMessagesForNextRequest.push(aiMessageThatTriggeredPlugin);
-                        baseMessagesForNextRequest.push({ role: "system", content: `[系统提示] ${pluginArgument || "请继续。"}` });
-                        
-                        const nextBodyObject = { ...(currentRequestBodyObject || {}), messages: baseMessagesForNextRequest };
-                        const nextReqData = { ...originalRequestData, body: JSON.stringify(nextBodyObject) };
-                        return await handleRequestAndPlugins(req, res, nextReqData, recursionDepth, continuationDepth + 1);
-                    } else {
-                        try {
-                            const pluginResult = await executePlugin(plugin, pluginArgument);
-                            const displayMode = rootConfig.conform_chat_display_mode || "detailed_plugin_responses";
-                            if (displayMode === "detailed_plugin_responses") {
-                                await fs.appendFile(CONFORM_CHAT_FILE, `\n\n\`\`\`\n[插件 ${plugin.name} 执行结果]:\n${pluginResult}\n\`\`\`\n\n`, 'utf-8');
-                            }
-                            
-                            baseMessagesForNextRequest.push(aiMessageThatTriggeredPlugin);
-                            baseMessagesForNextRequest.push({ role: "user", content: `[插件 ${plugin.name} 执行结果]:\n${pluginResult}` });
-                            
-                            const nextBodyObject = { ...(currentRequestBodyObject || {}), messages: baseMessagesForNextRequest };
-                            const nextReqData = { ...originalRequestData, body: JSON.stringify(nextBodyObject) };
-                            return await handleRequestAndPlugins(req, res, nextReqData, recursionDepth + 1, 0);
-                        } catch (pluginError) {
-                            console.error(`[NodeJS] 插件 ${plugin.name} 执行出错: ${pluginError.message}`);
-                            await fs.appendFile(CONFORM_CHAT_FILE, `\n\n\`\`\`\n[插件执行错误: ${plugin.name}]\n${pluginError.message}\n\`\`\`\n\n`, 'utf-8');
-                            
-                            baseMessagesForNextRequest.push(aiMessageThatTriggeredPlugin);
-                            baseMessagesForNextRequest.push({ role: "user", content: `[系统错误] 插件 '${plugin.name}' 执行失败: ${pluginError.message}. 请尝试其他方法。` });
-
-                            const nextBodyObject = { ...(currentRequestBodyObject || {}), messages: baseMessagesForNextRequest };
-                            const nextReqDataErr = { ...originalRequestData, body: JSON.stringify(nextBodyObject) };
-                            return await handleRequestAndPlugins(req, res, nextReqDataErr, recursionDepth + 1, 0);
-                        }
-                    } 
-                } 
-            } 
-        } 
-
-        if (!pluginMatchedAndProcessed) {
-            if (aiResponseMessageContent) {
-                 const currentConform = await fs.readFile(CONFORM_CHAT_FILE, 'utf-8').catch(() => "");
-                 let prefix = (currentConform.trim() && !currentConform.endsWith('\n\n') && !currentConform.endsWith('\n')) ? "\n\n" : (currentConform.trim() && !currentConform.endsWith('\n\n') ? "\n" : "");
-                 await fs.appendFile(CONFORM_CHAT_FILE, prefix + aiResponseMessageContent.trimEnd(), 'utf-8');
-            }
-            if (res && !res.headersSent) {
-                const finalConformContent = (await fs.readFile(CONFORM_CHAT_FILE, 'utf-8')).trim() || "[系统消息：AI未返回有效内容]";
-                await initializeConformChatFile();
-                
-                let finalResponseToClientObject = JSON.parse(JSON.stringify(aiFullResponseObject || { // Deep copy base
-                    id: `conformchat-${Date.now()}`, object: "chat.completion", created: Math.floor(Date.now()/1000),
-                    model: (currentRequestBodyObject && currentRequestBodyObject.model) ? currentRequestBodyObject.model : "unknown_model_conform",
-                    choices: [{ index: 0, message: {}, finish_reason: "stop" }]
-                }));
-
-                if (!finalResponseToClientObject.choices || !finalResponseToClientObject.choices[0]) finalResponseToClientObject.choices = [{ index: 0, message: {}, finish_reason: "stop" }];
-                if (!finalResponseToClientObject.choices[0].message) finalResponseToClientObject.choices[0].message = {};
-                finalResponseToClientObject.choices[0].message.role = "assistant";
-                finalResponseToClientObject.choices[0].message.content = finalConformContent;
-                
-                res.status(responseFromTarget.status).json(finalResponseToClientObject);
-            }
-        }
-    } catch (error) {
-        console.error(`[NodeJS] 转发或处理响应时出错: ${error.message}`, error.stack);
-        if (rootConfig.log_intercepted_data) await logResponse({status: 502, headers: new Map()}, `[错误: ${error.message}]`);
-        if (res && !res.headersSent) {
-             const errorResponseToClient = {
-                id: "error-proxy-" + Date.now(),
-                object: "error",
-                message: "代理转发或响应处理失败",
-                details: error.message,
-                target: targetUrl,
-                model: (currentRequestBodyObject && currentRequestBodyObject.model) ? currentRequestBodyObject.model : "unknown_model_proxy_error",
-                choices: [{ index: 0, message: { role: "assistant", content: `[系统错误] 代理转发或处理到 ${targetUrl} 的请求失败: ${error.message}` }, finish_reason: "error" }]
-            };
-            res.status(502).json(errorResponseToClient);
-        }
-        await initializeConformChatFile();
-    }
-}
-
-
-// --- Express App Setup ---
-const app = express();
-app.use(express.json({ limit: '100mb' }));
-app.use(express.text({ limit: '100mb', type: ['text/*', 'application/xml', 'application/javascript'] }));
-app.use(express.urlencoded({ extended: true, limit: '100mb' }));
-app.use(morgan('dev', { stream: { write: (msg) => console.log(msg.trim()) } }));
-
-// --- API Endpoints for Frontend ---
-app.get('/api/system-config', (req, res) => res.json(rootConfig || {}));
-app.post('/api/system-config', async (req, res) => {
-    try {
-        const newConfig = req.body;
-        await fs.writeFile(ROOT_CONFIG_FILE_PATH, JSON.stringify(newConfig, null, 2), 'utf-8');
-        loadRootConfig(); 
-        await discoverAndLoadPlugins(); 
-        res.json({ message: '系统配置已更新！部分更改需重启服务生效。' });
-    } catch (e) { res.status(500).json({ message: '保存系统配置失败', error: e.message }); }
-});
-
-app.get('/api/plugins', (req, res) => res.json(allDiscoveredPluginsInfo || []));
-
-app.get('/api/plugin-config/:plugin_id', async (req, res) => {
-    const pluginId = req.params.plugin_id;
-    const pluginInfo = allDiscoveredPluginsInfo.find(p => p.id === pluginId);
-    if (!pluginInfo) return res.status(404).json({ message: '插件未找到' });
-    try {
-        const configPath = path.join(PLUGINS_DIR, pluginInfo.folder_name, 'config.json');
-        const configContent = await fs.readFile(configPath, 'utf-8');
-        res.json(JSON.parse(configContent));
-    } catch (e) { res.status(500).json({ message: '读取插件配置失败', error: e.message }); }
-});
-
-app.post('/api/plugin-config/:plugin_id', async (req, res) => {
-    const pluginId = req.params.plugin_id;
-    const pluginInfo = allDiscoveredPluginsInfo.find(p => p.id === pluginId);
-    if (!pluginInfo) return res.status(404).json({ message: '插件未找到' });
-    try {
-        const newPluginConfig = req.body;
-        if (!newPluginConfig.plugin_id || newPluginConfig.plugin_id !== pluginId) {
-            return res.status(400).json({ message: '插件ID不匹配或丢失。' });
-        }
-        const configPath = path.join(PLUGINS_DIR, pluginInfo.folder_name, 'config.json');
-        await fs.writeFile(configPath, JSON.stringify(newPluginConfig, null, 2), 'utf-8');
-        await discoverAndLoadPlugins(); 
-        res.json({ message: `插件 ${pluginInfo.name} 配置已更新！` });
-    } catch (e) { res.status(500).json({ message: '保存插件配置失败', error: e.message }); }
-});
-
-
-// Serve frontend
-app.get('/plugin-manager', (req, res) => res.sendFile(path.join(__dirname, 'plugin_manager.html')));
-app.get('/plugin_manager.js', (req, res) => res.sendFile(path.join(__dirname, 'plugin_manager.js')));
-
-
-// Catch-all for proxying
-app.all('*', (req, res, next) => {
-    if (req.path.startsWith('/api/') || req.path.startsWith('/plugin-manager')) {
-        return next();
-    }
-    const initialRequestData = {
-        method: req.method, url: req.originalUrl, headers: { ...req.headers },
-        body: req.body, sourceIp: req.ip || req.socket?.remoteAddress
-    };
-    delete initialRequestData.headers['host'];
-    delete initialRequestData.headers['content-length']; 
-
-    handleRequestAndPlugins(req, res, initialRequestData);
-});
-
-// Error handler
-app.use((err, req, res, next) => {
-    console.error("[NodeJS] 未捕获的服务器错误:", err.stack || err.message);
-    if (!res.headersSent) res.status(500).json({ error: '服务器内部错误', details: err.message });
-});
-
-
-// --- Start Server ---
-(async () => {
-    loadRootConfig();
-    await initializeConformChatFile();
-    await discoverAndLoadPlugins();
-    
-    const port = rootConfig.proxy_server_port || 3001;
-    app.listen(port, '0.0.0.0', () => {
-        console.log("======================================================================");
-        console.log(`[NodeJS] Xice_Aitoolbox 监听服务正在运行于端口: ${port}`);
-        console.log(`[NodeJS] 转发到: ${rootConfig.target_proxy_url}`);
-        console.log(`[NodeJS] 插件管理界面: http://localhost:${port}/plugin-manager`);
-        console.log(`[NodeJS] 当前 ConformChat 显示模式: ${rootConfig.conform_chat_display_mode}`);
-        console.log("======================================================================");
-    }).on('error', (err) => {
-        if (err.code === 'EADDRINUSE') console.error(`[NodeJS] 致命错误：端口 ${port} 已被占用。`);
-        else console.error("[NodeJS] 启动服务器失败:", err);
-        process.exit(1);
-    });
-})();
-
-process.on('SIGINT', () => {
-    console.log('[NodeJS] 收到 SIGINT，正在关闭...');
-    process.exit(0);
+const express = require('express');
+const fs = require('fs').promises;
+const fsSync = require('fs'); // For synchronous checks like existsSync
+const path = require('path');
+const crypto = require('crypto');
+const morgan = require('morgan');
+const fetch = require('node-fetch'); // Ensure node-fetch v2 for CJS
+const { StringDecoder } = require('string_decoder');
+const { PythonPluginHostPool } = require('./plugin_host_pool');
+const { spawnPluginProcess } = require('./plugin_process');
+const { SseParser, formatSseData } = require('./sse_stream');
+const { PlaceholderMatcher, IncrementalPlaceholderScanner } = require('./placeholder_matcher');
+const { PluginCallBatch } = require('./plugin_call_batch');
+const { ConformChatTranscript } = require('./conform_chat');
+const { ExchangeLogWriter, readExchangeLog } = require('./exchange_log');
+const { UpstreamClient } = require('./upstream_pool');
+
+const ROOT_CONFIG_FILE_PATH = path.join(__dirname, 'config.json');
+const PLUGINS_DIR = path.join(__dirname, 'Plugin');
+
+let rootConfig;
+let activePlugins = [];
+let allDiscoveredPluginsInfo = []; 
+let systemPluginRulesDescription = "";
+let placeholderMatcher = new PlaceholderMatcher([]); // 已启用插件占位符编译成的自动机，插件重新加载时重建
+let pythonPluginHostPool = null;
+let exchangeLog = null;
+let upstreamClient = null;
+
+// --- Configuration Loading ---
+function loadRootConfig() {
+    try {
+        const configFileContent = fsSync.readFileSync(ROOT_CONFIG_FILE_PATH, 'utf-8');
+        rootConfig = JSON.parse(configFileContent);
+        console.log("[NodeJS] 根配置文件已加载。");
+    } catch (error) {
+        console.error(`[NodeJS] 致命错误：无法加载或解析根配置文件 ${path.basename(ROOT_CONFIG_FILE_PATH)}: ${error.message}`);
+        process.exit(1);
+    }
+}
+
+async function discoverAndLoadPlugins() {
+    allDiscoveredPluginsInfo = [];
+    activePlugins = [];
+    systemPluginRulesDescription = "";
+    console.log("[NodeJS] 开始扫描插件目录:", PLUGINS_DIR);
+
+    try {
+        const pluginFolders = await fs.readdir(PLUGINS_DIR, { withFileTypes: true });
+        for (const dirent of pluginFolders) {
+            if (dirent.isDirectory()) {
+                const pluginFolderName = dirent.name;
+                const pluginConfigPath = path.join(PLUGINS_DIR, pluginFolderName, 'config.json');
+                try {
+                    if (!fsSync.existsSync(pluginConfigPath)) {
+                        console.warn(`[NodeJS] 插件 ${pluginFolderName}: 未找到 config.json，已跳过。`);
+                        continue;
+                    }
+                    const pluginConfigFileContent = await fs.readFile(pluginConfigPath, 'utf-8');
+                    const pluginConfig = JSON.parse(pluginConfigFileContent);
+
+                    if (!pluginConfig.plugin_id || !pluginConfig.plugin_name_cn || !pluginConfig.executable_name ||
+                        !pluginConfig.placeholder_start || !pluginConfig.placeholder_end) {
+                        console.warn(`[NodeJS] 插件 ${pluginFolderName}: config.json 缺少必要字段，已跳过。`);
+                        continue;
+                    }
+                    
+                    const pluginInfo = {
+                        id: pluginConfig.plugin_id,
+                        name: pluginConfig.plugin_name_cn,
+                        version: pluginConfig.version || "0.0.0",
+                        description: pluginConfig.description || "无描述",
+                        author: pluginConfig.author || "未知",
+                        enabled: pluginConfig.enabled === undefined ? true : pluginConfig.enabled,
+                        is_python_script: pluginConfig.is_python_script === undefined ? true : pluginConfig.is_python_script,
+                        executable_name: pluginConfig.executable_name,
+                        python_entry_function: pluginConfig.python_entry_function || null,
+                        use_persistent_host: pluginConfig.use_persistent_host === undefined ? true : pluginConfig.use_persistent_host,
+                        argument_via_stdin: pluginConfig.argument_via_stdin === true,
+                        placeholder_start: pluginConfig.placeholder_start,
+                        placeholder_end: pluginConfig.placeholder_end,
+                        accepts_parameters: pluginConfig.accepts_parameters === undefined ? false : pluginConfig.accepts_parameters,
+                        is_internal_signal: pluginConfig.is_internal_signal === undefined ? false : pluginConfig.is_internal_signal,
+                        mutates_state: pluginConfig.mutates_state === undefined ? true : pluginConfig.mutates_state, // 未声明时按会修改状态处理 (串行执行)
+                        parameters_schema: pluginConfig.parameters || [],
+                        plugin_specific_config: pluginConfig.plugin_specific_config || {},
+                        folder_name: pluginFolderName
+                    };
+                    allDiscoveredPluginsInfo.push(pluginInfo);
+
+                    if (pluginInfo.enabled) {
+                        activePlugins.push(pluginInfo);
+                    }
+                    // console.log(`[NodeJS] 已加载插件: ${pluginInfo.name} (ID: ${pluginInfo.id}), 启用状态: ${pluginInfo.enabled}`);
+
+                } catch (err) {
+                    console.error(`[NodeJS] 加载插件 ${pluginFolderName} 的 config.json 失败: ${err.message}`);
+                }
+            }
+        }
+
+        if (activePlugins.length > 0) {
+            systemPluginRulesDescription = "你可以使用以下已启用的工具：\n";
+            activePlugins.forEach(p => {
+                systemPluginRulesDescription += `- ${p.name}: ${p.description}\n`;
+            });
+            systemPluginRulesDescription += "请严格按照占位符格式回复以调用工具。";
+        } else {
+            systemPluginRulesDescription = "当前没有已启用的插件工具。";
+        }
+        console.log(`[NodeJS] 插件扫描完成。发现 ${allDiscoveredPluginsInfo.length} 个插件定义，其中 ${activePlugins.length} 个已启用。`);
+
+    } catch (error) {
+        console.error(`[NodeJS] 扫描插件目录 ${PLUGINS_DIR} 失败: ${error.message}`);
+    }
+    placeholderMatcher = new PlaceholderMatcher(activePlugins);
+}
+
+
+// --- Utility Functions ---
+// 每个顶层客户端请求各自的对话聚合，按配置异步镜像到磁盘 (每个请求一个文件)
+function createConformChatTranscript() {
+    const mirrorDirectory = rootConfig.conform_chat_mirror_enabled ? path.resolve(__dirname, rootConfig.conform_chat_mirror_dir || 'conformchat_logs') : null;
+    return new ConformChatTranscript(ConformChatTranscript.createRequestId(), mirrorDirectory);
+}
+
+function getExchangeLogDirectory() {
+    return path.resolve(__dirname, rootConfig.log_directory || 'logs');
+}
+
+function getExchangeLog() {
+    if (!exchangeLog) {
+        exchangeLog = new ExchangeLogWriter({
+            directory: getExchangeLogDirectory(),
+            maxSegmentBytes: (rootConfig.log_rotate_max_mb ?? 10) * 1024 * 1024,
+            rotateIntervalMs: (rootConfig.log_rotate_interval_hours ?? 24) * 3600 * 1000,
+            compressRotated: rootConfig.log_compress_rotated !== false,
+            maxRotatedSegments: rootConfig.log_max_rotated_files ?? 10,
+            maxBodyBytes: (rootConfig.max_log_response_size_kb_in_received_file || 1024) * 1024,
+            largeBodySampleRate: rootConfig.log_large_body_sample_rate || 0,
+        });
+    }
+    return exchangeLog;
+}
+
+function closeExchangeLog() {
+    const closing = exchangeLog ? exchangeLog.close() : Promise.resolve();
+    exchangeLog = null;
+    return closing;
+}
+
+// 请求与响应日志只放入内存队列，由后台批量写入 (见 exchange_log.js)，不阻塞插件调用链
+function logRequest(req, bodyForLog, originalUrl, sourceIp, requestId) { // bodyForLog is expected to be an object or a raw string if not JSON
+    if (!rootConfig.log_intercepted_data) return;
+    getExchangeLog().write({
+        type: "request",
+        request_id: requestId,
+        method: req.method,
+        target_url: rootConfig.target_proxy_url + (req.originalUrl || originalUrl),
+        original_url: originalUrl ? `${req.protocol || 'http'}://${req.headers?.host || 'localhost'}${originalUrl}` : `${req.protocol}://${req.headers.host}${req.originalUrl}`,
+        source_ip: sourceIp || req.ip || req.socket?.remoteAddress,
+        headers: req.headers,
+        body: bodyForLog, // Log the (potentially modified) object or raw string
+    });
+}
+
+function logResponse(response, body, requestId) {
+    if (!rootConfig.log_intercepted_data) return;
+    getExchangeLog().write({
+        type: "response",
+        request_id: requestId,
+        status: response.status,
+        headers: Object.fromEntries(response.headers.entries()),
+        body: rootConfig.log_response_body_in_received_file ? body : "[响应体日志已禁用]",
+    });
+}
+
+function getPythonPluginHostPool() {
+    if (!rootConfig.python_plugin_host_enabled) return null;
+    if (!pythonPluginHostPool) {
+        const poolSize = rootConfig.python_plugin_host_pool_size || 2;
+        pythonPluginHostPool = new PythonPluginHostPool({
+            poolSize,
+            callTimeoutMs: (rootConfig.python_plugin_host_call_timeout_seconds || 0) * 1000,
+        });
+        console.log(`[NodeJS] 已启动常驻 Python 插件宿主池 (进程数: ${poolSize})。`);
+    }
+    return pythonPluginHostPool;
+}
+
+function getUpstreamClient() {
+    if (!upstreamClient) {
+        const seconds = (key, fallback) => (rootConfig[key] ?? fallback) * 1000;
+        upstreamClient = new UpstreamClient(fetch, {
+            keepAlive: rootConfig.upstream_keep_alive !== false,
+            maxSockets: rootConfig.upstream_max_sockets || 32,
+            maxFreeSockets: rootConfig.upstream_max_free_sockets ?? 8,
+            freeSocketTimeoutMs: seconds('upstream_free_socket_timeout_seconds', 4),
+            responseTimeoutMs: seconds('upstream_response_timeout_seconds', 600),
+            idleTimeoutMs: seconds('upstream_idle_timeout_seconds', 300),
+        });
+    }
+    return upstreamClient;
+}
+
+function retireUpstreamClient() {
+    if (upstreamClient) {
+        upstreamClient.retire(); // 进行中的请求继续使用旧连接池直到结束
+        upstreamClient = null;
+    }
+}
+
+function shutdownPythonPluginHostPool() {
+    if (pythonPluginHostPool) {
+        pythonPluginHostPool.shutdown();
+        pythonPluginHostPool = null;
+    }
+}
+
+// context.conversationId: 调用所在对话的标识 (见 conversationIdFor)，插件可据此区分不同对话的状态
+function executePlugin(pluginInfo, pluginArgument, context = {}) {
+    const argument = (pluginInfo.accepts_parameters && pluginArgument !== null && pluginArgument !== undefined) ? String(pluginArgument) : null;
+    // 声明了 python_entry_function 且未退出常驻宿主的 Python 插件由宿主池执行，其余插件仍按原方式单独启动进程
+    const hostPool = (pluginInfo.is_python_script && pluginInfo.python_entry_function && pluginInfo.use_persistent_host) ? getPythonPluginHostPool() : null;
+    if (hostPool && hostPool.available) {
+        console.log(`[NodeJS] 执行插件 (常驻宿主): ${pluginInfo.name} (ID: ${pluginInfo.id})`);
+        return hostPool.execute(pluginInfo, path.join(PLUGINS_DIR, pluginInfo.folder_name), argument, context);
+    }
+    if (hostPool) console.warn(`[NodeJS] 插件宿主进程暂不可用，单独启动进程执行插件: ${pluginInfo.name}`);
+    return spawnPluginProcess(pluginInfo, path.join(PLUGINS_DIR, pluginInfo.folder_name), argument, context);
+}
+
+function isContinueSignal(pluginInfo) {
+    return pluginInfo.is_internal_signal && pluginInfo.id === "continue_ai_reply";
+}
+
+function invocationArgument(invocation) {
+    return invocation.plugin.accepts_parameters && invocation.argument ? invocation.argument.trim() : null;
+}
+
+function createPluginCallBatch(conversationId) {
+    const context = { conversationId };
+    return new PluginCallBatch((plugin, argument) => executePlugin(plugin, argument, context), rootConfig.plugin_parallelism_limit || 4);
+}
+
+// 对话标识。客户端可以通过 X-Conversation-Id 请求头指定；否则取第一条 system 消息与第一条 user 消息的哈希
+// (聊天客户端每轮都会重发完整的历史消息，同一对话中这两条消息不变)。在注入插件规则之前计算，不受注入影响。
+function conversationIdFor(requestData) {
+    const header = requestData.headers['x-conversation-id'];
+    if (header) return String(header).substring(0, 128);
+    let body = requestData.body;
+    if (typeof body === 'string') {
+        try { body = JSON.parse(body); } catch (e) { return null; }
+    }
+    const messages = body && Array.isArray(body.messages) ? body.messages : null;
+    const firstContent = (role) => {
+        const message = messages.find(m => m && m.role === role);
+        if (!message) return '';
+        return typeof message.content === 'string' ? message.content : JSON.stringify(message.content ?? '');
+    };
+    if (!messages || !firstContent('user')) return null;
+    return crypto.createHash('sha256').update(firstContent('system')).update('\0').update(firstContent('user')).digest('hex').substring(0, 16);
+}
+
+// 等待批次中的全部调用完成。返回按文档顺序的结果，以及合并后发回给 AI 的一条消息。
+async function collectPluginResults(batch) {
+    const outcomes = await batch.results();
+    const messageParts = outcomes.map(outcome => {
+        if (outcome.error) {
+            console.error(`[NodeJS] 插件 ${outcome.plugin.name} 执行出错: ${outcome.error.message}`);
+            return `[系统错误] 插件 '${outcome.plugin.name}' 执行失败: ${outcome.error.message}. 请尝试其他方法。`;
+        }
+        return `[插件 ${outcome.plugin.name} 执行结果]:\n${outcome.result}`;
+    });
+    return { outcomes, message: messageParts.join('\n\n') };
+}
+
+// 插件结果在聚合对话与客户端流中的显示块。执行错误总是显示，执行结果只在详细模式下显示。
+function formatPluginResultBlock(outcome) {
+    if (outcome.error) return `\n\n\`\`\`\n[插件执行错误: ${outcome.plugin.name}]\n${outcome.error.message}\n\`\`\`\n\n`;
+    const displayMode = rootConfig.conform_chat_display_mode || "detailed_plugin_responses";
+    return displayMode === "detailed_plugin_responses" ? `\n\n\`\`\`\n[插件 ${outcome.plugin.name} 执行结果]:\n${outcome.result}\n\`\`\`\n\n` : '';
+}
+
+// 解析客户端请求体并按需注入插件规则。返回可修改的请求体对象 (请求体不是JSON时为 null) 以及实际发送给上游的请求体。
+function prepareUpstreamRequestBody(originalRequestData) {
+    let currentRequestBodyObject; // This will be an object if original body is JSON or becomes JSON
+    let originalBodyWasNonJsonString = false;
+
+    if (typeof originalRequestData.body === 'string') {
+        try {
+            currentRequestBodyObject = JSON.parse(originalRequestData.body);
+            // Deep clone to prevent modification of originalRequestData.body if it's parsed from string
+            currentRequestBodyObject = JSON.parse(JSON.stringify(currentRequestBodyObject));
+        } catch (e) {
+            console.warn("[NodeJS] 初始请求体是字符串但非有效JSON，无法注入规则:", originalRequestData.body.substring(0,100));
+            currentRequestBodyObject = null; // Indicate it's not a modifiable JSON object
+            originalBodyWasNonJsonString = true;
+        }
+    } else if (typeof originalRequestData.body === 'object' && originalRequestData.body !== null) {
+        currentRequestBodyObject = JSON.parse(JSON.stringify(originalRequestData.body)); // Deep copy
+    } else {
+        currentRequestBodyObject = { messages: [] }; // Default for null or other types, to allow injection
+    }
+
+    // Inject plugin rules if applicable, modifying 'currentRequestBodyObject'
+    if (currentRequestBodyObject && // Ensure it's a valid object for modification
+        rootConfig.inject_plugin_rules_on_first_request && 
+        systemPluginRulesDescription && 
+        activePlugins.length > 0 &&
+        currentRequestBodyObject.messages // And it has a messages array
+    ) {
+        const firstUserMsgIdx = currentRequestBodyObject.messages.findIndex(m => m.role === 'user');
+        const hasRuleInjected = currentRequestBodyObject.messages.some(m => m.role === 'system' && m.content && m.content.startsWith("你可以使用以下已启用的工具："));
+        
+        if (firstUserMsgIdx !== -1 && !hasRuleInjected) {
+             currentRequestBodyObject.messages.splice(firstUserMsgIdx, 0, { role: "system", content: systemPluginRulesDescription });
+             console.log("[NodeJS] 已注入插件规则描述。");
+        }
+    }
+
+    // Prepare the body for the fetch call
+    // If currentRequestBodyObject is null, it means original body was a non-JSON string and should be sent as is.
+    // Otherwise, stringify the (potentially modified) object.
+    const finalBodyForFetch = currentRequestBodyObject !== null ? JSON.stringify(currentRequestBodyObject) : originalRequestData.body;
+    
+    return { currentRequestBodyObject, finalBodyForFetch };
+}
+
+// --- Main Request Handling Logic ---
+async function handleRequestAndPlugins(req, res, originalRequestData, recursionDepth = 0, continuationDepth = 0, transcript = null) {
+    if (!transcript) transcript = createConformChatTranscript();
+
+    const MAX_RECURSION = rootConfig.max_plugin_recursion_depth || 5;
+    const MAX_CONTINUATION = rootConfig.max_continuation_depth || 5;
+
+    if (recursionDepth > MAX_RECURSION || continuationDepth > MAX_CONTINUATION) {
+        const limitType = recursionDepth > MAX_RECURSION ? "插件递归" : "继续回复";
+        console.warn(`[NodeJS] ${limitType}达到最大深度，停止调用。`);
+        const finalContent = (transcript.content.trim() || "[无内容]") + `\n\n[系统消息：已达到最大${limitType}深度]`;
+        const errorResponse = {
+            id: `error-${limitType.replace(" ", "-")}-limit-${Date.now()}`, object: "chat.completion",
+            choices: [{ message: { role: "assistant", content: finalContent }, finish_reason: "length" }],
+            model: (typeof originalRequestData.body === 'object' && originalRequestData.body?.model) ? originalRequestData.body.model : "unknown_model_limit"
+        };
+        if (res && !res.headersSent) res.status(200).json(errorResponse);
+        return;
+    }
+
+    const targetUrl = rootConfig.target_proxy_url + originalRequestData.url;
+    
+    const { currentRequestBodyObject, finalBodyForFetch } = prepareUpstreamRequestBody(originalRequestData);
+
+    // Log the request body that will be sent to the target
+    // If original was non-JSON string and couldn't be modified, log that original string. Otherwise, log the object.
+    if (rootConfig.log_intercepted_data) {
+        logRequest(req, 
+            currentRequestBodyObject === null ? originalRequestData.body : currentRequestBodyObject, 
+            originalRequestData.url, 
+            originalRequestData.sourceIp,
+            transcript.requestId
+        );
+    }
+
+    let responseFromTarget, responseBodyBuffer, aiResponseMessageContent = null, aiFullResponseObject = null;
+    try {
+        console.log(`[NodeJS] 转发请求 (请求 ${transcript.requestId}, 递归 ${recursionDepth}, 继续 ${continuationDepth}): ${originalRequestData.method} ${targetUrl}`);
+        const upstream = getUpstreamClient();
+        responseFromTarget = await upstream.fetch(targetUrl, {
+            method: originalRequestData.method, headers: originalRequestData.headers,
+            body: (originalRequestData.method !== 'GET' && originalRequestData.method !== 'HEAD') ? finalBodyForFetch : undefined,
+        });
+        responseBodyBuffer = await upstream.buffer(responseFromTarget);
+        const contentType = responseFromTarget.headers.get('content-type') || '';
+
+        if (contentType.includes('application/json')) {
+            const responseJsonString = responseBodyBuffer.toString('utf-8');
+            aiFullResponseObject = JSON.parse(responseJsonString);
+            aiResponseMessageContent = aiFullResponseObject?.choices?.[0]?.message?.content ||
+                                     aiFullResponseObject?.content?.[0]?.text || 
+                                     aiFullResponseObject?.message?.content;   
+        } else if (contentType.includes('text/')) {
+            aiResponseMessageContent = responseBodyBuffer.toString('utf-8');
+        }
+        if (rootConfig.log_intercepted_data) { logResponse(responseFromTarget, aiFullResponseObject || aiResponseMessageContent || responseBodyBuffer, transcript.requestId); }
+
+        let pluginMatchedAndProcessed = false;
+        if (aiResponseMessageContent && activePlugins.length > 0) {
+            const invocations = placeholderMatcher.findAll(aiResponseMessageContent);
+            if (invocations.length > 0) {
+                pluginMatchedAndProcessed = true;
+                console.log(`[NodeJS] 检测到插件调用: ${invocations.map(invocation => invocation.plugin.name).join(', ')}`);
+
+                // Base for next request's messages: currentRequestBodyObject (if it was JSON-like)
+                let baseMessagesForNextRequest = (currentRequestBodyObject && currentRequestBodyObject.messages) ? [...currentRequestBodyObject.messages] : [];
+                
+                // AI's message that triggered the plugin
+                const aiMessageThatTriggeredPlugin = aiFullResponseObject?.choices?.[0]?.message || 
+                                                   (aiFullResponseObject?.content?.[0]?.text ? {role: "assistant", content: aiFullResponseObject.content[0].text} : null) || 
+                                                   { role: "assistant", content: aiResponseMessageContent };
+                baseMessagesForNextRequest.push(aiMessageThatTriggeredPlugin);
+
+                const toolInvocations = invocations.filter(invocation => !isContinueSignal(invocation.plugin));
+                if (toolInvocations.length === 0) {
+                    const textBeforePlaceholder = aiResponseMessageContent.substring(0, invocations[0].start).trimEnd();
+                    if (textBeforePlaceholder) { transcript.append(textBeforePlaceholder + "\n"); }
+                    baseMessagesForNextRequest.push({ role: "system", content: `[系统提示] ${invocationArgument(invocations[0]) || "请继续。"}` });
+                    
+                    const nextBodyObject = { ...(currentRequestBodyObject || {}), messages: baseMessagesForNextRequest };
+                    const nextReqData = { ...originalRequestData, body: JSON.stringify(nextBodyObject) };
+                    return await handleRequestAndPlugins(req, res, nextReqData, recursionDepth, continuationDepth + 1, transcript);
+                }
+
+                // 回复中的全部工具调用在同一轮执行，结果合并为一条消息发回给 AI (继续回复信号此时不再需要)
+                const batch = createPluginCallBatch(originalRequestData.conversationId);
+                toolInvocations.forEach(invocation => batch.add(invocation.plugin, invocationArgument(invocation)));
+                const { outcomes, message } = await collectPluginResults(batch);
+
+                toolInvocations.forEach((invocation, index) => {
+                    const textBeforePlaceholder = aiResponseMessageContent.substring(index === 0 ? 0 : toolInvocations[index - 1].end, invocation.start).trim();
+                    if (textBeforePlaceholder) transcript.append(textBeforePlaceholder + "\n");
+                    transcript.append(formatPluginResultBlock(outcomes[index]));
+                });
+
+                baseMessagesForNextRequest.push({ role: "user", content: message });
+                const nextBodyObject = { ...(currentRequestBodyObject || {}), messages: baseMessagesForNextRequest };
+                const nextReqData = { ...originalRequestData, body: JSON.stringify(nextBodyObject) };
+                return await handleRequestAndPlugins(req, res, nextReqData, recursionDepth + 1, 0, transcript);
+            } 
+        } 
+
+        if (!pluginMatchedAndProcessed) {
+            if (aiResponseMessageContent) {
+                 const currentConform = transcript.content;
+                 let prefix = (currentConform.trim() && !currentConform.endsWith('\n\n') && !currentConform.endsWith('\n')) ? "\n\n" : (currentConform.trim() && !currentConform.endsWith('\n\n') ? "\n" : "");
+                 transcript.append(prefix + aiResponseMessageContent.trimEnd());
+            }
+            if (res && !res.headersSent) {
+                const finalConformContent = transcript.content.trim() || "[系统消息：AI未返回有效内容]";
+                
+                let finalResponseToClientObject = JSON.parse(JSON.stringify(aiFullResponseObject || { // Deep copy base
+                    id: `conformchat-${Date.now()}`, object: "chat.completion", created: Math.floor(Date.now()/1000),
+                    model: (currentRequestBodyObject && currentRequestBodyObject.model) ? currentRequestBodyObject.model : "unknown_model_conform",
+                    choices: [{ index: 0, message: {}, finish_reason: "stop" }]
+                }));
+
+                if (!finalResponseToClientObject.choices || !finalResponseToClientObject.choices[0]) finalResponseToClientObject.choices = [{ index: 0, message: {}, finish_reason: "stop" }];
+                if (!finalResponseToClientObject.choices[0].message) finalResponseToClientObject.choices[0].message = {};
+                finalResponseToClientObject.choices[0].message.role = "assistant";
+                finalResponseToClientObject.choices[0].message.content = finalConformContent;
+                
+                res.status(responseFromTarget.status).json(finalResponseToClientObject);
+            }
+        }
+    } catch (error) {
+        console.error(`[NodeJS] 转发或处理响应时出错: ${error.message}`, error.stack);
+        if (rootConfig.log_intercepted_data) logResponse({status: 502, headers: new Map()}, `[错误: ${error.message}]`, transcript.requestId);
+        if (res && !res.headersSent) {
+             const errorResponseToClient = {
+                id: "error-proxy-" + Date.now(),
+                object: "error",
+                message: "代理转发或响应处理失败",
+                details: error.message,
+                target: targetUrl,
+                model: (currentRequestBodyObject && currentRequestBodyObject.model) ? currentRequestBodyObject.model : "unknown_model_proxy_error",
+                choices: [{ index: 0, message: { role: "assistant", content: `[系统错误] 代理转发或处理到 ${targetUrl} 的请求失败: ${error.message}` }, finish_reason: "error" }]
+            };
+            res.status(502).json(errorResponseToClient);
+        }
+    }
+}
+
+
+// --- Streaming (SSE) Request Handling ---
+// 客户端请求 stream: true 时，上游的 SSE 分块到达后立即转发给客户端；
+// 增量扫描器只扣留可能是占位符开头的文本，每个占位符的结束标记一到达就开始执行该插件，同时继续读取上游；
+// 本轮回复结束后按文档顺序写出全部插件结果，后续轮次的回复继续写入同一个客户端流。
+function isStreamingRequest(body) {
+    if (typeof body === 'object' && body !== null) return body.stream === true;
+    if (typeof body === 'string') {
+        try { return JSON.parse(body).stream === true; } catch (e) { return false; }
+    }
+    return false;
+}
+
+function beginClientStream(res) {
+    if (res.headersSent) return;
+    res.status(200);
+    res.setHeader('Content-Type', 'text/event-stream; charset=utf-8');
+    res.setHeader('Cache-Control', 'no-cache');
+    res.setHeader('Connection', 'keep-alive');
+    res.flushHeaders();
+}
+
+function writeStreamContent(res, streamState, content, finishReason = null) {
+    beginClientStream(res);
+    streamState.transcript.append(content);
+    res.write(formatSseData({
+        id: streamState.id, object: "chat.completion.chunk", created: streamState.created, model: streamState.model,
+        choices: [{ index: 0, delta: content ? { content } : {}, finish_reason: finishReason }],
+    }));
+}
+
+function endClientStream(res, streamState, finishReason = null) {
+    if (res.writableEnded) return;
+    if (finishReason) writeStreamContent(res, streamState, '', finishReason);
+    res.write(formatSseData('[DONE]'));
+    res.end();
+}
+
+async function handleStreamingRequestAndPlugins(req, res, originalRequestData, recursionDepth = 0, continuationDepth = 0, streamState = null) {
+    if (!streamState) {
+        streamState = { id: `chatcmpl-xice-${Date.now()}`, created: Math.floor(Date.now() / 1000), model: null, roleSent: false, clientClosed: false,
+                        transcript: createConformChatTranscript() };
+        res.on('close', () => { streamState.clientClosed = true; });
+    }
+
+    const MAX_RECURSION = rootConfig.max_plugin_recursion_depth || 5;
+    const MAX_CONTINUATION = rootConfig.max_continuation_depth || 5;
+    if (recursionDepth > MAX_RECURSION || continuationDepth > MAX_CONTINUATION) {
+        const limitType = recursionDepth > MAX_RECURSION ? "插件递归" : "继续回复";
+        console.warn(`[NodeJS] ${limitType}达到最大深度，停止调用。`);
+        writeStreamContent(res, streamState, `\n\n[系统消息：已达到最大${limitType}深度]`);
+        endClientStream(res, streamState, "length");
+        return;
+    }
+
+    const targetUrl = rootConfig.target_proxy_url + originalRequestData.url;
+    const { currentRequestBodyObject, finalBodyForFetch } = prepareUpstreamRequestBody(originalRequestData);
+    streamState.model = streamState.model || currentRequestBodyObject?.model || "unknown_model_stream";
+
+    if (rootConfig.log_intercepted_data) {
+        logRequest(req, currentRequestBodyObject === null ? originalRequestData.body : currentRequestBodyObject, originalRequestData.url, originalRequestData.sourceIp, streamState.transcript.requestId);
+    }
+
+    let responseFromTarget;
+    let assistantText = ''; // 本轮 AI 生成的全部文本
+    try {
+        console.log(`[NodeJS] 转发流式请求 (请求 ${streamState.transcript.requestId}, 递归 ${recursionDepth}, 继续 ${continuationDepth}): ${originalRequestData.method} ${targetUrl}`);
+        const upstream = getUpstreamClient();
+        responseFromTarget = await upstream.fetch(targetUrl, {
+            method: originalRequestData.method, headers: originalRequestData.headers,
+            body: (originalRequestData.method !== 'GET' && originalRequestData.method !== 'HEAD') ? finalBodyForFetch : undefined,
+        });
+        const contentType = responseFromTarget.headers.get('content-type') || '';
+
+        if (!responseFromTarget.ok || !contentType.includes('text/event-stream')) {
+            const bodyText = (await upstream.buffer(responseFromTarget)).toString('utf-8');
+            if (rootConfig.log_intercepted_data) logResponse(responseFromTarget, bodyText, streamState.transcript.requestId);
+            if (!res.headersSent) {
+                res.status(responseFromTarget.status).type(contentType || 'text/plain').send(bodyText);
+            } else {
+                writeStreamContent(res, streamState, `\n\n[系统错误] 上游返回了非流式响应 (状态码 ${responseFromTarget.status}): ${bodyText.substring(0, 500)}`);
+                endClientStream(res, streamState, "error");
+            }
+            return;
+        }
+        beginClientStream(res);
+
+        const parser = new SseParser();
+        const decoder = new StringDecoder('utf8');
+        const scanner = new IncrementalPlaceholderScanner(placeholderMatcher);
+        const batch = createPluginCallBatch(originalRequestData.conversationId);
+        let continueInvocation = null;
+
+        // 工具调用一检测到就开始执行；继续回复信号只在本轮没有工具调用时生效
+        const startInvocation = (invocation) => {
+            console.log(`[NodeJS] 检测到插件调用 (流式): ${invocation.plugin.name}`);
+            if (!isContinueSignal(invocation.plugin)) batch.add(invocation.plugin, invocationArgument(invocation));
+            else if (!continueInvocation) continueInvocation = invocation;
+        };
+
+        const handleEvent = (event) => {
+            if (event.data === null || event.data.trim() === '[DONE]') return; // [DONE] 在整个流结束时统一发送
+            let payload;
+            try { payload = JSON.parse(event.data); }
+            catch (e) { res.write(event.raw + '\n\n'); return; }
+
+            const choice = payload.choices?.[0];
+            if (!choice) { res.write(formatSseData(payload)); return; } // 例如单独的 usage 分块
+            streamState.model = payload.model || streamState.model;
+
+            const deltaText = choice.delta?.content || '';
+            assistantText += deltaText;
+            let scanned = scanner.push(deltaText);
+            let text = scanned.text;
+            while (scanned.invocation) {
+                startInvocation(scanned.invocation);
+                scanned = scanner.push(scanned.rest);
+                text += scanned.text;
+            }
+            if (choice.finish_reason) {
+                text += scanner.flush();
+                if (batch.size > 0 || continueInvocation) choice.finish_reason = null; // 插件执行后还有下一轮回复
+            }
+
+            const delta = { ...(choice.delta || {}) };
+            delete delta.content;
+            if (streamState.roleSent) delete delta.role;
+            if (text) delta.content = text;
+            streamState.transcript.append(text);
+            if (Object.keys(delta).length > 0 || choice.finish_reason) {
+                if (delta.role) streamState.roleSent = true;
+                payload.id = streamState.id;
+                choice.delta = delta;
+                res.write(formatSseData(payload));
+            }
+        };
+
+        for await (const chunk of upstream.body(responseFromTarget)) {
+            if (streamState.clientClosed) break;
+            parser.push(decoder.write(chunk)).forEach(handleEvent);
+        }
+        if (!streamState.clientClosed) {
+            parser.push(decoder.end()).concat(parser.flush()).forEach(handleEvent);
+            const heldBack = scanner.flush();
+            if (heldBack) writeStreamContent(res, streamState, heldBack);
+        }
+        responseFromTarget.body.destroy(); // 客户端已断开时不再读取上游后续的输出
+        if (rootConfig.log_intercepted_data) logResponse(responseFromTarget, assistantText, streamState.transcript.requestId);
+        if (streamState.clientClosed) return;
+        if (batch.size === 0 && !continueInvocation) {
+            endClientStream(res, streamState);
+            return;
+        }
+
+        const baseMessagesForNextRequest = (currentRequestBodyObject && currentRequestBodyObject.messages) ? [...currentRequestBodyObject.messages] : [];
+        baseMessagesForNextRequest.push({ role: "assistant", content: assistantText });
+
+        if (batch.size === 0) {
+            baseMessagesForNextRequest.push({ role: "system", content: `[系统提示] ${invocationArgument(continueInvocation) || "请继续。"}` });
+            const nextReqData = { ...originalRequestData, body: JSON.stringify({ ...(currentRequestBodyObject || {}), messages: baseMessagesForNextRequest }) };
+            return await handleStreamingRequestAndPlugins(req, res, nextReqData, recursionDepth, continuationDepth + 1, streamState);
+        }
+
+        const { outcomes, message } = await collectPluginResults(batch);
+        const resultBlocks = outcomes.map(formatPluginResultBlock).join('');
+        if (resultBlocks && !streamState.clientClosed) writeStreamContent(res, streamState, resultBlocks);
+        baseMessagesForNextRequest.push({ role: "user", content: message });
+        if (streamState.clientClosed) return;
+        const nextReqData = { ...originalRequestData, body: JSON.stringify({ ...(currentRequestBodyObject || {}), messages: baseMessagesForNextRequest }) };
+        return await handleStreamingRequestAndPlugins(req, res, nextReqData, recursionDepth + 1, 0, streamState);
+    } catch (error) {
+        console.error(`[NodeJS] 转发或处理流式响应时出错: ${error.message}`, error.stack);
+        if (responseFromTarget && responseFromTarget.body) responseFromTarget.body.destroy();
+        if (rootConfig.log_intercepted_data) logResponse({status: 502, headers: new Map()}, `[错误: ${error.message}]`, streamState.transcript.requestId);
+        if (!res.headersSent) {
+            res.status(502).json({
+                id: "error-proxy-" + Date.now(), object: "error", message: "代理转发或响应处理失败", details: error.message, target: targetUrl,
+                model: streamState.model,
+                choices: [{ index: 0, message: { role: "assistant", content: `[系统错误] 代理转发或处理到 ${targetUrl} 的请求失败: ${error.message}` }, finish_reason: "error" }]
+            });
+        } else if (!res.writableEnded) {
+            writeStreamContent(res, streamState, `\n\n[系统错误] 代理转发或处理到 ${targetUrl} 的请求失败: ${error.message}`);
+            endClientStream(res, streamState, "error");
+        }
+    }
+}
+
+
+// --- Express App Setup ---
+const app = express();
+app.use(express.json({ limit: '100mb' }));
+app.use(express.text({ limit: '100mb', type: ['text/*', 'application/xml', 'application/javascript'] }));
+app.use(express.urlencoded({ extended: true, limit: '100mb' }));
+app.use(morgan('dev', { stream: { write: (msg) => console.log(msg.trim()) } }));
+
+// --- API Endpoints for Frontend ---
+app.get('/api/system-config', (req, res) => res.json(rootConfig || {}));
+app.post('/api/system-config', async (req, res) => {
+    try {
+        // 与现有配置合并，避免配置界面中未展示的配置项 (如插件宿主池设置) 在保存时丢失
+        const newConfig = { ...rootConfig, ...req.body };
+        await fs.writeFile(ROOT_CONFIG_FILE_PATH, JSON.stringify(newConfig, null, 2), 'utf-8');
+        loadRootConfig(); 
+        shutdownPythonPluginHostPool(); // 下次调用时按新配置重新创建
+        retireUpstreamClient();
+        closeExchangeLog();
+        await discoverAndLoadPlugins(); 
+        res.json({ message: '系统配置已更新！部分更改需重启服务生效。' });
+    } catch (e) { res.status(500).json({ message: '保存系统配置失败', error: e.message }); }
+});
+
+// 查询请求/响应日志: ?request_id=...&type=request|response&limit=100
+app.get('/api/exchange-log', async (req, res) => {
+    try {
+        if (exchangeLog) await exchangeLog.flush();
+        const limit = Math.min(Math.max(parseInt(req.query.limit, 10) || 100, 1), 1000);
+        const records = await readExchangeLog(getExchangeLogDirectory(), { requestId: req.query.request_id || null, type: req.query.type || null, limit });
+        res.json(records);
+    } catch (e) { res.status(500).json({ message: '读取日志失败', error: e.message }); }
+});
+
+// 上游连接池状态: 连接的新建/复用次数、正在使用/空闲/排队的连接数及超时次数
+app.get('/api/upstream-pool', (req, res) => res.json(upstreamClient ? upstreamClient.stats() : { requests: 0 }));
+
+app.get('/api/plugins', (req, res) => res.json(allDiscoveredPluginsInfo || []));
+
+app.get('/api/plugin-config/:plugin_id', async (req, res) => {
+    const pluginId = req.params.plugin_id;
+    const pluginInfo = allDiscoveredPluginsInfo.find(p => p.id === pluginId);
+    if (!pluginInfo) return res.status(404).json({ message: '插件未找到' });
+    try {
+        const configPath = path.join(PLUGINS_DIR, pluginInfo.folder_name, 'config.json');
+        const configContent = await fs.readFile(configPath, 'utf-8');
+        res.json(JSON.parse(configContent));
+    } catch (e) { res.status(500).json({ message: '读取插件配置失败', error: e.message }); }
+});
+
+app.post('/api/plugin-config/:plugin_id', async (req, res) => {
+    const pluginId = req.params.plugin_id;
+    const pluginInfo = allDiscoveredPluginsInfo.find(p => p.id === pluginId);
+    if (!pluginInfo) return res.status(404).json({ message: '插件未找到' });
+    try {
+        const newPluginConfig = req.body;
+        if (!newPluginConfig.plugin_id || newPluginConfig.plugin_id !== pluginId) {
+            return res.status(400).json({ message: '插件ID不匹配或丢失。' });
+        }
+        const configPath = path.join(PLUGINS_DIR, pluginInfo.folder_name, 'config.json');
+        await fs.writeFile(configPath, JSON.stringify(newPluginConfig, null, 2), 'utf-8');
+        await discoverAndLoadPlugins(); 
+        res.json({ message: `插件 ${pluginInfo.name} 配置已更新！` });
+    } catch (e) { res.status(500).json({ message: '保存插件配置失败', error: e.message }); }
+});
+
+
+// Serve frontend
+app.get('/plugin-manager', (req, res) => res.sendFile(path.join(__dirname, 'plugin_manager.html')));
+app.get('/plugin_manager.js', (req, res) => res.sendFile(path.join(__dirname, 'plugin_manager.js')));
+
+
+// Catch-all for proxying
+app.all('*', (req, res, next) => {
+    if (req.path.startsWith('/api/') || req.path.startsWith('/plugin-manager')) {
+        return next();
+    }
+    const initialRequestData = {
+        method: req.method, url: req.originalUrl, headers: { ...req.headers },
+        body: req.body, sourceIp: req.ip || req.socket?.remoteAddress
+    };
+    delete initialRequestData.headers['host'];
+    delete initialRequestData.headers['content-length']; 
+    delete initialRequestData.headers['connection']; // 逐跳请求头，与上游的连接由连接池管理
+    delete initialRequestData.headers['keep-alive'];
+    initialRequestData.conversationId = conversationIdFor(initialRequestData);
+
+    if (rootConfig.streaming_passthrough_enabled !== false && isStreamingRequest(initialRequestData.body)) {
+        handleStreamingRequestAndPlugins(req, res, initialRequestData);
+    } else {
+        handleRequestAndPlugins(req, res, initialRequestData);
+    }
+});
+
+// Error handler
+app.use((err, req, res, next) => {
+    console.error("[NodeJS] 未捕获的服务器错误:", err.stack || err.message);
+    if (!res.headersSent) res.status(500).json({ error: '服务器内部错误', details: err.message });
+});
+
+
+// --- Start Server ---
+(async () => {
+    loadRootConfig();
+    await discoverAndLoadPlugins();
+    getPythonPluginHostPool(); // 预先启动插件宿主进程，避免首次插件调用时的解释器启动开销
+    
+    const port = rootConfig.proxy_server_port || 3001;
+    app.listen(port, '0.0.0.0', () => {
+        console.log("======================================================================");
+        console.log(`[NodeJS] Xice_Aitoolbox 监听服务正在运行于端口: ${port}`);
+        console.log(`[NodeJS] 转发到: ${rootConfig.target_proxy_url}`);
+        console.log(`[NodeJS] 插件管理界面: http://localhost:${port}/plugin-manager`);
+        console.log(`[NodeJS] 当前 ConformChat 显示模式: ${rootConfig.conform_chat_display_mode}`);
+        console.log("======================================================================");
+    }).on('error', (err) => {
+        if (err.code === 'EADDRINUSE') console.error(`[NodeJS] 致命错误：端口 ${port} 已被占用。`);
+        else console.error("[NodeJS] 启动服务器失败:", err);
+        process.exit(1);
+    });
+})();
+
+process.on('SIGINT', () => {
+    console.log('[NodeJS] 收到 SIGINT，正在关闭...');
+    shutdownPythonPluginHostPool();
+    closeExchangeLog().finally(() => process.exit(0)); // 写完队列中的日志再退出
 });
\ No newline at end of file
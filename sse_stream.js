@@ -0,0 +1,43 @@
+// 流式 (SSE) 转发使用的工具: SSE 事件解析。在流式文本上增量检测插件占位符的扫描器见 placeholder_matcher.js。
+
+// 把上游的字节流切分为 SSE 事件。每个事件为 { raw: 原始事件文本, data: data 字段内容 (可能为 null) }。
+class SseParser {
+    constructor() {
+        this.buffer = '';
+    }
+
+    push(chunk) {
+        this.buffer += chunk;
+        const events = [];
+        let boundary;
+        while ((boundary = this._findBoundary()) !== null) {
+            const raw = this.buffer.substring(0, boundary.index);
+            this.buffer = this.buffer.substring(boundary.index + boundary.length);
+            if (raw.trim()) events.push(SseParser.parseEvent(raw));
+        }
+        return events;
+    }
+
+    // 上游结束时返回缓冲中剩余的不完整事件
+    flush() {
+        const raw = this.buffer;
+        this.buffer = '';
+        return raw.trim() ? [SseParser.parseEvent(raw)] : [];
+    }
+
+    _findBoundary() {
+        const match = /\r?\n\r?\n/.exec(this.buffer);
+        return match ? { index: match.index, length: match[0].length } : null;
+    }
+
+    static parseEvent(raw) {
+        const dataLines = raw.split(/\r?\n/).filter(line => line.startsWith('data:')).map(line => line.substring(5).replace(/^ /, ''));
+        return { raw, data: dataLines.length > 0 ? dataLines.join('\n') : null };
+    }
+}
+
+function formatSseData(payload) {
+    return `data: ${typeof payload === 'string' ? payload : JSON.stringify(payload)}\n\n`;
+}
+
+module.exports = { SseParser, formatSseData };
@@ -0,0 +1,217 @@
+const http = require('http');
+const https = require('https');
+
+// 到上游 (target_proxy_url) 的 keep-alive 连接池。
+// 一次用户请求在插件调用之间会向上游发出多轮请求 (最多 max_plugin_recursion_depth + max_continuation_depth 轮)，
+// 原先每轮都由 node-fetch 新建 TCP (以及 TLS) 连接，每轮多付出一到三个往返的握手时间。
+// 这里为 http / https 各建一个共享的 keep-alive Agent: 每个上游地址最多 maxSockets 个并发连接，超出的请求排队；
+// 空闲连接最多保留 maxFreeSockets 个，空闲超过 freeSocketTimeoutMs 后关闭 (应小于上游服务器的 keep-alive 超时，
+// 避免复用一个正被服务器关闭的连接；Node.js 的 HTTP 服务器默认为 5 秒)。
+
+function countingAgentClass(Base) {
+    return class CountingAgent extends Base {
+        constructor(options) {
+            super(options);
+            this.requestCount = 0;
+            this.socketsCreated = 0;
+            this.peakActiveSockets = 0;
+            this.peakQueuedRequests = 0;
+        }
+
+        createConnection(...args) {
+            this.socketsCreated++;
+            return super.createConnection(...args);
+        }
+
+        addRequest(req, ...args) {
+            this.requestCount++;
+            super.addRequest(req, ...args);
+            this.peakActiveSockets = Math.max(this.peakActiveSockets, countSockets(this.sockets));
+            this.peakQueuedRequests = Math.max(this.peakQueuedRequests, countSockets(this.requests));
+        }
+    };
+}
+
+const CountingHttpAgent = countingAgentClass(http.Agent);
+const CountingHttpsAgent = countingAgentClass(https.Agent);
+
+function countSockets(socketsByOrigin) {
+    return Object.values(socketsByOrigin).reduce((total, list) => total + list.length, 0);
+}
+
+class UpstreamAgentPool {
+    constructor({ keepAlive = true, maxSockets = 32, maxFreeSockets = 8, freeSocketTimeoutMs = 4000 } = {}) {
+        this.options = { keepAlive, maxSockets: Math.max(1, maxSockets), maxFreeSockets: Math.max(0, maxFreeSockets), freeSocketTimeoutMs };
+        const agentOptions = {
+            keepAlive,
+            maxSockets: this.options.maxSockets,
+            maxFreeSockets: this.options.maxFreeSockets,
+            timeout: freeSocketTimeoutMs > 0 ? freeSocketTimeoutMs : undefined, // keep-alive 时作用于空闲连接
+            scheduling: 'lifo', // 优先复用最近用过的连接，多余的空闲连接更快超时关闭
+        };
+        this.httpAgent = new CountingHttpAgent(agentOptions);
+        this.httpsAgent = new CountingHttpsAgent(agentOptions);
+        this.agentFor = (parsedUrl) => (parsedUrl.protocol === 'https:' ? this.httpsAgent : this.httpAgent); // node-fetch 的 agent 选项
+    }
+
+    stats() {
+        const agents = [this.httpAgent, this.httpsAgent];
+        const sum = (key) => agents.reduce((total, agent) => total + agent[key], 0);
+        const origins = {};
+        for (const agent of agents) {
+            for (const [field, byOrigin] of [['active', agent.sockets], ['free', agent.freeSockets], ['queued', agent.requests]]) {
+                for (const [origin, list] of Object.entries(byOrigin)) {
+                    origins[origin] = origins[origin] || { active: 0, free: 0, queued: 0 };
+                    origins[origin][field] += list.length;
+                }
+            }
+        }
+        const requests = sum('requestCount');
+        const socketsCreated = sum('socketsCreated');
+        const activeSockets = agents.reduce((total, agent) => total + countSockets(agent.sockets), 0);
+        return {
+            keep_alive: this.options.keepAlive,
+            max_sockets_per_origin: this.options.maxSockets,
+            max_free_sockets_per_origin: this.options.maxFreeSockets,
+            free_socket_timeout_ms: this.options.freeSocketTimeoutMs,
+            requests,
+            sockets_created: socketsCreated,
+            sockets_reused: requests - socketsCreated, // 每个请求要么新建连接，要么使用已有连接 (含排队后分到的连接)
+            reuse_ratio: requests ? Number(((requests - socketsCreated) / requests).toFixed(3)) : 0,
+            active_sockets: activeSockets,
+            free_sockets: agents.reduce((total, agent) => total + countSockets(agent.freeSockets), 0),
+            queued_requests: agents.reduce((total, agent) => total + countSockets(agent.requests), 0),
+            peak_active_sockets: Math.max(...agents.map(agent => agent.peakActiveSockets)),
+            peak_queued_requests: Math.max(...agents.map(agent => agent.peakQueuedRequests)),
+            origins, // 每个上游地址: 正在使用、空闲、排队中的连接数 (active / max_sockets_per_origin 即利用率)
+        };
+    }
+
+    // 关闭空闲连接；正在使用的连接在请求结束后直接关闭，不再回到空闲列表。用于配置变更后换用新的连接池。
+    retire() {
+        for (const agent of [this.httpAgent, this.httpsAgent]) {
+            agent.maxFreeSockets = 0;
+            for (const list of Object.values(agent.freeSockets)) list.forEach(socket => socket.destroy());
+        }
+    }
+
+    destroy() {
+        this.httpAgent.destroy();
+        this.httpsAgent.destroy();
+    }
+}
+
+// 空闲计时器: 超过 timeoutMs 没有 touch() 时调用 onExpire。每个数据块只更新时间戳，不重建定时器。
+class IdleDeadline {
+    constructor(onExpire) {
+        this.onExpire = onExpire;
+        this.timer = null;
+        this.expired = false;
+    }
+
+    arm(timeoutMs) {
+        this.clear();
+        this.timeoutMs = timeoutMs;
+        if (!(timeoutMs > 0)) return;
+        this.lastActivity = Date.now();
+        this._schedule(timeoutMs);
+    }
+
+    _schedule(delayMs) {
+        this.timer = setTimeout(() => {
+            const remaining = this.lastActivity + this.timeoutMs - Date.now();
+            if (remaining > 0) return this._schedule(remaining);
+            this.timer = null;
+            this.expired = true;
+            this.onExpire();
+        }, delayMs);
+        this.timer.unref();
+    }
+
+    touch() {
+        this.lastActivity = Date.now();
+    }
+
+    clear() {
+        if (this.timer) clearTimeout(this.timer);
+        this.timer = null;
+    }
+}
+
+// 通过连接池向上游发请求，并为每个请求加上两个超时:
+// responseTimeoutMs 为发出请求到收到响应头的最长时间 (非流式请求的上游通常生成完整回复后才返回响应头)，
+// idleTimeoutMs 为收到响应头后两次收到数据之间的最长间隔。超时会中止请求并关闭该连接。0 表示不限制。
+class UpstreamClient {
+    constructor(fetchImpl, { responseTimeoutMs = 0, idleTimeoutMs = 0, ...poolOptions } = {}) {
+        this.fetchImpl = fetchImpl;
+        this.pool = new UpstreamAgentPool(poolOptions);
+        this.responseTimeoutMs = responseTimeoutMs;
+        this.idleTimeoutMs = idleTimeoutMs;
+        this.deadlines = new WeakMap();
+        this.counters = { awaiting_response: 0, response_timeouts: 0, idle_timeouts: 0, errors: 0 };
+    }
+
+    async fetch(url, init = {}) {
+        const controller = new AbortController();
+        const deadline = new IdleDeadline(() => controller.abort());
+        deadline.arm(this.responseTimeoutMs);
+        this.counters.awaiting_response++;
+        try {
+            const response = await this.fetchImpl(url, { ...init, agent: this.pool.agentFor, signal: controller.signal });
+            deadline.arm(this.idleTimeoutMs);
+            this.deadlines.set(response, deadline);
+            return response;
+        } catch (error) {
+            deadline.clear();
+            if (deadline.expired) {
+                this.counters.response_timeouts++;
+                throw new Error(`上游在 ${this.responseTimeoutMs / 1000} 秒内没有返回响应头，已中止请求。`);
+            }
+            this.counters.errors++;
+            throw error;
+        } finally {
+            this.counters.awaiting_response--;
+        }
+    }
+
+    // 逐块读取响应体，每个数据块重置空闲超时。提前退出循环 (break) 时同样清除计时器。
+    async *body(response) {
+        const deadline = this.deadlines.get(response);
+        try {
+            for await (const chunk of response.body) {
+                if (deadline) deadline.touch();
+                yield chunk;
+            }
+        } catch (error) {
+            if (deadline && deadline.expired) {
+                this.counters.idle_timeouts++;
+                throw new Error(`上游超过 ${this.idleTimeoutMs / 1000} 秒没有返回数据，已中止请求。`);
+            }
+            this.counters.errors++;
+            throw error;
+        } finally {
+            if (deadline) deadline.clear();
+        }
+    }
+
+    async buffer(response) {
+        const chunks = [];
+        for await (const chunk of this.body(response)) chunks.push(chunk);
+        return Buffer.concat(chunks);
+    }
+
+    stats() {
+        return {
+            ...this.pool.stats(),
+            ...this.counters,
+            response_timeout_ms: this.responseTimeoutMs,
+            idle_timeout_ms: this.idleTimeoutMs,
+        };
+    }
+
+    retire() {
+        this.pool.retire();
+    }
+}
+
+module.exports = { UpstreamAgentPool, UpstreamClient };